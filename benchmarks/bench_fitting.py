@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from synthetic import make_xy_data, make_ogip_files, read_ogip_plugin, make_spectral_model, \
+    benchmark_data_directory
+from threeML.classicMLE.joint_likelihood import JointLikelihood
+from threeML.data_list import DataList
+
+XY_SIZES = [50, 500, 5000]
+
+OGIP_SIZES = [(128, 140), (512, 600)]
+
+
+def _fit(jl):
+
+    jl.fit(quiet=True, compute_covariance=True)
+
+    return jl
+
+
+@pytest.fixture(scope="module", params=XY_SIZES, ids=lambda size: "%d_points" % size)
+def xy_joint_likelihood(request):
+
+    model, xy = make_xy_data(request.param)
+
+    return JointLikelihood(model, DataList(xy))
+
+
+@pytest.fixture(scope="module", params=OGIP_SIZES, ids=lambda size: "%dx%d" % size)
+def ogip_joint_likelihood(request):
+
+    directory = benchmark_data_directory()
+
+    ogip = read_ogip_plugin(directory, make_ogip_files(directory, *request.param))
+
+    return JointLikelihood(make_spectral_model(), DataList(ogip))
+
+
+def _reset_and_fit(jl):
+
+    # every round starts from the same (non optimal) point
+
+    def setup():
+
+        for parameter in jl.likelihood_model.free_parameters.values():
+
+            parameter.value = parameter.value * 0.9
+
+        return (jl,)
+
+    return setup
+
+
+def bench_xylike_fit(measure_with_setup, xy_joint_likelihood):
+
+    measure_with_setup(_fit, _reset_and_fit(xy_joint_likelihood))
+
+
+def bench_ogiplike_fit(measure_with_setup, ogip_joint_likelihood):
+
+    measure_with_setup(_fit, _reset_and_fit(ogip_joint_likelihood))
+
+
+def bench_xylike_error_propagation(measure, xy_joint_likelihood):
+
+    jl = _fit(xy_joint_likelihood)
+
+    results = jl.results
+
+    fit_function = results.optimized_model.synthetic.spectrum.main.shape
+
+    # propagate the errors on all the free parameters through the function, at many x values
+
+    x = np.linspace(0, 10, 20)
+
+    def propagate():
+
+        arguments = {}
+
+        for parameter in fit_function.parameters.values():
+
+            if parameter.free:
+
+                arguments[parameter.name] = results.get_variates(parameter.path)
+
+        propagated = results.propagate(fit_function.evaluate_at, **arguments)
+
+        return [propagated(this_x) for this_x in x]
+
+    values = measure(propagate)
+
+    assert len(values) == len(x)
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from synthetic import make_response, make_ogip_files, read_ogip_plugin, make_spectral_model, \
+    benchmark_data_directory
+
+# (n_channels, n_mc_energies)
+
+RESPONSE_SIZES = [(128, 140), (512, 600), (2048, 2400)]
+
+
+@pytest.fixture(scope="module", params=RESPONSE_SIZES, ids=lambda size: "%dx%d" % size)
+def ogip_files(request):
+
+    directory = benchmark_data_directory()
+
+    return directory, make_ogip_files(directory, *request.param)
+
+
+@pytest.fixture(scope="module")
+def ogip_plugin(ogip_files):
+
+    ogip = read_ogip_plugin(*ogip_files)
+
+    ogip.set_model(make_spectral_model())
+
+    return ogip
+
+
+@pytest.mark.parametrize("size", RESPONSE_SIZES, ids=lambda size: "%dx%d" % size)
+def bench_response_convolve(measure, size):
+
+    response = make_response(*size)
+
+    spectrum = make_spectral_model().synthetic.spectrum.main.shape
+
+    # integrate the model with the trapezoid rule, as the plugins do
+
+    def integral(e1, e2):
+
+        return (e2 - e1) / 2.0 * (spectrum(e1) + spectrum(e2))
+
+    response.set_function(integral)
+
+    folded = measure(response.convolve)
+
+    assert folded.shape == (size[0],)
+
+
+def bench_ogiplike_get_log_like(measure, ogip_plugin):
+
+    log_like = measure(ogip_plugin.get_log_like)
+
+    assert np.isfinite(log_like)
+
+
+def bench_ogiplike_read(measure, ogip_files):
+
+    measure(read_ogip_plugin, *ogip_files)
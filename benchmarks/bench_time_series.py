@@ -0,0 +1,66 @@
+import pytest
+
+from synthetic import make_event_list
+from threeML.utils.bayesian_blocks import bayesian_blocks
+
+EVENT_LIST_SIZES = [10000, 100000, 1000000]
+
+BAYESIAN_BLOCKS_SIZES = [1000, 5000, 20000]
+
+
+@pytest.fixture(scope="module", params=EVENT_LIST_SIZES, ids=lambda size: "%d_events" % size)
+def event_list(request):
+
+    return make_event_list(request.param)
+
+
+@pytest.fixture(scope="module")
+def fitted_event_list(event_list):
+
+    event_list.set_polynomial_fit_interval('-100.--10.', '50.-200.', unbinned=False)
+
+    return event_list
+
+
+def _fit_polynomial(event_list, unbinned):
+
+    event_list.set_polynomial_fit_interval('-100.--10.', '50.-200.', unbinned=unbinned)
+
+
+@pytest.mark.parametrize("unbinned", [False, True], ids=["binned", "unbinned"])
+def bench_event_list_polynomial_fit(measure_with_setup, event_list, unbinned):
+
+    # the event list is shared by the benchmarks, so the cache of the polynomial fits is emptied before each round
+    # (otherwise all rounds but the first would only restore the cached fit)
+
+    def setup():
+
+        event_list._polynomial_fit_cache.clear()
+
+        return event_list, unbinned
+
+    measure_with_setup(_fit_polynomial, setup)
+
+
+def bench_event_list_bin_by_significance(measure, fitted_event_list):
+
+    measure(fitted_event_list.bin_by_significance, -10., 50., sigma=5)
+
+    assert len(fitted_event_list.bins) > 0
+
+
+def bench_event_list_active_interval(measure, fitted_event_list):
+
+    measure(fitted_event_list.set_active_time_intervals, '0.-10.')
+
+
+@pytest.mark.parametrize("n_events", BAYESIAN_BLOCKS_SIZES, ids=lambda size: "%d_events" % size)
+def bench_bayesian_blocks(measure, n_events):
+
+    event_list = make_event_list(n_events, n_channels=8)
+
+    arrival_times = event_list.arrival_times
+
+    edges = measure(bayesian_blocks, arrival_times, arrival_times[0], arrival_times[-1], 1E-3)
+
+    assert len(edges) >= 2
@@ -0,0 +1,90 @@
+import gc
+
+import numpy as np
+import pytest
+
+try:
+
+    import tracemalloc
+
+except ImportError:
+
+    has_tracemalloc = False
+
+else:
+
+    has_tracemalloc = True
+
+
+def peak_memory(function, *args, **kwargs):
+    """
+    the peak memory allocated (in bytes) during one call of the function, or None if tracemalloc is not available
+
+    :param function: the function to call
+    :return: peak memory in bytes
+    """
+
+    if not has_tracemalloc:
+
+        return None
+
+    gc.collect()
+
+    tracemalloc.start()
+
+    try:
+
+        function(*args, **kwargs)
+
+        _, peak = tracemalloc.get_traced_memory()
+
+    finally:
+
+        tracemalloc.stop()
+
+    return peak
+
+
+@pytest.fixture(scope="function", autouse=True)
+def reset_random_seed():
+
+    np.random.seed(1234)
+
+    np.seterr(over='ignore', under='ignore', divide='ignore', invalid='ignore')
+
+
+@pytest.fixture(scope="function")
+def measure(benchmark):
+    """
+    Benchmark a function for time (with pytest-benchmark) and for peak memory (with one more
+    call traced by tracemalloc). The peak memory is stored in the extra info of the benchmark,
+    so that it ends up in the json output and can be compared against a baseline.
+    """
+
+    def run(function, *args, **kwargs):
+
+        result = benchmark(function, *args, **kwargs)
+
+        benchmark.extra_info['peak_memory'] = peak_memory(function, *args, **kwargs)
+
+        return result
+
+    return run
+
+
+@pytest.fixture(scope="function")
+def measure_with_setup(benchmark):
+    """
+    Like measure, for functions which change the state they work on (for example a fit): setup() is called
+    before each round (outside of the timing) and returns the tuple of arguments of the function.
+    """
+
+    def run(function, setup, rounds=5):
+
+        result = benchmark.pedantic(function, setup=lambda: (setup(), {}), rounds=rounds)
+
+        benchmark.extra_info['peak_memory'] = peak_memory(function, *setup())
+
+        return result
+
+    return run
@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+"""
+Run the benchmarks and store the results as a baseline, or compare them against a stored baseline.
+
+Examples:
+
+    # on the reference version of the code
+    python benchmarks/run_benchmarks.py --save-baseline master
+
+    # on the version to test (exits with status 1 if something got slower or bigger by more than 20%)
+    python benchmarks/run_benchmarks.py --compare master --threshold 20
+
+The baselines are json files (in the pytest-benchmark format) in benchmarks/baselines.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+benchmarks_directory = os.path.dirname(os.path.abspath(__file__))
+
+baselines_directory = os.path.join(benchmarks_directory, 'baselines')
+
+
+def run_benchmarks(json_output, selection=None, extra_arguments=()):
+    """
+    run the benchmarks with pytest-benchmark
+
+    :param json_output: where to write the results
+    :param selection: a pytest -k expression to select the benchmarks
+    :param extra_arguments: more arguments for pytest
+    :return: the exit code of pytest
+    """
+
+    arguments = [benchmarks_directory,
+                 '-o', 'python_files=bench_*.py',
+                 '-o', 'python_functions=bench_*',
+                 '-p', 'no:cacheprovider',
+                 '--benchmark-only',
+                 '--benchmark-json=%s' % json_output,
+                 '--benchmark-columns=min,mean,stddev,rounds']
+
+    if selection is not None:
+
+        arguments.extend(['-k', selection])
+
+    arguments.extend(extra_arguments)
+
+    return pytest.main(arguments)
+
+
+def load_results(filename):
+    """
+    :param filename: a json file written by pytest-benchmark
+    :return: dictionary {benchmark name: (mean time, peak memory)}
+    """
+
+    with open(filename) as f:
+
+        data = json.load(f)
+
+    return dict((benchmark['fullname'], (benchmark['stats']['mean'], benchmark['extra_info'].get('peak_memory')))
+                for benchmark in data['benchmarks'])
+
+
+def compare_results(baseline, current, threshold):
+    """
+    compare the mean time and the peak memory of each benchmark with the baseline
+
+    :param baseline: the results of the baseline (as returned by load_results)
+    :param current: the current results (as returned by load_results)
+    :param threshold: the maximum allowed increase, in percent
+    :return: list of the regressions, as (benchmark name, quantity, baseline, current)
+    """
+
+    regressions = []
+
+    line_format = "%-80s %12s %12s %8s"
+
+    print(line_format % ("benchmark", "baseline", "current", "change"))
+
+    for name in sorted(current):
+
+        if name not in baseline:
+
+            print(line_format % (name, "-", "-", "new"))
+
+            continue
+
+        for quantity, baseline_value, current_value in zip(['time', 'memory'], baseline[name], current[name]):
+
+            if baseline_value is None or current_value is None or baseline_value == 0:
+
+                continue
+
+            change = (current_value / float(baseline_value) - 1) * 100
+
+            print(line_format % ("%s [%s]" % (name, quantity), "%.4g" % baseline_value, "%.4g" % current_value,
+                                 "%+.1f%%" % change))
+
+            if change > threshold:
+
+                regressions.append((name, quantity, baseline_value, current_value))
+
+    return regressions
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+
+    parser.add_argument('--save-baseline', metavar='NAME', help='store the results as the baseline NAME')
+    parser.add_argument('--compare', metavar='NAME', help='compare the results against the baseline NAME')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help='maximum allowed increase of time or memory, in percent (default: 10)')
+    parser.add_argument('-k', dest='selection', help='pytest expression selecting the benchmarks to run')
+
+    args, extra_arguments = parser.parse_known_args(argv)
+
+    output_directory = tempfile.mkdtemp()
+
+    try:
+
+        json_output = os.path.join(output_directory, 'results.json')
+
+        exit_code = run_benchmarks(json_output, args.selection, extra_arguments)
+
+        if exit_code != 0:
+
+            return exit_code
+
+        if args.save_baseline is not None:
+
+            if not os.path.exists(baselines_directory):
+
+                os.makedirs(baselines_directory)
+
+            shutil.copy(json_output, os.path.join(baselines_directory, '%s.json' % args.save_baseline))
+
+        if args.compare is not None:
+
+            baseline = load_results(os.path.join(baselines_directory, '%s.json' % args.compare))
+
+            regressions = compare_results(baseline, load_results(json_output), args.threshold)
+
+            if regressions:
+
+                print("\n%d regression(s) above %.1f%%:" % (len(regressions), args.threshold))
+
+                for name, quantity, baseline_value, current_value in regressions:
+
+                    print("  %s [%s]: %.4g -> %.4g" % (name, quantity, baseline_value, current_value))
+
+                return 1
+
+    finally:
+
+        shutil.rmtree(output_directory)
+
+    return 0
+
+
+if __name__ == '__main__':
+
+    sys.exit(main())
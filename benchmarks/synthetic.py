@@ -0,0 +1,200 @@
+"""
+Synthetic data sets for the benchmarks. Everything is generated from fixed seeds, so
+that two runs of the benchmarks (on different versions of the code) use exactly the same data.
+"""
+
+import os
+
+import numpy as np
+from astromodels import Powerlaw, Line, Gaussian, Model, PointSource
+
+from threeML.io.file_utils import within_directory
+from threeML.plugins.DispersionSpectrumLike import DispersionSpectrumLike
+from threeML.plugins.OGIPLike import OGIPLike
+from threeML.plugins.XYLike import XYLike
+from threeML.utils.OGIP.response import InstrumentResponse
+from threeML.utils.time_series.event_list import EventListWithDeadTime
+
+
+def make_response(n_channels, n_mc_energies):
+    """
+    a response with a gaussian energy dispersion (in log energy) and a smooth effective area
+
+    :param n_channels: number of detector channels
+    :param n_mc_energies: number of monte carlo energy bins
+    :return: InstrumentResponse
+    """
+
+    ebounds = np.logspace(1, 3.5, n_channels + 1)
+    mc_energies = np.logspace(0.8, 3.7, n_mc_energies + 1)
+
+    log_mc_centers = np.log10(np.sqrt(mc_energies[:-1] * mc_energies[1:]))
+    log_channel_centers = np.log10(np.sqrt(ebounds[:-1] * ebounds[1:]))
+
+    dispersion = np.exp(-0.5 * ((log_channel_centers[:, np.newaxis] - log_mc_centers[np.newaxis, :]) / 0.05) ** 2)
+
+    dispersion /= dispersion.sum(axis=0)
+
+    effective_area = 100. * np.exp(-0.5 * ((log_mc_centers - 2.) / 0.8) ** 2)
+
+    return InstrumentResponse(dispersion * effective_area, ebounds, mc_energies)
+
+
+def make_ogip_files(directory, n_channels, n_mc_energies, seed=1234):
+    """
+    simulate a spectrum with background through a synthetic response and write it as OGIP PHA/BAK/RSP files
+
+    :param directory: where to write the files
+    :param n_channels: number of detector channels
+    :param n_mc_energies: number of monte carlo energy bins
+    :param seed: random seed
+    :return: the name of the observation (PHA II) file, relative to the directory
+    """
+
+    np.random.seed(seed)
+
+    response = make_response(n_channels, n_mc_energies)
+
+    source_function = Powerlaw(K=10., index=-1.5, piv=100.)
+    background_function = Powerlaw(K=5., index=-1.2, piv=100.)
+
+    simulated = DispersionSpectrumLike.from_function('sim',
+                                                     source_function=source_function,
+                                                     background_function=background_function,
+                                                     response=response)
+
+    with within_directory(directory):
+
+        simulated.write_pha('synthetic_%d_%d' % (n_channels, n_mc_energies), overwrite=True, force_rsp_write=True)
+
+    return 'synthetic_%d_%d.pha{1}' % (n_channels, n_mc_energies)
+
+
+def read_ogip_plugin(directory, observation):
+    """
+    read back an OGIP plugin written by make_ogip_files
+
+    :param directory: the directory of the files
+    :param observation: the name of the observation file
+    :return: OGIPLike
+    """
+
+    with within_directory(directory):
+
+        ogip = OGIPLike('synthetic', observation=observation, verbose=False)
+
+    return ogip
+
+
+def make_spectral_model():
+    """
+    :return: a model with one point source with a power law spectrum
+    """
+
+    return Model(PointSource('synthetic', 0.0, 0.0, spectral_shape=Powerlaw(K=10., index=-1.5, piv=100.)))
+
+
+def make_event_list(n_events, n_channels=128, seed=1234):
+    """
+    a TTE-like event list with dead time: a background with a linear trend over [-100, 200] s
+    plus a burst with a fast rise and exponential decay starting at t=0
+
+    :param n_events: the total number of events
+    :param n_channels: number of channels
+    :param seed: random seed
+    :return: EventListWithDeadTime
+    """
+
+    np.random.seed(seed)
+
+    n_burst = n_events // 5
+    n_background = n_events - n_burst
+
+    # linear background by inverse transform sampling of (1 + 0.002 t)
+
+    u = np.random.uniform(0, 1, n_background)
+
+    a, b = 1., 0.002
+    t_min, t_max = -100., 200.
+
+    cdf_min = a * t_min + 0.5 * b * t_min ** 2
+    cdf_max = a * t_max + 0.5 * b * t_max ** 2
+
+    target = cdf_min + u * (cdf_max - cdf_min)
+
+    background_times = (-a + np.sqrt(a ** 2 + 2 * b * target)) / b
+
+    burst_times = np.random.exponential(5., n_burst) + np.random.uniform(0., 1., n_burst)
+
+    burst_times = burst_times[burst_times < t_max]
+
+    arrival_times = np.sort(np.concatenate((background_times, burst_times)))
+
+    channels = np.random.randint(0, n_channels, arrival_times.shape[0])
+
+    dead_time = np.random.uniform(2.6E-6, 1E-5, arrival_times.shape[0])
+
+    return EventListWithDeadTime(arrival_times=arrival_times,
+                                 measurement=channels,
+                                 n_channels=n_channels,
+                                 start_time=t_min,
+                                 stop_time=t_max,
+                                 dead_time=dead_time,
+                                 first_channel=0,
+                                 instrument='synthetic',
+                                 mission='synthetic',
+                                 verbose=False)
+
+
+def make_xy_data(n_points, seed=1234):
+    """
+    Poisson XY data of a line plus a gaussian line, with the model to fit it
+
+    :param n_points: number of data points
+    :param seed: random seed
+    :return: (model, XYLike)
+    """
+
+    np.random.seed(seed)
+
+    generator = Line() + Gaussian()
+
+    generator.b_1 = 40.0
+    generator.a_1 = 0.8
+    generator.mu_2 = 5.0
+    generator.sigma_2 = 0.32
+    generator.F_2 = 70.4
+
+    x = np.linspace(0, 10, n_points)
+
+    y = np.random.poisson(generator(x))
+
+    xy = XYLike('synthetic', x, y, poisson_data=True)
+
+    fit_function = Line() + Gaussian()
+
+    fit_function.a_1.bounds = (-10, 10.0)
+    fit_function.b_1.bounds = (-100, 100.0)
+    fit_function.F_2 = 60.0
+    fit_function.F_2.bounds = (1e-3, 200.0)
+    fit_function.mu_2 = 4.5
+    fit_function.mu_2.bounds = (0.0, 100.0)
+    fit_function.sigma_2.bounds = (1e-3, 10.0)
+
+    model = Model(PointSource('synthetic', 0.0, 0.0, fit_function))
+
+    return model, xy
+
+
+def benchmark_data_directory():
+    """
+    :return: the directory where the synthetic files are written (created if needed)
+    """
+
+    directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.synthetic_data')
+
+    if not os.path.exists(directory):
+
+        os.makedirs(directory)
+
+    return directory
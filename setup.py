@@ -121,7 +121,7 @@ setup(
     install_requires=[
         'numpy >= 1.6',
         'scipy >=0.18',
-        'emcee',
+        'emcee<3',
         'astropy>=1.3.3',
         'astroquery',
         'matplotlib',
@@ -209,7 +209,7 @@ from threeML.io.plotting.post_process_data_plots import display_spectrum_model_c
     display_photometry_model_magnitudes
 
 # Import the joint likelihood set
-from .classicMLE.joint_likelihood_set import JointLikelihoodSet, JointLikelihoodSetAnalyzer
+from .classicMLE.joint_likelihood_set import JointLikelihoodSet, JointLikelihoodSetAnalyzer, TimeResolvedJointLikelihoodSet
 from .classicMLE.likelihood_ratio_test import LikelihoodRatioTest
 from .classicMLE.goodness_of_fit import GoodnessOfFit
 
@@ -3,6 +3,7 @@ import datetime
 import functools
 import inspect
 import math
+import os
 
 import astromodels
 import astropy.units as u
@@ -28,7 +29,7 @@ else:
     has_chainconsumer = True
 
 from threeML.exceptions.custom_exceptions import custom_warnings
-from threeML.io.file_utils import sanitize_filename
+from threeML.io.file_utils import sanitize_filename, is_hdf5_file
 from threeML.io.fits_file import fits, FITSFile, FITSExtension
 from threeML.io.rich_display import display
 from threeML.io.table import NumericMatrix
@@ -60,12 +61,22 @@ def _escape_back_yaml_from_fits(yaml_code):
 
 def load_analysis_results(fits_file):
     """
-    Load the results of one or more analysis from a FITS file produced by 3ML
+    Load the results of one or more analysis from a FITS file produced by 3ML, or from a HDF5 store of results
+    (see AnalysisResultsSet.write_to)
 
     :param fits_file: path to the FITS file containing the results, as output by MLEResults or BayesianResults
-    :return: a new instance of either MLEResults or Bayesian results dending on the type of the input FITS file
+    :return: a new instance of either MLEResults or Bayesian results dending on the type of the input FITS file (for a
+    HDF5 store, a LazyAnalysisResultsSet)
     """
 
+    if is_hdf5_file(fits_file):
+
+        # a columnar store of results, which is read lazily
+
+        from threeML.io.analysis_results_store import LazyAnalysisResultsSet
+
+        return LazyAnalysisResultsSet(fits_file)
+
     with fits.open(fits_file) as f:
 
         n_results = map(lambda x: x.name, f).count('ANALYSIS_RESULTS')
@@ -358,9 +369,13 @@ class _AnalysisResults(object):
 
         self._n_free_parameters = len(optimized_model.free_parameters)
 
-        assert samples.shape[1] == self._n_free_parameters, "Number of free parameters (%s) and set of samples (%s) " \
-                                                            "do not agree." % (samples.shape[1],
-                                                                               self._n_free_parameters)
+        # samples can be None if the subclass generates them on demand (see _generate_samples)
+
+        if samples is not None:
+
+            assert samples.shape[1] == self._n_free_parameters, "Number of free parameters (%s) and set of samples " \
+                                                                "(%s) do not agree." % (samples.shape[1],
+                                                                                        self._n_free_parameters)
 
         # NOTE: we clone the model so that whatever happens outside or after, this copy of the model will not be
         # changed
@@ -369,7 +384,13 @@ class _AnalysisResults(object):
 
         # Save a transposed version of the samples for easier access
 
-        self._samples_transposed = samples.T
+        if samples is not None:
+
+            self._stored_samples_transposed = samples.T
+
+        else:
+
+            self._stored_samples_transposed = None
 
         # Store likelihood values in a pandas Series
 
@@ -389,6 +410,21 @@ class _AnalysisResults(object):
         # Set the analysis type
         self._analysis_type = analysis_type
 
+    @property
+    def _samples_transposed(self):
+
+        # Generate the samples the first time they are needed, if they were not provided
+
+        if self._stored_samples_transposed is None:
+
+            self._stored_samples_transposed = self._generate_samples().T
+
+        return self._stored_samples_transposed
+
+    def _generate_samples(self):
+
+        raise NotImplementedError("You need to implement this")
+
     @property
     def samples(self):
         """
@@ -616,14 +652,17 @@ class _AnalysisResults(object):
 
             parameter_paths.append(this_par.path)
 
-            this_phys_q = self.get_variates(parameter_paths[-1])
+            # the best fit value is stored, the samples are used only for the errors which need them (for MLE results
+            # they are generated the first time they are needed, see MLEResults)
 
-            values.append(this_phys_q.value)
+            values.append(self._values[i])
 
             units_dict.append(this_par.unit)
 
             if error_type != "covariance":
 
+                this_phys_q = self.get_variates(parameter_paths[-1])
+
                 low_bound, hi_bound = errors_gatherer(this_phys_q, cl)
 
                 negative_errors.append(low_bound - values[-1])
@@ -1287,6 +1326,73 @@ class BayesianResults(_AnalysisResults):
 
 
 
+def _sample_truncated_multivariate_normal(mean, covariance, low_bounds, hi_bounds, n_samples, max_rounds=100):
+    """
+    Draw samples from a multivariate normal distribution truncated to the box [low_bounds, hi_bounds], by rejection.
+    The decomposition of the covariance matrix is done only once, and samples are drawn in blocks until n_samples
+    samples have been accepted (or max_rounds blocks have been drawn).
+
+    :return: (samples, fraction of the drawn samples which were accepted)
+    """
+
+    n_parameters = mean.shape[0]
+
+    if n_samples <= 0:
+
+        return np.zeros((0, n_parameters)), 1.0
+
+    try:
+
+        decomposition = np.linalg.cholesky(covariance)
+
+    except np.linalg.LinAlgError:
+
+        # The covariance matrix is only positive semi-definite (for example if one parameter has zero error), use
+        # its eigen-decomposition instead
+
+        eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+
+        decomposition = eigenvectors * np.sqrt(np.maximum(eigenvalues, 0))
+
+    accepted = []
+
+    n_accepted = 0
+    n_drawn = 0
+    acceptance = 1.0
+
+    for _ in range(max_rounds):
+
+        n_needed = n_samples - n_accepted
+
+        if n_needed <= 0:
+
+            break
+
+        # Draw a bit more than what we expect to need given the acceptance so far
+
+        n_to_draw = int(np.ceil(n_needed / max(acceptance, 1e-3) * 1.1))
+
+        these_samples = mean + np.dot(np.random.standard_normal((n_to_draw, n_parameters)), decomposition.T)
+
+        to_be_kept = np.all((these_samples >= low_bounds) & (these_samples <= hi_bounds), axis=1)
+
+        accepted.append(these_samples[to_be_kept])
+
+        n_accepted += accepted[-1].shape[0]
+        n_drawn += n_to_draw
+
+        acceptance = float(n_accepted) / n_drawn
+
+    samples = np.concatenate(accepted)[:n_samples]
+
+    if samples.shape[0] < n_samples:
+
+        custom_warnings.warn("Could only generate %i of the %i samples requested within the boundaries of the "
+                             "parameters" % (samples.shape[0], n_samples))
+
+    return samples, float(n_accepted) / n_drawn
+
+
 class MLEResults(_AnalysisResults):
     """
     Build the _AnalysisResults object starting from a covariance matrix.
@@ -1300,18 +1406,22 @@ class MLEResults(_AnalysisResults):
     :type likelihood_values: dict
     :param n_samples: Number of samples to use
     :type n_samples: int
+    :param lazy: if True (default), the samples are generated only when they are first needed (for example for error
+    propagation)
+    :type lazy: bool
     :return: an _AnalysisResults instance
     """
 
-    def __init__(self, optimized_model, covariance_matrix, likelihood_values, n_samples=5000, statistical_measures=None):
-
-        # Generate samples for each parameter accounting for their covariance
+    def __init__(self, optimized_model, covariance_matrix, likelihood_values, n_samples=5000, statistical_measures=None,
+                 lazy=True):
 
         # Force covariance into proper type
         covariance_matrix = np.array(covariance_matrix, float, copy=True)
 
+        free_parameters = optimized_model.free_parameters.values()
+
         # Get the best fit value for each parameter
-        values = map(lambda x:x._get_internal_value(), optimized_model.free_parameters.values())
+        values = np.array(map(lambda x: x._get_internal_value(), free_parameters), float)
 
         # This is the expected shape for the covariance matrix
 
@@ -1325,66 +1435,113 @@ class MLEResults(_AnalysisResults):
 
             assert np.all(np.isfinite(covariance_matrix)), "Covariance matrix contains Nan or inf. Cannot continue."
 
-            # Generate samples from the multivariate normal distribution, i.e., accounting for the covariance of the
-            # parameters
-
-            samples = np.random.multivariate_normal(np.array(values).T, covariance_matrix, n_samples)
+            self._has_errors = True
 
         else:
 
-            # No error information, just make duplicates of the values
-            samples = np.ones((n_samples, len(values))) * np.array(values)
+            # No error information, the samples will be duplicates of the values
+
+            self._has_errors = False
 
             # Make a fake covariance matrix
             covariance_matrix = np.zeros(expected_shape)
 
-        # Now reject the samples outside of the boundaries. If we reject more than 1% we warn the user
-
         # Gather boundaries
         # NOTE: every None boundary will become nan thanks to the casting to float
-        low_bounds = np.array(map(lambda x: x._get_internal_min_value(), optimized_model.free_parameters.values()), float)
-        hi_bounds = np.array(map(lambda x: x._get_internal_max_value(), optimized_model.free_parameters.values()), float)
+        low_bounds = np.array(map(lambda x: x._get_internal_min_value(), free_parameters), float)
+        hi_bounds = np.array(map(lambda x: x._get_internal_max_value(), free_parameters), float)
 
         # Fix all nans
         low_bounds[np.isnan(low_bounds)] = -np.inf
         hi_bounds[np.isnan(hi_bounds)] = np.inf
 
-        to_be_kept_mask = np.ones(samples.shape[0], bool)
+        # Store everything which is needed to generate the samples, so that they can be generated later on (the
+        # optimized model is cloned by the base class, so we keep the transformations here)
 
-        for i, sample in enumerate(samples):
+        self._internal_values = values
+        self._internal_low_bounds = low_bounds
+        self._internal_hi_bounds = hi_bounds
+        self._transformations = [parameter.transformation if parameter.has_transformation() else None
+                                 for parameter in free_parameters]
 
-            if np.any(sample > hi_bounds) or np.any(sample < low_bounds):
-                # Remove this sample
-                to_be_kept_mask[i] = False
+        self._n_samples = int(n_samples)
 
-        # Compute how many samples we have removed
-        n_removed_samples = samples.shape[0] - np.sum(to_be_kept_mask)
+        # Store the covariance matrix
 
-        # Warn the user if more than 1% of the samples have been lost
+        self._covariance_matrix = covariance_matrix
 
-        if n_removed_samples > samples.shape[0] / 100.0:
-            custom_warnings.warn("%s percent of samples have been thrown away because they failed the constraints "
-                                 "on the parameters. This results might not be suitable for error propagation. "
-                                 "Enlarge the boundaries until you loose less than 1 percent of the samples." %
-                                 (float(n_removed_samples) / samples.shape[0] * 100.0))
+        # Build the class. The samples are generated when they are first needed, unless lazy is False
 
-        # Now remove them
-        samples = samples[to_be_kept_mask, :]
+        super(MLEResults, self).__init__(optimized_model, None, likelihood_values, "MLE", statistical_measures)
 
-        # Now transform in the external space
-        for i, parameter in enumerate(optimized_model.free_parameters.values()):
+        if not lazy:
 
-            if parameter.has_transformation():
+            _ = self._samples_transposed
 
-                samples[:, i] = parameter.transformation.backward(samples[:, i])
+    @property
+    def n_samples(self):
+        """
+        The number of samples (to be) generated from the covariance matrix
 
-        # Finally build the class
+        :return: number of samples
+        """
 
-        super(MLEResults, self).__init__(optimized_model, samples, likelihood_values, "MLE", statistical_measures)
+        return self._n_samples
 
-        # Store the covariance matrix
+    def set_number_of_samples(self, n_samples):
+        """
+        Change the number of samples generated from the covariance matrix. Samples already generated are discarded
+        and new ones will be generated the next time they are needed.
 
-        self._covariance_matrix = covariance_matrix
+        :param n_samples: the new number of samples
+        :return: none
+        """
+
+        self._n_samples = int(n_samples)
+
+        self._stored_samples_transposed = None
+
+    def _generate_samples(self):
+        """
+        Generate samples for each parameter accounting for their covariance, keeping only the samples within the
+        boundaries of the parameters (in the internal space). Rejected samples are replaced by new ones, so that
+        n_samples samples are always returned (unless the acceptance is extremely low).
+
+        :return: (n_samples, n_free_parameters) array of samples in the external space
+        """
+
+        n_parameters = self._internal_values.shape[0]
+
+        if not self._has_errors:
+
+            # No error information, just make duplicates of the values
+            samples = np.ones((self._n_samples, n_parameters)) * self._internal_values
+
+        else:
+
+            samples, acceptance = _sample_truncated_multivariate_normal(self._internal_values,
+                                                                        self._covariance_matrix,
+                                                                        self._internal_low_bounds,
+                                                                        self._internal_hi_bounds,
+                                                                        self._n_samples)
+
+            # Warn the user if more than 1% of the samples have been rejected
+
+            if acceptance < 0.99:
+
+                custom_warnings.warn("%s percent of samples have been thrown away because they failed the "
+                                     "constraints on the parameters. This results might not be suitable for error "
+                                     "propagation. Enlarge the boundaries until you loose less than 1 percent of the "
+                                     "samples." % ((1 - acceptance) * 100.0))
+
+        # Now transform in the external space
+        for i, transformation in enumerate(self._transformations):
+
+            if transformation is not None:
+
+                samples[:, i] = transformation.backward(samples[:, i])
+
+        return samples
 
     @property
     def covariance_matrix(self):
@@ -1410,6 +1567,20 @@ class MLEResults(_AnalysisResults):
 
         return self._get_statistic_frame(name='-log(likelihood)')
 
+    def get_data_frame(self, error_type="covariance", cl=0.68):
+        """
+        Returns a pandas DataFrame with the parameters and their errors. By default the errors are computed from the
+        covariance matrix (as in display), which does not need the samples. "equal tail" and "hpd" errors are
+        computed from the samples (which are generated the first time they are needed)
+
+        :param error_type: "covariance" (default), "equal tail" or "hpd" (highest posterior density)
+        :type error_type: str
+        :param cl: confidence level (0 < cl < 1), used only for "equal tail" and "hpd"
+        :return: a pandas DataFrame instance
+        """
+
+        return self._get_results_table(error_type, cl, covariance=self._covariance_matrix).frame
+
     def display(self, display_correlation=True, cl=0.68):
 
         best_fit_table = self._get_results_table(error_type="covariance", cl=cl, covariance=self.covariance_matrix)
@@ -1538,13 +1709,22 @@ class AnalysisResultsSet(collections.Sequence):
 
     def write_to(self, filename, overwrite=False):
         """
-        Write this set of results to a FITS file.
+        Write this set of results to a FITS file or, if the name ends with .h5 or .hdf5, to a columnar HDF5 store
+        (which is faster to write and to read for large sets, see threeML.io.analysis_results_store).
 
         :param filename: name for the output file
         :param overwrite: True or False
         :return: None
         """
 
+        if os.path.splitext(filename)[1].lower() in ('.h5', '.hdf5'):
+
+            from threeML.io.analysis_results_store import write_analysis_results_set_hdf5
+
+            write_analysis_results_set_hdf5(self, filename, overwrite=overwrite)
+
+            return
+
         if not hasattr(self, "_sequence_name"):
             # The user didn't specify what this sequence is
 
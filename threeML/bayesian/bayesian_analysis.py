@@ -59,6 +59,8 @@ import time
 import matplotlib.pyplot as plt
 
 from threeML.parallel.parallel_client import ParallelClient
+from threeML.parallel.plugin_evaluation import ConcurrentPluginEvaluator
+from threeML.bayesian.surrogate_sampler import QuadraticSurrogate, DelayedAcceptanceSampler
 from threeML.config.config import threeML_config
 from threeML.io.progress_bar import progress_bar
 from threeML.exceptions.custom_exceptions import LikelihoodIsInfinite, custom_warnings
@@ -156,10 +158,90 @@ class BayesianAnalysis(object):
         self._log_like_values = None
         self._results = None
 
+        # By default the plugins are evaluated one after the other
+
+        self._plugin_evaluator = None
+
+        # By default the likelihood is computed for all the proposals of the sampler
+
+        self._surrogate_options = None
+        self._surrogate_statistics = None
+
         # Get the initial list of free parameters, useful for debugging purposes
 
         self._update_free_parameters()
 
+    def enable_concurrent_plugin_evaluation(self, n_threads=None):
+        """
+        Evaluate the likelihood of the plugins concurrently on a pool of threads during each call of the
+        likelihood. The results of the plugins are always summed in the order of the data list.
+
+        A SharedModelState exception is raised if the plugins cannot be evaluated concurrently
+        (for example because they are tagged with an independent variable of the model).
+
+        :param n_threads: number of threads (default: one per plugin, up to the number of CPUs)
+        :return: none
+        """
+
+        self.disable_concurrent_plugin_evaluation()
+
+        self._plugin_evaluator = ConcurrentPluginEvaluator(self._data_list, n_threads)
+
+    def disable_concurrent_plugin_evaluation(self):
+        """
+        Go back to evaluating the plugins one after the other
+
+        :return: none
+        """
+
+        if self._plugin_evaluator is not None:
+
+            self._plugin_evaluator.close()
+
+            self._plugin_evaluator = None
+
+    def enable_surrogate(self, n_points=None, refit_interval=None):
+        """
+        Use a surrogate of the likelihood in the emcee sampler (see sample()), to save evaluations of expensive
+        likelihoods. The surrogate is a quadratic form in the parameters, fitted on the most recent points where the
+        likelihood has been computed. It is refined during the burn-in and then kept fixed during the sampling. Each
+        move proposed by the sampler is first screened with the surrogate, and the true likelihood is computed only
+        for the moves which pass the screening (delayed acceptance). Since the surrogate does not change during the
+        sampling, the posterior which is sampled is still the exact one.
+
+        This is useful only if the likelihood is expensive (for example FermiLATLike or HAWCLike), since the
+        screening adds an overhead to each step.
+
+        :param n_points: number of points used in the fit of the surrogate (default: 10 times the number of its
+        coefficients)
+        :param refit_interval: the surrogate is fitted again each time this number of new points are available
+        (default: the number of its coefficients)
+        :return: none
+        """
+
+        self._surrogate_options = {'n_points': n_points, 'refit_interval': refit_interval}
+
+    def disable_surrogate(self):
+        """
+        Go back to computing the likelihood for all the moves proposed by the sampler
+
+        :return: none
+        """
+
+        self._surrogate_options = None
+
+    @property
+    def surrogate_statistics(self):
+        """
+        Statistics on the use of the surrogate during the last run of sample() (burn-in included): number of
+        moves proposed by the sampler, number of evaluations of the likelihood, number of evaluations saved (moves
+        rejected by the surrogate) and number of fits of the surrogate
+
+        :return: a dictionary, or None if the surrogate was not used
+        """
+
+        return self._surrogate_statistics
+
     @property
     def results(self):
 
@@ -226,6 +308,8 @@ class BayesianAnalysis(object):
 
         sampling_procedure = sample_with_progress
 
+        sampler_options = {}
+
         # Deactivate memoization in astromodels, which is useless in this case since we will never use twice the
         # same set of parameters
         with use_astromodels_memoization(False):
@@ -235,18 +319,25 @@ class BayesianAnalysis(object):
                 c = ParallelClient()
                 view = c[:]
 
-                sampler = emcee.EnsembleSampler(n_walkers, n_dim,
-                                                self.get_posterior,
-                                                pool=view)
+                sampler_options['pool'] = view
 
                 # Sampling with progress in parallel is super-slow, so let's
                 # use the non-interactive one
                 sampling_procedure = sample_without_progress
 
+            if self._surrogate_options is not None:
+
+                sampler = DelayedAcceptanceSampler(n_walkers, n_dim,
+                                                   self.get_posterior,
+                                                   self._log_prior,
+                                                   QuadraticSurrogate(n_dim, **self._surrogate_options),
+                                                   **sampler_options)
+
             else:
 
                 sampler = emcee.EnsembleSampler(n_walkers, n_dim,
-                                                self.get_posterior)
+                                                self.get_posterior,
+                                                **sampler_options)
 
             # If a seed is provided, set the random number seed
             if seed is not None:
@@ -260,6 +351,12 @@ class BayesianAnalysis(object):
 
             sampler.reset()
 
+            if self._surrogate_options is not None:
+
+                # Stop refining the surrogate, otherwise the samples would not come from the exact posterior
+
+                sampler.surrogate.freeze()
+
             # Run the true sampling
 
             _ = sampling_procedure(title="Sampling", p0=pos, sampler=sampler, n_samples=n_samples, rstate0=state)
@@ -268,6 +365,22 @@ class BayesianAnalysis(object):
 
         print("\nMean acceptance fraction: %s\n" % acc)
 
+        if self._surrogate_options is not None:
+
+            self._surrogate_statistics = collections.OrderedDict()
+
+            self._surrogate_statistics['proposals'] = sampler.n_proposals
+            self._surrogate_statistics['likelihood evaluations'] = sampler.n_evaluations
+            self._surrogate_statistics['saved evaluations'] = sampler.n_screened
+            self._surrogate_statistics['surrogate fits'] = sampler.surrogate.n_fits
+
+            print("Likelihood evaluations: %i (%i saved by the surrogate)\n" % (sampler.n_evaluations,
+                                                                               sampler.n_screened))
+
+        else:
+
+            self._surrogate_statistics = None
+
         self._sampler = sampler
         self._raw_samples = sampler.flatchain
 
@@ -790,7 +903,13 @@ class BayesianAnalysis(object):
 
             # Loop over each dataset and get the likelihood values for each set
 
-            log_like_values = map(lambda dataset: dataset.get_log_like(), self._data_list.values())
+            if self._plugin_evaluator is not None:
+
+                log_like_values = self._plugin_evaluator.get_log_likes()
+
+            else:
+
+                log_like_values = map(lambda dataset: dataset.get_log_like(), self._data_list.values())
 
         except ModelAssertionViolation:
 
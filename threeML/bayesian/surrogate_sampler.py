@@ -0,0 +1,327 @@
+from distutils.version import LooseVersion
+
+import numpy as np
+import emcee
+
+# DelayedAcceptanceSampler overrides internal methods of the EnsembleSampler of emcee 2.x, which were removed in
+# emcee 3
+
+_emcee_supports_delayed_acceptance = LooseVersion(emcee.__version__) < LooseVersion('3')
+
+
+class QuadraticSurrogate(object):
+
+    def __init__(self, n_dim, n_points=None, refit_interval=None):
+        """
+        A cheap emulator of the log-likelihood: a quadratic form in the parameters, fitted by least squares on the
+        most recent points where the true log-likelihood has been computed. Since the sampler moves slowly, these
+        points are all in the region currently explored, so the emulator is local to that region and follows the
+        walkers as they move.
+
+        :param n_dim: number of parameters
+        :param n_points: number of (most recent) points used in the fit (default: 10 times the number of
+        coefficients of the quadratic form)
+        :param refit_interval: the fit is repeated each time this number of new points is available (default: the
+        number of coefficients of the quadratic form)
+        """
+
+        self._n_dim = int(n_dim)
+
+        # constant, linear and quadratic terms
+
+        self._n_coefficients = 1 + self._n_dim + self._n_dim * (self._n_dim + 1) // 2
+
+        self._n_points = 10 * self._n_coefficients if n_points is None else int(n_points)
+
+        self._refit_interval = self._n_coefficients if refit_interval is None else int(refit_interval)
+
+        assert self._n_points >= 2 * self._n_coefficients, "A quadratic surrogate in %i dimensions needs at " \
+                                                           "least %i points" % (self._n_dim,
+                                                                                2 * self._n_coefficients)
+
+        assert self._refit_interval >= 1, "The refit interval must be at least 1"
+
+        # ring buffer of the training points
+
+        self._points = np.zeros((self._n_points, self._n_dim))
+        self._values = np.zeros(self._n_points)
+
+        self._n_stored = 0
+        self._next = 0
+
+        self._n_new_points = 0
+
+        self._coefficients = None
+        self._center = None
+        self._scale = None
+
+        self._n_fits = 0
+
+        self._frozen = False
+
+    @property
+    def n_fits(self):
+        """
+        :return: the number of times the surrogate has been fitted
+        """
+
+        return self._n_fits
+
+    @property
+    def is_ready(self):
+        """
+        :return: whether the surrogate has been fitted and can be used
+        """
+
+        return self._coefficients is not None
+
+    @property
+    def is_frozen(self):
+        """
+        :return: whether the surrogate has been frozen (see freeze())
+        """
+
+        return self._frozen
+
+    def freeze(self):
+        """
+        Stop refining the surrogate: from now on new points are ignored and the surrogate does not change anymore.
+
+        :return: none
+        """
+
+        self._frozen = True
+
+    def add(self, points, values):
+        """
+        Add points where the true log-likelihood is known. Points with a non-finite value are ignored. The surrogate
+        is fitted again if enough new points are available. Nothing is done if the surrogate is frozen.
+
+        :param points: array of points (n_points, n_dim)
+        :param values: the values of the log-likelihood at the points
+        :return: none
+        """
+
+        if self._frozen:
+
+            return
+
+        points = np.atleast_2d(np.array(points, dtype=float))
+        values = np.atleast_1d(np.array(values, dtype=float))
+
+        finite = np.isfinite(values) & np.all(np.isfinite(points), axis=1)
+
+        for point, value in zip(points[finite], values[finite]):
+
+            self._points[self._next] = point
+            self._values[self._next] = value
+
+            self._next = (self._next + 1) % self._n_points
+
+            self._n_stored = min(self._n_stored + 1, self._n_points)
+
+            self._n_new_points += 1
+
+        if self._n_new_points >= self._refit_interval and self._n_stored >= 2 * self._n_coefficients:
+
+            self._fit()
+
+    def _design_matrix(self, points):
+
+        x = (points - self._center) / self._scale
+
+        i, j = np.triu_indices(self._n_dim)
+
+        return np.hstack((np.ones((x.shape[0], 1)), x, x[:, i] * x[:, j]))
+
+    def _fit(self):
+
+        points = self._points[:self._n_stored]
+        values = self._values[:self._n_stored]
+
+        # work with standardized coordinates, so that the least squares problem is well conditioned
+
+        self._center = points.mean(axis=0)
+
+        scale = points.std(axis=0)
+
+        self._scale = np.where(scale > 0, scale, 1.0)
+
+        coefficients, _, rank, _ = np.linalg.lstsq(self._design_matrix(points), values, rcond=-1)
+
+        self._n_new_points = 0
+
+        if rank < self._n_coefficients:
+
+            # degenerate set of points (for example walkers stuck on a line). Keep the previous fit, if any
+
+            return
+
+        self._coefficients = coefficients
+
+        self._n_fits += 1
+
+    def __call__(self, points):
+        """
+        Get the surrogate log-likelihood
+
+        :param points: array of points (n_points, n_dim)
+        :return: array of values
+        """
+
+        assert self.is_ready, "The surrogate has not been fitted yet"
+
+        return self._design_matrix(np.atleast_2d(points)).dot(self._coefficients)
+
+
+class DelayedAcceptanceSampler(emcee.EnsembleSampler):
+
+    def __init__(self, n_walkers, n_dim, log_posterior, log_prior, surrogate, **kwargs):
+        """
+        The affine invariant ensemble sampler of emcee, with a delayed acceptance step (Christen & Fox 2005): each
+        proposed move is first accepted or rejected using the surrogate of the log-likelihood (plus the exact
+        log-prior), and the true posterior is computed only for the moves which survive this screening. A second
+        acceptance step corrects for the error of the surrogate.
+
+        Every evaluation of the true posterior is used to refine the surrogate, until the surrogate is frozen (see
+        QuadraticSurrogate.freeze). The chain samples exactly the true posterior only once the surrogate is frozen,
+        since a surrogate which depends on the history of the chain breaks the detailed balance: refine it during
+        the burn-in and freeze it before the production run. Until the surrogate is ready, the sampler works exactly
+        as emcee.EnsembleSampler.
+
+        :param n_walkers: number of walkers
+        :param n_dim: number of parameters
+        :param log_posterior: function returning the log-posterior for a point (the expensive one)
+        :param log_prior: function returning the log-prior for a point (should be cheap)
+        :param surrogate: the surrogate of the log-likelihood (for example a QuadraticSurrogate)
+        :param kwargs: other arguments for emcee.EnsembleSampler (for example pool)
+        """
+
+        if not _emcee_supports_delayed_acceptance:
+
+            raise RuntimeError("The delayed acceptance sampler needs emcee 2.x, but emcee %s is installed"
+                               % emcee.__version__)
+
+        super(DelayedAcceptanceSampler, self).__init__(n_walkers, n_dim, log_posterior, **kwargs)
+
+        self._log_prior = log_prior
+
+        self._surrogate = surrogate
+
+        self._n_proposals = 0
+        self._n_evaluations = 0
+        self._n_screened = 0
+
+    @property
+    def surrogate(self):
+
+        return self._surrogate
+
+    @property
+    def n_proposals(self):
+        """
+        :return: number of proposed moves since the creation of the sampler
+        """
+
+        return self._n_proposals
+
+    @property
+    def n_evaluations(self):
+        """
+        :return: number of evaluations of the true posterior since the creation of the sampler
+        """
+
+        return self._n_evaluations
+
+    @property
+    def n_screened(self):
+        """
+        :return: number of proposed moves rejected by the surrogate, i.e., evaluations of the true posterior
+        which have been saved
+        """
+
+        return self._n_screened
+
+    def _get_log_priors(self, points):
+
+        return np.array([self._log_prior(point) for point in points], dtype=float)
+
+    def _get_lnprob(self, pos=None):
+
+        lnprob, blob = super(DelayedAcceptanceSampler, self)._get_lnprob(pos)
+
+        points = self.pos if pos is None else pos
+
+        self._n_evaluations += len(lnprob)
+
+        # train the surrogate on the log-likelihood, i.e., the log-posterior without the log-prior
+
+        with np.errstate(invalid='ignore'):
+
+            self._surrogate.add(points, lnprob - self._get_log_priors(points))
+
+        return lnprob, blob
+
+    def _propose_stretch(self, p0, p1, lnprob0):
+
+        if not self._surrogate.is_ready:
+
+            self._n_proposals += len(np.atleast_2d(p0))
+
+            return super(DelayedAcceptanceSampler, self)._propose_stretch(p0, p1, lnprob0)
+
+        s = np.atleast_2d(p0)
+        n_s = len(s)
+        c = np.atleast_2d(p1)
+        n_c = len(c)
+
+        # Generate the proposals as emcee does
+
+        zz = ((self.a - 1.) * self._random.rand(n_s) + 1) ** 2. / self.a
+        rint = self._random.randint(n_c, size=(n_s,))
+
+        q = c[rint] - zz[:, np.newaxis] * (c[rint] - s)
+
+        self._n_proposals += n_s
+
+        # First stage: screen the proposals with the approximate posterior (exact prior + surrogate likelihood)
+
+        approx_new = self._get_log_priors(q)
+
+        inside = np.isfinite(approx_new)
+
+        approx_new[inside] += self._surrogate(q[inside])
+
+        approx_old = self._get_log_priors(s) + self._surrogate(s)
+
+        # Walkers with a non-finite approximate posterior at their current position (for example starting points
+        # outside of the support of the prior) are moved with the normal acceptance rule
+
+        normal = ~np.isfinite(approx_old)
+
+        approx_diff = np.where(normal, 0.0, approx_new - np.where(normal, 0.0, approx_old))
+
+        promoted = normal | ((self.dim - 1.) * np.log(zz) + approx_diff > np.log(self._random.rand(n_s)))
+
+        promoted &= inside | normal
+
+        self._n_screened += n_s - np.sum(promoted)
+
+        # Second stage: compute the true posterior for the proposals which passed the screening, and correct
+        # for the error of the surrogate
+
+        newlnprob = np.zeros(n_s) - np.inf
+
+        if np.any(promoted):
+
+            newlnprob[promoted], _ = self._get_lnprob(q[promoted])
+
+        with np.errstate(invalid='ignore'):
+
+            lnpdiff = np.where(normal,
+                               (self.dim - 1.) * np.log(zz) + newlnprob - lnprob0,
+                               newlnprob - lnprob0 - approx_diff)
+
+        accept = promoted & (lnpdiff > np.log(self._random.rand(n_s)))
+
+        return q, newlnprob, accept, None
@@ -0,0 +1,700 @@
+import copy
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+from astromodels import clone_model
+
+from threeML.classicMLE.joint_likelihood import JointLikelihood
+from threeML.data_list import DataList
+from threeML.exceptions.custom_exceptions import custom_warnings, FitFailed
+from threeML.plugins.SpectrumLike import SpectrumLike
+from threeML.utils.spectrum.spectrum_likelihood import get_random_generator
+from threeML.utils.statistics.likelihood_functions import half_chi2, half_chi2_derivative
+from threeML.utils.statistics.likelihood_functions import poisson_log_likelihood_ideal_bkg
+from threeML.utils.statistics.likelihood_functions import poisson_observed_gaussian_background
+from threeML.utils.statistics.likelihood_functions import poisson_observed_poisson_background
+from threeML.utils.statistics.likelihood_functions import poisson_log_likelihood_derivative
+
+
+class BatchedSpectrumFit(object):
+
+    def __init__(self, spectrum_plugin, likelihood_model, observed_counts, background_counts=None):
+        """
+        Fit the same model to many realizations of the same spectrum at once, as needed for simulation studies.
+
+        The realizations share everything with the provided plugin (response, exposure, noise models, mask and
+        rebinning) except the counts, which are given as a (n_realizations, n_channels) array. All the realizations
+        are fitted together with a vectorized Levenberg-Marquardt algorithm: for each trial parameter matrix the
+        model is integrated for all realizations at once (when the spectral shapes allow it, see
+        _get_vectorized_integral) and folded through the response with one matrix product, while the statistic, its
+        derivatives and the steps are computed for all realizations at once. Realizations which do not converge are
+        fitted individually with a JointLikelihood.
+
+        :param spectrum_plugin: a SpectrumLike (or child) instance with the setup of the realizations
+        :param likelihood_model: the model to fit (its free parameters are used as starting point)
+        :param observed_counts: (n_realizations, n_channels) array of observed counts (all channels)
+        :param background_counts: (optional) (n_realizations, n_channels) array of background counts (all channels).
+        If not given, the background of the plugin is used for all realizations.
+        """
+
+        assert isinstance(spectrum_plugin, SpectrumLike), "The plugin must be an instance of SpectrumLike"
+
+        assert spectrum_plugin.background_plugin is None, "Batched fits are not supported for modeled backgrounds"
+
+        self._plugin = spectrum_plugin
+
+        self._likelihood_model = likelihood_model
+
+        self._observation_noise_model = spectrum_plugin.observation_noise_model
+        self._background_noise_model = spectrum_plugin.background_noise_model
+
+        n_channels = spectrum_plugin.observed_spectrum.n_channels
+
+        observed_counts = np.atleast_2d(np.array(observed_counts, dtype=float))
+
+        assert observed_counts.shape[1] == n_channels, "The observed counts must have one column per channel"
+
+        self._n_realizations = observed_counts.shape[0]
+
+        self._all_observed_counts = observed_counts
+        self._observed_counts = self._select(observed_counts)
+
+        # the background (if any) and the errors are stored already selected
+
+        self._all_background_counts = None
+        self._background_counts = None
+        self._observed_count_errors = None
+        self._background_count_errors = None
+
+        if self._background_noise_model is not None:
+
+            if background_counts is None:
+
+                if self._background_noise_model == 'ideal':
+
+                    background_counts = spectrum_plugin._scaled_background_counts
+
+                else:
+
+                    background_counts = spectrum_plugin._background_counts
+
+            else:
+
+                self._all_background_counts = np.atleast_2d(np.array(background_counts, dtype=float))
+
+            background_counts = np.broadcast_to(background_counts, observed_counts.shape)
+
+            self._background_counts = self._select(background_counts)
+
+            if self._background_noise_model == 'gaussian':
+
+                self._background_count_errors = np.broadcast_to(self._select_errors(spectrum_plugin._back_count_errors),
+                                                                self._background_counts.shape)
+
+            if self._background_noise_model == 'poisson':
+
+                self._scale_factor = spectrum_plugin.scale_factor
+
+        else:
+
+            assert background_counts is None, "The plugin has no background, cannot use background counts"
+
+        if self._observation_noise_model == 'gaussian':
+
+            self._observed_count_errors = self._select_errors(spectrum_plugin._observed_count_errors)
+
+        # Get the integral of the model and the energy bins it has to be integrated on
+
+        _, self._integral = spectrum_plugin._get_diff_flux_and_integral(likelihood_model)
+
+        self._e1, self._e2 = spectrum_plugin._get_integration_edges()
+
+        self._free_parameters = list(likelihood_model.free_parameters.values())
+
+        # set by fit (None if the model has to be integrated once per realization)
+
+        self._vectorized_integral = None
+
+        self._fallback_plugin = None
+
+        self._results = None
+
+    @classmethod
+    def from_simulations(cls, spectrum_plugin, n_realizations, random_seed=None):
+        """
+        Prepare a batched fit of n_realizations random realizations of the current expectation of the provided plugin
+        (with respect to its current model), as get_simulated_dataset would produce them.
+
+        :param spectrum_plugin: a SpectrumLike (or child) instance with a model set
+        :param n_realizations: the number of realizations
+        :param random_seed: (optional) seed for the random generator
+        :return: a BatchedSpectrumFit instance
+        """
+
+        assert spectrum_plugin.likelihood_model is not None, "You need to set up a model before randomizing"
+
+        assert spectrum_plugin.background_plugin is None, "Batched fits are not supported for modeled backgrounds"
+
+        # The simulated plugin is built once, to get the setup of the simulated data (same exposure and scale for
+        # source and background)
+
+        template = spectrum_plugin._build_simulated_dataset("%s_batch" % spectrum_plugin.name)
+
+        generator = get_random_generator(random_seed)
+
+        likelihood_evaluator = spectrum_plugin._likelihood_evaluator
+
+        with spectrum_plugin._without_mask_nor_rebinner():
+
+            source_model_counts = spectrum_plugin._evaluate_model() * spectrum_plugin.exposure
+
+            observed_counts = likelihood_evaluator.get_randomized_source_counts_batch(source_model_counts,
+                                                                                      n_realizations,
+                                                                                      generator)
+
+            background_counts = likelihood_evaluator.get_randomized_background_counts_batch(n_realizations, generator)
+
+        return cls(template, spectrum_plugin.likelihood_model, observed_counts, background_counts)
+
+    @property
+    def n_realizations(self):
+
+        return self._n_realizations
+
+    @property
+    def results(self):
+        """
+        :return: the results of the last fit (see .fit)
+        """
+
+        return self._results
+
+    def _select(self, array):
+        """
+        Apply the mask and the rebinning of the plugin to all rows of a (n_realizations, n_channels) array
+        """
+
+        rebinner = self._plugin._rebinner
+
+        if rebinner is not None:
+
+            return rebinner.rebin_batch(array)
+
+        else:
+
+            return np.array(array)[:, self._plugin._mask]
+
+    def _select_errors(self, errors):
+        """
+        Apply the mask and the rebinning of the plugin to a vector of errors (summed in quadrature)
+        """
+
+        rebinner = self._plugin._rebinner
+
+        if rebinner is not None:
+
+            return np.sqrt(rebinner.rebin_batch(errors ** 2)[0])
+
+        else:
+
+            return errors[self._plugin._mask]
+
+    @contextmanager
+    def _preserved_parameter_values(self):
+
+        original_values = [parameter.value for parameter in self._free_parameters]
+
+        try:
+
+            yield
+
+        finally:
+
+            for parameter, value in zip(self._free_parameters, original_values):
+
+                parameter.value = value
+
+    def _set_parameter_values(self, values):
+
+        for parameter, value in zip(self._free_parameters, values):
+
+            parameter.value = value
+
+    def _get_vectorized_integral(self):
+        """
+        Build a function integrating the model over the integration bins for all the rows of a parameter matrix with
+        one call of the evaluate method of each spectral shape, which receives a column of values for each free
+        parameter (instead of setting the parameters and integrating the model once per row). This is not possible
+        for tagged plugins, for models with linked parameters, or for shapes whose evaluate method does not broadcast
+        over the parameters: in these cases None is returned.
+
+        :return: a function of the (n_rows, n_free_parameters) parameter matrix returning the (n_rows, n_bins)
+        integrated fluxes, or None
+        """
+
+        plugin = self._plugin
+
+        if plugin.tag is not None:
+
+            return None
+
+        point_sources = self._likelihood_model.point_sources
+
+        if plugin._source_name is None:
+
+            sources = point_sources.values()
+
+        elif plugin._source_name in point_sources:
+
+            sources = [point_sources[plugin._source_name]]
+
+        else:
+
+            return None
+
+        parameter_indexes = dict((id(parameter), i) for i, parameter in enumerate(self._free_parameters))
+
+        # for each spectral shape the arguments of its evaluate method: the index of the column of the parameter
+        # matrix for the free parameters, the value for the others
+
+        shapes = []
+
+        for source in sources:
+
+            for component in source.components.values():
+
+                arguments = []
+
+                for parameter in component.shape.parameters.values():
+
+                    if parameter.has_auxiliary_variable():
+
+                        return None
+
+                    arguments.append((parameter_indexes.get(id(parameter)), parameter.value))
+
+                shapes.append((component.shape, arguments))
+
+        e1, e2 = self._e1, self._e2
+
+        n_bins = e1.shape[0]
+
+        # evaluate the shapes on the edges and the centers of all bins at once
+
+        energies = np.concatenate((e1, (e1 + e2) / 2.0, e2))[np.newaxis, :]
+
+        def integral(parameter_matrix):
+
+            fluxes = 0
+
+            for shape, arguments in shapes:
+
+                values = [value if index is None else parameter_matrix[:, index, np.newaxis]
+                          for index, value in arguments]
+
+                fluxes = fluxes + shape.evaluate(energies, *values)
+
+            fluxes = np.broadcast_to(fluxes, (parameter_matrix.shape[0], energies.shape[1]))
+
+            # Simpson's rule, as in SpectrumLike
+
+            return (e2 - e1) / 6.0 * (fluxes[:, :n_bins] + 4 * fluxes[:, n_bins: 2 * n_bins] + fluxes[:, 2 * n_bins:])
+
+        return integral
+
+    def _integrate_with_loop(self, parameter_matrix):
+        """
+        Integrate the model once per row of the parameter matrix (for models which cannot be vectorized)
+        """
+
+        true_fluxes = np.empty((parameter_matrix.shape[0], len(self._e1)))
+
+        for i, values in enumerate(parameter_matrix):
+
+            self._set_parameter_values(values)
+
+            true_fluxes[i, :] = self._integral(self._e1, self._e2)
+
+        return true_fluxes
+
+    def _set_up_integration(self, initial_values, lower_bounds, upper_bounds):
+        """
+        Use the vectorized integration if it gives the same result as the integration of the model one row at the
+        time, on two parameter sets with different values for all the free parameters
+        """
+
+        self._vectorized_integral = None
+
+        integral = self._get_vectorized_integral()
+
+        if integral is None:
+
+            return
+
+        other_values = np.where(initial_values != 0, initial_values * 1.01, 1e-2)
+
+        test_matrix = np.vstack((initial_values, np.clip(other_values, lower_bounds, upper_bounds)))
+
+        try:
+
+            with np.errstate(all='ignore'):
+
+                vectorized = integral(test_matrix)
+
+        except Exception:
+
+            return
+
+        if vectorized.shape == (2, len(self._e1)) and np.allclose(vectorized, self._integrate_with_loop(test_matrix),
+                                                                   rtol=1e-10, atol=0, equal_nan=True):
+
+            self._vectorized_integral = integral
+
+    def _get_model_counts(self, parameter_matrix):
+        """
+        Compute the (selected) model counts for each row of a (n_rows, n_free_parameters) matrix of parameter values
+
+        :param parameter_matrix: the parameter values, one set per row
+        :return: (n_rows, n_selected_channels) array of model counts
+        """
+
+        if self._vectorized_integral is not None:
+
+            true_fluxes = self._vectorized_integral(parameter_matrix)
+
+        else:
+
+            true_fluxes = self._integrate_with_loop(parameter_matrix)
+
+        # Fold all the realizations at once
+
+        rates = self._plugin._fold_true_fluxes(true_fluxes)
+
+        model_counts = self._select(rates * self._plugin.exposure)
+
+        return model_counts * self._plugin._nuisance_parameter.value
+
+    def _get_log_likes(self, model_counts, rows):
+        """
+        The log(likelihood) per channel for the given realizations
+
+        :param model_counts: (n_rows, n_selected_channels) array of model counts
+        :param rows: the indexes of the realizations corresponding to the rows of model_counts
+        :return: ((n_rows, n_selected_channels) array of log-likelihoods, expected background counts added to the
+        model counts in the Poisson likelihood (profiled for the profile likelihoods), or None for Gaussian data)
+        """
+
+        observed_counts = self._observed_counts[rows]
+
+        if self._observation_noise_model == 'gaussian':
+
+            return half_chi2(observed_counts, self._observed_count_errors, model_counts) * (-1), None
+
+        if self._background_noise_model is None:
+
+            return poisson_log_likelihood_ideal_bkg(observed_counts, np.zeros_like(model_counts), model_counts)
+
+        elif self._background_noise_model == 'ideal':
+
+            return poisson_log_likelihood_ideal_bkg(observed_counts, self._background_counts[rows], model_counts)
+
+        elif self._background_noise_model == 'poisson':
+
+            return poisson_observed_poisson_background(observed_counts,
+                                                       self._background_counts[rows],
+                                                       self._scale_factor,
+                                                       model_counts)
+
+        else:
+
+            background_counts = self._background_counts[rows]
+
+            log_likes, background_model_counts = poisson_observed_gaussian_background(observed_counts,
+                                                                                      background_counts,
+                                                                                      self._background_count_errors[rows],
+                                                                                      model_counts)
+
+            # where there are no background counts the likelihood is the pure Poisson one
+
+            return log_likes, np.where(background_counts > 0, background_model_counts, 0)
+
+    def _get_statistic(self, model_counts, rows):
+        """
+        The -log(likelihood) per channel for the given realizations
+
+        :param model_counts: (n_rows, n_selected_channels) array of model counts
+        :param rows: the indexes of the realizations corresponding to the rows of model_counts
+        :return: (n_rows, n_selected_channels) array
+        """
+
+        log_likes, _ = self._get_log_likes(model_counts, rows)
+
+        return log_likes * (-1)
+
+    def _get_minus_log_like(self, parameter_matrix, rows):
+
+        return np.sum(self._get_statistic(self._get_model_counts(parameter_matrix), rows), axis=1)
+
+    def _get_statistic_derivatives(self, model_counts, rows):
+        """
+        First and second derivatives of the statistic with respect to the model counts, for all channels at once.
+
+        The first derivatives are the analytic ones (see poisson_log_likelihood_derivative and half_chi2_derivative).
+        For the second derivatives of the Poisson likelihoods the background is kept fixed at its (profiled) value,
+        which gives the positive curvature o / (m + b)^2 as in the Gauss-Newton approximation.
+        """
+
+        observed_counts = self._observed_counts[rows]
+
+        if self._observation_noise_model == 'gaussian':
+
+            first = half_chi2_derivative(observed_counts, self._observed_count_errors, model_counts) * (-1)
+
+            second = np.broadcast_to(1.0 / self._observed_count_errors ** 2, model_counts.shape)
+
+        else:
+
+            _, background_model_counts = self._get_log_likes(model_counts, rows)
+
+            first = poisson_log_likelihood_derivative(observed_counts, background_model_counts, model_counts) * (-1)
+
+            with np.errstate(divide='ignore', invalid='ignore'):
+
+                second = observed_counts / (model_counts + background_model_counts) ** 2
+
+        # Channels where the statistic is not defined carry no information for the step
+
+        first = np.where(np.isfinite(first), first, 0)
+        second = np.where(np.isfinite(second), second, 0)
+
+        return first, second
+
+    def _get_jacobian(self, parameter_matrix, model_counts, upper_bounds):
+        """
+        Derivatives of the model counts with respect to the parameters, by forward finite differences. The model
+        counts for all the shifted parameter sets are computed with one call.
+
+        :return: (n_rows, n_selected_channels, n_free_parameters) array
+        """
+
+        n_rows, n_parameters = parameter_matrix.shape
+
+        steps = np.where(parameter_matrix != 0, 1e-5 * np.abs(parameter_matrix), 1e-5)
+
+        # step backward if we would go beyond the upper bound
+
+        steps = np.where(parameter_matrix + steps > upper_bounds, -steps, steps)
+
+        # one copy of the parameter matrix for each parameter, with that parameter shifted
+
+        parameter_indexes = np.arange(n_parameters)
+
+        shifted = np.repeat(parameter_matrix[np.newaxis, :, :], n_parameters, axis=0)
+        shifted[parameter_indexes, :, parameter_indexes] += steps.T
+
+        shifted_counts = self._get_model_counts(shifted.reshape(n_parameters * n_rows, n_parameters))
+
+        shifted_counts = shifted_counts.reshape(n_parameters, n_rows, model_counts.shape[1])
+
+        jacobian = (shifted_counts - model_counts[np.newaxis, :, :]) / steps.T[:, :, np.newaxis]
+
+        return jacobian.transpose(1, 2, 0)
+
+    def fit(self, max_iterations=100, tolerance=1e-5, fallback=True):
+        """
+        Fit all the realizations.
+
+        :param max_iterations: maximum number of Levenberg-Marquardt iterations (default: 100)
+        :param tolerance: the fit of a realization is converged when an accepted step improves the -log(likelihood)
+        by less than this (default: 1e-5)
+        :param fallback: whether to fit the realizations which did not converge individually with a JointLikelihood
+        (default: True). If False, they are reported with NaN values
+        :return: a pandas DataFrame with one row per realization, containing the best fit values of the free
+        parameters, the -log(likelihood) at the minimum, the number of iterations and whether the individual fit was
+        used
+        """
+
+        n_parameters = len(self._free_parameters)
+
+        assert n_parameters > 0, "There is no free parameter in the current model"
+
+        lower_bounds = np.array([-np.inf if parameter.min_value is None else parameter.min_value
+                                 for parameter in self._free_parameters])
+
+        upper_bounds = np.array([np.inf if parameter.max_value is None else parameter.max_value
+                                 for parameter in self._free_parameters])
+
+        initial_values = np.array([parameter.value for parameter in self._free_parameters])
+
+        n_realizations = self._n_realizations
+
+        parameter_matrix = np.tile(initial_values, (n_realizations, 1))
+
+        damping = np.ones(n_realizations) * 1e-3
+        n_iterations = np.zeros(n_realizations, dtype=int)
+        converged = np.zeros(n_realizations, dtype=bool)
+        active = np.ones(n_realizations, dtype=bool)
+
+        identity = np.eye(n_parameters)
+
+        with self._preserved_parameter_values():
+
+            self._set_up_integration(initial_values, lower_bounds, upper_bounds)
+
+            current_values = self._get_minus_log_like(parameter_matrix, np.arange(n_realizations))
+
+            for _ in range(max_iterations):
+
+                rows = np.where(active)[0]
+
+                if rows.shape[0] == 0:
+
+                    break
+
+                this_parameters = parameter_matrix[rows]
+
+                model_counts = self._get_model_counts(this_parameters)
+
+                jacobian = self._get_jacobian(this_parameters, model_counts, upper_bounds)
+
+                first, second = self._get_statistic_derivatives(model_counts, rows)
+
+                gradient = np.einsum('ncp,nc->np', jacobian, first)
+                hessian = np.einsum('ncp,nc,ncq->npq', jacobian, second, jacobian)
+
+                # Levenberg-Marquardt damping on the diagonal (plus a tiny regularization)
+
+                diagonal = np.einsum('npp->np', hessian)
+
+                damped_hessian = (hessian + damping[rows, np.newaxis, np.newaxis] * diagonal[:, :, np.newaxis] * identity
+                                  + 1e-12 * identity)
+
+                try:
+
+                    steps = np.linalg.solve(damped_hessian, -gradient[:, :, np.newaxis])[:, :, 0]
+
+                except np.linalg.LinAlgError:
+
+                    # give up on the batched step, the remaining realizations will be fitted individually
+
+                    break
+
+                trial_parameters = np.clip(this_parameters + steps, lower_bounds, upper_bounds)
+
+                trial_values = self._get_minus_log_like(trial_parameters, rows)
+
+                improved = np.isfinite(trial_values) & (trial_values < current_values[rows])
+
+                improvement = current_values[rows] - trial_values
+
+                accepted = rows[improved]
+
+                parameter_matrix[accepted] = trial_parameters[improved]
+                current_values[accepted] = trial_values[improved]
+
+                damping[accepted] *= 0.1
+                damping[rows[~improved]] *= 10.0
+
+                n_iterations[rows] += 1
+
+                # A realization is converged when the improvement is negligible, or when the step does not move the
+                # parameters anymore
+
+                relative_steps = np.max(np.abs(trial_parameters - this_parameters) /
+                                        np.maximum(np.abs(this_parameters), 1e-30), axis=1)
+
+                done = (improved & (improvement < tolerance)) | (~improved & (relative_steps < 1e-10))
+
+                converged[rows[done]] = True
+                active[rows[done]] = False
+
+                # The damping exploded, so this realization is stuck
+
+                active[rows[damping[rows] > 1e10]] = False
+
+        used_fallback = np.zeros(n_realizations, dtype=bool)
+
+        failed = np.where(~converged)[0]
+
+        if failed.shape[0] > 0:
+
+            if fallback:
+
+                for i in failed:
+
+                    parameter_matrix[i], current_values[i] = self._fit_individually(i, initial_values)
+
+                    used_fallback[i] = True
+
+            else:
+
+                custom_warnings.warn("%i realizations did not converge" % failed.shape[0])
+
+                parameter_matrix[failed] = np.nan
+                current_values[failed] = np.nan
+
+        results = pd.DataFrame(parameter_matrix, columns=[parameter.path for parameter in self._free_parameters])
+
+        results['-log(likelihood)'] = current_values
+        results['n_iterations'] = n_iterations
+        results['fallback'] = used_fallback
+
+        self._results = results
+
+        return results
+
+    def _fit_individually(self, realization, initial_values):
+        """
+        Fit one realization with a normal JointLikelihood
+
+        :param realization: the index of the realization
+        :param initial_values: starting values of the free parameters
+        :return: (best fit values, -log(likelihood) at the minimum)
+        """
+
+        if self._fallback_plugin is None:
+
+            self._fallback_plugin = copy.deepcopy(self._plugin)
+
+            self._fallback_plugin._verbose = False
+
+        plugin = self._fallback_plugin
+
+        background_counts = None
+
+        if self._all_background_counts is not None and self._background_noise_model != 'ideal':
+
+            background_counts = self._all_background_counts[realization]
+
+        plugin._overwrite_counts(self._all_observed_counts[realization], background_counts)
+
+        if plugin._rebinner is not None:
+
+            plugin._apply_rebinner(plugin._rebinner)
+
+        else:
+
+            plugin._apply_mask_to_original_vectors()
+
+        model = clone_model(self._likelihood_model)
+
+        free_parameters = list(model.free_parameters.values())
+
+        for parameter, value in zip(free_parameters, initial_values):
+
+            parameter.value = value
+
+        jl = JointLikelihood(model, DataList(plugin))
+
+        try:
+
+            jl.fit(quiet=True, compute_covariance=False)
+
+        except FitFailed:
+
+            custom_warnings.warn("The individual fit of realization %i failed" % realization)
+
+            return np.nan, np.nan
+
+        return np.array([parameter.value for parameter in free_parameters]), jl.current_minimum
@@ -9,6 +9,7 @@ import scipy.stats
 from astromodels import ModelAssertionViolation
 from astromodels import clone_model
 from threeML.analysis_results import MLEResults
+from threeML.classicMLE.likelihood_cache import LikelihoodCache
 from threeML.config.config import threeML_config
 from threeML.exceptions import custom_exceptions
 from threeML.exceptions.custom_exceptions import custom_warnings, FitFailed
@@ -16,6 +17,7 @@ from threeML.io.results_table import ResultsTable
 from threeML.io.table import Table
 from threeML.minimizer import minimization
 from threeML.parallel.parallel_client import ParallelClient
+from threeML.parallel.plugin_evaluation import ConcurrentPluginEvaluator
 from threeML.utils.statistics.stats_tools import aic, bic
 
 
@@ -87,6 +89,125 @@ class JointLikelihood(object):
 
         self._analysis_results = None
 
+        # By default the plugins are evaluated one after the other
+
+        self._plugin_evaluator = None
+
+        # By default the gradient provided by the plugins is used by the minimizers which support it
+
+        self._use_plugin_gradients = True
+
+        self._ngradient_calls = 0
+
+        # By default the likelihood values are not cached
+
+        self._likelihood_cache_options = None
+        self._likelihood_cache = None
+
+    def enable_plugin_gradients(self):
+        """
+        Use the gradient of the log-likelihood provided by the plugins (see PluginPrototype.get_log_like_gradient)
+        in the minimizers which support it (default). It is used only if all the plugins provide it, otherwise the
+        minimizers differentiate the likelihood numerically.
+
+        :return: none
+        """
+
+        self._use_plugin_gradients = True
+
+    def disable_plugin_gradients(self):
+        """
+        Let the minimizers differentiate the likelihood numerically even if the plugins can provide the gradient
+
+        :return: none
+        """
+
+        self._use_plugin_gradients = False
+
+    def enable_likelihood_cache(self, max_entries=10000, tolerance=0.0):
+        """
+        Cache the values of the likelihood of each plugin, keyed by the values of the free parameters, so that the
+        likelihood is not computed again for parameters which have already been tried (as happens in the computation
+        of the errors, of the profile likelihood or of the covariance matrix). Each plugin is evaluated again only if
+        one of the parameters it depends on changed (for example, if only the nuisance parameters of another plugin
+        changed, its value comes from the cache).
+
+        The cache is emptied at the beginning of each fit. If you change the data or the fixed parameters after a fit,
+        call this method again (or fit again) before computing errors or contours.
+
+        :param max_entries: maximum number of values stored for each plugin (the least recently used are dropped
+        first)
+        :param tolerance: relative tolerance within which two sets of parameters are considered the same (default:
+        0, i.e., exact match)
+        :return: none
+        """
+
+        self._likelihood_cache_options = {'max_entries': max_entries, 'tolerance': tolerance}
+
+        self._reset_likelihood_cache()
+
+    def disable_likelihood_cache(self):
+        """
+        Stop caching the values of the likelihood
+
+        :return: none
+        """
+
+        self._likelihood_cache_options = None
+        self._likelihood_cache = None
+
+    def _reset_likelihood_cache(self):
+
+        if self._likelihood_cache_options is not None:
+
+            self._likelihood_cache = LikelihoodCache(self._data_list, self._free_parameters,
+                                                     **self._likelihood_cache_options)
+
+    @property
+    def likelihood_cache_statistics(self):
+        """
+        The hits and misses of the likelihood cache (see enable_likelihood_cache) since the beginning of the last
+        fit, for each plugin and in total
+
+        :return: a pandas DataFrame, or None if the cache is not enabled
+        """
+
+        if self._likelihood_cache is None:
+
+            return None
+
+        return self._likelihood_cache.statistics
+
+    def enable_concurrent_plugin_evaluation(self, n_threads=None):
+        """
+        Evaluate the likelihood of the plugins concurrently on a pool of threads during each call of the
+        likelihood. This is useful when there are many plugins spending their time in code releasing the GIL. The
+        results of the plugins are always summed in the order of the data list.
+
+        A SharedModelState exception is raised if the plugins cannot be evaluated concurrently
+        (for example because they are tagged with an independent variable of the model).
+
+        :param n_threads: number of threads (default: one per plugin, up to the number of CPUs)
+        :return: none
+        """
+
+        self.disable_concurrent_plugin_evaluation()
+
+        self._plugin_evaluator = ConcurrentPluginEvaluator(self._data_list, n_threads)
+
+    def disable_concurrent_plugin_evaluation(self):
+        """
+        Go back to evaluating the plugins one after the other
+
+        :return: none
+        """
+
+        if self._plugin_evaluator is not None:
+
+            self._plugin_evaluator.close()
+
+            self._plugin_evaluator = None
+
     def _assign_model_to_data(self, model):
 
         for dataset in self._data_list.values():
@@ -193,6 +314,10 @@ class JointLikelihood(object):
         # Empty the call recorder
         self._record_calls = {}
         self._ncalls = 0
+        self._ngradient_calls = 0
+
+        # Start with an empty cache (if enabled)
+        self._reset_likelihood_cache()
 
         # Check if we have free parameters, otherwise simply return the value of the log like
         if len(self._free_parameters) == 0:
@@ -243,9 +368,12 @@ class JointLikelihood(object):
 
                     print("\nTotal log-likelihood minimum: %.3f\n" % global_log_likelihood_minimum)
 
-                # Now set up secondary minimizer
+                # Now set up secondary minimizer (with the gradient, if it can use it)
+                gradient_option = self._get_gradient_option(self._minimizer_type.second_minimization)
+
                 self._minimizer = self._minimizer_type.get_second_minimization_instance(self.minus_log_like_profile,
-                                                                                        self._free_parameters)
+                                                                                        self._free_parameters,
+                                                                                        **gradient_option)
 
             else:
 
@@ -271,6 +399,19 @@ class JointLikelihood(object):
             # First restore best fit (to make sure we compute the likelihood at the right point in the following)
             self._minimizer.restore_best_fit()
 
+            if self._likelihood_cache is not None:
+
+                # With a tolerance, the minimum might have been taken from a nearby point in the cache.
+                # Compute it exactly
+
+                minimum = 0
+
+                for log_like in self._inner_fits():
+
+                    minimum += log_like * (-1)
+
+                self._current_minimum = float(minimum)
+
         # Now collect the values for the likelihood for the various datasets
 
         # Fill the dictionary with the values of the -log likelihood (dataset by dataset)
@@ -731,29 +872,37 @@ class JointLikelihood(object):
         # Now profile out nuisance parameters and compute the new value
         # for the likelihood
 
-        summed_log_likelihood = 0
+        try:
 
-        for dataset in self._data_list.values():
+            if self._likelihood_cache is not None:
 
-            try:
+                log_likes = self._likelihood_cache.get_log_likes(trial_values, self._inner_fits)
+
+            else:
 
-                this_log_like = dataset.inner_fit()
+                log_likes = self._inner_fits()
 
-            except ModelAssertionViolation:
+        except ModelAssertionViolation:
 
-                # This is a zone of the parameter space which is not allowed. Return
-                # a big number for the likelihood so that the fit engine will avoid it
+            # This is a zone of the parameter space which is not allowed. Return
+            # a big number for the likelihood so that the fit engine will avoid it
 
-                custom_warnings.warn("Fitting engine in forbidden space: %s" % (trial_values,),
-                                     custom_exceptions.ForbiddenRegionOfParameterSpace)
+            custom_warnings.warn("Fitting engine in forbidden space: %s" % (trial_values,),
+                                 custom_exceptions.ForbiddenRegionOfParameterSpace)
 
-                return minimization.FIT_FAILED
+            return minimization.FIT_FAILED
 
-            except:
+        except:
 
-                # Do not intercept other errors
+            # Do not intercept other errors
 
-                raise
+            raise
+
+        # Sum in the order of the data list, so that the result does not depend on the evaluation order
+
+        summed_log_likelihood = 0
+
+        for this_log_like in log_likes:
 
             summed_log_likelihood += this_log_like
 
@@ -780,6 +929,127 @@ class JointLikelihood(object):
 
         return summed_log_likelihood * (-1)
 
+    def _inner_fits(self, indexes=None):
+        """
+        Profile out the nuisance parameters of the plugins and get their log-likelihoods
+
+        :param indexes: (optional) evaluate only the plugins at these positions in the data list
+        :return: list of log-likelihoods
+        """
+
+        if self._plugin_evaluator is not None:
+
+            return self._plugin_evaluator.inner_fits(indexes)
+
+        datasets = list(self._data_list.values())
+
+        if indexes is not None:
+
+            datasets = [datasets[i] for i in indexes]
+
+        return [dataset.inner_fit() for dataset in datasets]
+
+    def minus_log_like_gradient(self, *trial_values):
+        """
+        Return the derivatives of the minus log likelihood with respect to the internal values of the free parameters,
+        for a given set of trial values, as computed by the plugins (see PluginPrototype.get_log_like_gradient)
+
+        :param trial_values: the trial values. Must be in the same number as the free parameters in the model
+        :return: array of derivatives
+        """
+
+        self._ngradient_calls += 1
+
+        trial_values = np.array(trial_values)
+
+        if not np.isfinite(np.dot(trial_values, trial_values.T)):
+
+            # Same as in minus_log_like_profile: the minimizer is lost, give it a flat direction
+
+            return np.zeros_like(trial_values)
+
+        for i, parameter in enumerate(self._free_parameters.values()):
+
+            parameter._set_internal_value(trial_values[i])
+
+        try:
+
+            gradients = [dataset.get_log_like_gradient(self._free_parameters) for dataset in self._data_list.values()]
+
+        except ModelAssertionViolation:
+
+            return np.zeros_like(trial_values)
+
+        summed_gradient = np.zeros_like(trial_values)
+
+        for dataset_name, this_gradient in zip(self._data_list.keys(), gradients):
+
+            assert this_gradient is not None, "Plugin %s cannot provide the gradient anymore" % dataset_name
+
+            summed_gradient += this_gradient
+
+        return summed_gradient * (-1)
+
+    def _plugins_provide_gradient(self):
+        """
+        Check whether all the plugins can provide the gradient of their log-likelihood with the current setup
+
+        :return: True or False
+        """
+
+        if len(self._free_parameters) == 0:
+
+            return False
+
+        for dataset in self._data_list.values():
+
+            try:
+
+                gradient = dataset.get_log_like_gradient(self._free_parameters)
+
+            except ModelAssertionViolation:
+
+                return False
+
+            if gradient is None or not np.all(np.isfinite(gradient)):
+
+                return False
+
+        return True
+
+    def _get_gradient_option(self, minimization):
+        """
+        The keyword arguments to give the gradient to a minimizer, if it can use it and all plugins provide it
+
+        :param minimization: the minimization (a LocalMinimization or GlobalMinimization instance)
+        :return: a dictionary, empty if the gradient is not to be used
+        """
+
+        if self._use_plugin_gradients and minimization.supports_gradient and self._plugins_provide_gradient():
+
+            return {'gradient': self.minus_log_like_gradient}
+
+        else:
+
+            return {}
+
+    @property
+    def ngradient_calls(self):
+        """
+        :return: the number of evaluations of the gradient (see minus_log_like_gradient) since the beginning of the
+        last fit
+        """
+
+        return self._ngradient_calls
+
+    @property
+    def ncalls(self):
+        """
+        :return: the number of evaluations of the likelihood since the beginning of the last fit
+        """
+
+        return self._ncalls
+
     @property
     def fit_trace(self):
         return pd.DataFrame(self._record_calls)
@@ -811,6 +1081,12 @@ class JointLikelihood(object):
 
     def _get_minimizer(self, *args, **kwargs):
 
+        # Give the gradient to the minimizer if possible
+
+        if 'gradient' not in kwargs:
+
+            kwargs.update(self._get_gradient_option(self._minimizer_type))
+
         # Get an instance of the minimizer
 
         minimizer_instance = self._minimizer_type.get_instance(*args, **kwargs)
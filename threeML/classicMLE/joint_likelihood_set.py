@@ -1,3 +1,4 @@
+import collections
 import logging
 import numpy as np
 import warnings
@@ -10,6 +11,7 @@ from threeML.config.config import threeML_config
 from threeML.data_list import DataList
 from threeML.io.progress_bar import progress_bar
 from threeML.analysis_results import AnalysisResultsSet
+from threeML.io.analysis_results_store import AnalysisResultsStore, LazyAnalysisResultsSet
 from threeML.minimizer.minimization import _Minimization, LocalMinimization, _minimizers
 
 from astromodels import Model
@@ -110,6 +112,22 @@ class JointLikelihoodSet(object):
 
     def worker(self, interval):
 
+        frame_with_parameters, frame_with_like, analysis_results, _, _ = self._fit_interval(interval)
+
+        return frame_with_parameters, frame_with_like, analysis_results
+
+    def _fit_interval(self, interval, initial_values=None):
+        """
+        Fit all the models for one interval
+
+        :param interval: the number of the interval
+        :param initial_values: (optional) for each model, None or a dictionary {path: value} of starting values for
+        the free parameters
+        :return: (frame with parameters, frame with likelihood values, list of results, list of best fit values
+        {path: value} (None for a failed fit), list of the number of likelihood evaluations), with one element
+        per model in the lists
+        """
+
         # Get the dataset for this interval
 
         this_data = self._data_getter(interval)  # type: DataList
@@ -130,8 +148,10 @@ class JointLikelihoodSet(object):
         parameters_frames = []
         like_frames = []
         analysis_results = []
+        best_fit_values = []
+        n_calls = []
 
-        for this_model in this_models:
+        for i, this_model in enumerate(this_models):
 
             # Prepare a joint likelihood and fit it
 
@@ -141,6 +161,13 @@ class JointLikelihoodSet(object):
 
                 jl = JointLikelihood(this_model, this_data)
 
+            # NOTE: this is done after creating the joint likelihood, so that the nuisance parameters
+            # of the plugins are in the model
+
+            if initial_values is not None and initial_values[i] is not None:
+
+                _set_initial_values(this_model, initial_values[i])
+
             this_parameter_frame, this_like_frame = self._fitter(jl)
 
             # Append results
@@ -148,6 +175,18 @@ class JointLikelihoodSet(object):
             parameters_frames.append(this_parameter_frame)
             like_frames.append(this_like_frame)
             analysis_results.append(jl.results)
+            n_calls.append(jl.ncalls)
+
+            if this_parameter_frame.empty:
+
+                # failed fit
+
+                best_fit_values.append(None)
+
+            else:
+
+                best_fit_values.append(collections.OrderedDict([(path, parameter.value) for path, parameter in
+                                                                this_model.free_parameters.items()]))
 
         # Now merge the results in one data frame for the parameters and one for the likelihood
         # values
@@ -168,7 +207,7 @@ class JointLikelihoodSet(object):
             frame_with_parameters = parameters_frames[0]
             frame_with_like = like_frames[0]
 
-        return frame_with_parameters, frame_with_like, analysis_results
+        return frame_with_parameters, frame_with_like, analysis_results, best_fit_values, n_calls
 
     def _fitter(self, jl):
 
@@ -198,7 +237,37 @@ class JointLikelihoodSet(object):
 
         return model_results, logl_results
 
-    def go(self, continue_on_failure=True, compute_covariance=False, verbose=False, **options_for_parallel_computation):
+    def _open_results_stores(self, results_store):
+
+        if results_store is None:
+
+            return _OrderedResultsWriter([])
+
+        # Trick to make the file names always a list
+        filenames = list(np.array(results_store, ndmin=1))
+
+        assert len(filenames) == self._n_models, "You need to provide one results store per model"
+
+        return _OrderedResultsWriter([AnalysisResultsStore(filename, mode='w') for filename in filenames])
+
+    def go(self, continue_on_failure=True, compute_covariance=False, verbose=False, results_store=None,
+           **options_for_parallel_computation):
+        """
+        Perform all the fits
+
+        :param continue_on_failure: if True, a failed fit does not stop the other ones
+        :param compute_covariance: whether to compute the covariance matrix of each fit
+        :param verbose: print information on the fits
+        :param results_store: (optional) name of a HDF5 file (or list of names, one per model) where the results are
+        written as AnalysisResultsStore. Each result is written as soon as it is available and all the results
+        before it have been written, so that the file always contains the results of the first iterations in order
+        (in parallel mode, the results which arrive before some of the previous ones are kept in memory until
+        those are available). They can be read back (even partially, if the computation did not finish) with
+        load_analysis_results. The results are not kept in memory: after the fits, the results property reads them
+        lazily from the stores.
+        :param options_for_parallel_computation: options for the parallel client
+        :return: (data frame of parameters, data frame of likelihood values)
+        """
 
         # Generate the data frame which will contain all results
 
@@ -210,30 +279,45 @@ class JointLikelihoodSet(object):
 
         self._compute_covariance = compute_covariance
 
+        writer = self._open_results_stores(results_store)
+
+        # the results in the order of the iterations
+
+        results = [None] * self._n_iterations
+
         # let's iterate, perform the fit and fill the data frame
 
-        if threeML_config['parallel']['use-parallel']:
+        try:
 
-            # Parallel computation
+            if threeML_config['parallel']['use-parallel']:
 
-            client = ParallelClient(**options_for_parallel_computation)
+                # Parallel computation
 
-            results = client.execute_with_progress_bar(self.worker, range(self._n_iterations))
+                client = ParallelClient(**options_for_parallel_computation)
 
+                for i, this_results in client.iterate_with_progress_bar(self.worker, range(self._n_iterations)):
 
-        else:
+                    results[i] = writer.add(i, this_results)
+
+            else:
+
+                # Serial computation
+
+                with progress_bar(self._n_iterations, title='Goodness of fit computation') as p:
 
-            # Serial computation
+                    for i in range(self._n_iterations):
 
-            results = []
+                        results[i] = writer.add(i, self.worker(i))
 
-            with progress_bar(self._n_iterations, title='Goodness of fit computation') as p:
+                        p.increase()
 
-                for i in range(self._n_iterations):
+        finally:
 
-                    results.append(self.worker(i))
+            writer.close()
 
-                    p.increase()
+        return self._collect_results(results, writer.get_results_sets())
+
+    def _collect_results(self, results, results_sets=None):
 
         assert len(results) == self._n_iterations, "Something went wrong, I have %s results " \
                                                    "for %s intervals" % (len(results), self._n_iterations)
@@ -245,13 +329,21 @@ class JointLikelihoodSet(object):
 
         # Store a list with all results (this is a list of lists, each list contains the results for the different
         # iterations for the same model)
-        self._all_results = []
+        if results_sets is not None:
 
-        for i in range(self._n_models):
+            # the results have been written to stores, and are read from there
+
+            self._all_results = results_sets
+
+        else:
 
-            this_model_results = map(lambda x: x[2][i], results)
+            self._all_results = []
 
-            self._all_results.append(AnalysisResultsSet(this_model_results))
+            for i in range(self._n_models):
+
+                this_model_results = map(lambda x: x[2][i], results)
+
+                self._all_results.append(AnalysisResultsSet(this_model_results))
 
         return parameter_frames, like_frames
 
@@ -296,6 +388,281 @@ class JointLikelihoodSet(object):
             this_results.write_to(filenames[i], overwrite=overwrite)
 
 
+class _OrderedResultsWriter(object):
+
+    def __init__(self, stores):
+        """
+        Write the results of the iterations of a JointLikelihoodSet to the stores (one per model) in the order of the
+        iterations: each result is written as soon as it is available and all the previous ones have been written.
+        Only the results which arrive before some of the previous ones are kept in memory, until they can be written.
+
+        :param stores: list of AnalysisResultsStore instances, one per model (can be empty)
+        """
+
+        self._stores = stores
+
+        self._filenames = [store.filename for store in stores]
+
+        self._pending = {}
+
+        self._n_written = 0
+
+    def add(self, iteration, worker_results):
+        """
+        Add the results of an iteration
+
+        :param iteration: the number of the iteration
+        :param worker_results: (frame with parameters, frame with likelihood values, list of results)
+        :return: the worker results to keep in memory (without the analysis results if they are written to stores)
+        """
+
+        if not self._stores:
+
+            return worker_results
+
+        self._pending[iteration] = worker_results[2]
+
+        while self._n_written in self._pending:
+
+            for store, analysis_results in zip(self._stores, self._pending.pop(self._n_written)):
+
+                store.append(analysis_results)
+
+            self._n_written += 1
+
+        return worker_results[0], worker_results[1], None
+
+    def close(self):
+
+        for store in self._stores:
+
+            store.close()
+
+    def get_results_sets(self):
+        """
+        :return: a LazyAnalysisResultsSet for each store, or None if there are no stores
+        """
+
+        if not self._filenames:
+
+            return None
+
+        return [LazyAnalysisResultsSet(filename) for filename in self._filenames]
+
+
+def _set_initial_values(model, values):
+    """
+    Set the values of the free parameters of a model which are in the given dictionary (clipped to the bounds of
+    the parameters)
+
+    :param model: the model
+    :param values: dictionary {path: value}
+    :return: none
+    """
+
+    free_parameters = model.free_parameters
+
+    for path, value in values.items():
+
+        if path not in free_parameters:
+
+            continue
+
+        parameter = free_parameters[path]
+
+        if parameter.min_value is not None:
+
+            value = max(value, parameter.min_value)
+
+        if parameter.max_value is not None:
+
+            value = min(value, parameter.max_value)
+
+        parameter.value = value
+
+
+class TimeResolvedJointLikelihoodSet(JointLikelihoodSet):
+
+    def __init__(self, data_getter, model_getter, interval_times, iteration_name='interval', preprocessor=None):
+        """
+        A JointLikelihoodSet for a sequence of time intervals (for example for time-resolved spectroscopy).
+        The intervals are fit in time order, and the fit of each interval starts from the best fit of the closest
+        interval fit before it (warm start), which is usually very close to the new best fit.
+
+        In parallel mode the sequence is split in contiguous chunks, one per engine by default, so that the warm
+        start works within each chunk. Only the first interval of each chunk starts from the values returned by
+        the model getter.
+
+        The number of likelihood evaluations of each fit is available after go() in the likelihood_calls property.
+
+        :param data_getter: a function returning the DataList of an interval, given its number
+        :param model_getter: a function returning the model (or list of models) of an interval, given its number
+        :param interval_times: a reference time for each interval (for example its start time), used to order them
+        :param iteration_name: the name of the iterations (used in messages)
+        :param preprocessor: (optional) a function called with the models and the data before each fit
+        """
+
+        self._interval_times = np.array(interval_times, dtype=float, ndmin=1)
+
+        super(TimeResolvedJointLikelihoodSet, self).__init__(data_getter, model_getter, self._interval_times.shape[0],
+                                                             iteration_name=iteration_name, preprocessor=preprocessor)
+
+        # a stable sort, so that intervals with the same time are fit in their original order
+
+        self._time_order = np.argsort(self._interval_times, kind='mergesort')
+
+        self._warm_start = True
+
+        self._chunks = None
+
+        self._likelihood_calls = None
+
+    def _fit_chunk(self, chunk):
+        """
+        A generator which fits the intervals of a chunk one after the other, starting each fit from the last
+        successful one
+
+        :param chunk: list of interval numbers, in time order
+        :return: generator of (interval, (frame with parameters, frame with likelihood values, list of results,
+        list of number of likelihood evaluations, warm started or not))
+        """
+
+        initial_values = [None] * self._n_models
+
+        for interval in chunk:
+
+            warm_started = any([values is not None for values in initial_values])
+
+            frame_with_parameters, frame_with_like, analysis_results, best_fit_values, n_calls = \
+                self._fit_interval(interval, initial_values if self._warm_start else None)
+
+            for i, values in enumerate(best_fit_values):
+
+                if values is not None:
+
+                    initial_values[i] = values
+
+            yield interval, (frame_with_parameters, frame_with_like, analysis_results, n_calls,
+                             warm_started and self._warm_start)
+
+    def chunk_worker(self, chunk_number):
+
+        return list(self._fit_chunk(self._chunks[chunk_number]))
+
+    def go(self, continue_on_failure=True, compute_covariance=False, verbose=False, results_store=None,
+           warm_start=True, n_chunks=None, **options_for_parallel_computation):
+        """
+        Perform all the fits
+
+        :param continue_on_failure: if True, a failed fit does not stop the other ones
+        :param compute_covariance: whether to compute the covariance matrix of each fit
+        :param verbose: print information on the fits
+        :param results_store: (optional) name of a HDF5 file (or list of names, one per model) where the results are
+        written, in the order of the intervals, as soon as they are available (see JointLikelihoodSet.go)
+        :param warm_start: start each fit from the best fit of the previous interval (default: True)
+        :param n_chunks: number of contiguous chunks the sequence is split in (default: one per engine in parallel
+        mode, 1 otherwise)
+        :param options_for_parallel_computation: options for the parallel client
+        :return: (data frame of parameters, data frame of likelihood values)
+        """
+
+        if verbose:
+
+            log.setLevel(logging.INFO)
+
+        self._continue_on_failure = continue_on_failure
+
+        self._compute_covariance = compute_covariance
+
+        self._warm_start = bool(warm_start)
+
+        writer = self._open_results_stores(results_store)
+
+        # the results (and the warm start flags) in the order of the intervals
+
+        results = [None] * self._n_iterations
+        warm_started = np.zeros(self._n_iterations, bool)
+        n_calls = np.zeros((self._n_iterations, self._n_models), int)
+
+        def add_fit(interval, this_fit):
+
+            frame_with_parameters, frame_with_like, analysis_results, n_calls[interval], \
+            warm_started[interval] = this_fit
+
+            # the results are written to the stores in the order of the intervals
+
+            results[interval] = writer.add(interval, (frame_with_parameters, frame_with_like, analysis_results))
+
+        try:
+
+            if threeML_config['parallel']['use-parallel']:
+
+                client = ParallelClient(**options_for_parallel_computation)
+
+                if n_chunks is None:
+
+                    n_chunks = client.get_number_of_engines()
+
+                self._chunks = self._split_in_chunks(n_chunks)
+
+                for _, chunk_results in client.iterate_with_progress_bar(self.chunk_worker, range(len(self._chunks))):
+
+                    for interval, this_fit in chunk_results:
+
+                        add_fit(interval, this_fit)
+
+            else:
+
+                self._chunks = self._split_in_chunks(1 if n_chunks is None else n_chunks)
+
+                with progress_bar(self._n_iterations, title='Time-resolved fits') as p:
+
+                    for chunk in self._chunks:
+
+                        for interval, this_fit in self._fit_chunk(chunk):
+
+                            add_fit(interval, this_fit)
+
+                            p.increase()
+
+        finally:
+
+            writer.close()
+
+        likelihood_calls = collections.OrderedDict()
+
+        likelihood_calls['time'] = self._interval_times
+        likelihood_calls['warm_start'] = warm_started
+
+        for i in range(self._n_models):
+
+            likelihood_calls['model_%i' % i] = n_calls[:, i]
+
+        self._likelihood_calls = pd.DataFrame(likelihood_calls, index=pd.Index(range(self._n_iterations),
+                                                                                 name=self._iteration_name))
+
+        return self._collect_results(results, writer.get_results_sets())
+
+    def _split_in_chunks(self, n_chunks):
+
+        assert n_chunks >= 1, "There must be at least one chunk"
+
+        return [list(chunk) for chunk in np.array_split(self._time_order, min(n_chunks, self._n_iterations))]
+
+    @property
+    def likelihood_calls(self):
+        """
+        The number of evaluations of the likelihood needed by each fit (one column per model), with the
+        time of the interval and whether the fit was warm started
+
+        :return: a data frame indexed by interval
+        """
+
+        assert self._likelihood_calls is not None, "You have to run go() first"
+
+        return self._likelihood_calls
+
+
 class JointLikelihoodSetAnalyzer(object):
     """
     A class to help in offline re-analysis of the results obtained with the JointLikelihoodSet class
@@ -0,0 +1,268 @@
+import collections
+
+import numpy as np
+import pandas as pd
+
+
+class VectorLRUCache(object):
+
+    def __init__(self, n_dim, max_entries, tolerance=0.0):
+        """
+        A bounded cache of values keyed by vectors of floats. When full, the least recently used entry is dropped.
+
+        With a tolerance of zero the vectors must match exactly. Otherwise a vector matches a stored one if all their
+        elements are within the given relative tolerance, and the value of the closest match is returned.
+
+        :param n_dim: the length of the vectors
+        :param max_entries: the maximum number of entries
+        :param tolerance: relative tolerance for the match (default: 0, i.e., exact match)
+        """
+
+        assert max_entries >= 1, "The cache must hold at least one entry"
+
+        assert tolerance >= 0, "The tolerance cannot be negative"
+
+        self._n_dim = int(n_dim)
+        self._max_entries = int(max_entries)
+        self._tolerance = float(tolerance)
+
+        # key -> (slot, value), in order of use. The keys are also stored in the rows (slots) of an array, so that
+        # the search within the tolerance is vectorized
+
+        self._entries = collections.OrderedDict()
+
+        self._keys = np.zeros((self._max_entries, self._n_dim))
+        self._used = np.zeros(self._max_entries, bool)
+        self._slot_keys = [None] * self._max_entries
+
+        self._n_hits = 0
+        self._n_misses = 0
+
+    @property
+    def n_hits(self):
+
+        return self._n_hits
+
+    @property
+    def n_misses(self):
+
+        return self._n_misses
+
+    def __len__(self):
+
+        return len(self._entries)
+
+    def clear(self):
+
+        self._entries.clear()
+        self._used[:] = False
+        self._slot_keys = [None] * self._max_entries
+
+    def _find_close(self, vector):
+
+        if not np.any(self._used):
+
+            return None
+
+        distances = np.abs(self._keys - vector)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+
+            relative_distances = np.max(np.where(distances > 0, distances / np.abs(vector), 0), axis=1)
+
+        relative_distances[~self._used] = np.inf
+
+        closest = np.argmin(relative_distances)
+
+        if relative_distances[closest] <= self._tolerance:
+
+            return self._slot_keys[closest]
+
+        else:
+
+            return None
+
+    def get(self, vector):
+        """
+        Look for a vector in the cache
+
+        :param vector: the vector
+        :return: the value, or None if the vector is not in the cache
+        """
+
+        key = tuple(vector)
+
+        if key not in self._entries and self._tolerance > 0:
+
+            key = self._find_close(np.array(vector, dtype=float))
+
+        if key is None or key not in self._entries:
+
+            self._n_misses += 1
+
+            return None
+
+        self._n_hits += 1
+
+        # mark as most recently used
+
+        entry = self._entries.pop(key)
+
+        self._entries[key] = entry
+
+        return entry[1]
+
+    def put(self, vector, value):
+        """
+        Store a value for a vector
+
+        :param vector: the vector
+        :param value: the value
+        :return: none
+        """
+
+        key = tuple(vector)
+
+        if key in self._entries:
+
+            slot, _ = self._entries.pop(key)
+
+        elif len(self._entries) < self._max_entries:
+
+            slot = len(self._entries)
+
+        else:
+
+            # drop the least recently used entry and reuse its slot
+
+            _, (slot, _) = self._entries.popitem(last=False)
+
+        self._entries[key] = (slot, value)
+
+        self._keys[slot, :] = vector
+        self._used[slot] = True
+        self._slot_keys[slot] = key
+
+
+class LikelihoodCache(object):
+
+    def __init__(self, data_list, free_parameters, max_entries=10000, tolerance=0.0):
+        """
+        A cache of the log-likelihood values of the plugins of a joint likelihood, keyed by the internal values of the
+        free parameters. Each plugin has its own cache, keyed only by the parameters it depends on, i.e., all the free
+        parameters except the nuisance parameters of the other plugins. This way, when only the nuisance parameters
+        of one plugin change, only that plugin is evaluated again.
+
+        NOTE: the cached values are valid only as long as the data, the fixed parameters and the setup of the plugins
+        do not change.
+
+        :param data_list: the data list
+        :param free_parameters: ordered dictionary of the free parameters, in the order of the trial values
+        :param max_entries: maximum number of entries for each plugin (default: 10000)
+        :param tolerance: relative tolerance for the match of the parameters (default: 0, i.e., exact match)
+        """
+
+        self._names = list(data_list.keys())
+
+        free_parameters = list(free_parameters.values())
+
+        self._n_parameters = len(free_parameters)
+
+        # The nuisance parameters of each plugin (by identity, the names in the model and in the plugin can differ)
+
+        nuisance_ids = [set(id(parameter) for parameter in plugin.nuisance_parameters.values())
+                        for plugin in data_list.values()]
+
+        self._parameter_indexes = []
+        self._caches = []
+
+        for i in range(len(self._names)):
+
+            other_nuisance_ids = set()
+
+            for j, these_ids in enumerate(nuisance_ids):
+
+                if j != i:
+
+                    other_nuisance_ids |= these_ids
+
+            indexes = np.array([k for k, parameter in enumerate(free_parameters)
+                                if id(parameter) not in other_nuisance_ids], dtype=int)
+
+            self._parameter_indexes.append(indexes)
+
+            self._caches.append(VectorLRUCache(len(indexes), max_entries, tolerance))
+
+        self._n_calls = 0
+        self._n_complete_hits = 0
+
+    def get_log_likes(self, trial_values, evaluate):
+        """
+        Get the log-likelihood of all the plugins for the given trial values, evaluating only the plugins
+        whose values are not in the cache
+
+        :param trial_values: the internal values of the free parameters
+        :param evaluate: a function which, given a list of indexes of plugins (in the data list), evaluates them
+        with the current values of the parameters and returns their log-likelihoods
+        :return: the list of log-likelihoods, in the order of the data list
+        """
+
+        trial_values = np.asarray(trial_values)
+
+        assert trial_values.shape[0] == self._n_parameters, "Number of trial values and of free parameters do not match"
+
+        self._n_calls += 1
+
+        log_likes = []
+        missing = []
+
+        for i, (indexes, cache) in enumerate(zip(self._parameter_indexes, self._caches)):
+
+            value = cache.get(trial_values[indexes])
+
+            if value is None:
+
+                missing.append(i)
+
+            log_likes.append(value)
+
+        if missing:
+
+            for i, value in zip(missing, evaluate(missing)):
+
+                log_likes[i] = value
+
+                self._caches[i].put(trial_values[self._parameter_indexes[i]], value)
+
+        else:
+
+            self._n_complete_hits += 1
+
+        return log_likes
+
+    def clear(self):
+
+        for cache in self._caches:
+
+            cache.clear()
+
+    @property
+    def statistics(self):
+        """
+        The number of hits and misses of the cache of each plugin, and the hit rate. The 'total' row refers to the
+        whole likelihood (a hit means that no plugin had to be evaluated).
+
+        :return: a pandas DataFrame
+        """
+
+        hits = [cache.n_hits for cache in self._caches] + [self._n_complete_hits]
+        misses = [cache.n_misses for cache in self._caches] + [self._n_calls - self._n_complete_hits]
+
+        statistics = pd.DataFrame(collections.OrderedDict([('hits', hits), ('misses', misses)]),
+                                  index=self._names + ['total'])
+
+        with np.errstate(invalid='ignore'):
+
+            statistics['hit rate'] = statistics['hits'] / (statistics['hits'] + statistics['misses']).astype(float)
+
+        return statistics
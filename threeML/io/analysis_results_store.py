@@ -0,0 +1,605 @@
+import collections
+import os
+
+import astropy.units as u
+import numpy as np
+import pandas as pd
+from astromodels.core.model_parser import ModelParser
+from astromodels.core.my_yaml import my_yaml
+from pandas import HDFStore
+
+from threeML.analysis_results import AnalysisResultsSet, MLEResults, BayesianResults
+from threeML.io.file_utils import sanitize_filename
+
+# The models are stored as text split in chunks of this length, so that they fit in a table of fixed-length strings
+
+_MODEL_CHUNK_LENGTH = 1024
+
+# Maximum length of the names of parameters, plugins and statistical measures
+
+_NAME_LENGTH = 256
+
+
+class AnalysisResultsStore(object):
+    def __init__(self, filename, mode='a'):
+        """
+        A columnar HDF5 store for a (possibly large) sequence of analysis results, such as those of a time-resolved
+        analysis. Results can be appended one at a time as they are produced, and read back lazily with
+        load_analysis_results (see LazyAnalysisResultsSet).
+
+        The store contains one table for each kind of information, with one or more rows per result:
+
+        - results: the type of each result (MLE, Bayesian, or none for failed analyses)
+        - parameters: the best fit values and (equal-tail) errors of the free parameters
+        - statistics: the statistic values for each plugin and the statistical measures
+        - models: the serialization of the optimized models
+        - covariance: the covariance matrix of MLE results
+        - samples/p<i>: the samples of the i-th parameter in the sample_parameters table, for Bayesian results
+
+        The tables are chunked, and the result number is a queryable column, so that the information about one result
+        can be read without reading the others, and parameters can be queried across all the results at once.
+
+        :param filename: the name of the HDF5 file
+        :param mode: 'w' to create a new store (overwriting the file), 'a' to append to an existing store (or create
+        it), 'r' to only read
+        """
+
+        assert mode in ['w', 'a', 'r'], "mode must be 'w', 'a' or 'r'"
+
+        self._filename = sanitize_filename(filename)
+
+        self._mode = mode
+
+        self._store = HDFStore(self._filename, mode=mode, complevel=5, complib='zlib')
+
+        self._n_results = self._store.get_storer('results').nrows if '/results' in self._store.keys() else 0
+
+        if '/sample_parameters' in self._store.keys():
+
+            self._sample_parameters = list(self._store['sample_parameters'].values)
+
+        else:
+
+            self._sample_parameters = []
+
+    @property
+    def filename(self):
+
+        return self._filename
+
+    def __len__(self):
+
+        return self._n_results
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, *args):
+
+        self.close()
+
+    def close(self):
+
+        if self._mode != 'r' and self._store.is_open:
+
+            # Index the result column of the tables (this is done only at the end, as updating the index at each
+            # append would be expensive), so that reading one result does not need to scan the whole table
+
+            for key in self._store.keys():
+
+                storer = self._store.get_storer(key)
+
+                if storer.is_table and 'result' in storer.data_columns:
+
+                    self._store.create_table_index(key, columns=['result'], optlevel=9, kind='full')
+
+        self._store.close()
+
+    def _append_rows(self, key, data_frame, string_lengths, data_columns=('result',)):
+
+        self._store.append(key, data_frame, format='table', index=False, data_columns=list(data_columns),
+                           min_itemsize=string_lengths)
+
+    def append(self, analysis_results):
+        """
+        Append one result to the store
+
+        :param analysis_results: a MLEResults or BayesianResults instance (or None for a failed analysis)
+        :return: the number of the result in the store
+        """
+
+        index = self._n_results
+
+        if analysis_results is None:
+
+            self._append_result_row(index, 'none', 0, 0)
+
+            return index
+
+        # Parameters (always use equal tail errors, as in the FITS files)
+
+        data_frame = analysis_results.get_data_frame(error_type="equal tail")
+
+        n_parameters = data_frame.shape[0]
+
+        parameters = pd.DataFrame({'result': np.ones(n_parameters, int) * index,
+                                   'parameter': [str(name) for name in data_frame.index],
+                                   'value': data_frame['value'].values.astype(float),
+                                   'negative_error': data_frame['negative_error'].values.astype(float),
+                                   'positive_error': data_frame['positive_error'].values.astype(float),
+                                   'error': data_frame['error'].values.astype(float),
+                                   'unit': [str(unit) for unit in data_frame['unit'].values]},
+                                  columns=['result', 'parameter', 'value', 'negative_error', 'positive_error',
+                                           'error', 'unit'])
+
+        self._append_rows('parameters', parameters, {'parameter': _NAME_LENGTH, 'unit': 64},
+                          data_columns=('result', 'parameter'))
+
+        # Statistic values and statistical measures
+
+        statistic_values = analysis_results.optimal_statistic_values
+        measures = analysis_results.statistical_measures
+
+        statistics = pd.DataFrame({'result': index,
+                                   'kind': ['statistic'] * len(statistic_values) + ['measure'] * len(measures),
+                                   'name': [str(name) for name in statistic_values.index] +
+                                           [str(name) for name in measures.index],
+                                   'value': np.concatenate((np.asarray(statistic_values.values, float),
+                                                            np.asarray(measures.values, float)))},
+                                  columns=['result', 'kind', 'name', 'value'])
+
+        self._append_rows('statistics', statistics, {'kind': 16, 'name': _NAME_LENGTH})
+
+        # The model, as text
+
+        serialized_model = my_yaml.dump(analysis_results.optimized_model.to_dict_with_types())
+
+        chunks = [serialized_model[i:i + _MODEL_CHUNK_LENGTH]
+                  for i in range(0, len(serialized_model), _MODEL_CHUNK_LENGTH)]
+
+        self._append_rows('models', pd.DataFrame({'result': index, 'chunk': range(len(chunks)), 'text': chunks},
+                                                 columns=['result', 'chunk', 'text']),
+                          {'text': _MODEL_CHUNK_LENGTH})
+
+        # The errors: covariance for MLE, samples for Bayesian results
+
+        if analysis_results.analysis_type == "MLE":
+
+            covariance_matrix = analysis_results.covariance_matrix
+
+            rows, columns = np.indices(covariance_matrix.shape)
+
+            self._append_rows('covariance', pd.DataFrame({'result': index,
+                                                          'row': rows.flatten(),
+                                                          'column': columns.flatten(),
+                                                          'value': covariance_matrix.flatten()},
+                                                         columns=['result', 'row', 'column', 'value']), {})
+
+            n_samples = 0
+
+        else:
+
+            samples = analysis_results.samples
+
+            for parameter, these_samples in zip(parameters['parameter'], samples):
+
+                self._append_rows(self._get_samples_key(parameter, create=True),
+                                  pd.DataFrame({'result': index, 'value': these_samples}, columns=['result', 'value']),
+                                  {})
+
+            n_samples = samples.shape[1]
+
+        # the row in the results table is written last, so that an interrupted append does not leave
+        # an incomplete result
+
+        self._append_result_row(index, analysis_results.analysis_type, n_parameters, n_samples)
+
+        return index
+
+    def _append_result_row(self, index, analysis_type, n_parameters, n_samples):
+
+        self._append_rows('results', pd.DataFrame({'result': [index],
+                                                   'analysis_type': [analysis_type],
+                                                   'n_parameters': [n_parameters],
+                                                   'n_samples': [n_samples]},
+                                                  columns=['result', 'analysis_type', 'n_parameters', 'n_samples']),
+                          {'analysis_type': 16})
+
+        self._n_results += 1
+
+    def _get_samples_key(self, parameter, create=False):
+
+        if parameter not in self._sample_parameters:
+
+            assert create, "There are no samples for parameter %s" % parameter
+
+            self._sample_parameters.append(parameter)
+
+            self._store.put('sample_parameters', pd.Series(self._sample_parameters), format='table',
+                            min_itemsize={'values': _NAME_LENGTH})
+
+        return 'samples/p%i' % self._sample_parameters.index(parameter)
+
+    def set_sequence(self, name, data_tuple):
+        """
+        Store the characterization of the sequence of results (see AnalysisResultsSet.characterize_sequence)
+
+        :param name: the name of the sequence
+        :param data_tuple: a tuple of (column name, values) pairs, where values can be astropy quantities
+        :return: none
+        """
+
+        columns = collections.OrderedDict()
+        units = {}
+
+        for column_name, values in data_tuple:
+
+            if isinstance(values, u.Quantity):
+
+                units[column_name] = str(values.unit)
+
+                values = values.value
+
+            columns[column_name] = np.asarray(values)
+
+        self._store.put('sequence', pd.DataFrame(columns), format='table')
+
+        attributes = self._store.get_storer('sequence').attrs
+
+        attributes.sequence_name = str(name)
+        attributes.units = units
+
+    def get_sequence(self):
+        """
+        :return: (name, data tuple) of the sequence, or None if it was not set
+        """
+
+        if '/sequence' not in self._store.keys():
+
+            return None
+
+        frame = self._store['sequence']
+
+        attributes = self._store.get_storer('sequence').attrs
+
+        data_tuple = []
+
+        for column_name in frame.columns:
+
+            values = frame[column_name].values
+
+            if column_name in attributes.units:
+
+                values = values * u.Unit(attributes.units[column_name])
+
+            data_tuple.append((column_name, values))
+
+        return attributes.sequence_name, tuple(data_tuple)
+
+    def _select(self, key, result=None, where=None):
+
+        conditions = [] if where is None else [where]
+
+        if result is not None:
+
+            conditions.append('result == %i' % result)
+
+        return self._store.select(key, where=conditions if conditions else None)
+
+    def get_analysis_types(self):
+        """
+        :return: array with the type of each result (MLE, Bayesian or none)
+        """
+
+        if self._n_results == 0:
+
+            return np.array([], str)
+
+        return self._store.select_column('results', 'analysis_type').values
+
+    def get_parameter_table(self, parameters=None, result=None):
+        """
+        Get the best fit values and errors of the parameters of all the results (or of one result), in one query
+
+        :param parameters: (optional) a list of parameter paths to select
+        :param result: (optional) the number of the result to select
+        :return: a data frame indexed by (result, parameter)
+        """
+
+        where = None
+
+        if parameters is not None:
+
+            where = 'parameter == %s' % repr([str(parameter) for parameter in parameters])
+
+        frame = self._select('parameters', result, where)
+
+        return frame.set_index(['result', 'parameter'])
+
+    def get_statistics_table(self, result=None):
+        """
+        Get the statistic values and the statistical measures of all the results (or of one result)
+
+        :param result: (optional) the number of the result to select
+        :return: a data frame indexed by (result, kind, name)
+        """
+
+        return self._select('statistics', result).set_index(['result', 'kind', 'name'])
+
+    def get_serialized_model(self, result):
+        """
+        :param result: the number of the result
+        :return: the serialization of the optimized model of the result
+        """
+
+        chunks = self._select('models', result).sort_values('chunk')
+
+        return ''.join(chunks['text'].values)
+
+    def get_samples(self, result, parameters):
+        """
+        Read the samples of a Bayesian result
+
+        :param result: the number of the result
+        :param parameters: the paths of the parameters
+        :return: (n_parameters x n_samples) array
+        """
+
+        return np.array([self._select(self._get_samples_key(parameter), result)['value'].values
+                         for parameter in parameters])
+
+    def get_covariance_matrix(self, result, n_parameters):
+        """
+        Read the covariance matrix of a MLE result
+
+        :param result: the number of the result
+        :param n_parameters: the number of free parameters of the result
+        :return: covariance matrix
+        """
+
+        frame = self._select('covariance', result)
+
+        covariance_matrix = np.zeros((n_parameters, n_parameters))
+
+        covariance_matrix[frame['row'].values, frame['column'].values] = frame['value'].values
+
+        return covariance_matrix
+
+    def load_results(self, result):
+        """
+        Load one result completely (this parses its model)
+
+        :param result: the number of the result
+        :return: MLEResults or BayesianResults instance (or None for a failed analysis)
+        """
+
+        analysis_type = self.get_analysis_types()[result]
+
+        if analysis_type == 'none':
+
+            return None
+
+        optimized_model = ModelParser(model_dict=my_yaml.load(self.get_serialized_model(result))).get_model()
+
+        statistics = self.get_statistics_table(result).loc[result]
+
+        statistic_values = collections.OrderedDict()
+        measure_values = collections.OrderedDict()
+
+        for (kind, name), value in zip(statistics.index, statistics['value'].values):
+
+            if kind == 'statistic':
+
+                statistic_values[name] = value
+
+            else:
+
+                measure_values[name] = value
+
+        parameters = list(self.get_parameter_table(result=result).loc[result].index)
+
+        if analysis_type == "MLE":
+
+            covariance_matrix = self.get_covariance_matrix(result, len(parameters))
+
+            return MLEResults(optimized_model, covariance_matrix, statistic_values, statistical_measures=measure_values)
+
+        else:
+
+            samples = self.get_samples(result, parameters)
+
+            return BayesianResults(optimized_model, samples.T, statistic_values, statistical_measures=measure_values)
+
+
+class _LazyAnalysisResults(object):
+    def __init__(self, store, result, analysis_type):
+        """
+        A result in an AnalysisResultsStore, which is loaded (and its model parsed) only when needed. The best fit
+        values, the statistic values and the samples are read directly from the store. Any other attribute is taken
+        from the fully loaded result.
+
+        :param store: the AnalysisResultsStore
+        :param result: the number of the result in the store
+        :param analysis_type: MLE or Bayesian
+        """
+
+        self._store = store
+        self._result = result
+        self._analysis_type = analysis_type
+
+        self._loaded = None
+
+    @property
+    def analysis_type(self):
+
+        return self._analysis_type
+
+    @property
+    def is_loaded(self):
+
+        return self._loaded is not None
+
+    def load(self):
+        """
+        :return: the fully loaded MLEResults or BayesianResults
+        """
+
+        if self._loaded is None:
+
+            self._loaded = self._store.load_results(self._result)
+
+        return self._loaded
+
+    def get_data_frame(self, error_type="equal tail", cl=0.68):
+
+        if self._loaded is None and error_type == "equal tail" and cl == 0.68:
+
+            # this is what is stored
+
+            frame = self._store.get_parameter_table(result=self._result).loc[self._result]
+
+            frame.index.name = None
+
+            return frame[['value', 'negative_error', 'positive_error', 'error', 'unit']]
+
+        return self.load().get_data_frame(error_type, cl)
+
+    def _get_statistics(self, kind):
+
+        statistics = self._store.get_statistics_table(self._result).loc[self._result]
+
+        selected = statistics.loc[kind] if kind in statistics.index.get_level_values(0) else statistics.iloc[:0]
+
+        return pd.Series(selected['value'].values, index=selected.index.get_level_values(-1))
+
+    @property
+    def optimal_statistic_values(self):
+
+        return self._get_statistics('statistic')
+
+    @property
+    def statistical_measures(self):
+
+        return self._get_statistics('measure')
+
+    @property
+    def samples(self):
+
+        if self._loaded is None and self._analysis_type == 'Bayesian':
+
+            parameters = list(self._store.get_parameter_table(result=self._result).loc[self._result].index)
+
+            return self._store.get_samples(self._result, parameters)
+
+        return self.load().samples
+
+    def __getattr__(self, name):
+
+        # everything else comes from the full result
+
+        if name.startswith('__') or name in ('_store', '_result', '_analysis_type', '_loaded'):
+
+            raise AttributeError(name)
+
+        return getattr(self.load(), name)
+
+
+class LazyAnalysisResultsSet(AnalysisResultsSet):
+    def __init__(self, filename):
+        """
+        A set of results read from an AnalysisResultsStore. Opening the set only reads the list of results: each
+        result is read (and its model parsed) only when it is used. Use get_parameter_table to query the best fit
+        values of all the results at once.
+
+        :param filename: the HDF5 file
+        """
+
+        self._store = AnalysisResultsStore(filename, mode='r')
+
+        results = []
+
+        for i, analysis_type in enumerate(self._store.get_analysis_types()):
+
+            results.append(None if analysis_type == 'none' else _LazyAnalysisResults(self._store, i, analysis_type))
+
+        super(LazyAnalysisResultsSet, self).__init__(results)
+
+        sequence = self._store.get_sequence()
+
+        if sequence is not None:
+
+            self.characterize_sequence(*sequence)
+
+    @property
+    def store(self):
+
+        return self._store
+
+    def get_parameter_table(self, parameters=None):
+        """
+        The best fit values and errors of the parameters of all the results
+
+        :param parameters: (optional) list of parameter paths to select
+        :return: a data frame indexed by (result, parameter)
+        """
+
+        return self._store.get_parameter_table(parameters)
+
+    def get_statistics_table(self):
+        """
+        The statistic values and statistical measures of all the results
+
+        :return: a data frame indexed by (result, kind, name)
+        """
+
+        return self._store.get_statistics_table()
+
+    def write_to(self, filename, overwrite=False):
+        """
+        Write this set of results to a FITS file or (if the name ends with .h5 or .hdf5) to a new HDF5 store.
+        All the results are loaded.
+
+        :param filename: name for the output file
+        :param overwrite: True or False
+        :return: None
+        """
+
+        loaded = AnalysisResultsSet([results if results is None else results.load() for results in self])
+
+        if hasattr(self, "_sequence_name"):
+
+            loaded.characterize_sequence(self._sequence_name, self._sequence_tuple)
+
+        loaded.write_to(filename, overwrite=overwrite)
+
+    def close(self):
+
+        self._store.close()
+
+
+def write_analysis_results_set_hdf5(analysis_results_set, filename, overwrite=False):
+    """
+    Write a set of results to a new AnalysisResultsStore
+
+    :param analysis_results_set: the AnalysisResultsSet
+    :param filename: the name of the HDF5 file
+    :param overwrite: overwrite an existing file
+    :return: none
+    """
+
+    filename = sanitize_filename(filename)
+
+    if os.path.exists(filename) and not overwrite:
+
+        raise IOError("File %s already exists" % filename)
+
+    with AnalysisResultsStore(filename, mode='w') as store:
+
+        for analysis_results in analysis_results_set:
+
+            store.append(analysis_results)
+
+        if hasattr(analysis_results_set, "_sequence_name"):
+
+            store.set_sequence(analysis_results_set._sequence_name, analysis_results_set._sequence_tuple)
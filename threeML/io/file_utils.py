@@ -33,6 +33,21 @@ def file_existing_and_readable(filename):
         return False
 
 
+def is_hdf5_file(filename):
+    """
+    :param filename: a file name
+    :return: True if the file is a HDF5 file (as opposed, for example, to a FITS file)
+    """
+
+    # the first bytes of any HDF5 file
+
+    signature = b'\x89HDF\r\n\x1a\n'
+
+    with open(sanitize_filename(filename), 'rb') as f:
+
+        return f.read(len(signature)) == signature
+
+
 def path_exists_and_is_directory(path):
 
     sanitized_path = sanitize_filename(path, abspath=True)
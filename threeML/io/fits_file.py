@@ -47,6 +47,24 @@ _NUMPY_TO_FITS_CODE = {
     }
 
 
+_creator_version = {}
+
+
+def get_creator_version():
+    """
+    The version of 3ML written in the CREATOR keyword of the extensions. Looking up the distribution is slow, so it is
+    done only once.
+
+    :return: the version string
+    """
+
+    if 'threeML' not in _creator_version:
+
+        _creator_version['threeML'] = pkg_resources.get_distribution("threeML").version
+
+    return _creator_version['threeML']
+
+
 class FITSFile(object):
 
     def __init__(self, primary_hdu=None, fits_extensions=None):
@@ -230,7 +248,7 @@ class FITSExtension(object):
         self._hdu = fits.BinTableHDU.from_columns(fits.ColDefs(fits_columns), header=header)
 
         # update the header to indicate that the file was created by 3ML
-        self._hdu.header.set('CREATOR', "3ML v.%s" % (pkg_resources.get_distribution("threeML").version),
+        self._hdu.header.set('CREATOR', "3ML v.%s" % get_creator_version(),
              "(G.Vianello, giacomov@slac.stanford.edu)")
 
     @property
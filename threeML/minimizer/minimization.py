@@ -330,6 +330,14 @@ class _Minimization(object):
 
         self._algorithm = algorithm
 
+    @property
+    def supports_gradient(self):
+        """
+        :return: whether the minimizer can use the gradient of the function (see Minimizer)
+        """
+
+        return self._minimizer_type.supports_gradient
+
 
 class LocalMinimization(_Minimization):
 
@@ -374,6 +382,11 @@ class GlobalMinimization(_Minimization):
 
         super(GlobalMinimization, self).setup(**setup_dict)
 
+    @property
+    def second_minimization(self):
+
+        return self._2nd_minimization
+
     def get_second_minimization_instance(self, *args, **kwargs):
 
         return self._2nd_minimization.get_instance(*args, **kwargs)
@@ -394,7 +407,11 @@ class GlobalMinimization(_Minimization):
 
 class Minimizer(object):
 
-    def __init__(self, function, parameters, verbosity=1, setup_dict=None):
+    # Minimizers which can use the gradient of the function override this
+
+    supports_gradient = False
+
+    def __init__(self, function, parameters, verbosity=1, setup_dict=None, gradient=None):
         """
 
         :param function: function to be minimized
@@ -402,10 +419,14 @@ class Minimizer(object):
                in the calling sequence of the function to be minimized.
         :param verbosity: control the verbosity of the output
         :param type: type of the optimizer (use the enums LOCAL_OPTIMIZER or GLOBAL_OPTIMIZER)
+        :param gradient: (optional) function with the same calling sequence of the function to be minimized,
+               returning its derivatives with respect to all the parameters. Used only by the minimizers which
+               support it (see supports_gradient), the others differentiate the function numerically
         :return:
         """
 
         self._function = function
+        self._gradient = gradient
         self._external_parameters = parameters
         self._internal_parameters = self._update_internal_parameter_dictionary()
         self._Npar = len(self.parameters.keys())
@@ -529,6 +550,11 @@ class Minimizer(object):
 
         return self._function
 
+    @property
+    def gradient(self):
+
+        return self._gradient
+
     @property
     def parameters(self):
 
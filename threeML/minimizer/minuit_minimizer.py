@@ -1,11 +1,18 @@
 from threeML.minimizer.minimization import LocalMinimizer, CannotComputeErrors, FitFailed, CannotComputeCovariance
 from threeML.io.detect_notebook import is_inside_notebook
 
+import iminuit
 from iminuit import Minuit
 from iminuit.frontends.console import ConsoleFrontend
 from iminuit.frontends.html import HtmlFrontend
 import collections
 import numpy as np
+from distutils.version import LooseVersion
+
+
+# Only iminuit 1.3 and later accept a user-provided gradient
+
+_minuit_accepts_gradient = LooseVersion(iminuit.__version__) >= LooseVersion('1.3')
 
 
 class MINOSFailed(Exception):
@@ -42,17 +49,19 @@ class MinuitMinimizer(LocalMinimizer):
 
     valid_setup_keys = ('ftol',)
 
+    supports_gradient = _minuit_accepts_gradient
+
     # NOTE: this class is built to be able to work both with iMinuit and with a boost interface to SEAL
     # minuit, i.e., it does not rely on functionality that iMinuit provides which is not of the original
     # minuit. This makes the implementation a little bit more cumbersome, but more adaptable if we want
     # to switch back to the bare bone SEAL minuit
 
-    def __init__(self, function, parameters, verbosity=0, setup_dict=None):
+    def __init__(self, function, parameters, verbosity=0, setup_dict=None, gradient=None):
 
         # This will contain the results of the last call to Migrad
         self._last_migrad_results = None
 
-        super(MinuitMinimizer, self).__init__(function, parameters, verbosity, setup_dict)
+        super(MinuitMinimizer, self).__init__(function, parameters, verbosity, setup_dict, gradient)
 
     def _setup(self, user_setup_dict):
 
@@ -97,6 +106,12 @@ class MinuitMinimizer(LocalMinimizer):
 
         iminuit_init_parameters['forced_parameters'] = variable_names_for_iminuit
 
+        if self.gradient is not None and _minuit_accepts_gradient:
+
+            # Use the provided gradient instead of finite differences
+
+            iminuit_init_parameters['grad'] = self.gradient
+
         # # We need to make a function with the parameters as explicit
         # # variables in the calling sequence, so that Minuit will be able
         # # to probe the parameter's names
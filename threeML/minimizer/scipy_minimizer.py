@@ -13,9 +13,11 @@ class ScipyMinimizer(LocalMinimizer):
 
     valid_setup_keys = ('tol', 'algorithm')
 
-    def __init__(self, function, parameters, verbosity=10, setup_dict=None):
+    supports_gradient = True
 
-        super(ScipyMinimizer, self).__init__(function, parameters, verbosity, setup_dict)
+    def __init__(self, function, parameters, verbosity=10, setup_dict=None, gradient=None):
+
+        super(ScipyMinimizer, self).__init__(function, parameters, verbosity, setup_dict, gradient)
 
     def _setup(self, user_setup_dict):
 
@@ -97,6 +99,12 @@ class ScipyMinimizer(LocalMinimizer):
 
                 return np.inf
 
+            if self.gradient is not None:
+
+                # Use the gradient provided with the function
+
+                return np.array(self.gradient(*x))
+
             jacv = get_jacobian(wrapper_2, x, minima, maxima)
 
             return jacv
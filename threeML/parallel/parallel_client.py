@@ -243,7 +243,16 @@ if has_parallel:
 
             return self._current_amr
 
-        def execute_with_progress_bar(self, worker, items, chunk_size=None):
+        def iterate_with_progress_bar(self, worker, items, chunk_size=None):
+            """
+            Apply the worker to the items on the engines, yielding each result as soon as it is available (i.e.,
+            not in the order of the items)
+
+            :param worker: the function to be applied
+            :param items: the items to apply the function to
+            :param chunk_size: how many items an engine processes before reporting back (default: automatic)
+            :return: generator of (index of the item, result)
+            """
 
             # Let's make a wrapper which will allow us to recover the order
             def wrapper(x):
@@ -260,14 +269,16 @@ if has_parallel:
 
                 amr = self._interactive_map(wrapper, items_wrapped, ordered=False, chunk_size=chunk_size)
 
-                results = []
+                for res in amr:
 
-                for i, res in enumerate(amr):
-
-                    results.append(res)
+                    yield res
 
                     p.increase()
 
+        def execute_with_progress_bar(self, worker, items, chunk_size=None):
+
+            results = list(self.iterate_with_progress_bar(worker, items, chunk_size))
+
             # Reorder the list according to the id
             return map(lambda x:x[1], sorted(results, key=lambda x:x[0]))
 
@@ -0,0 +1,144 @@
+import multiprocessing
+import operator
+from multiprocessing.pool import ThreadPool
+
+from astromodels import use_astromodels_memoization
+
+
+class SharedModelState(RuntimeError):
+    pass
+
+
+def find_shared_state(plugins):
+    """
+    Look for plugins which would modify the same astromodels state if their likelihoods were evaluated at the
+    same time, and which therefore cannot be evaluated concurrently.
+
+    :param plugins: a list of plugin instances
+    :return: a list of strings describing the problems (empty if the plugins can be evaluated concurrently)
+    """
+
+    problems = []
+
+    # (the same instance cannot appear twice, since a DataList uses the names of the plugins as keys)
+
+    # tagged plugins set the value of an independent variable (for example the time) of the
+    # shared model before evaluating it, so two of them would overwrite each other's value
+
+    tagged = [plugin.name for plugin in plugins if plugin.tag is not None]
+
+    if tagged:
+
+        problems.append("plugins %s are tagged with an independent variable of the shared model" % ", ".join(tagged))
+
+    return problems
+
+
+class ConcurrentPluginEvaluator(object):
+    def __init__(self, data_list, n_threads=None):
+        """
+        Evaluates the likelihood of all the plugins of a data list concurrently on a persistent pool of threads.
+        This is useful when the plugins spend their time in code which releases the GIL (numpy, C++ libraries).
+        The results are always returned in the order of the data list, so that their reduction is deterministic.
+
+        The threads are started at the first evaluation, and stopped by close (or at the end of a with statement).
+
+        :param data_list: the data list (normally an instance of DataList)
+        :param n_threads: the number of threads (default: one per plugin, up to the number of CPUs)
+        """
+
+        self._plugins = list(data_list.values())
+
+        problems = find_shared_state(self._plugins)
+
+        if problems:
+
+            raise SharedModelState("The plugins cannot be evaluated concurrently: %s" % "; ".join(problems))
+
+        if n_threads is None:
+
+            n_threads = min(len(self._plugins), multiprocessing.cpu_count())
+
+        assert n_threads >= 1, "The number of threads must be at least 1"
+
+        self._n_threads = int(n_threads)
+
+        self._pool = None
+
+    def __getstate__(self):
+
+        # the pool cannot be pickled (its threads are started again at the first evaluation)
+
+        state = dict(self.__dict__)
+
+        state['_pool'] = None
+
+        return state
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+
+        self.close()
+
+    def __del__(self):
+
+        self.close()
+
+    @property
+    def n_threads(self):
+
+        return self._n_threads
+
+    def _get_pool(self):
+
+        if self._pool is None:
+
+            self._pool = ThreadPool(self._n_threads)
+
+        return self._pool
+
+    def _map(self, method_name, indexes=None):
+
+        plugins = self._plugins if indexes is None else [self._plugins[i] for i in indexes]
+
+        # the memoization cache of astromodels is shared among all the plugins,
+        # so we do not use it while the plugins run concurrently
+
+        with use_astromodels_memoization(False):
+
+            return self._get_pool().map(operator.methodcaller(method_name), plugins, chunksize=1)
+
+    def get_log_likes(self):
+        """
+        :return: the list of the log likelihoods of the plugins, in the order of the data list
+        """
+
+        return self._map('get_log_like')
+
+    def inner_fits(self, indexes=None):
+        """
+        :param indexes: (optional) evaluate only the plugins at these positions in the data list
+        :return: the list of the profiled log likelihoods of the plugins, in the order of the data list
+        """
+
+        return self._map('inner_fit', indexes)
+
+    def close(self):
+        """
+        Stop the threads of the pool (if they were started). The evaluator can still be used afterwards, the
+        threads are started again at the next evaluation
+
+        :return: none
+        """
+
+        pool = getattr(self, '_pool', None)
+
+        if pool is not None:
+
+            self._pool = None
+
+            pool.close()
+            pool.join()
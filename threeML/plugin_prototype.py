@@ -108,6 +108,21 @@ class PluginPrototype(object):
 
         return 1.
 
+    def get_log_like_gradient(self, parameters):
+        """
+        Return the derivatives of the log-likelihood (as returned by inner_fit) with respect to the internal values
+        of the provided parameters (see the Parameter class), with the current values of all the parameters.
+        Parameters which do not affect this plugin have a zero derivative.
+
+        Plugins which can compute these derivatives more efficiently than by differentiating the whole likelihood
+        numerically should override this method. The gradient is used by the gradient-based minimizers.
+
+        :param parameters: ordered dictionary {path: parameter} (normally the free parameters of the fit)
+        :return: an array with one derivative per parameter, or None if the plugin cannot compute them
+        """
+
+        return None
+
     def _get_tag(self):
 
         return self._tag
@@ -70,6 +70,8 @@ class DispersionSpectrumLike(SpectrumLike):
 
         differential_flux, integral = self._get_diff_flux_and_integral(self._like_model)
 
+        self._integral_flux = integral
+
         self._rsp.set_function(integral)
 
     def _evaluate_model(self):
@@ -80,6 +82,27 @@ class DispersionSpectrumLike(SpectrumLike):
 
         return self._rsp.convolve()
 
+    def _get_integration_edges(self):
+        """
+        The model is integrated over the monte carlo energies of the response
+
+        :return: (low edges, high edges)
+        """
+
+        mc_energies = self._rsp.monte_carlo_energies
+
+        return mc_energies[:-1], mc_energies[1:]
+
+    def _fold_true_fluxes(self, true_fluxes):
+        """
+        fold the fluxes integrated over the monte carlo energies through the response
+
+        :param true_fluxes: the integrated fluxes (1-d or 2-d)
+        :return: the rates in all channels
+        """
+
+        return self._rsp.fold(true_fluxes)
+
     def get_simulated_dataset(self, new_name=None, **kwargs):
         """
         Returns another DispersionSpectrumLike instance where data have been obtained by randomizing the current expectation from the
@@ -12,6 +12,7 @@ from threeML.plugin_prototype import PluginPrototype
 from threeML.io.file_utils import get_random_unique_name
 from threeML.plugins.gammaln import logfactorial
 from threeML.io.suppress_stdout import suppress_stdout
+from threeML.utils.source_flux_cache import SourceFluxCache
 
 import UnbinnedAnalysis
 import BinnedAnalysis
@@ -276,6 +277,10 @@ class FermiLATLike(PluginPrototype):
 
         self.likelihoodModel = likelihoodModel
 
+        # The spectra set in the gtlike model, so that only the sources which changed are set again
+
+        self._source_cache = SourceFluxCache()
+
         # Here we need also to compute the logLike value, so that the model
         # in the XML file will be chanded if needed
         dumb = self.get_log_like()
@@ -328,9 +333,17 @@ class FermiLATLike(PluginPrototype):
 
         energies = self.lmc.energiesKeV
 
-        for id, srcName in enumerate(self.likelihoodModel.point_sources.keys()):
+        for id, (srcName, source) in enumerate(self.likelihoodModel.point_sources.items()):
+
+            # only the sources whose parameters changed since the last update need a new spectrum
+
+            values, changed = self._source_cache.get(srcName, source,
+                                                     lambda: self.likelihoodModel.get_point_source_fluxes(
+                                                         id, energies, tag=self._tag))
+
+            if not changed:
 
-            values = self.likelihoodModel.get_point_source_fluxes(id, energies, tag=self._tag)
+                continue
 
             gtlikeSrcModel = self.like[srcName]
 
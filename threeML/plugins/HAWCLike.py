@@ -14,6 +14,7 @@ from threeML.exceptions.custom_exceptions import custom_warnings
 
 from threeML.io.file_utils import file_existing_and_readable, sanitize_filename
 from threeML.plugin_prototype import PluginPrototype
+from threeML.utils.source_flux_cache import SourceFluxCache
 
 defaultMinChannel = 0
 defaultMaxChannel = 9
@@ -230,6 +231,10 @@ class HAWCLike(PluginPrototype):
 
         self._pymodel = pyToCppModelInterfaceCache()
 
+        # The fluxes pushed to the C++ model, so that only the sources which changed are evaluated and pushed again
+
+        self._source_cache = SourceFluxCache()
+
         # Set boundaries for extended source
         # NOTE: we assume that these boundaries do not change during the fit
 
@@ -350,67 +355,82 @@ class HAWCLike(PluginPrototype):
 
         self._nuisance_parameters.values()[0].free = False
 
-    def _fill_model_cache(self):
+    def _get_extended_source_cube(self, id):
 
-        n_extended = self._model.get_number_of_extended_sources()
+        # Get the positions for this extended source
+        positions = np.array(self._theLikeHAWC.GetPositions(id, False), order='C')
 
-        # Pre-compute all the model
+        ras = positions[:, 0]
+        decs = positions[:, 1]
 
-        for id in range(n_extended):
+        # Get the energies for this extended source
+        # We need to multiply by 1000 because the cube is in "per keV" while
+        # LiFF needs "per MeV"
 
-            # Get the positions for this extended source
-            positions = np.array(self._theLikeHAWC.GetPositions(id, False), order='C')
+        cube = self._model.get_extended_source_fluxes(id, ras, decs, self._energies) * 1000.0
 
-            ras = positions[:, 0]
-            decs = positions[:, 1]
+        # Make sure that cube is in C order (and not fortran order), otherwise
+        # the cache will silently fail!
 
-            # Get the energies for this extended source
-            # We need to multiply by 1000 because the cube is in "per keV" while
-            # LiFF needs "per MeV"
+        if not cube.flags.c_contiguous:
 
-            cube = self._model.get_extended_source_fluxes(id, ras, decs, self._energies) * 1000.0
+            cube = np.array(cube, order='C')
 
-            # Make sure that cube is in C order (and not fortran order), otherwise
-            # the cache will silently fail!
+        if not ras.flags.c_contiguous:
 
-            if not cube.flags.c_contiguous:
+            ras = np.array(ras, order='C')
 
-                cube = np.array(cube, order='C')
+        if not decs.flags.c_contiguous:
 
-            if not ras.flags.c_contiguous:
+            decs = np.array(decs, order='C')
 
-                ras = np.array(ras, order='C')
+        assert ras.flags.c_contiguous
+        assert decs.flags.c_contiguous
+        assert cube.flags.c_contiguous
 
-            if not decs.flags.c_contiguous:
+        return cube, ras, decs
 
-                decs = np.array(decs, order='C')
+    def _get_point_source_spectrum(self, id):
 
-            assert ras.flags.c_contiguous
-            assert decs.flags.c_contiguous
-            assert cube.flags.c_contiguous
+        # The 1000.0 factor is due to the fact that this diff. flux here is in
+        # 1 / (kev cm2 s) while LiFF needs it in 1 / (MeV cm2 s)
 
-            self._pymodel.setExtSourceCube(id, cube, ras, decs)
+        this_spectrum = self._model.get_point_source_fluxes(id, self._energies, tag=self._tag) * 1000.0
 
-        n_point_sources = self._model.get_number_of_point_sources()
+        this_ra, this_dec = self._model.get_point_source_position(id)
 
-        for id in range(n_point_sources):
+        if not this_spectrum.flags.c_contiguous:
 
-            # The 1000.0 factor is due to the fact that this diff. flux here is in
-            # 1 / (kev cm2 s) while LiFF needs it in 1 / (MeV cm2 s)
+            this_spectrum = np.array(this_spectrum, order='C')
 
-            this_spectrum = self._model.get_point_source_fluxes(id, self._energies, tag=self._tag) * 1000.0
+        assert this_spectrum.flags.c_contiguous
 
-            this_ra, this_dec = self._model.get_point_source_position(id)
+        return this_spectrum, this_ra, this_dec
 
-            self._pymodel.setPtsSourcePosition(id, this_ra, this_dec)
+    def _fill_model_cache(self):
+
+        # Pre-compute all the model. Only the sources whose parameters changed since the last
+        # call are evaluated again, the others are already in the C++ cache
+
+        for id, (name, source) in enumerate(self._model.extended_sources.items()):
+
+            (cube, ras, decs), changed = self._source_cache.get(('extended', name), source,
+                                                                lambda: self._get_extended_source_cube(id))
+
+            if changed:
+
+                self._pymodel.setExtSourceCube(id, cube, ras, decs)
+
+        for id, (name, source) in enumerate(self._model.point_sources.items()):
 
-            if not this_spectrum.flags.c_contiguous:
+            (this_spectrum, this_ra, this_dec), changed = self._source_cache.get(
+                ('point', name), source, lambda: self._get_point_source_spectrum(id))
 
-                this_spectrum = np.array(this_spectrum, order='C')
+            if changed:
 
-            assert this_spectrum.flags.c_contiguous
+                self._pymodel.setPtsSourcePosition(id, this_ra, this_dec)
 
-            self._pymodel.setPtsSourceSpectrum(id, this_spectrum)
+                self._pymodel.setPtsSourceSpectrum(id, this_spectrum)
 
     def get_log_like(self):
 
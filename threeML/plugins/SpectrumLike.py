@@ -26,7 +26,8 @@ from threeML.utils.string_utils import dash_separated_string_to_tuple
 from threeML.utils.spectrum.pha_spectrum import PHASpectrum
 
 from threeML.utils.statistics.stats_tools import Significance
-from threeML.utils.spectrum.spectrum_likelihood import statistic_lookup
+from threeML.utils.source_flux_cache import SourceFluxCache
+from threeML.utils.spectrum.spectrum_likelihood import statistic_lookup, get_random_generator
 from threeML.io.plotting.data_residual_plot import ResidualPlot
 
 
@@ -182,6 +183,12 @@ class SpectrumLike(PluginPrototype):
         # This will be used to keep track of how many syntethic datasets have been generated
         self._n_synthetic_datasets = 0
 
+        # The in-place simulation mode is off by default (see set_in_place_simulation)
+        self._in_place_batch_size = None
+        self._random_generator = None
+        self._in_place_plugin = None
+        self._simulation_batch = None
+
 
         if tstart is not None:
 
@@ -1065,11 +1072,149 @@ class SpectrumLike(PluginPrototype):
 
             self._apply_mask_to_original_vectors()
 
+    def set_in_place_simulation(self, active=True, batch_size=100, random_seed=None):
+        """
+        Activate (or deactivate) the in-place simulation mode. In this mode get_simulated_dataset builds the simulated
+        plugin only once and, on subsequent calls, only overwrites its counts with new random realizations, which are
+        drawn in batches of batch_size realizations at the time. This avoids re-building spectra, plugins and
+        cloning the likelihood model for every simulation, which is what dominates the cost of Monte Carlo studies
+        such as GoodnessOfFit.by_mc or LikelihoodRatioTest.by_mc.
+
+        NOTE: in this mode the same plugin instance is returned at every call, so a simulated dataset is only valid
+        until the next call to get_simulated_dataset. Also, its simulated_parameters are the (live) likelihood model of
+        this plugin instead of a copy.
+
+        :param active: whether to activate the mode (default: True)
+        :param batch_size: number of realizations drawn at once (default: 100)
+        :param random_seed: (optional) seed for the random generator
+        :return: none
+        """
+
+        if not active:
+
+            self._in_place_batch_size = None
+            self._random_generator = None
+            self._in_place_plugin = None
+            self._simulation_batch = None
+
+            return
+
+        assert self._background_plugin is None, "In-place simulation is not supported for modeled backgrounds"
+
+        assert int(batch_size) > 0, "The batch size must be a positive integer"
+
+        self._in_place_batch_size = int(batch_size)
+
+        self._random_generator = get_random_generator(random_seed)
+
+        self._in_place_plugin = None
+        self._simulation_batch = None
+
+    def _get_next_realization(self):
+        """
+        Return the next (source counts, background counts) realization from the current batch, drawing a new batch
+        if the current one is exhausted or if the expectation has changed since it was drawn. Must be called with no
+        mask nor rebinner applied.
+
+        :return: (randomized source counts, randomized background counts or None)
+        """
+
+        source_model_counts = self._evaluate_model() * self.exposure
+
+        batch = self._simulation_batch
+
+        if (batch is None or
+                batch['index'] >= self._in_place_batch_size or
+                batch['nuisance'] != self._nuisance_parameter.value or
+                not np.array_equal(batch['expectation'], source_model_counts)):
+
+            source_counts = self._likelihood_evaluator.get_randomized_source_counts_batch(source_model_counts,
+                                                                                          self._in_place_batch_size,
+                                                                                          self._random_generator)
+
+            assert source_counts is not None, "In-place simulation is not supported for these noise models"
+
+            background_counts = self._likelihood_evaluator.get_randomized_background_counts_batch(
+                self._in_place_batch_size,
+                self._random_generator)
+
+            batch = {'expectation': source_model_counts,
+                     'nuisance': self._nuisance_parameter.value,
+                     'source': source_counts,
+                     'background': background_counts,
+                     'index': 0}
+
+            self._simulation_batch = batch
+
+        i = batch['index']
+
+        batch['index'] += 1
+
+        if batch['background'] is None:
+
+            return batch['source'][i], None
+
+        else:
+
+            return batch['source'][i], batch['background'][i]
+
+    def _overwrite_counts(self, new_observed_counts, new_background_counts=None):
+        """
+        Overwrite in place the observed (and background) counts of this plugin, keeping everything else. Used by the
+        in-place simulation mode.
+
+        :param new_observed_counts: the new observed counts (all channels)
+        :param new_background_counts: (optional) the new background counts (all channels)
+        :return: none
+        """
+
+        self._observed_counts[:] = new_observed_counts
+        self._observed_spectrum._contents[:] = self._observed_counts / self._observed_spectrum.exposure
+
+        if new_background_counts is not None:
+
+            self._background_counts[:] = new_background_counts
+            self._background_spectrum._contents[:] = self._background_counts / self._background_spectrum.exposure
+
+            # the simulated background has the same exposure and scale as the observation, so the scaled
+            # background counts are the counts themselves
+
+            self._scaled_background_counts[:] = self._get_expected_background_counts_scaled(self._background_spectrum)
+
+    def _get_simulated_dataset_in_place(self):
+
+        with self._without_mask_nor_rebinner():
+
+            randomized_source_counts, randomized_background_counts = self._get_next_realization()
+
+        simulated_plugin = self._in_place_plugin
+
+        simulated_plugin._overwrite_counts(randomized_source_counts, randomized_background_counts)
+
+        # Apply the same selections as the current data set
+
+        if self._rebinner is not None:
+
+            simulated_plugin._apply_rebinner(self._rebinner)
+
+        else:
+
+            simulated_plugin._mask = np.array(self._mask, copy=True)
+            simulated_plugin._rebinner = None
+            simulated_plugin._apply_mask_to_original_vectors()
+
+        simulated_plugin._simulation_storage = self._like_model
+
+        return simulated_plugin
+
     def get_simulated_dataset(self, new_name=None, **kwargs):
         """
         Returns another Binned instance where data have been obtained by randomizing the current expectation from the
         model, as well as from the background (depending on the respective noise models)
 
+        If the in-place simulation mode is active (see set_in_place_simulation) the same instance is returned at
+        each call with new randomized counts.
+
         :return: an BinnedSpectrum or child instance
         """
 
@@ -1083,6 +1228,25 @@ class SpectrumLike(PluginPrototype):
         if new_name is None:
             new_name = "%s_sim_%i" % (self.name, self._n_synthetic_datasets)
 
+        if self._in_place_batch_size is not None:
+
+            if self._in_place_plugin is not None and self._in_place_plugin.name == new_name:
+
+                return self._get_simulated_dataset_in_place()
+
+            else:
+
+                # We need to build the plugin once through the standard path. We then draw its counts
+                # from the batch as for all the subsequent calls
+
+                self._in_place_plugin = self._build_simulated_dataset(new_name, **kwargs)
+
+                return self._get_simulated_dataset_in_place()
+
+        return self._build_simulated_dataset(new_name, **kwargs)
+
+    def _build_simulated_dataset(self, new_name, **kwargs):
+
         # Generate randomized data depending on the different noise models
 
         # We remove the mask temporarily because we need the various elements for all channels. We will restore it
@@ -1401,14 +1565,131 @@ class SpectrumLike(PluginPrototype):
         :return: 
         """
 
-        loglike, _ = self._likelihood_evaluator.get_current_value()
+        return self._likelihood_evaluator.get_current_log_like()
+
+    def get_log_likes_for_model_counts(self, model_counts):
+        """
+        The log-likelihood for many vectors of expected model counts at once (for example the models of an ensemble of
+        trial parameters), with the current data, mask, rebinning and noise models. The data-only terms of the
+        statistic are computed only once for all the vectors.
+
+        :param model_counts: (n_models, n_channels) array of expected counts in the currently selected channels (as
+        returned by get_model)
+        :return: an array with the log-likelihood of each row
+        """
+
+        log_likes = self._likelihood_evaluator.get_log_likes_batch(np.atleast_2d(model_counts))
+
+        assert log_likes is not None, "The current noise models do not support batched evaluations"
 
-        return loglike
+        return log_likes
 
     def inner_fit(self):
 
         return self.get_log_like()
 
+    def get_log_like_gradient(self, parameters):
+        """
+        The derivatives of the log-likelihood with respect to the internal values of the provided parameters.
+
+        The statistic is differentiated in closed form with respect to the model counts. The derivative of the model
+        counts with respect to each parameter is obtained from the derivative of the integrated flux on the
+        integration grid (by central differences, one pair of evaluations of the model per parameter, so that only
+        the sources depending on that parameter are evaluated again), folded through the response for all the
+        parameters at once.
+
+        :param parameters: ordered dictionary {path: parameter} (normally the free parameters of the fit)
+        :return: an array with one derivative per parameter, or None if the current noise models do not
+        allow it (modeled background)
+        """
+
+        current_derivatives = self._likelihood_evaluator.get_current_derivatives()
+
+        if current_derivatives is None:
+
+            return None
+
+        statistic_derivatives, model_counts = current_derivatives
+
+        e1, e2 = self._get_integration_edges()
+
+        parameters = list(parameters.values())
+
+        flux_derivatives = np.zeros((len(parameters), len(e1)))
+
+        nuisance_derivatives = np.zeros(len(parameters))
+
+        for i, parameter in enumerate(parameters):
+
+            internal_value = parameter._get_internal_value()
+
+            # A step in the internal reference, reversed or made one-sided at the boundaries
+
+            step = 1e-5 * max(abs(internal_value), 1e-2)
+
+            internal_min = parameter._get_internal_min_value()
+            internal_max = parameter._get_internal_max_value()
+
+            low = internal_value - step
+            high = internal_value + step
+
+            if internal_min is not None and low < internal_min:
+
+                low = internal_value
+
+            if internal_max is not None and high > internal_max:
+
+                high = internal_value
+
+            original_value = parameter.value
+
+            try:
+
+                if parameter is self._nuisance_parameter:
+
+                    # the model counts are proportional to the effective area correction, so there is no need
+                    # to evaluate the model
+
+                    parameter._set_internal_value(high)
+
+                    high_value = parameter.value
+
+                    parameter._set_internal_value(low)
+
+                    nuisance_derivatives[i] = (high_value - parameter.value) / (high - low)
+
+                else:
+
+                    parameter._set_internal_value(high)
+
+                    high_fluxes = self._integral_flux(e1, e2)
+
+                    parameter._set_internal_value(low)
+
+                    flux_derivatives[i, :] = (high_fluxes - self._integral_flux(e1, e2)) / (high - low)
+
+            finally:
+
+                parameter.value = original_value
+
+        # Fold all the derivatives at once, and apply the same selection of get_model
+
+        rate_derivatives = self._fold_true_fluxes(flux_derivatives) * self._observed_spectrum.exposure
+
+        if self._rebinner is not None:
+
+            count_derivatives = self._rebinner.rebin_batch(rate_derivatives)
+
+        else:
+
+            count_derivatives = rate_derivatives[:, self._mask]
+
+        count_derivatives *= self._nuisance_parameter.value
+
+        count_derivatives += nuisance_derivatives[:, np.newaxis] * (model_counts / self._nuisance_parameter.value)
+
+        return count_derivatives.dot(statistic_derivatives)
+
     def set_model(self, likelihoodModel):
         """
         Set the model to be used in the joint minimization.
@@ -1447,6 +1728,27 @@ class SpectrumLike(PluginPrototype):
 
         return np.array([self._integral_flux(emin, emax) for emin, emax in self._observed_spectrum.bin_stack])
 
+    def _get_integration_edges(self):
+        """
+        The energy bins over which the model is integrated before being folded with _fold_true_fluxes. Without
+        dispersion these are the energy bins of the spectrum.
+
+        :return: (low edges, high edges)
+        """
+
+        return np.array(self._observed_spectrum.starts), np.array(self._observed_spectrum.stops)
+
+    def _fold_true_fluxes(self, true_fluxes):
+        """
+        Transform the model integrated over the integration bins (see _get_integration_edges) into rates in all
+        channels. Without dispersion this is the identity. true_fluxes can also be a 2-d array (n_spectra, n_bins).
+
+        :param true_fluxes: the integrated fluxes
+        :return: the rates in all channels
+        """
+
+        return true_fluxes
+
     def get_model(self):
         """
         The model integrated over the energy bins. Note that it only returns the  model for the
@@ -1501,18 +1803,29 @@ class SpectrumLike(PluginPrototype):
 
     def _get_diff_flux_and_integral(self, likelihood_model):
 
-        if self._source_name is None:
+        # The flux of each source is evaluated again only when one of its parameters changed, so that
+        # the sources which are fixed (or not moved by the minimizer) are not recomputed at each call
+
+        flux_cache = SourceFluxCache()
 
-            n_point_sources = likelihood_model.get_number_of_point_sources()
+        if self._source_name is None:
 
             # Make a function which will stack all point sources (OGIP do not support spatial dimension)
 
             def differential_flux(energies):
-                fluxes = likelihood_model.get_point_source_fluxes(0, energies, tag=self._tag)
 
-                # If we have only one point source, this will never be executed
-                for i in range(1, n_point_sources):
-                    fluxes += likelihood_model.get_point_source_fluxes(i, energies, tag=self._tag)
+                fluxes = 0
+
+                for i, (name, source) in enumerate(likelihood_model.point_sources.items()):
+
+                    this_flux, _ = flux_cache.get(name, source,
+                                                  lambda: likelihood_model.get_point_source_fluxes(i, energies,
+                                                                                                   tag=self._tag),
+                                                  energies=energies)
+
+                    # (a new array, the cached fluxes must not be modified)
+
+                    fluxes = fluxes + this_flux
 
                 return fluxes
 
@@ -1527,7 +1840,13 @@ class SpectrumLike(PluginPrototype):
 
                 def differential_flux(energies):
 
-                    return likelihood_model.sources[self._source_name](energies, tag=self._tag)
+                    source = likelihood_model.sources[self._source_name]
+
+                    this_flux, _ = flux_cache.get(self._source_name, source,
+                                                  lambda: source(energies, tag=self._tag),
+                                                  energies=energies)
+
+                    return np.array(this_flux)
 
             except KeyError:
 
@@ -262,23 +262,71 @@ class VERITASRun(object):
         return integral_f(e2) - integral_f(e1)
 
     @staticmethod
-    def _integrate(function, e1, e2):
+    def _integrate(function, e1, e2, n_points=30):
 
-        integrals = []
+        # Integrate with Simpson's rule on a fixed grid of n_points within each bin. The function is evaluated
+        # only once on the grid of all the bins
 
-        for ee1, ee2 in zip(e1,e2):
+        grid = e1[:, np.newaxis] + (e2 - e1)[:, np.newaxis] * np.linspace(0, 1, n_points)[np.newaxis, :]
 
-            grid = np.linspace(ee1, ee2, 30)
-
-            integrals.append(scipy.integrate.simps(function(grid), grid))
+        values = np.reshape(function(grid.flatten()), grid.shape)
 
         # integrals = map(lambda x:scipy.integrate.quad(function, x[0], x[1], epsrel=1e-2)[0], zip(e1, e2))
 
-        return np.array(integrals)
+        return scipy.integrate.simps(values, grid, axis=1)
 
-    def get_log_like(self, like_model, fast=True):
+    @property
+    def log_mc_energies(self):
+
+        return self._log_mc_energies
+
+    @property
+    def log_recon_energies(self):
+
+        return self._log_recon_energies
+
+    @property
+    def exposure(self):
+
+        return self._exposure
+
+    @property
+    def counts(self):
+
+        return self._counts
+
+    @property
+    def background_counts(self):
+
+        return self._bkg_counts
+
+    @property
+    def background_renormalization(self):
+
+        return self._bkg_renorm
+
+    @property
+    def channel_mask(self):
+        """
+        :return: boolean mask of the channels used in the likelihood
+        """
+
+        mask = np.zeros(self._n_chan, bool)
+
+        mask[self._first_chan: self._last_chan + 1] = True
+
+        return mask
+
+    def get_weight(self, like_model, fast=True):
+        """
+        Return the ratio between the spectrum of the model and the simulated spectrum in the Monte Carlo energy bins,
+        which is used to reweight the migration matrix
+
+        :param like_model: the likelihood model
+        :param fast: if True use the value at the center of the bins instead of the average over the bins
+        :return: the weights
+        """
 
-        # Reweight the response matrix
         diff_flux, integral = self._get_diff_flux_and_integral(like_model)
 
         e1 = 10**self._log_mc_energies[:-1]
@@ -299,13 +347,17 @@ class VERITASRun(object):
 
         weight = this_spectrum / sim_spectrum  # type: np.ndarray
 
-        # print("Sum of weight: %s" % np.sum(weight))
+        return weight
+
+    def get_log_like(self, like_model, fast=True):
+
+        # Reweight the response matrix
 
-        n_pred = np.zeros(self._n_chan)
+        weight = self.get_weight(like_model, fast)
 
-        for i in range(n_pred.shape[0]):
+        # print("Sum of weight: %s" % np.sum(weight))
 
-            n_pred[i] = np.sum(self._hMigration[i, :] * weight) * self._exposure
+        n_pred = np.dot(self._hMigration, weight) * self._exposure
 
         log_like, _ = poisson_observed_poisson_background(self._counts, self._bkg_counts, self._bkg_renorm,
                                                           n_pred)
@@ -323,6 +375,65 @@ class VERITASRun(object):
         return log_like_tot, locals()
 
 
+class _StackedVERITASRuns(object):
+
+    def __init__(self, runs):
+        """
+        Stack the migration matrices and the data of runs sharing the same energy binning, so that the predicted counts
+        of all runs can be computed with one tensor contraction and the likelihood of all runs in one call
+
+        :param runs: list of VERITASRun instances with the same binning
+        """
+
+        self._reference_run = runs[0]
+
+        # (n_runs, n_channels, n_mc_energies) tensor
+        self._migration_tensor = np.array([run.migration_matrix for run in runs])
+
+        self._exposures = np.array([run.exposure for run in runs])
+
+        self._counts = np.array([run.counts for run in runs])
+        self._bkg_counts = np.array([run.background_counts for run in runs])
+
+        # one renormalization per run, broadcasted over the channels
+        self._bkg_renorm = np.array([run.background_renormalization for run in runs])[:, np.newaxis]
+
+        self._channel_mask = np.array([run.channel_mask for run in runs])
+
+    @staticmethod
+    def can_stack(runs):
+        """
+        Check whether the runs share the same energy binning
+
+        :param runs: list of VERITASRun instances
+        :return: True or False
+        """
+
+        reference = runs[0]
+
+        for run in runs[1:]:
+
+            if (run.log_mc_energies.shape != reference.log_mc_energies.shape or
+                    run.log_recon_energies.shape != reference.log_recon_energies.shape or
+                    not np.allclose(run.log_mc_energies, reference.log_mc_energies) or
+                    not np.allclose(run.log_recon_energies, reference.log_recon_energies)):
+
+                return False
+
+        return True
+
+    def get_log_like(self, like_model, fast=True):
+
+        # The weights depend only on the model and on the MC energies, so they are the same for all runs
+
+        weight = self._reference_run.get_weight(like_model, fast)
+
+        n_pred = np.einsum('rcm,m->rc', self._migration_tensor, weight) * self._exposures[:, np.newaxis]
+
+        log_like, _ = poisson_observed_poisson_background(self._counts, self._bkg_counts, self._bkg_renorm, n_pred)
+
+        return np.sum(np.where(self._channel_mask, log_like, 0))
+
 
 class VERITASLike(PluginPrototype):
 
@@ -372,6 +483,16 @@ class VERITASLike(PluginPrototype):
                 # self._runs_like[run_name].set_active_measurements("c50-c130")
                 self._runs_like[run_name] = this_run
 
+        # If all runs share the same binning, fold all of them at once
+
+        self._stacked_runs = None
+
+        runs = self._runs_like.values()
+
+        if len(runs) > 0 and _StackedVERITASRuns.can_stack(runs):
+
+            self._stacked_runs = _StackedVERITASRuns(runs)
+
         super(VERITASLike, self).__init__(name, {})
 
     def rebin_on_background(self, *args, **kwargs):
@@ -404,6 +525,10 @@ class VERITASLike(PluginPrototype):
         parameters
         """
 
+        if self._stacked_runs is not None:
+
+            return self._stacked_runs.get_log_like(self._likelihood_model)
+
         # Collect the likelihood from each run
         total = 0
 
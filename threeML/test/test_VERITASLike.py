@@ -0,0 +1,136 @@
+import pytest
+import numpy as np
+import scipy.integrate
+from astromodels import Powerlaw, Model, PointSource
+
+from threeML.utils.statistics.likelihood_functions import poisson_observed_poisson_background
+
+try:
+
+    import ROOT
+
+except:
+
+    has_root = False
+
+else:
+
+    has_root = True
+
+skip_if_ROOT_is_not_available = pytest.mark.skipif(not has_root, reason="No ROOT available")
+
+
+def _get_synthetic_run(seed, exposure, bkg_renorm, first_chan, last_chan):
+    """
+    A VERITASRun with random data on a small energy grid (built without a ROOT file)
+    """
+
+    from threeML.plugins.experimental.VERITASLike import VERITASRun
+
+    rng = np.random.RandomState(seed)
+
+    run = VERITASRun.__new__(VERITASRun)
+
+    # 8 channels and 12 MC energy bins, between 100 GeV and 30 TeV (in keV)
+
+    run._log_recon_energies = np.linspace(8, 10.5, 9)
+    run._log_mc_energies = np.linspace(8, 10.5, 13)
+
+    run._mc_energies_c = (10 ** run._log_mc_energies[1:] + 10 ** run._log_mc_energies[:-1]) / 2.0
+
+    run._n_chan = 8
+
+    run._hMigration = rng.uniform(0, 1E5, (8, 12))
+
+    run._exposure = exposure
+
+    run._counts = rng.poisson(20, 8).astype(float)
+    run._bkg_counts = rng.poisson(30, 8).astype(float)
+
+    run._bkg_renorm = bkg_renorm
+
+    run._first_chan = first_chan
+    run._last_chan = last_chan
+
+    return run
+
+
+def _get_model():
+
+    return Model(PointSource('src', 0, 0, spectral_shape=Powerlaw(K=1E-10, index=-2.3, piv=1E9)))
+
+
+def _get_log_like_with_loop(run, like_model, fast):
+
+    # The folding as it was done before the vectorization, one channel at the time
+
+    weight = run.get_weight(like_model, fast)
+
+    n_pred = np.zeros(run._n_chan)
+
+    for i in range(n_pred.shape[0]):
+
+        n_pred[i] = np.sum(run._hMigration[i, :] * weight) * run._exposure
+
+    log_like, _ = poisson_observed_poisson_background(run._counts, run._bkg_counts, run._bkg_renorm, n_pred)
+
+    return np.sum(log_like[run._first_chan: run._last_chan + 1])
+
+
+@skip_if_ROOT_is_not_available
+def test_veritas_integration():
+
+    from threeML.plugins.experimental.VERITASLike import VERITASRun
+
+    function = lambda x: x ** -2.3 * np.exp(-x / 5E9)
+
+    e = np.logspace(8, 10.5, 13)
+    e1, e2 = e[:-1], e[1:]
+
+    # Simpson's rule bin by bin
+
+    expected = []
+
+    for ee1, ee2 in zip(e1, e2):
+
+        grid = np.linspace(ee1, ee2, 30)
+
+        expected.append(scipy.integrate.simps(function(grid), grid))
+
+    assert np.allclose(VERITASRun._integrate(function, e1, e2), expected, rtol=1e-10)
+
+
+@skip_if_ROOT_is_not_available
+def test_veritas_log_like():
+
+    from threeML.plugins.experimental.VERITASLike import _StackedVERITASRuns
+
+    like_model = _get_model()
+
+    runs = [_get_synthetic_run(1, 1000., 0.2, 1, 6),
+            _get_synthetic_run(2, 1500., 0.3, 0, 7),
+            _get_synthetic_run(3, 800., 0.25, 2, 5)]
+
+    for fast in (True, False):
+
+        expected = [_get_log_like_with_loop(run, like_model, fast) for run in runs]
+
+        for run, this_expected in zip(runs, expected):
+
+            assert np.isclose(run.get_log_like(like_model, fast)[0], this_expected, rtol=1e-10)
+
+        # all the runs at once
+
+        assert _StackedVERITASRuns.can_stack(runs)
+
+        stacked = _StackedVERITASRuns(runs)
+
+        assert np.isclose(stacked.get_log_like(like_model, fast), np.sum(expected), rtol=1e-10)
+
+    # runs with a different binning cannot be stacked
+
+    other_run = _get_synthetic_run(4, 1000., 0.2, 1, 6)
+
+    other_run._log_mc_energies = np.linspace(8, 10.5, 14)
+
+    assert not _StackedVERITASRuns.can_stack(runs + [other_run])
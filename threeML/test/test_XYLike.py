@@ -251,3 +251,56 @@ def test_xy_plot():
 
 
 
+
+
+def test_XYLike_concurrent_plugin_evaluation():
+
+    from threeML.parallel.plugin_evaluation import find_shared_state, ConcurrentPluginEvaluator
+
+    y = np.array(gauss_signal)
+    yerr = np.array(gauss_sigma)
+
+    xy1 = XYLike("test1", x, y, yerr)
+    xy2 = XYLike("test2", x, np.array(poiss_sig), poisson_data=True)
+
+    fitfun = Line() + Gaussian()
+    fitfun.F_2 = 60.0
+    fitfun.mu_2 = 4.5
+
+    model = Model(PointSource("pts1", ra=0.0, dec=0.0, spectral_shape=fitfun))
+
+    jl = JointLikelihood(model, DataList(xy1, xy2))
+
+    trial_values = [0.8, 40.0, 62.0, 5.0, 0.3]
+
+    log_like_serial = jl.minus_log_like_profile(*trial_values)
+
+    jl.enable_concurrent_plugin_evaluation(n_threads=2)
+
+    log_like_concurrent = jl.minus_log_like_profile(*trial_values)
+
+    jl.disable_concurrent_plugin_evaluation()
+
+    assert log_like_serial == log_like_concurrent
+
+    assert len(find_shared_state([xy1, xy2])) == 0
+
+    # the threads are started only when needed, and are not pickled
+
+    with ConcurrentPluginEvaluator(DataList(xy1, xy2), n_threads=2) as evaluator:
+
+        assert evaluator._pool is None
+
+        log_likes = evaluator.get_log_likes()
+
+        assert evaluator._pool is not None
+
+        assert evaluator.__getstate__()['_pool'] is None
+
+    assert evaluator._pool is None
+
+    # after close the threads are started again if needed
+
+    assert evaluator.get_log_likes() == log_likes
+
+    evaluator.close()
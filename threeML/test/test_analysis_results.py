@@ -105,6 +105,53 @@ def test_analysis_set_input_output(xy_fitted_joint_likelihood):
         _results_are_same(res1, res2)
 
 
+def test_analysis_set_hdf5_store(xy_fitted_joint_likelihood, xy_completed_bayesian_analysis):
+
+    jl, _, _ = xy_fitted_joint_likelihood  # type: JointLikelihood, None, None
+
+    jl.restore_best_fit()
+
+    bs, _ = xy_completed_bayesian_analysis
+
+    analysis_set = AnalysisResultsSet([jl.results, bs.results, jl.results])
+
+    analysis_set.set_bins("testing", [-1, 1, 3], [1, 3, 5], unit='s')
+
+    temp_file = "_analysis_set_test.h5"
+
+    analysis_set.write_to(temp_file, overwrite=True)
+
+    analysis_set_reloaded = load_analysis_results(temp_file)
+
+    assert len(analysis_set_reloaded) == len(analysis_set)
+
+    # the best fit values of all the results can be queried at once, without loading the results
+
+    table = analysis_set_reloaded.get_parameter_table()
+
+    assert table.shape[0] == sum([res.get_data_frame().shape[0] for res in analysis_set])
+
+    assert not any([res.is_loaded for res in analysis_set_reloaded])
+
+    # the samples of the Bayesian results are read without parsing the model
+
+    assert np.allclose(analysis_set_reloaded[1].samples, bs.results.samples)
+
+    assert not analysis_set_reloaded[1].is_loaded
+
+    for res1, res2, bayes in zip(analysis_set, analysis_set_reloaded, [False, True, False]):
+
+        _results_are_same(res1, res2, bayes=bayes)
+
+        assert res2.load().analysis_type == res1.analysis_type
+
+    assert np.allclose(analysis_set_reloaded._sequence_tuple[0][1].value, [-1, 1, 3])
+
+    analysis_set_reloaded.close()
+
+    os.remove(temp_file)
+
+
 def test_error_propagation(xy_fitted_joint_likelihood):
 
     jl, _, _ = xy_fitted_joint_likelihood  # type: JointLikelihood, None, None
@@ -246,3 +293,68 @@ def test_one_free_parameter_input_output():
 
 
 
+
+
+def test_mle_results_sampling():
+
+    spectrum = Powerlaw()
+    source = PointSource("tst", ra=100, dec=20, spectral_shape=spectrum)
+    model = Model(source)
+
+    spectrum.index = -2.3
+    spectrum.index.bounds = (-2.35, 0)
+    spectrum.index.fix = False
+    spectrum.K.fix = True
+
+    cov_matrix = np.diag([0.01])
+
+    ar = MLEResults(model, cov_matrix, {}, n_samples=1000)
+
+    # samples are generated only when needed
+
+    assert ar._stored_samples_transposed is None
+
+    samples = ar.samples
+
+    # rejected samples are replaced by new ones
+
+    assert samples.shape == (1, 1000)
+    assert np.all(samples >= -2.35)
+    assert np.all(samples <= 0)
+
+    ar.set_number_of_samples(200)
+
+    assert ar.samples.shape == (1, 200)
+
+    ar = MLEResults(model, cov_matrix, {}, n_samples=100, lazy=False)
+
+    assert ar._stored_samples_transposed is not None
+
+
+def test_fit_does_not_generate_samples():
+
+    xy = XYLike("test_no_samples", x, np.array(poiss_sig), poisson_data=True)
+
+    fitfun = Line() + Gaussian()
+
+    fitfun.F_2 = 60.0
+    fitfun.F_2.bounds = (1e-3, 200.0)
+    fitfun.mu_2 = 5.0
+    fitfun.mu_2.bounds = (0.0, 100.0)
+    fitfun.sigma_2.bounds = (1e-3, 10.0)
+
+    model = Model(PointSource('fake', 0.0, 0.0, fitfun))
+
+    jl = JointLikelihood(model, DataList(xy))
+
+    res_frame, _ = jl.fit()
+
+    # the values and the errors of the fit come from the best fit and the covariance matrix
+
+    assert jl.results._stored_samples_transposed is None
+
+    # the samples are generated when errors need them
+
+    _ = jl.results.get_data_frame(error_type="equal tail")
+
+    assert jl.results._stored_samples_transposed is not None
@@ -0,0 +1,100 @@
+import numpy as np
+from astromodels import Powerlaw, PointSource, Model, clone_model
+
+from threeML.classicMLE.batched_spectrum_fit import BatchedSpectrumFit
+from threeML.classicMLE.joint_likelihood import JointLikelihood
+from threeML.data_list import DataList
+from threeML.plugins.SpectrumLike import SpectrumLike
+from threeML.utils.binner import Rebinner
+
+
+def get_simulated_plugin():
+
+    np.random.seed(1234)
+
+    source_function = Powerlaw(K=10., index=-2.)
+
+    energies = np.logspace(1, 3, 51)
+
+    spectrum_generator = SpectrumLike.from_function('fake',
+                                                    source_function=source_function,
+                                                    energy_min=energies[:-1],
+                                                    energy_max=energies[1:])
+
+    model = Model(PointSource('fake', 0, 0, spectral_shape=Powerlaw(K=10., index=-2.)))
+
+    spectrum_generator.set_model(model)
+
+    return spectrum_generator, model
+
+
+def test_batched_fit_from_simulations():
+
+    spectrum_generator, model = get_simulated_plugin()
+
+    batched_fit = BatchedSpectrumFit.from_simulations(spectrum_generator, n_realizations=20, random_seed=1234)
+
+    assert batched_fit.n_realizations == 20
+
+    results = batched_fit.fit()
+
+    assert len(results) == 20
+    assert np.all(np.isfinite(results['-log(likelihood)']))
+
+    # The index is recovered on average
+
+    assert np.isclose(np.mean(results['fake.spectrum.main.Powerlaw.index']), -2., rtol=0.05)
+
+    # The starting values are not changed by the fit
+
+    assert model.fake.spectrum.main.Powerlaw.index.value == -2.
+
+
+def test_batched_fit_against_serial_fit():
+
+    spectrum_generator, model = get_simulated_plugin()
+
+    simulation = spectrum_generator.get_simulated_dataset('sim')
+
+    observed_counts = np.array(simulation.observed_counts, copy=True)
+
+    batched_fit = BatchedSpectrumFit(simulation, model, observed_counts)
+
+    results = batched_fit.fit(fallback=False)
+
+    serial_model = clone_model(model)
+
+    jl = JointLikelihood(serial_model, DataList(simulation))
+
+    jl.fit(quiet=True, compute_covariance=False)
+
+    assert np.isclose(results['-log(likelihood)'][0], jl.current_minimum, rtol=1e-4)
+
+    assert np.isclose(results['fake.spectrum.main.Powerlaw.index'][0],
+                      serial_model.fake.spectrum.main.Powerlaw.index.value,
+                      rtol=1e-3)
+
+
+def test_rebin_batch_ignores_masked_elements():
+
+    vector = np.array([5., 5., 5., 5., 5., 5., 5., 5.])
+
+    mask = np.array([True, True, False, True, True, True, False, True])
+
+    rebinner = Rebinner(vector, 10, mask=mask)
+
+    array = np.random.RandomState(0).uniform(0, 10, size=(3, len(vector)))
+
+    expected = np.array([rebinner.rebin(row)[0] for row in array])
+
+    assert np.allclose(rebinner.rebin_batch(array), expected)
+
+    # Non-finite values in the masked elements do not affect any bin
+
+    array[:, 2] = np.nan
+    array[:, 6] = np.inf
+
+    rebinned = rebinner.rebin_batch(array)
+
+    assert np.all(np.isfinite(rebinned))
+    assert np.allclose(rebinned, expected)
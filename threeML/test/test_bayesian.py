@@ -1,6 +1,10 @@
-from threeML import BayesianAnalysis, Uniform_prior, Log_uniform_prior
+from threeML import BayesianAnalysis, Uniform_prior, Log_uniform_prior, JointLikelihood, DataList
+from threeML.plugins.XYLike import XYLike
+from threeML.bayesian.surrogate_sampler import QuadraticSurrogate
+from astromodels import Line, PointSource, Model
 import numpy as np
 import pytest
+import time
 
 
 def remove_priors(model):
@@ -67,6 +71,99 @@ def test_multinest(completed_bn090217206_bayesian_analysis):
 
     check_results(res)
 
+class SlowXYLike(XYLike):
+
+    # A stand-in for a plugin with an expensive likelihood
+
+    def get_log_like(self):
+
+        time.sleep(1e-4)
+
+        return super(SlowXYLike, self).get_log_like()
+
+
+def test_emcee_with_surrogate():
+
+    np.random.seed(1234)
+
+    x = np.linspace(0, 10, 50)
+
+    generator = XYLike.from_function("generator", Line(a=2.0, b=1.0), x, yerr=np.ones_like(x))
+
+    xy = SlowXYLike("slow", generator.x, generator.y, generator.yerr)
+
+    line = Line()
+
+    line.a.prior = Uniform_prior(lower_bound=-10.0, upper_bound=10.0)
+    line.b.prior = Uniform_prior(lower_bound=-10.0, upper_bound=10.0)
+
+    model = Model(PointSource("source", 0.0, 0.0, line))
+
+    jl = JointLikelihood(model, DataList(xy))
+
+    best_fit, _ = jl.fit()
+
+    bayes = BayesianAnalysis(model, DataList(xy))
+
+    bayes.enable_surrogate()
+
+    bayes.sample(n_walkers=20, burn_in=100, n_samples=500, quiet=True, seed=1234)
+
+    statistics = bayes.surrogate_statistics
+
+    # the surrogate must have been used and have saved some evaluations
+
+    assert statistics['surrogate fits'] > 0
+    assert statistics['saved evaluations'] > 0
+    assert statistics['likelihood evaluations'] < statistics['proposals']
+
+    # the surrogate is kept fixed during the sampling
+
+    assert bayes.sampler.surrogate.is_frozen
+
+    # the posterior is still the right one
+
+    for parameter_name, samples in bayes.samples.items():
+
+        best_fit_value = best_fit['value'][parameter_name]
+        error = best_fit['error'][parameter_name]
+
+        assert abs(np.median(samples) - best_fit_value) < error
+
+        assert np.isclose(np.std(samples), error, rtol=0.3)
+
+    bayes.disable_surrogate()
+
+    bayes.sample(n_walkers=20, burn_in=10, n_samples=10, quiet=True)
+
+    assert bayes.surrogate_statistics is None
+
+
+def test_frozen_surrogate():
+
+    np.random.seed(1234)
+
+    surrogate = QuadraticSurrogate(2)
+
+    points = np.random.normal(size=(60, 2))
+
+    surrogate.add(points, -0.5 * np.sum(points ** 2, axis=1))
+
+    assert surrogate.is_ready
+
+    n_fits = surrogate.n_fits
+    values = surrogate(points)
+
+    surrogate.freeze()
+
+    new_points = np.random.normal(loc=3.0, size=(60, 2))
+
+    surrogate.add(new_points, np.sum(new_points, axis=1))
+
+    assert surrogate.n_fits == n_fits
+    assert np.all(surrogate(points) == values)
+
+
 # def test_parallel_temp():
 #
 #     powerlaw.index.prior = Uniform_prior(lower_bound=-5.0, upper_bound=5.0)
@@ -1,10 +1,12 @@
 import pytest
 from threeML import *
 from threeML.plugins.OGIPLike import OGIPLike
-from threeML.utils.fitted_objects.fitted_point_sources import InvalidUnitError
+from threeML.utils.fitted_objects.fitted_point_sources import InvalidUnitError, integrate_fluxes
 from threeML.io.calculate_flux import _calculate_point_source_flux
 import astropy.units as u
 import matplotlib.pyplot as plt
+import numpy as np
+import scipy.integrate as integrate
 
 from threeML.io.package_data import get_path_of_data_dir
 
@@ -188,3 +190,48 @@ def test_units_on_energy_range(analysis_to_test):
     with pytest.raises(AssertionError):
         plot_point_source_spectra(analysis_to_test[0], ene_min=1.*u.keV, ene_max=1.)
 
+
+def test_vectorized_flux_integration():
+
+    np.random.seed(1234)
+
+    def cutoff_powerlaw(x, K, index, xc):
+
+        return K * (x / 100.) ** index * np.exp(-x / xc)
+
+    def one_sample_at_a_time(x, K, index, xc):
+
+        assert np.ndim(K) == 0 and np.ndim(index) == 0
+
+        return cutoff_powerlaw(x, K, index, xc)
+
+    samples = dict(K=np.random.uniform(0.5, 2., 20), index=np.random.uniform(-2.5, -1., 20), xc=300.)
+
+    broadcasted = integrate_fluxes(one_sample_at_a_time, samples, 10., 1000., broadcast_function=cutoff_powerlaw)
+
+    looped = integrate_fluxes(one_sample_at_a_time, samples, 10., 1000.)
+
+    for flux_type, power in [('photon_flux', 0), ('energy_flux', 1), ('nufnu_flux', 2)]:
+
+        assert broadcasted[flux_type].shape == (20,)
+
+        assert np.allclose(broadcasted[flux_type], looped[flux_type], rtol=1E-10)
+
+        expected = [integrate.quad(lambda x: x ** power * cutoff_powerlaw(x, K, index, 300.), 10., 1000.)[0]
+                    for K, index in zip(samples['K'], samples['index'])]
+
+        assert np.allclose(broadcasted[flux_type], expected, rtol=1E-6)
+
+    # a broadcast function giving different values is not used
+
+    wrong = integrate_fluxes(one_sample_at_a_time, samples, 10., 1000.,
+                             broadcast_function=lambda x, K, index, xc: 2 * cutoff_powerlaw(x, K, index, xc))
+
+    assert np.allclose(wrong['photon_flux'], looped['photon_flux'])
+
+    # too few sub-intervals for the requested accuracy
+
+    with pytest.warns(Warning):
+
+        integrate_fluxes(one_sample_at_a_time, samples, 10., 1000., broadcast_function=cutoff_powerlaw, n_points=2,
+                         max_intervals=8)
@@ -1,3 +1,5 @@
+import numpy as np
+
 from threeML import *
 from conftest import data_list_bn090217206_nai6, get_grb_model
 
@@ -32,3 +34,39 @@ def test_joint_likelihood_set_parallel():
     print(res)
 
 
+
+
+def test_time_resolved_joint_likelihood_set():
+
+    # the intervals are given in reverse time order on purpose
+
+    times = np.arange(5)[::-1]
+
+    jlset = TimeResolvedJointLikelihoodSet(data_getter=get_data, model_getter=get_model, interval_times=times)
+
+    cold_parameters, cold_like = jlset.go(compute_covariance=False, warm_start=False)
+
+    cold_calls = jlset.likelihood_calls
+
+    assert cold_calls.shape[0] == 5
+    assert not np.any(cold_calls['warm_start'])
+
+    warm_parameters, warm_like = jlset.go(compute_covariance=False)
+
+    warm_calls = jlset.likelihood_calls
+
+    # only the first interval in time order (the last one) starts from scratch
+
+    assert list(warm_calls['warm_start']) == [True, True, True, True, False]
+
+    # all the intervals are the same, so warm started fits start from the solution
+
+    assert warm_calls['model_0'].values[:-1].sum() <= cold_calls['model_0'].values[:-1].sum()
+
+    assert np.allclose(warm_parameters['value'].values, cold_parameters['value'].values, rtol=1e-2)
+
+    with parallel_computation(start_cluster=False):
+
+        parallel_parameters, _ = jlset.go(compute_covariance=False, n_chunks=2)
+
+    assert np.allclose(parallel_parameters['value'].values, cold_parameters['value'].values, rtol=1e-2)
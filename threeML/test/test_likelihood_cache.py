@@ -0,0 +1,80 @@
+import numpy as np
+
+from threeML.classicMLE.likelihood_cache import VectorLRUCache
+
+
+def test_vector_lru_cache():
+
+    cache = VectorLRUCache(2, 3)
+
+    for i in range(4):
+
+        cache.put([float(i), 1.0], i)
+
+    # the oldest entry has been dropped
+
+    assert len(cache) == 3
+    assert cache.get([0.0, 1.0]) is None
+    assert cache.get([3.0, 1.0]) == 3
+
+    # using an entry makes it the most recent one
+
+    assert cache.get([1.0, 1.0]) == 1
+
+    cache.put([9.0, 9.0], 9)
+
+    assert cache.get([2.0, 1.0]) is None
+    assert cache.get([1.0, 1.0]) == 1
+
+    assert cache.n_hits == 3 and cache.n_misses == 2
+
+    # match within a tolerance
+
+    cache = VectorLRUCache(2, 10, tolerance=1e-6)
+
+    cache.put([1.0, 2.0], 'a')
+
+    assert cache.get([1.0 + 1e-7, 2.0]) == 'a'
+    assert cache.get([1.0 + 1e-4, 2.0]) is None
+
+    cache.clear()
+
+    assert len(cache) == 0
+    assert cache.get([1.0, 2.0]) is None
+
+
+def test_joint_likelihood_with_cache(joint_likelihood_bn090217206_nai):
+
+    jl = joint_likelihood_bn090217206_nai
+
+    jl.set_minimizer("minuit")
+
+    reference, _ = jl.fit()
+
+    reference_errors = jl.get_errors()
+
+    jl.enable_likelihood_cache()
+
+    results, _ = jl.fit()
+
+    errors = jl.get_errors()
+
+    assert np.allclose(results['value'].values, reference['value'].values, rtol=1e-3)
+    assert np.allclose(errors['negative_error'].values, reference_errors['negative_error'].values, rtol=1e-2)
+    assert np.allclose(errors['positive_error'].values, reference_errors['positive_error'].values, rtol=1e-2)
+
+    # the same point again comes from the cache
+
+    trial_values = [parameter._get_internal_value() for parameter in jl.likelihood_model.free_parameters.values()]
+
+    first = jl.minus_log_like_profile(*trial_values)
+
+    hits = jl.likelihood_cache_statistics.loc['total', 'hits']
+
+    assert jl.minus_log_like_profile(*trial_values) == first
+
+    assert jl.likelihood_cache_statistics.loc['total', 'hits'] == hits + 1
+
+    jl.disable_likelihood_cache()
+
+    assert jl.likelihood_cache_statistics is None
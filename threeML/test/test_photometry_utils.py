@@ -58,6 +58,46 @@ def test_filter_set():
 
 
 
+def test_batched_ab_magnitudes():
+
+    import numpy as np
+    import astropy.units as astro_units
+    import astropy.constants as constants
+
+    sf = spec_filters.load_filters('bessell-*')
+
+    fs = FilterSet(sf, mask=np.ones(len(sf.names), dtype=bool))
+
+    spec = Powerlaw(K=1E-2, index=-2.)
+
+    fs.set_model(spec)
+
+    batched = fs.ab_magnitudes()
+
+    assert batched.shape == (fs.n_bands,)
+
+    # compare with the convolution done by speclite filter by filter
+
+    conversion_factor = (constants.c ** 2 * constants.h ** 2).to('keV2 * cm2')
+
+    def wrapped_model(x):
+
+        energies = x.to('keV', equivalencies=astro_units.spectral()).value
+
+        return spec(energies) / (astro_units.keV * astro_units.cm ** 2 * astro_units.s) * conversion_factor / x ** 3
+
+    expected = []
+
+    for filter in sf:
+
+        synthetic_flux = filter.convolve_with_function(wrapped_model).to('1/(cm2 s)')
+
+        expected.append(-2.5 * np.log10((synthetic_flux / filter.ab_zeropoint.to('1/(cm2 s)')).value))
+
+    assert np.allclose(batched, expected, rtol=1E-6)
+
+
+
 
 def test_constructor():
 
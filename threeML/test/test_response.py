@@ -1,5 +1,6 @@
 import numpy as np
 import os
+import pickle
 import pytest
 import warnings
 
@@ -113,6 +114,55 @@ def test_instrument_response_replace_matrix():
         rsp.replace_matrix(np.random.uniform(0,1,100).reshape(10,10))
 
 
+def test_instrument_response_sharing():
+
+    matrix, mc_energies, ebounds = get_matrix_elements()
+
+    rsp_a = InstrumentResponse(matrix, ebounds, mc_energies)
+    rsp_b = InstrumentResponse(matrix.copy(), np.array(ebounds), mc_energies)
+
+    # responses with the same content share (read-only) arrays
+
+    assert rsp_a.matrix is rsp_b.matrix
+    assert rsp_a.ebounds is rsp_b.ebounds
+    assert rsp_a.monte_carlo_energies is rsp_b.monte_carlo_energies
+
+    with pytest.raises(ValueError):
+
+        rsp_a.matrix[0, 0] = 10.0
+
+    # the original matrix is not affected
+
+    matrix[0, 0] = 10.0
+
+    assert rsp_a.matrix[0, 0] == 1.0
+
+    # replacing the matrix of one response does not change the other one
+
+    rsp_b.replace_matrix(rsp_a.matrix / 2.0)
+
+    assert np.all(rsp_a.matrix == 2.0 * rsp_b.matrix)
+
+    # pickling many responses with the same content sends one copy of the arrays
+
+    large_matrix = np.random.uniform(0, 1, (128, 140))
+    ebounds = np.logspace(1, 3, 129)
+    mc_energies = np.logspace(0.5, 3.5, 141)
+
+    responses = [InstrumentResponse(large_matrix, ebounds, mc_energies) for _ in range(20)]
+
+    pickled = pickle.dumps(responses, pickle.HIGHEST_PROTOCOL)
+
+    assert len(pickled) < 2 * large_matrix.nbytes
+
+    # and the unpickled responses share the arrays again
+
+    unpickled = pickle.loads(pickled)
+
+    assert unpickled[0].matrix is unpickled[-1].matrix is responses[0].matrix
+    assert not unpickled[-1].matrix.flags.writeable
+
+
 def test_instrument_response_set_function_and_convolve():
 
     # A very basic test. More tests will be made against XSpec later
@@ -337,6 +387,20 @@ def test_response_set_weighting():
 
     assert np.allclose(weighted_matrix.matrix, 0.5625000000000001 * rsp_a.matrix)
 
+    # the responses of the set are not modified, and replacing one of their matrices changes the weighting
+
+    original_matrix = rsp_b.matrix
+
+    weighted_matrix = rsp_set.weight_by_exposure("5.0 - 25.0")
+
+    assert rsp_b.matrix is original_matrix
+
+    rsp_b.replace_matrix(rsp_a.matrix)
+
+    weighted_matrix = rsp_set.weight_by_exposure("5.0 - 25.0")
+
+    assert np.allclose(weighted_matrix.matrix, rsp_a.matrix)
+
 
 def test_response_set_weighting_with_reference_time():
 
@@ -400,4 +464,55 @@ def test_response_set_weighting_with_disjoint_intervals():
 
     factor = 1.0 / (w1 + w2 + w3) * (w1 + w2 / 2.0 + w3 / 2.0)
 
-    assert np.allclose(weighted_matrix.matrix, factor * rsp_a.matrix)
\ No newline at end of file
+    assert np.allclose(weighted_matrix.matrix, factor * rsp_a.matrix)
+
+def test_response_set_weighting_over_intervals():
+
+    [rsp_a, rsp_b], exposure_getter, counts_getter = get_matrix_set_elements_with_coverage()
+
+    rsp_set = InstrumentResponseSet([rsp_a, rsp_b], exposure_getter, counts_getter)
+
+    starts = [0.0, 5.0, 12.0]
+    stops = [5.0, 25.0, 30.0]
+
+    weighted_matrices = rsp_set.weight_by_counts_over_intervals(starts, stops)
+
+    assert len(weighted_matrices) == len(starts)
+
+    for start, stop, weighted_matrix in zip(starts, stops, weighted_matrices):
+
+        assert np.allclose(weighted_matrix.matrix, rsp_set.weight_by_counts("%s - %s" % (start, stop)).matrix)
+
+    assert np.allclose(weighted_matrices[1].matrix, 0.5625000000000001 * rsp_a.matrix)
+
+    weighted_matrices = rsp_set.weight_by_exposure_over_intervals(starts, stops)
+
+    assert np.allclose(weighted_matrices[1].matrix, 0.625 * rsp_a.matrix)
+
+    # the cached matrices are not shared among the responses
+
+    assert rsp_set.weight_by_exposure("5.0 - 25.0") is not rsp_set.weight_by_exposure("5.0 - 25.0")
+
+
+def test_response_set_weights_in_one_call():
+
+    [rsp_a, rsp_b], exposure_getter, counts_getter = get_matrix_set_elements_with_coverage()
+
+    calls = []
+
+    def counting_exposure_getter(t1, t2):
+
+        calls.append((t1, t2))
+
+        return exposure_getter(t1, t2)
+
+    rsp_set = InstrumentResponseSet([rsp_a, rsp_b], counting_exposure_getter, counts_getter)
+
+    weighted_matrices = rsp_set.weight_by_exposure_over_intervals([0.0, 5.0, 12.0], [5.0, 25.0, 30.0])
+
+    # the getter is called once, with the overlaps of all the intervals with all the matrices
+
+    assert len(calls) == 1
+    assert np.allclose(sorted(zip(*calls[0])), [(0.0, 5.0), (5.0, 10.0), (10.0, 25.0), (12.0, 30.0)])
+
+    assert np.allclose(weighted_matrices[1].matrix, 0.625 * rsp_a.matrix)
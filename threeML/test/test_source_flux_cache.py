@@ -0,0 +1,165 @@
+import imp
+import sys
+
+import numpy as np
+from astromodels import Powerlaw, Model, PointSource
+
+from threeML.utils.source_flux_cache import SourceFluxCache, source_fingerprint
+
+
+class StandInModelInterface(object):
+    """
+    Records what a plugin pushes to the C++ model (like cthreeML's pyToCppModelInterfaceCache)
+    """
+
+    def __init__(self):
+
+        self.spectra = {}
+        self.positions = {}
+        self.n_pushes = 0
+
+    def setPtsSourcePosition(self, id, ra, dec):
+
+        self.positions[id] = (ra, dec)
+
+    def setPtsSourceSpectrum(self, id, spectrum):
+
+        self.spectra[id] = np.array(spectrum)
+        self.n_pushes += 1
+
+
+def _get_model(n_sources):
+
+    sources = [PointSource('src%d' % i, ra=float(i), dec=0., spectral_shape=Powerlaw(K=1. + i, index=-2.))
+               for i in range(n_sources)]
+
+    return Model(*sources)
+
+
+def test_source_flux_cache():
+
+    model = _get_model(3)
+
+    energies = np.logspace(1, 3, 10)
+
+    cache = SourceFluxCache()
+
+    def get_fluxes(energies):
+
+        fluxes = []
+
+        for id, (name, source) in enumerate(model.point_sources.items()):
+
+            flux, _ = cache.get(name, source, lambda: model.get_point_source_fluxes(id, energies), energies=energies)
+
+            fluxes.append(flux)
+
+        return fluxes
+
+    first = get_fluxes(energies)
+
+    assert cache.n_evaluations == 3 and cache.n_hits == 0
+
+    assert source_fingerprint(model.src0) == tuple(p.value for p in model.src0.parameters.values())
+
+    # nothing changed
+
+    get_fluxes(energies)
+
+    assert cache.n_evaluations == 3 and cache.n_hits == 3
+
+    # only the source which moved is evaluated again
+
+    model.src1.spectrum.main.Powerlaw.K = 10.
+
+    second = get_fluxes(energies)
+
+    assert cache.n_evaluations == 4
+
+    assert np.allclose(second[1], 10. / 2. * first[1])
+    assert second[0] is first[0] and second[2] is first[2]
+
+    # a different grid is a different entry
+
+    get_fluxes(energies * 2)
+
+    assert cache.n_evaluations == 7
+
+    cache.clear()
+
+    get_fluxes(energies)
+
+    assert cache.n_evaluations == 10
+
+    # the least recently used entries are dropped
+
+    small_cache = SourceFluxCache(max_entries=2)
+
+    for name, source in model.point_sources.items():
+
+        small_cache.get(name, source, lambda: 0)
+
+    small_cache.get('src0', model.src0, lambda: 0)
+
+    assert small_cache.n_evaluations == 4
+
+
+def test_hawc_plugin_pushes_only_changed_sources(monkeypatch):
+
+    # stand-ins for the HAWC C++ libraries, if they are not available
+
+    for module_name in ['hawc', 'cthreeML', 'cthreeML.pyModelInterfaceCache']:
+
+        try:
+
+            __import__(module_name)
+
+        except ImportError:
+
+            stand_in = imp.new_module(module_name)
+
+            stand_in.liff_3ML = None
+            stand_in.pyToCppModelInterfaceCache = StandInModelInterface
+
+            monkeypatch.setitem(sys.modules, module_name, stand_in)
+
+    monkeypatch.delitem(sys.modules, 'threeML.plugins.HAWCLike', raising=False)
+
+    from threeML.plugins.HAWCLike import HAWCLike
+
+    model = _get_model(3)
+
+    # an instance with only what is needed to fill the model cache
+
+    plugin = HAWCLike.__new__(HAWCLike)
+
+    plugin._model = model
+    plugin._tag = None
+    plugin._energies = np.logspace(0, 3, 20)
+    plugin._pymodel = StandInModelInterface()
+    plugin._source_cache = SourceFluxCache()
+
+    plugin._fill_model_cache()
+
+    assert plugin._pymodel.n_pushes == 3
+
+    plugin._fill_model_cache()
+
+    assert plugin._pymodel.n_pushes == 3
+
+    model.src2.spectrum.main.Powerlaw.index = -2.5
+
+    plugin._fill_model_cache()
+
+    assert plugin._pymodel.n_pushes == 4
+
+    assert np.allclose(plugin._pymodel.spectra[2], model.get_point_source_fluxes(2, plugin._energies) * 1000.0)
+
+    # moving a source pushes its position as well
+
+    model.src0.position.ra = 0.5
+
+    plugin._fill_model_cache()
+
+    assert plugin._pymodel.n_pushes == 5
+    assert plugin._pymodel.positions[0] == (0.5, 0.)
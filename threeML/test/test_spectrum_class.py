@@ -201,3 +201,74 @@ def test_dispersion_spectrum_clone(loaded_response):
     obs_spectrum.clone(new_counts=np.zeros_like(obs_spectrum.counts), new_count_errors=None)
 
     obs_spectrum.clone()
+
+
+def test_in_place_simulation():
+
+    ebounds = ChannelSet.from_list_of_edges(np.array([0,1,2,3,4,5]))
+
+    pl = Powerlaw()
+
+    ps = PointSource('fake', 0, 0, spectral_shape=pl)
+
+    model = Model(ps)
+
+    obs_spectrum = BinnedSpectrum(counts=np.ones(len(ebounds)), exposure=1, ebounds=ebounds, is_poisson=True)
+    bkg_spectrum = BinnedSpectrum(counts=np.ones(len(ebounds)), exposure=1, ebounds=ebounds, is_poisson=True)
+
+    specLike = SpectrumLike('fake', observation=obs_spectrum, background=bkg_spectrum)
+    specLike.set_model(model)
+
+    specLike.set_in_place_simulation(batch_size=10, random_seed=1234)
+
+    sim_1 = specLike.get_simulated_dataset('sim')
+
+    # the same instance is re-used with new counts
+
+    for i in range(25):
+
+        sim_2 = specLike.get_simulated_dataset('sim')
+
+        assert sim_2 is sim_1
+        assert np.all(sim_2.observed_counts >= 0)
+        assert np.all(sim_2.observed_spectrum.counts == sim_2.observed_counts)
+
+    sim_1.set_model(model)
+    sim_1.get_log_like()
+
+    # a different name creates a new persistent plugin
+
+    sim_3 = specLike.get_simulated_dataset('other_sim')
+
+    assert sim_3 is not sim_1
+    assert sim_3.name == 'other_sim'
+
+    # the mask of the generator is propagated
+
+    specLike.set_active_measurements('1-3')
+
+    sim_3 = specLike.get_simulated_dataset('other_sim')
+
+    assert np.all(sim_3._mask == specLike._mask)
+
+    specLike.set_in_place_simulation(active=False)
+
+    sim_4 = specLike.get_simulated_dataset('other_sim')
+
+    assert sim_4 is not sim_3
+
+    # gaussian source only
+
+    obs_spectrum = BinnedSpectrum(counts=np.ones(len(ebounds)), count_errors=np.ones(len(ebounds)), exposure=1,
+                                  ebounds=ebounds)
+
+    specLike = SpectrumLike('fake', observation=obs_spectrum, background=None)
+    specLike.set_model(model)
+
+    specLike.set_in_place_simulation(batch_size=5)
+
+    for i in range(10):
+
+        sim = specLike.get_simulated_dataset('sim')
+
+        assert np.all(sim.observed_counts >= 0)
@@ -8,6 +8,10 @@ from threeML.plugins.DispersionSpectrumLike import DispersionSpectrumLike
 from threeML.plugins.SpectrumLike import SpectrumLike
 from threeML.utils.OGIP.response import OGIPResponse
 from threeML.exceptions.custom_exceptions import NegativeBackground
+from threeML.utils.statistics.likelihood_functions import half_chi2, poisson_log_likelihood_ideal_bkg
+from threeML.utils.statistics.likelihood_functions import poisson_observed_gaussian_background
+from threeML.utils.statistics.likelihood_functions import poisson_observed_poisson_background
+from threeML.utils.statistics.statistic_kernels import PoissonObservedGaussianBackgroundKernel
 import warnings
 warnings.simplefilter('ignore')
 
@@ -173,6 +177,124 @@ def test_spectrumlike_fit():
     assert np.all(np.isclose([K_variates.mean(), kT_variates.mean()], [sim_K, sim_kT], atol=1 ))
 
 
+def test_spectrumlike_with_unchanged_sources():
+
+    energies = np.logspace(1, 3, 51)
+
+    spectrum_generator = SpectrumLike.from_function('fake',
+                                                    source_function=Blackbody(K=1E-1, kT=20.),
+                                                    background_function=Powerlaw(K=1, index=-1.5, piv=100.),
+                                                    energy_min=energies[:-1],
+                                                    energy_max=energies[1:])
+
+    model = Model(PointSource('bb', 0, 0, spectral_shape=Blackbody(K=1E-1, kT=20.)),
+                  PointSource('pl', 1, 0, spectral_shape=Powerlaw(K=1E-2, index=-2.)))
+
+    spectrum_generator.set_model(model)
+
+    log_like = spectrum_generator.get_log_like()
+
+    # move one of the sources: only its flux is computed again, but the sum must be right
+
+    model.pl.spectrum.main.Powerlaw.K = 2E-2
+
+    moved_log_like = spectrum_generator.get_log_like()
+
+    assert moved_log_like != log_like
+
+    spectrum_generator.set_model(model)
+
+    assert np.isclose(spectrum_generator.get_log_like(), moved_log_like)
+
+    model.pl.spectrum.main.Powerlaw.K = 1E-2
+
+    assert np.isclose(spectrum_generator.get_log_like(), log_like)
+
+
+def _get_numerical_log_like_gradient(plugin, parameters):
+
+    gradient = []
+
+    for parameter in parameters.values():
+
+        value = parameter._get_internal_value()
+
+        step = 1e-5 * max(abs(value), 1e-2)
+
+        parameter._set_internal_value(value + step)
+
+        high = plugin.get_log_like()
+
+        parameter._set_internal_value(value - step)
+
+        low = plugin.get_log_like()
+
+        parameter._set_internal_value(value)
+
+        gradient.append((high - low) / (2 * step))
+
+    return np.array(gradient)
+
+
+def test_spectrumlike_log_like_gradient():
+
+    energies = np.logspace(1, 3, 51)
+
+    source_function = Blackbody(K=1E-1, kT=20.)
+    background_function = Powerlaw(K=1, index=-1.5, piv=100.)
+
+    response = OGIPResponse(get_path_of_data_file('datasets/ogip_powerlaw.rsp'))
+
+    plugins = [SpectrumLike.from_function('fake',
+                                          source_function=source_function,
+                                          background_function=background_function,
+                                          energy_min=energies[:-1],
+                                          energy_max=energies[1:]),
+               DispersionSpectrumLike.from_function('test',
+                                                    source_function=source_function,
+                                                    response=response,
+                                                    background_function=background_function)]
+
+    for plugin in plugins:
+
+        model = Model(PointSource('mysource', 0, 0, spectral_shape=Blackbody(K=9E-2, kT=25.)))
+
+        jl = JointLikelihood(model, DataList(plugin))
+
+        gradient = plugin.get_log_like_gradient(model.free_parameters)
+
+        assert np.allclose(gradient, _get_numerical_log_like_gradient(plugin, model.free_parameters), rtol=1e-3)
+
+        # the fit with the gradient of the plugins must find the same minimum of the numerical one
+
+        jl.set_minimizer('scipy')
+
+        jl.disable_plugin_gradients()
+
+        numerical_results, _ = jl.fit(quiet=True, compute_covariance=False)
+
+        numerical_calls = jl.ncalls
+
+        numerical_minimum = jl.current_minimum
+
+        assert jl.ngradient_calls == 0
+
+        model.mysource.spectrum.main.Blackbody.K = 9E-2
+        model.mysource.spectrum.main.Blackbody.kT = 25.
+
+        jl.enable_plugin_gradients()
+
+        results, _ = jl.fit(quiet=True, compute_covariance=False)
+
+        assert jl.ngradient_calls > 0
+
+        assert jl.ncalls < numerical_calls
+
+        assert np.allclose(results['value'].values, numerical_results['value'].values, rtol=1e-2)
+
+        assert np.isclose(jl.current_minimum, numerical_minimum, atol=0.1)
+
+
 def test_dispersionspectrumlike_fit():
 
 
@@ -361,3 +483,129 @@ def test_all_statistics():
 
     spectrum_generator.get_log_like()
 
+
+def _get_reference_log_like(plugin, model_counts):
+
+    observed_counts = plugin.current_observed_counts
+
+    if plugin.observation_noise_model == 'gaussian':
+
+        return -np.sum(half_chi2(observed_counts, plugin.current_observed_count_errors, model_counts))
+
+    if plugin.background_noise_model is None:
+
+        log_likes, _ = poisson_log_likelihood_ideal_bkg(observed_counts, np.zeros_like(model_counts), model_counts)
+
+    elif plugin.background_noise_model == 'ideal':
+
+        log_likes, _ = poisson_log_likelihood_ideal_bkg(observed_counts,
+                                                        plugin.current_scaled_background_counts,
+                                                        model_counts)
+
+    elif plugin.background_noise_model == 'poisson':
+
+        log_likes, _ = poisson_observed_poisson_background(observed_counts,
+                                                           plugin.current_background_counts,
+                                                           plugin.scale_factor,
+                                                           model_counts)
+
+    else:
+
+        log_likes, _ = poisson_observed_gaussian_background(observed_counts,
+                                                            plugin.current_background_counts,
+                                                            plugin.current_background_count_errors,
+                                                            model_counts)
+
+    return np.sum(log_likes)
+
+
+def test_statistic_kernels():
+
+    energies = np.logspace(1, 3, 51)
+
+    low_edge = energies[:-1]
+    high_edge = energies[1:]
+
+    source_function = Blackbody(K=9E-2, kT=20)
+    background_function = Powerlaw(K=1, index=-1.5, piv=100.)
+
+    model = Model(PointSource('mysource', 0, 0, spectral_shape=Blackbody(K=8E-2, kT=22)))
+
+    plugins = [SpectrumLike.from_function('fake',
+                                          source_function=source_function,
+                                          energy_min=low_edge,
+                                          energy_max=high_edge),
+               SpectrumLike.from_function('fake',
+                                          source_function=source_function,
+                                          background_function=background_function,
+                                          energy_min=low_edge,
+                                          energy_max=high_edge),
+               SpectrumLike.from_function('fake',
+                                          source_function=source_function,
+                                          background_function=background_function,
+                                          background_errors=0.1 * background_function(low_edge),
+                                          energy_min=low_edge,
+                                          energy_max=high_edge),
+               SpectrumLike.from_function('fake',
+                                          source_function=source_function,
+                                          source_errors=0.5 * source_function(low_edge),
+                                          energy_min=low_edge,
+                                          energy_max=high_edge)]
+
+    ideal_plugin = SpectrumLike.from_function('fake',
+                                              source_function=source_function,
+                                              background_function=background_function,
+                                              energy_min=low_edge,
+                                              energy_max=high_edge)
+
+    with warnings.catch_warnings():
+
+        warnings.simplefilter('ignore')
+
+        ideal_plugin.background_noise_model = 'ideal'
+
+    plugins.append(ideal_plugin)
+
+    for plugin in plugins:
+
+        plugin.set_model(model)
+
+        for selection in ('all', '20-500'):
+
+            # the terms depending only on the data must follow the selection
+
+            plugin.set_active_measurements(selection)
+
+            model_counts = plugin.get_model()
+
+            assert np.isclose(plugin.get_log_like(), _get_reference_log_like(plugin, model_counts), rtol=1e-10)
+
+            # batched mode
+
+            batch = np.vstack([model_counts * scale for scale in (0.5, 1.0, 2.0)])
+
+            log_likes = plugin.get_log_likes_for_model_counts(batch)
+
+            assert log_likes.shape == (3,)
+
+            assert np.allclose(log_likes, [_get_reference_log_like(plugin, row) for row in batch], rtol=1e-10)
+
+            assert np.isclose(log_likes[1], plugin.get_log_like(), rtol=1e-12)
+
+    # channels without background counts but with a background error (and with observed counts) have the pure
+    # Poisson likelihood, without background
+
+    observed_counts = np.array([5., 3., 0., 7., 2.])
+    background_counts = np.array([2., 0., 0., 4., 0.])
+    background_errors = np.array([1., 1.5, 0.5, 2., 0.])
+    model_counts = np.array([4., 2.5, 1., 3., 0.5])
+
+    kernel = PoissonObservedGaussianBackgroundKernel(observed_counts, background_counts, background_errors)
+
+    log_likes, _ = poisson_observed_gaussian_background(observed_counts, background_counts, background_errors,
+                                                        model_counts)
+
+    log_like, background = kernel(model_counts, background=True)
+
+    assert np.isclose(log_like, np.sum(log_likes), rtol=1e-12)
+    assert np.all(background[background_counts == 0] == 0)
@@ -4,7 +4,16 @@ import pytest
 from threeML.io.file_utils import within_directory
 from threeML.utils.time_interval import TimeIntervalSet
 from threeML.utils.time_series.event_list import EventListWithDeadTime, EventList
+from threeML.utils.time_series.event_list_replay import EventListReplay
+from threeML.utils.time_series.binned_spectrum_series import BinnedSpectrumSeries
+from threeML.utils.time_series.polynomial import Polynomial, PolynomialSet, polyfit, unbinned_polyfit
+from threeML.utils.time_series.polynomial import PolyBinnedLogLikelihood, PolyUnbinnedLogLikelihood
+from threeML.utils.time_series.polynomial import select_polynomial_grade
 from threeML.utils.data_builders.time_series_builder import TimeSeriesBuilder
+from threeML.utils.spectrum.binned_spectrum import BinnedSpectrum
+from threeML.utils.spectrum.binned_spectrum_set import BinnedSpectrumSet
+from threeML.utils.OGIP.pha import PHAII, PHAIIWriter, write_time_series_pha
+from threeML.utils.OGIP.response import InstrumentResponse
 from threeML.io.file_utils import within_directory
 from threeML.plugins.DispersionSpectrumLike import DispersionSpectrumLike
 from threeML.plugins.OGIPLike import OGIPLike
@@ -14,6 +23,584 @@ import astropy.io.fits as fits
 datasets_directory = get_test_datasets_directory()
 
 
+
+def test_polynomial_set():
+
+    np.random.seed(1234)
+
+    n_channels = 5
+
+    polynomials = []
+
+    for i in range(n_channels):
+
+        coefficients = np.random.uniform(0.5, 2., 3)
+
+        covariance = np.diag(np.random.uniform(0.01, 0.1, 3))
+
+        polynomials.append(Polynomial.from_previous_fit(coefficients, covariance))
+
+    poly_set = PolynomialSet(polynomials)
+
+    assert len(poly_set) == n_channels
+    assert poly_set.degree == 2
+    assert poly_set.coefficients.shape == (n_channels, 3)
+    assert poly_set.covariance_matrices.shape == (n_channels, 3, 3)
+
+    starts = np.array([-5., 0., 2.5])
+    stops = np.array([-1., 1., 10.])
+
+    counts = poly_set.integral(starts, stops)
+    errors = poly_set.integral_error(starts, stops)
+
+    assert counts.shape == (len(starts), n_channels)
+    assert errors.shape == (len(starts), n_channels)
+
+    for i, (tmin, tmax) in enumerate(zip(starts, stops)):
+
+        for j, poly in enumerate(polynomials):
+
+            assert np.allclose(counts[i, j], poly.integral(tmin, tmax))
+            assert np.allclose(errors[i, j], poly.integral_error(tmin, tmax))
+
+    # scalar intervals give one value per channel
+
+    assert poly_set.integral(0., 1.).shape == (n_channels,)
+
+
+
+def _finite_difference_gradient(function, point, rel_step=1E-6):
+
+    steps = np.diag(rel_step * np.abs(point))
+
+    return np.array([(function(point + step) - function(point - step)) / (2 * step[i])
+                     for i, step in enumerate(steps)])
+
+
+def test_polynomial_fit_analytic_derivatives():
+
+    np.random.seed(1234)
+
+    # binned
+
+    x = np.linspace(-10, 50, 120) + 0.25
+    exposure = np.ones_like(x) * 0.5
+    y = np.random.poisson((20 + 0.3 * x - 0.004 * x ** 2) * exposure).astype(float)
+
+    polynomial, min_log_like = polyfit(x, y, 2, exposure)
+
+    log_like = PolyBinnedLogLikelihood(x, y, Polynomial([1., 0., 0.]), exposure)
+
+    best_fit = np.array(polynomial.coefficients)
+
+    assert np.allclose(log_like.gradient(best_fit), 0., atol=1E-3)
+
+    point = best_fit * 1.1
+
+    assert np.allclose(log_like.gradient(point), _finite_difference_gradient(log_like, point), rtol=1E-4)
+
+    assert np.allclose(log_like.hessian(point),
+                       _finite_difference_gradient(log_like.gradient, point).T, rtol=1E-4)
+
+    assert np.allclose(polynomial.covariance_matrix, np.linalg.inv(log_like.hessian(best_fit)))
+
+    # unbinned
+
+    events = np.sort(np.concatenate([np.random.uniform(-10, 0, 300), np.random.uniform(20, 50, 1000)]))
+
+    polynomial, min_log_like = unbinned_polyfit(events, 1, [-10, 20], [0, 50], 1.)
+
+    log_like = PolyUnbinnedLogLikelihood(events, Polynomial([1., 0.]), [-10, 20], [0, 50], 1.)
+
+    best_fit = np.array(polynomial.coefficients)
+
+    assert np.allclose(log_like.gradient(best_fit), 0., atol=1E-3)
+
+    point = best_fit * 1.05
+
+    assert np.allclose(log_like.gradient(point), _finite_difference_gradient(log_like, point), rtol=1E-4)
+
+    assert np.all(np.isfinite(polynomial.error))
+
+
+
+def test_warm_started_grade_selection():
+
+    np.random.seed(1234)
+
+    x = np.linspace(-10, 50, 120) + 0.25
+    exposure = np.ones_like(x) * 0.5
+    y = np.random.poisson((20 + 0.3 * x - 0.004 * x ** 2) * exposure).astype(float)
+
+    cold_fits = [polyfit(x, y, grade, exposure) for grade in range(5)]
+
+    warm_fits = []
+
+    def fit(grade, initial_guess):
+
+        warm_fits.append(polyfit(x, y, grade, exposure, initial_guess=initial_guess))
+
+        return warm_fits[-1]
+
+    best_grade = select_polynomial_grade(fit)
+
+    assert best_grade == select_polynomial_grade(lambda grade, initial_guess: polyfit(x, y, grade, exposure))
+
+    # starting from the previous grade gives the same minima
+
+    for (_, cold_log_like), (_, warm_log_like) in zip(cold_fits, warm_fits):
+
+        assert np.allclose(cold_log_like, warm_log_like, rtol=1E-6)
+
+    # unbinned
+
+    events = np.sort(np.concatenate([np.random.uniform(-10, 0, 300), np.random.uniform(20, 50, 1000)]))
+
+    cold_fit = unbinned_polyfit(events, 1, [-10, 20], [0, 50], 1.)
+
+    warm_fit = unbinned_polyfit(events, 1, [-10, 20], [0, 50], 1.,
+                                initial_guess=unbinned_polyfit(events, 0, [-10, 20], [0, 50], 1.)[0].coefficients)
+
+    assert np.allclose(cold_fit[1], warm_fit[1], rtol=1E-6)
+
+
+def test_polynomial_fit_cache():
+
+    np.random.seed(1234)
+
+    arrival_times = np.sort(np.random.uniform(-20, 50, 20000))
+    channels = np.random.randint(0, 8, arrival_times.shape[0])
+
+    evt_list = EventListWithDeadTime(arrival_times=arrival_times,
+                                     measurement=channels,
+                                     n_channels=8,
+                                     start_time=-20,
+                                     stop_time=50,
+                                     dead_time=np.zeros_like(arrival_times),
+                                     first_channel=0)
+
+    evt_list.set_polynomial_fit_interval("-20.-0.", "30.-50.", unbinned=False)
+
+    first_fit = evt_list.polynomials
+
+    evt_list.set_polynomial_fit_interval("-20.-0.", "35.-50.", unbinned=False)
+
+    assert evt_list.polynomials is not first_fit
+
+    # going back to the first selection reuses its fit
+
+    evt_list.set_polynomial_fit_interval("-20.-0.", "30.-50.", unbinned=False)
+
+    assert evt_list.polynomials is first_fit
+
+    # but not if the fit method is different
+
+    evt_list.set_polynomial_fit_interval("-20.-0.", "30.-50.", unbinned=True)
+
+    assert evt_list.polynomials is not first_fit
+
+    # or if the data have changed, even when the counts in the selection are the same
+
+    evt_list.set_polynomial_fit_interval("-20.-0.", "30.-50.", unbinned=False)
+
+    assert evt_list.polynomials is first_fit
+
+    evt_list.append_events(np.array([50.5, 51.]), np.array([0, 1]), dead_time=np.zeros(2))
+
+    evt_list.set_polynomial_fit_interval("-20.-0.", "30.-50.", unbinned=False)
+
+    assert evt_list.polynomials is not first_fit
+
+
+def test_streaming_event_list():
+
+    np.random.seed(1234)
+
+    arrival_times = np.sort(np.random.uniform(-20, 50, 20000))
+    channels = np.random.randint(0, 8, arrival_times.shape[0])
+    dead_time = np.random.uniform(2.6E-6, 1E-5, arrival_times.shape[0])
+
+    one_shot = EventListWithDeadTime(arrival_times=arrival_times,
+                                     measurement=channels,
+                                     n_channels=8,
+                                     start_time=-20,
+                                     stop_time=50,
+                                     dead_time=dead_time,
+                                     first_channel=0)
+
+    one_shot.set_polynomial_fit_interval("-20.-0.", "30.-50.", unbinned=False)
+
+    replay = EventListReplay(arrival_times, channels, 8, -20., 50., dead_time=dead_time, chunk_duration=7.)
+
+    assert replay.n_chunks == 10
+
+    for evt_list in replay.replay():
+
+        # follow the background while the data arrive
+
+        if evt_list.arrival_times[-1] > 0:
+
+            evt_list.set_polynomial_fit_interval("-20.-0.", "30.-50.", unbinned=False)
+
+    evt_list.refit_polynomials()
+
+    assert evt_list.n_events == one_shot.n_events
+    assert np.all(evt_list.arrival_times == arrival_times)
+    assert np.all(evt_list.measurement == channels)
+
+    # the incrementally updated background table is the one built in one go
+
+    for streamed, fresh in zip(evt_list._get_background_table(), one_shot._get_background_table()):
+
+        assert np.allclose(streamed, fresh)
+
+    for streamed, fresh in zip(evt_list.polynomials, one_shot.polynomials):
+
+        assert np.allclose(streamed.coefficients, fresh.coefficients, rtol=1E-3)
+
+    assert np.allclose(evt_list.exposure_over_interval(0, 10), one_shot.exposure_over_interval(0, 10))
+
+    with pytest.raises(AssertionError):
+
+        evt_list.append_events([10.], [1], dead_time=[1E-5])
+
+    # the dead time of the appended events cannot be dropped silently
+
+    without_dead_time = EventListWithDeadTime(arrival_times=arrival_times[:100],
+                                              measurement=channels[:100],
+                                              n_channels=8,
+                                              start_time=-20,
+                                              stop_time=arrival_times[99],
+                                              first_channel=0)
+
+    with pytest.raises(AssertionError):
+
+        without_dead_time.append_events(arrival_times[100:200], channels[100:200], dead_time=dead_time[100:200])
+
+    without_dead_time.append_events(arrival_times[100:200], channels[100:200])
+
+    assert without_dead_time.n_events == 200
+
+
+def test_interval_slices():
+
+    np.random.seed(1234)
+
+    arrival_times = np.sort(np.random.uniform(-20, 50, 20000))
+    channels = np.random.randint(0, 8, arrival_times.shape[0])
+    dead_time = np.random.uniform(0, 1E-5, arrival_times.shape[0])
+
+    evt_list = EventListWithDeadTime(arrival_times=arrival_times,
+                                     measurement=channels,
+                                     n_channels=8,
+                                     start_time=-20,
+                                     stop_time=50,
+                                     dead_time=dead_time,
+                                     first_channel=0)
+
+    evt_list.set_polynomial_fit_interval("-20.-0.", "30.-50.", unbinned=False)
+
+    # adjacent intervals, with a bound falling exactly on an event
+
+    starts = np.array([0., 1.5, 4., arrival_times[1000]])
+    stops = np.array([1.5, 4., 10., arrival_times[2000]])
+
+    slices = evt_list.get_interval_slices(starts, stops)
+
+    assert len(slices) == len(starts)
+
+    for start, stop, time_slice in zip(starts, stops, slices):
+
+        assert np.allclose(time_slice.counts, evt_list.count_per_channel_over_interval(start, stop))
+        assert np.allclose(time_slice.exposure, evt_list.exposure_over_interval(start, stop))
+
+    # compare with the selections (on the intervals which can be exactly written as strings)
+
+    for start, stop, time_slice in zip(starts[:3], stops[:3], slices[:3]):
+
+        evt_list.set_active_time_intervals("%.1f-%.1f" % (start, stop))
+
+        for use_poly in [False, True]:
+
+            expected = evt_list.get_information_dict(use_poly=use_poly)
+            obtained = time_slice.get_information_dict(use_poly=use_poly)
+
+            assert np.allclose(obtained['counts'], expected['counts'])
+            assert np.allclose(obtained['exposure'], expected['exposure'])
+
+            if use_poly:
+
+                assert np.allclose(obtained['counts error'], expected['counts error'])
+
+
+def test_bulk_pha_writing():
+
+    np.random.seed(1234)
+
+    arrival_times = np.sort(np.random.uniform(-20, 50, 20000))
+    channels = np.random.randint(0, 8, arrival_times.shape[0])
+    dead_time = np.random.uniform(0, 1E-5, arrival_times.shape[0])
+
+    evt_list = EventListWithDeadTime(arrival_times=arrival_times,
+                                     measurement=channels,
+                                     n_channels=8,
+                                     start_time=-20,
+                                     stop_time=50,
+                                     dead_time=dead_time,
+                                     first_channel=0)
+
+    evt_list.set_polynomial_fit_interval("-20.-0.", "30.-50.", unbinned=False)
+
+    starts = np.linspace(0, 9, 10)
+    stops = starts + 1
+
+    ebounds = np.logspace(1, 3, 9)
+    response = InstrumentResponse(np.eye(8), ebounds, ebounds)
+
+    # chunks smaller than the number of intervals, and not dividing it
+
+    write_time_series_pha(evt_list, 'test_bulk_pha', starts, stops, responses=response, overwrite=True, chunk_size=3)
+
+    counts = evt_list.count_per_channel_over_intervals(starts, stops)
+    exposure = evt_list.exposure_over_intervals(starts, stops)
+
+    with fits.open('test_bulk_pha.pha') as f:
+
+        spectrum = f['SPECTRUM']
+
+        assert spectrum.header['DETCHANS'] == 8
+        assert spectrum.header['POISSERR']
+
+        assert np.all(spectrum.data['SPEC_NUM'] == np.arange(1, 11))
+        assert np.allclose(spectrum.data['TSTART'], starts)
+        assert np.allclose(spectrum.data['RATE'], counts / exposure[:, np.newaxis])
+        assert np.allclose(spectrum.data['EXPOSURE'], exposure)
+
+        # the channels of the time series, also without a response
+
+        assert np.all(spectrum.data['CHANNEL'] == np.arange(8))
+
+        # the response is shared, so it is written only once
+
+        assert np.all(spectrum.data['RESPFILE'] == 'test_bulk_pha.rsp{1}')
+        assert spectrum.data['BACKFILE'][4] == 'test_bulk_pha_bak.pha{5}'
+
+    with fits.open('test_bulk_pha_bak.pha') as f:
+
+        background = f['SPECTRUM']
+
+        assert not background.header['POISSERR']
+        assert np.allclose(background.data['RATE'] * exposure[:, np.newaxis],
+                           evt_list.polynomials.integral(starts, stops))
+        assert np.all(background.data['STAT_ERR'] > 0)
+        assert np.all(background.data['CHANNEL'] == np.arange(8))
+
+    with fits.open('test_bulk_pha.rsp') as f:
+
+        # primary, EBOUNDS and one matrix
+
+        assert len(f) == 3
+
+    # the same spectra in memory
+
+    pha = PHAII.from_time_series(evt_list, start_times=starts, stop_times=stops)
+
+    assert np.allclose(pha['SPECTRUM'].data['RATE'], counts / exposure[:, np.newaxis])
+
+    for file_name in ['test_bulk_pha.pha', 'test_bulk_pha_bak.pha', 'test_bulk_pha.rsp']:
+
+        os.remove(file_name)
+
+    # without a response the channels are still those of the time series
+
+    write_time_series_pha(evt_list, 'test_bulk_pha', starts, stops, overwrite=True, chunk_size=3)
+
+    for file_name in ['test_bulk_pha.pha', 'test_bulk_pha_bak.pha']:
+
+        with fits.open(file_name) as f:
+
+            assert np.all(f['SPECTRUM'].data['CHANNEL'] == np.arange(8))
+            assert np.all(f['SPECTRUM'].data['RESPFILE'] == 'NONE')
+
+        os.remove(file_name)
+
+    # the file must contain all the spectra that were announced
+
+    with pytest.raises(RuntimeError):
+
+        with PHAIIWriter('test_bulk_pha.pha', 2, 8, 'instrument', 'telescope', overwrite=True) as writer:
+
+            writer.write(starts[:1], 1., counts[:1] / exposure[:1], exposure[:1])
+
+    os.remove('test_bulk_pha.pha')
+
+    # times and rates are written in double precision (MET start times need it)
+
+    met_starts = 5E8 + np.array([0.123, 1.456])
+
+    with PHAIIWriter('test_bulk_pha.pha', 2, 8, 'instrument', 'telescope', overwrite=True) as writer:
+
+        writer.write(met_starts, 1., counts[:2] / exposure[:2, np.newaxis], exposure[:2])
+
+    with fits.open('test_bulk_pha.pha') as f:
+
+        assert np.all(f['SPECTRUM'].data['TSTART'] == met_starts)
+        assert np.all(f['SPECTRUM'].data['RATE'] == counts[:2] / exposure[:2, np.newaxis])
+
+    os.remove('test_bulk_pha.pha')
+
+
+def test_light_curve_pyramid():
+
+    np.random.seed(1234)
+
+    arrival_times = np.sort(np.random.uniform(-20, 50, 20000))
+    channels = np.random.randint(0, 8, arrival_times.shape[0])
+    dead_time = np.random.uniform(0, 1E-5, arrival_times.shape[0])
+
+    evt_list = EventListWithDeadTime(arrival_times=arrival_times,
+                                     measurement=channels,
+                                     n_channels=8,
+                                     start_time=-20,
+                                     stop_time=50,
+                                     dead_time=dead_time,
+                                     first_channel=0)
+
+    evt_list.set_polynomial_fit_interval("-20.-0.", "30.-50.", unbinned=False)
+
+    # the light curves computed directly from the events
+
+    expected = {}
+
+    queries = [(-10., 20., 1., None), (-10., 20., 0.25, (2, 5)), (0., 10., 0.64, (0, 0)), (-3.3, 7.1, 0.7, (1, 7))]
+
+    for query in queries:
+
+        expected[query] = evt_list.get_light_curve(*query)
+
+    pyramid = evt_list.build_light_curve_pyramid(base_dt=0.01, n_levels=8)
+
+    assert evt_list.light_curve_pyramid is pyramid
+
+    assert pyramid.grid_start <= -20
+    assert pyramid.grid_stop >= 50
+
+    for query in queries:
+
+        time_bins, counts, exposure, bkg = evt_list.get_light_curve(*query)
+
+        assert np.allclose(time_bins, expected[query][0])
+        assert np.all(counts == expected[query][1])
+        assert np.allclose(exposure, expected[query][2])
+        assert np.allclose(bkg, expected[query][3])
+
+    # the light curves on the grid are read from the pyramid
+
+    edges = np.arange(-10., 20. + 0.32, 0.32)
+
+    assert pyramid.get_light_curve(edges) is not None
+
+    # and those which are not on the grid are not
+
+    assert pyramid.get_light_curve(edges + 0.005) is None
+
+
+def test_binned_spectrum_series_light_curve_pyramid():
+
+    np.random.seed(1234)
+
+    n_channels = 8
+
+    # native bins of 0.25 s between -20 and 50
+
+    edges = -20. + 0.25 * np.arange(281)
+    ebounds = np.logspace(1, 3, n_channels + 1)
+
+    spectra = [BinnedSpectrum(np.random.poisson(10., n_channels), exposure=0.2, ebounds=ebounds, is_poisson=True)
+               for _ in range(edges.shape[0] - 1)]
+
+    spectrum_set = BinnedSpectrumSet(spectra, time_intervals=TimeIntervalSet.from_starts_and_stops(edges[:-1],
+                                                                                                   edges[1:]))
+
+    series = BinnedSpectrumSeries(spectrum_set, first_channel=1, verbose=False)
+
+    # light curve bins made of whole native bins, both on the grids of the pyramid and not (dt = 0.75)
+
+    queries = [(-10., 20., 1., None), (-10., 20., 0.5, (2, 5)), (0., 10., 0.75, (1, 1)), (-20., 50., 2., (3, 8))]
+
+    def check(query):
+
+        start, stop, dt, channel_range = query
+
+        time_bins, counts, exposure, bkg = series.get_light_curve(*query)
+
+        first, last = (1, n_channels) if channel_range is None else channel_range
+
+        expected_counts = spectrum_set.counts_over_intervals(time_bins[:, 0], time_bins[:, 1])[:, first - 1: last]
+
+        assert np.all(counts == expected_counts.sum(axis=1))
+        assert np.allclose(exposure, spectrum_set.exposure_over_intervals(time_bins[:, 0], time_bins[:, 1]))
+        assert bkg is None
+
+    for query in queries:
+
+        check(query)
+
+    pyramid = series.build_light_curve_pyramid(base_dt=0.25, n_levels=4)
+
+    assert series.light_curve_pyramid is pyramid
+
+    for query in queries:
+
+        check(query)
+
+    assert pyramid.get_light_curve(np.arange(-10., 20. + 1., 1.)) is not None
+
+
+def test_binned_spectrum_set_interval_queries():
+
+    np.random.seed(1234)
+
+    n_bins = 200
+    n_channels = 6
+
+    edges = np.cumsum(np.random.uniform(0.5, 2., n_bins + 1)) - 50.
+    ebounds = np.logspace(1, 3, n_channels + 1)
+
+    spectra = [BinnedSpectrum(np.random.poisson(10., n_channels), exposure=0.9 * (edges[i + 1] - edges[i]),
+                              ebounds=ebounds, is_poisson=True) for i in range(n_bins)]
+
+    spectrum_set = BinnedSpectrumSet(spectra, time_intervals=TimeIntervalSet.from_starts_and_stops(edges[:-1],
+                                                                                                   edges[1:]))
+
+    counts = np.array([spectrum.counts for spectrum in spectra])
+    exposure = np.array([spectrum.exposure for spectrum in spectra])
+
+    starts = np.array([-40., edges[10], -100., 20.])
+    stops = np.array([10., edges[30], 1000., 20.5])
+
+    for start, stop, this_counts, this_exposure, mask in zip(starts, stops,
+                                                              spectrum_set.counts_over_intervals(starts, stops),
+                                                              spectrum_set.exposure_over_intervals(starts, stops),
+                                                              [spectrum_set.bin_mask_over_intervals(start, stop)
+                                                               for start, stop in zip(starts, stops)]):
+
+        expected_mask = spectrum_set.time_intervals.containing_interval(start, stop, as_mask=True)
+
+        assert np.all(mask == expected_mask)
+        assert np.all(this_counts == counts[expected_mask].sum(axis=0))
+        assert np.allclose(this_exposure, exposure[expected_mask].sum())
+
+    # snapping to the closest bin edges
+
+    snapped_starts, snapped_stops = spectrum_set.snap_to_bins(starts, stops)
+
+    for start, stop, snapped_start, snapped_stop in zip(starts, stops, snapped_starts, snapped_stops):
+
+        assert snapped_start == edges[:-1][np.abs(edges[:-1] - start).argmin()]
+        assert snapped_stop == edges[1:][np.abs(edges[1:] - stop).argmin()]
+
+
 def test_event_list_constructor():
     dummy_times = np.linspace(0, 10, 10)
     dummy_energy = np.zeros_like(dummy_times)
@@ -289,3 +876,40 @@ def test_read_lle():
         assert new_errors == old_errors
 
         assert old_tmin_list == new_tmin_list
+
+
+def test_binned_fit_counts_only_selected_events():
+
+    np.random.seed(1234)
+
+    arrival_times = np.sort(np.random.uniform(-20, 50, 20000))
+    channels = np.random.randint(0, 8, arrival_times.shape[0])
+
+    # a burst just after the end of a selection, in a bin whose center is inside the selection
+
+    burst_times = np.random.uniform(45.8, 45.95, 2000)
+    burst_channels = np.random.randint(0, 8, burst_times.shape[0])
+
+    idx = np.argsort(np.concatenate((arrival_times, burst_times)), kind='mergesort')
+
+    fits = []
+
+    for times, measurement in [(arrival_times, channels),
+                               (np.concatenate((arrival_times, burst_times))[idx],
+                                np.concatenate((channels, burst_channels))[idx])]:
+
+        evt_list = EventListWithDeadTime(arrival_times=times,
+                                         measurement=measurement,
+                                         n_channels=8,
+                                         start_time=-20,
+                                         stop_time=50,
+                                         dead_time=np.zeros_like(times),
+                                         first_channel=0)
+
+        evt_list.set_polynomial_fit_interval("-20.-0.", "30.-45.7", unbinned=False)
+
+        fits.append([polynomial.coefficients for polynomial in evt_list.polynomials])
+
+    # the events outside of the selections do not change the background fit
+
+    assert np.allclose(fits[0], fits[1])
@@ -4,7 +4,7 @@ import numpy as np
 import os
 import warnings
 
-from threeML.io.fits_file import FITSExtension, FITSFile
+from threeML.io.fits_file import FITSExtension, FITSFile, get_creator_version
 from threeML.utils.OGIP.response import EBOUNDS, SPECRESP_MATRIX
 
 
@@ -60,6 +60,13 @@ class PHAWrite(object):
 
         self._spec_iterator = 1
 
+        # the responses to write, and the number of the extension of each response matrix
+        # (the plugins built from the same data share the same matrix, which is written only once)
+
+        self._out_rsp = []
+
+        self._rsp_numbers = {}
+
     def write(self, outfile_name, overwrite=True, force_rsp_write=False):
         """
         Write a PHA Type II and BAK file for the given OGIP plugin. Automatically determines
@@ -86,6 +93,8 @@ class PHAWrite(object):
 
         self._out_rsp = []
 
+        self._rsp_numbers = {}
+
         for ogip in self._ogiplike:
 
             self._append_ogip(ogip, force_rsp_write)
@@ -153,13 +162,11 @@ class PHAWrite(object):
 
 
 
-                rsp_file_name = "%s.rsp{%d}"%(self._outfile_basename,self._spec_iterator)
+                rsp_number = _register_response(pha_info['rsp'], self._out_rsp, self._rsp_numbers)
 
-                self._respfile[key].append(rsp_file_name)
+                rsp_file_name = "%s.rsp{%d}" % (self._outfile_basename, rsp_number)
 
-                if key == 'pha':
-
-                        self._out_rsp.append(pha_info['rsp'])
+                self._respfile[key].append(rsp_file_name)
 
 
             self._rate[key].append(pha_info[key].rates.tolist())
@@ -290,23 +297,62 @@ class PHAWrite(object):
 
             # add the various responses needed
 
-            extensions = [EBOUNDS(self._out_rsp[0].ebounds)]
+            _write_rsp_file("%s.rsp" % self._outfile_basename, self._out_rsp, self._mission['pha'],
+                            self._instrument['pha'])
+
+
+def _register_response(response, responses, numbers):
+    """
+    Add a response to the list of responses to write, unless its arrays (matrix, ebounds and monte carlo energies)
+    are already in the list
+
+    :param response: the response
+    :param responses: the list of the responses to write
+    :param numbers: dictionary of the number of the extension of each matrix in the list
+    :return: the number of the extension (EXTVER) of the response matrix
+    """
 
-            extensions.extend([SPECRESP_MATRIX(this_rsp.monte_carlo_energies, this_rsp.ebounds, this_rsp.matrix) for this_rsp in self._out_rsp])
+    # Responses sharing the matrix (see response_registry) can still have different energy bounds
 
-            for i, ext in enumerate(extensions[1:]):
+    key = (id(response.matrix), id(response.ebounds), id(response.monte_carlo_energies))
 
+    if key not in numbers:
 
-                # Set telescope and instrument name
-                ext.hdu.header.set("TELESCOP", self._mission['pha'])
-                ext.hdu.header.set("INSTRUME", self._instrument['pha'])
-                ext.hdu.header.set("EXTVER", i+1)
+        responses.append(response)
 
+        # keep the arrays alive, so that their ids are not reused
 
+        numbers[key] = (len(responses), (response.matrix, response.ebounds, response.monte_carlo_energies))
 
-            rsp2 = FITSFile(fits_extensions=extensions)
+    return numbers[key][0]
 
-            rsp2.writeto("%s.rsp" % self._outfile_basename, clobber=True)
+
+def _write_rsp_file(file_name, responses, telescope_name, instrument_name):
+    """
+    Write a set of responses (with the same ebounds) to a RSP file, with one SPECRESP MATRIX extension each
+
+    :param file_name: the name of the RSP file
+    :param responses: the list of responses
+    :param telescope_name: name of the telescope
+    :param instrument_name: name of the instrument
+    :return: None
+    """
+
+    extensions = [EBOUNDS(responses[0].ebounds)]
+
+    extensions.extend([SPECRESP_MATRIX(this_rsp.monte_carlo_energies, this_rsp.ebounds, this_rsp.matrix)
+                       for this_rsp in responses])
+
+    for i, ext in enumerate(extensions[1:]):
+
+        # Set telescope and instrument name
+        ext.hdu.header.set("TELESCOP", telescope_name)
+        ext.hdu.header.set("INSTRUME", instrument_name)
+        ext.hdu.header.set("EXTVER", i + 1)
+
+    rsp2 = FITSFile(fits_extensions=extensions)
+
+    rsp2.writeto(file_name, overwrite=True)
 
 def _atleast_2d_with_dtype(value,dtype=None):
 
@@ -518,7 +564,40 @@ class PHAII(FITSFile):
 
 
     @classmethod
-    def from_time_series(cls, time_series, use_poly=False):
+    def from_time_series(cls, time_series, use_poly=False, start_times=None, stop_times=None):
+        """
+        Build a PHAII from the active selection of a time series or, if start and stop times are given, with one
+        spectrum for each of the intervals. In the latter case the counts of all the intervals are computed at once.
+
+        :param time_series: the time series
+        :param use_poly: use the background polynomials instead of the counts
+        :param start_times: (optional) start times of the intervals
+        :param stop_times: (optional) stop times of the intervals
+        :return: PHAII
+        """
+
+        if start_times is not None or stop_times is not None:
+
+            assert start_times is not None and stop_times is not None, 'must specify the start AND the stop times'
+
+            pha_information = time_series.get_information_over_intervals(start_times, stop_times, use_poly=use_poly)
+
+            n_spectra = len(pha_information['tstart'])
+
+            return PHAII(instrument_name=pha_information['instrument'],
+                         telescope_name=pha_information['telescope'],
+                         tstart=pha_information['tstart'],
+                         telapse=pha_information['telapse'],
+                         channel=np.tile(pha_information['channel'], (n_spectra, 1)),
+                         rate=pha_information['rates'],
+                         stat_err=pha_information['rate error'],
+                         quality=np.tile(pha_information['quality'].to_ogip(), (n_spectra, 1)),
+                         grouping=np.tile(pha_information['grouping'], (n_spectra, 1)),
+                         exposure=pha_information['exposure'],
+                         backscale=np.ones(n_spectra),
+                         respfile=['NONE'] * n_spectra,
+                         ancrfile=['NONE'] * n_spectra,
+                         is_poisson=pha_information['is_poisson'])
 
         pha_information = time_series.get_information_dict(use_poly)
 
@@ -587,3 +666,368 @@ class PHAII(FITSFile):
         return
 
 
+class PHAIIWriter(object):
+
+    def __init__(self, file_name, n_spectra, n_channels, instrument_name, telescope_name, is_poisson=True,
+                 file_name_length=128, chunk_size=512, overwrite=False):
+        """
+        Writes a PHAII file with many spectra without keeping them all in memory. The rows of the SPECTRUM extension
+        are filled in a preallocated record array, which is streamed to the file each time it is full. The number of
+        spectra must be known in advance, and exactly that number of spectra must be written before closing.
+
+        The columns are the same as those written by PHAII.
+
+        :param file_name: name of the PHAII file
+        :param n_spectra: the number of spectra that will be written
+        :param n_channels: the number of channels
+        :param instrument_name: name of the instrument
+        :param telescope_name: name of the telescope
+        :param is_poisson: whether the rates are Poisson distributed (if not, a STAT_ERR column is written)
+        :param file_name_length: the maximum length of the names of the RSP, ARF and background files
+        :param chunk_size: the number of rows written to the file at once
+        :param overwrite: overwrite an existing file
+        """
+
+        assert n_spectra > 0, 'There must be at least one spectrum'
+
+        assert chunk_size > 0, 'The chunk size must be positive'
+
+        self._n_spectra = int(n_spectra)
+        self._n_channels = int(n_channels)
+        self._is_poisson = bool(is_poisson)
+
+        vector = '%i%%s' % self._n_channels
+        string = '%iA' % file_name_length
+
+        columns = [fits.Column(name='TSTART', format='D', unit='s'),
+                   fits.Column(name='TELAPSE', format='D', unit='s'),
+                   fits.Column(name='SPEC_NUM', format='J'),
+                   fits.Column(name='CHANNEL', format=vector % 'I'),
+                   fits.Column(name='RATE', format=vector % 'D', unit='1 / s'),
+                   fits.Column(name='QUALITY', format=vector % 'I'),
+                   fits.Column(name='BACKSCAL', format='D'),
+                   fits.Column(name='GROUPING', format=vector % 'I'),
+                   fits.Column(name='EXPOSURE', format='D', unit='s'),
+                   fits.Column(name='RESPFILE', format=string),
+                   fits.Column(name='ANCRFILE', format=string),
+                   fits.Column(name='BACKFILE', format=string)]
+
+        if not self._is_poisson:
+
+            columns.append(fits.Column(name='STAT_ERR', format=vector % 'D'))
+
+        columns.append(fits.Column(name='SYS_ERR', format=vector % 'D'))
+
+        # Get the header (with the description of the columns) of an empty table
+
+        empty_table = fits.BinTableHDU.from_columns(fits.ColDefs(columns),
+                                                    header=fits.Header(SPECTRUM._HEADER_KEYWORDS),
+                                                    nrows=0)
+
+        header = empty_table.header
+
+        header.set('NAXIS2', self._n_spectra)
+
+        header.set('CREATOR', "3ML v.%s" % get_creator_version(), "(G.Vianello, giacomov@slac.stanford.edu)")
+        header.set("TELESCOP", telescope_name)
+        header.set("INSTRUME", instrument_name)
+        header.set("DETCHANS", self._n_channels)
+        header.set("POISSERR", self._is_poisson)
+
+        # FITS tables are big-endian
+
+        self._buffer = np.zeros(int(chunk_size), dtype=empty_table.columns.dtype.newbyteorder('>'))
+
+        self._n_buffered = 0
+        self._n_written = 0
+
+        fits.PrimaryHDU().writeto(file_name, overwrite=overwrite)
+
+        self._stream = fits.StreamingHDU(file_name, header)
+
+    @property
+    def n_written(self):
+        """
+        :return: the number of spectra written so far
+        """
+
+        return self._n_written + self._n_buffered
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        if exc_type is None:
+
+            self.close()
+
+        else:
+
+            # do not hide the original error with the one about the missing rows
+
+            self._close_stream()
+
+    def write(self, tstart, telapse, rate, exposure, channel=None, quality=None, grouping=None, backscale=1.,
+              respfile='NONE', ancrfile='NONE', back_file='NONE', stat_err=None, sys_err=None):
+        """
+        Write a block of spectra. Scalars and one-dimensional values are used for all the spectra of the block.
+
+        :param tstart: array of interval start times
+        :param telapse: array of times elapsed since start
+        :param rate: (n_spectra x n_channels) array of rates
+        :param exposure: array of exposures
+        :param channel: channel numbers (default: starting from 1)
+        :param quality: OGIP quality values (default: all good)
+        :param grouping: OGIP grouping values (default: no grouping)
+        :param backscale: backscale values
+        :param respfile: associated response file name(s)
+        :param ancrfile: associated ancillary file name(s)
+        :param back_file: associated background file name(s)
+        :param stat_err: (n_spectra x n_channels) array of statistical errors (required if not Poisson)
+        :param sys_err: systematic errors (default: zero)
+        :return: None
+        """
+
+        rate = np.atleast_2d(rate)
+
+        n_new = rate.shape[0]
+
+        assert rate.shape[1] == self._n_channels, 'The rates must have %i channels' % self._n_channels
+
+        assert self.n_written + n_new <= self._n_spectra, 'Trying to write more than %i spectra' % self._n_spectra
+
+        assert (stat_err is None) == self._is_poisson, 'STAT_ERR must be given if and only if the rates are not Poisson'
+
+        if channel is None:
+
+            channel = np.arange(1, self._n_channels + 1)
+
+        if quality is None:
+
+            quality = 0
+
+        if grouping is None:
+
+            grouping = 1
+
+        if sys_err is None:
+
+            sys_err = 0.
+
+        columns = [('TSTART', tstart), ('TELAPSE', telapse), ('CHANNEL', channel), ('RATE', rate),
+                   ('QUALITY', quality), ('BACKSCAL', backscale), ('GROUPING', grouping), ('EXPOSURE', exposure),
+                   ('RESPFILE', respfile), ('ANCRFILE', ancrfile), ('BACKFILE', back_file), ('SYS_ERR', sys_err)]
+
+        if stat_err is not None:
+
+            columns.append(('STAT_ERR', stat_err))
+
+        # broadcast everything to the rows of the block
+
+        columns = [(name, np.broadcast_to(value, (n_new,) + self._buffer.dtype[name].shape)
+                    if np.ndim(value) <= len(self._buffer.dtype[name].shape) else np.asarray(value))
+                   for name, value in columns]
+
+        first = 0
+
+        while first < n_new:
+
+            n_rows = min(n_new - first, self._buffer.shape[0] - self._n_buffered)
+
+            rows = slice(self._n_buffered, self._n_buffered + n_rows)
+
+            for name, value in columns:
+
+                self._buffer[name][rows] = value[first:first + n_rows]
+
+            self._buffer['SPEC_NUM'][rows] = np.arange(self.n_written, self.n_written + n_rows) + 1
+
+            self._n_buffered += n_rows
+
+            first += n_rows
+
+            if self._n_buffered == self._buffer.shape[0]:
+
+                self._flush()
+
+    def _flush(self):
+
+        if self._n_buffered > 0:
+
+            self._stream.write(self._buffer[:self._n_buffered].view(np.uint8))
+
+            self._n_written += self._n_buffered
+
+            self._n_buffered = 0
+
+    def _close_stream(self):
+
+        self._stream.close()
+
+    def close(self):
+        """
+        Write the remaining spectra and close the file
+
+        :return: None
+        """
+
+        self._flush()
+
+        self._close_stream()
+
+        if self._n_written != self._n_spectra:
+
+            raise RuntimeError("Only %i of the %i spectra have been written. The file is incomplete" %
+                               (self._n_written, self._n_spectra))
+
+
+def write_time_series_pha(time_series, file_name, start_times, stop_times, responses=None, overwrite=False,
+                          force_rsp_write=False, extract_measured_background=False, chunk_size=512):
+    """
+    Write the spectra of a time series over a set of intervals to a PHAII file, without building a plugin for each
+    interval. If the background of the time series has been fit, the background spectra are written to a second
+    PHAII file (<file_name>_bak.pha). The counts of each chunk of intervals are computed at once and streamed to the
+    files, and a response shared by several intervals is written only once to the RSP file.
+
+    :param time_series: the time series
+    :param file_name: the file name of the output files (excluding .pha)
+    :param start_times: start times of the intervals
+    :param stop_times: stop times of the intervals
+    :param responses: None, the response of all the intervals or a list with the response of each interval
+    :param overwrite: if the fits files should be overwritten
+    :param force_rsp_write: force the writing of the responses which have a file already
+    :param extract_measured_background: Use the selected background rather than a polynomial fit to the background
+    :param chunk_size: the number of intervals processed (and written) at once
+    :return: None
+    """
+
+    # Remove the .pha extension if any
+    if os.path.splitext(file_name)[-1].lower() == '.pha':
+
+        file_name = os.path.splitext(file_name)[0]
+
+    start_times = np.atleast_1d(np.asarray(start_times, dtype=float))
+    stop_times = np.atleast_1d(np.asarray(stop_times, dtype=float))
+
+    n_spectra = start_times.shape[0]
+
+    assert n_spectra > 0, 'There must be at least one interval'
+
+    if not isinstance(responses, (list, tuple)):
+
+        responses = [responses] * n_spectra
+
+    assert len(responses) == n_spectra, 'There must be one response for each interval'
+
+    # the names of the response files, and the responses which need to be written
+
+    out_rsp = []
+    rsp_numbers = {}
+
+    respfile = []
+
+    for response in responses:
+
+        if response is None:
+
+            respfile.append('NONE')
+
+        elif response.rsp_filename is not None and not force_rsp_write:
+
+            respfile.append(response.rsp_filename)
+
+        else:
+
+            respfile.append("%s.rsp{%d}" % (file_name, _register_response(response, out_rsp, rsp_numbers)))
+
+    respfile = np.array(respfile)
+
+    write_background = time_series.poly_fit_exists
+
+    back_file = np.array(['NONE'] * n_spectra)
+
+    if write_background:
+
+        back_file = np.array(['%s_bak.pha{%d}' % (file_name, i + 1) for i in range(n_spectra)])
+
+    file_name_length = max(len(max(respfile, key=len)), len(max(back_file, key=len)), 4)
+
+    pha_writer = None
+    bak_writer = None
+
+    try:
+
+        for first in range(0, n_spectra, chunk_size):
+
+            chunk = slice(first, first + chunk_size)
+
+            information = time_series.get_information_over_intervals(start_times[chunk], stop_times[chunk])
+
+            if pha_writer is None:
+
+                instrument = information['instrument']
+                telescope = information['telescope']
+
+                pha_writer = PHAIIWriter('%s.pha' % file_name, n_spectra, time_series.n_channels, instrument,
+                                         telescope, is_poisson=True, file_name_length=file_name_length,
+                                         chunk_size=chunk_size, overwrite=overwrite)
+
+                if write_background:
+
+                    bak_writer = PHAIIWriter('%s_bak.pha' % file_name, n_spectra, time_series.n_channels,
+                                             instrument, telescope, is_poisson=extract_measured_background,
+                                             file_name_length=file_name_length, chunk_size=chunk_size,
+                                             overwrite=overwrite)
+
+            quality = information['quality'].to_ogip()
+
+            pha_writer.write(tstart=start_times[chunk],
+                             telapse=stop_times[chunk] - start_times[chunk],
+                             rate=information['rates'],
+                             exposure=information['exposure'],
+                             channel=information['channel'],
+                             quality=quality,
+                             grouping=information['grouping'],
+                             respfile=respfile[chunk],
+                             back_file=back_file[chunk])
+
+            if bak_writer is not None:
+
+                background_information = time_series.get_information_over_intervals(
+                    start_times[chunk], stop_times[chunk],
+                    use_poly=not extract_measured_background,
+                    extract=extract_measured_background)
+
+                bak_writer.write(tstart=start_times[chunk],
+                                 telapse=stop_times[chunk] - start_times[chunk],
+                                 rate=background_information['rates'],
+                                 exposure=background_information['exposure'],
+                                 channel=information['channel'],
+                                 quality=quality,
+                                 grouping=information['grouping'],
+                                 respfile=respfile[chunk],
+                                 stat_err=background_information['rate error'])
+
+    except:
+
+        # close the files without complaining about the missing spectra, and report the original error
+
+        for writer in (pha_writer, bak_writer):
+
+            if writer is not None:
+
+                writer._close_stream()
+
+        raise
+
+    pha_writer.close()
+
+    if bak_writer is not None:
+
+        bak_writer.close()
+
+    if out_rsp:
+
+        _write_rsp_file("%s.rsp" % file_name, out_rsp, telescope, instrument)
@@ -4,7 +4,8 @@ import warnings
 import matplotlib.cm as cm
 from matplotlib.colors import SymLogNorm
 import matplotlib.pyplot as plt
-from operator import itemgetter, attrgetter
+from operator import itemgetter
+import collections
 import copy
 
 import astropy.units as u
@@ -12,6 +13,7 @@ import astropy.units as u
 from threeML.io.file_utils import file_existing_and_readable, sanitize_filename
 from threeML.io.fits_file import FITSExtension, FITSFile
 from threeML.utils.time_interval import TimeInterval, TimeIntervalSet
+from threeML.utils.OGIP.response_registry import response_registry
 from threeML.exceptions.custom_exceptions import custom_warnings
 
 class NoCoverageIntervals(RuntimeError):
@@ -52,16 +54,19 @@ class InstrumentResponse(object):
         :type coverage_interval: TimeInterval
         """
 
-        # we simply store all the variables to the class
+        # we simply store all the variables to the class. The arrays are shared (read-only) with all the other
+        # responses with the same content
 
-        self._matrix = np.array(matrix, float)
+        matrix = np.asarray(matrix, float)
 
         # Make sure there are no nans or inf
-        assert np.all(np.isfinite(self._matrix)), "Infinity or nan in matrix"
+        assert np.all(np.isfinite(matrix)), "Infinity or nan in matrix"
 
-        self._ebounds = np.array(ebounds, float)
+        self._matrix = response_registry.intern(matrix)
 
-        self._mc_energies = np.array(monte_carlo_energies)
+        self._ebounds = response_registry.intern(ebounds)
+
+        self._mc_energies = response_registry.intern(monte_carlo_energies)
 
         self._integral_function = None
 
@@ -144,14 +149,27 @@ class InstrumentResponse(object):
 
     def replace_matrix(self, new_matrix):
         """
-        Replace the read matrix with a new one of the same shape
+        Replace the read matrix with a new one of the same shape. Only this response is affected, even if its matrix
+        was shared with other responses.
 
         :return: none
         """
 
         assert new_matrix.shape == self._matrix.shape
 
-        self._matrix = new_matrix
+        self._matrix = response_registry.intern(new_matrix)
+
+    def __setstate__(self, state):
+
+        # after unpickling (for example in a parallel worker) share the arrays again with the other responses
+
+        self.__dict__.update(state)
+
+        for name in ['_matrix', '_ebounds', '_mc_energies']:
+
+            if name in state:
+
+                setattr(self, name, response_registry.intern(state[name]))
 
     @property
     def ebounds(self):
@@ -188,6 +206,18 @@ class InstrumentResponse(object):
         true_fluxes = self._integral_function(self._mc_energies[:-1],
                                               self._mc_energies[1:])
 
+        return self.fold(true_fluxes)
+
+    def fold(self, true_fluxes):
+        """
+        Fold fluxes integrated over the monte carlo energy bins through the matrix. true_fluxes can also be a 2-d
+        array (n_spectra, n_mc_energies), in which case all the spectra are folded at once and a
+        (n_spectra, n_channels) array is returned
+
+        :param true_fluxes: the integrated fluxes in the monte carlo energy bins
+        :return: the folded counts
+        """
+
         # Sometimes some channels have 0 lenths, or maybe they start at 0, where
         # many functions (like a power law) are not defined. In the response these
         # channels have usually a 0, but unfortunately for a computer
@@ -604,6 +634,8 @@ class InstrumentResponseSet(object):
         :type matrix_list : list[InstrumentResponse]
         :param exposure_getter : a function returning the exposure between t1 and t2
         :param counts_getter : a function returning the number of counts between t1 and t2
+        NOTE: the getters are called with arrays of t1 and t2, and must return an array with the value for each
+        (t1, t2) pair (for example the exposure_over_intervals and counts_over_intervals methods of a time series)
         :param reference_time : a reference time to be added to the specifications of the intervals used in the
         weight_by_* methods. Use this if you want to express the time intervals in time units from the reference_time,
         instead of "absolute" time. For GRBs, this is the trigger time. NOTE: if you use a reference time, the
@@ -675,6 +707,28 @@ class InstrumentResponseSet(object):
 
         self._reference_time = float(reference_time)
 
+        assert len(set(map(lambda x: x.matrix.shape, self._matrix_list))) == 1, \
+            "All the matrices in the set must have the same shape"
+
+        # the stack of the matrices (see _get_matrix_stack)
+
+        self._matrix_stack = None
+        self._stacked_matrices = None
+
+        # the (sorted) bounds of the coverage intervals, used to compute the weights
+        # of many intervals at once
+
+        self._coverage_starts = np.array(self._coverage_intervals.start_times, dtype=float)
+        self._coverage_stops = np.array(self._coverage_intervals.stop_times, dtype=float)
+
+        # cache of the weighted matrices, keyed by weighting and intervals
+
+        self._weighted_matrices_cache = collections.OrderedDict()
+
+    # maximum number of weighted matrices kept in the cache
+
+    _max_cached_matrices = 256
+
     @property
     def reference_time(self):
 
@@ -771,45 +825,147 @@ class InstrumentResponseSet(object):
 
         return self._get_weighted_matrix("counts", *intervals)
 
+    def weight_by_exposure_over_intervals(self, starts, stops):
+        """
+        Get one response weighted by exposure for each of the given intervals. The weights of all the
+        intervals are computed at once.
+
+        :param starts: start times of the intervals
+        :param stops: stop times of the intervals
+        :return: list of InstrumentResponse
+        """
+
+        return self._get_weighted_matrices("exposure", starts, stops)
+
+    def weight_by_counts_over_intervals(self, starts, stops):
+        """
+        Get one response weighted by counts for each of the given intervals. The weights of all the
+        intervals are computed at once.
+
+        :param starts: start times of the intervals
+        :param stops: stop times of the intervals
+        :return: list of InstrumentResponse
+        """
+
+        return self._get_weighted_matrices("counts", starts, stops)
+
     def _get_weighted_matrix(self, switch, *intervals):
 
         assert len(intervals) > 0, "You have to provide at least one interval"
 
         intervals_set = TimeIntervalSet.from_strings(*intervals)
 
-        # Compute a set of weights for each interval
-        weights = np.zeros(len(self._matrix_list))
+        starts = np.array(intervals_set.start_times, dtype=float)
+        stops = np.array(intervals_set.stop_times, dtype=float)
+
+        key = (switch,) + tuple(zip(starts, stops))
+
+        matrix_stack = self._get_matrix_stack()
+
+        if key not in self._weighted_matrices_cache:
+
+            # Compute a set of weights for each interval and add them up
 
-        for interval in intervals_set:
+            weights = self._weight_response(starts, stops, switch).sum(axis=0)
 
-            weights += self._weight_response(interval, switch)
+            # Normalize to 1
+            weights /= np.sum(weights)
 
-        # Normalize to 1
-        weights /= np.sum(weights)
+            # Weight matrices
 
-        # Weight matrices
-        matrix = np.dot(np.array(map(attrgetter("matrix"), self._matrix_list)).T, weights.T).T
+            self._cache_weighted_matrix(key, np.tensordot(weights, matrix_stack, axes=1))
 
         # Now generate the instance of the response
 
+        return self._build_response(self._weighted_matrices_cache[key])
+
+    def _get_weighted_matrices(self, switch, starts, stops):
+
+        starts = np.atleast_1d(np.asarray(starts, dtype=float))
+        stops = np.atleast_1d(np.asarray(stops, dtype=float))
+
+        keys = [(switch, (start, stop)) for start, stop in zip(starts, stops)]
+
+        matrix_stack = self._get_matrix_stack()
+
+        missing = np.array([key not in self._weighted_matrices_cache for key in keys], dtype=bool)
+
+        if np.any(missing):
+
+            weights = self._weight_response(starts[missing], stops[missing], switch)
+
+            # Normalize each interval to 1
+            weights /= np.sum(weights, axis=1)[:, np.newaxis]
+
+            # Weight the matrices of all the intervals at once
+
+            matrices = np.tensordot(weights, matrix_stack, axes=1)
+
+            missing_keys = [key for key, is_missing in zip(keys, missing) if is_missing]
+
+            for key, matrix in zip(missing_keys, matrices):
+
+                self._cache_weighted_matrix(key, matrix)
+
+        return [self._build_response(self._weighted_matrices_cache[key]) for key in keys]
+
+    def _get_matrix_stack(self):
+        """
+        The matrices of the responses as one contiguous (n_matrices, n_channels, n_mc_energies) array, so that
+        weighting them is a single tensordot. The stack is a private copy (the responses are not modified), which is
+        built again if the matrix of one of the responses has been replaced since (see
+        InstrumentResponse.replace_matrix). In that case the cached weighted matrices are dropped as well.
+
+        :return: the stack of the matrices
+        """
+
+        matrices = [response.matrix for response in self._matrix_list]
+
+        if self._stacked_matrices is None or any(matrix is not stacked_matrix
+                                                 for matrix, stacked_matrix in zip(matrices, self._stacked_matrices)):
+
+            self._matrix_stack = np.array(matrices)
+
+            # like the matrices of the responses, the stack is read-only
+
+            self._matrix_stack.flags.writeable = False
+
+            self._stacked_matrices = matrices
+
+            self._weighted_matrices_cache.clear()
+
+        return self._matrix_stack
+
+    def _cache_weighted_matrix(self, key, matrix):
+
+        self._weighted_matrices_cache[key] = matrix
+
+        # drop the oldest entries if the cache is too large
+
+        while len(self._weighted_matrices_cache) > self._max_cached_matrices:
+
+            self._weighted_matrices_cache.popitem(last=False)
+
+    def _build_response(self, matrix):
+
         # get EBOUNDS from the first matrix
         ebounds = self._matrix_list[0].ebounds
 
         # Get mc channels from the first matrix
         mc_channels = self._matrix_list[0].monte_carlo_energies
 
-        matrix_instance = InstrumentResponse(matrix, ebounds, mc_channels)
+        # the constructor interns a copy of the matrix, so the cached one is never modified
 
-        return matrix_instance
+        return InstrumentResponse(matrix, ebounds, mc_channels)
 
-    def _weight_response(self, interval_of_interest, switch):
+    def _weight_response(self, interval_starts, interval_stops, switch):
 
         """
 
-        :param interval_start : start time of the interval
-        :param interval_stop : stop time of the interval
+        :param interval_starts : start times of the intervals of interest
+        :param interval_stops : stop times of the intervals of interest
         :param switch: either 'counts' or 'exposure'
-
+        :return: (n_intervals x n_matrices) array of weights
         """
 
         #######################
@@ -817,85 +973,90 @@ class InstrumentResponseSet(object):
         # more than one interval
         #######################
 
-        # Now mark all responses which overlap with the interval of interest
-        # NOTE: this is a mask of the same length as _matrix_list and _coverage_intervals
+        starts = interval_starts[:, np.newaxis]
+        stops = interval_stops[:, np.newaxis]
 
-        matrices_mask = map(lambda c_i: c_i.overlaps_with(interval_of_interest), self._coverage_intervals)
+        coverage_starts = self._coverage_starts
+        coverage_stops = self._coverage_stops
 
-        # Check that we have at least one matrix
+        # Now mark all responses which overlap with the intervals of interest (with the same
+        # logic as TimeInterval.overlaps_with)
+        # NOTE: this is a (n_intervals x n_matrices) mask
 
-        if not np.any(matrices_mask):
+        matrices_mask = ((starts == coverage_starts) | (stops == coverage_stops) |
+                         ((starts > coverage_starts) & (starts < coverage_stops)) |
+                         ((stops > coverage_starts) & (stops < coverage_stops)) |
+                         ((starts < coverage_starts) & (stops > coverage_stops)))
 
-            raise NoMatrixForInterval("Could not find any matrix applicable to %s\n Have intervals:%s" % (interval_of_interest,', '.join([str(interval) for interval in self._coverage_intervals]) ))
+        # These "effective intervals" are how much of the coverage interval is really used for each matrix
 
-        # Compute the weights
+        effective_starts = np.maximum(coverage_starts, starts)
+        effective_stops = np.minimum(coverage_stops, stops)
 
-        weights = np.empty_like(self._matrix_list, float)
+        # Check that each interval has at least one matrix
 
-        # These "effective intervals" are how much of the coverage interval is really used for each matrix
-        # NOTE: the length of effective_intervals list *will not be* the same as the weight mask or the matrix_list.
-        # There are as many effective intervals as matrices with weight > 0
+        no_matrix = ~np.any(matrices_mask, axis=1)
 
-        effective_intervals = []
+        if np.any(no_matrix):
 
-        for i, matrix in enumerate(self._matrix_list):
+            i = np.flatnonzero(no_matrix)[0]
 
-            if matrices_mask[i]:
+            interval_of_interest = TimeInterval(interval_starts[i], interval_stops[i])
 
-                # A matrix of interest
-                this_coverage_interval = self._coverage_intervals[i]
+            raise NoMatrixForInterval("Could not find any matrix applicable to %s\n Have intervals:%s" % (interval_of_interest,', '.join([str(interval) for interval in self._coverage_intervals]) ))
 
-                # See how much it overlaps with the interval of interest
-                this_effective_interval = this_coverage_interval.intersect(interval_of_interest)
+        if switch == 'counts':
 
-                effective_intervals.append(this_effective_interval)
+            # Weight according to the number of events
+            getter = self._counts_getter
 
-                # Now compute the weight
+        elif switch == 'exposure':
 
-                if switch == 'counts':
+            # Weight according to the exposure
+            getter = self._exposure_getter
 
-                    # Weight according to the number of events
-                    weights[i] = self._counts_getter(this_effective_interval.start_time,
-                                                     this_effective_interval.stop_time)
+        # Compute the weights of all the overlapping (interval, matrix) pairs in one call of the getter.
+        # Uninteresting matrices have zero weight
 
-                elif switch == 'exposure':
+        weights = np.zeros(matrices_mask.shape)
 
-                    # Weight according to the exposure
-                    weights[i] = self._exposure_getter(this_effective_interval.start_time,
-                                                       this_effective_interval.stop_time)
+        weights[matrices_mask] = getter(effective_starts[matrices_mask], effective_stops[matrices_mask])
 
-            else:
+        # if all weights are zero, there is something clearly wrong with the exposure or the counts computation
+        assert np.all(np.sum(weights, axis=1) > 0), "All weights are zero. There must be a bug in the exposure or " \
+                                                    "counts computation"
 
-                # Uninteresting matrix
-                weights[i] = 0.0
+        # The first and the last matrix of each interval
 
-        # if all weights are zero, there is something clearly wrong with the exposure or the counts computation
-        assert np.sum(weights) > 0, "All weights are zero. There must be a bug in the exposure or counts computation"
+        rows = np.arange(matrices_mask.shape[0])
 
-        # Check that the first matrix with weight > 0 has an effective interval starting at the beginning of
-        # the interval of interest (otherwise it means that part of the interval of interest is not covered!)
+        first_matrix = np.argmax(matrices_mask, axis=1)
+        last_matrix = matrices_mask.shape[1] - 1 - np.argmax(matrices_mask[:, ::-1], axis=1)
 
-        if effective_intervals[0].start_time != interval_of_interest.start_time:
+        # Check that the first matrix has an effective interval starting at the beginning of the interval of
+        # interest, and the last one an effective interval ending at its end (otherwise it means that part of
+        # the interval of interest is not covered!)
 
-            raise IntervalOfInterestNotCovered('The interval of interest (%s) is not covered by %s'% (interval_of_interest,effective_intervals[0]))
+        not_covered = ((effective_starts[rows, first_matrix] != interval_starts) |
+                       (effective_stops[rows, last_matrix] != interval_stops))
 
-        # Check that the last matrix with weight > 0 has an effective interval starting at the beginning of
-        # the interval of interest (otherwise it means that part of the interval of interest is not covered!)
+        if np.any(not_covered):
 
-        if effective_intervals[-1].stop_time != interval_of_interest.stop_time:
-            raise IntervalOfInterestNotCovered(
-                'The interval of interest (%s) is not covered by %s' % (interval_of_interest, effective_intervals[0]))
+            i = np.flatnonzero(not_covered)[0]
 
+            interval_of_interest = TimeInterval(interval_starts[i], interval_stops[i])
 
-        # Lastly, check that there is no interruption in coverage (bad time intervals are *not* supported)
-        all_tstarts = np.array(map(lambda x:x.start_time, effective_intervals))
-        all_tstops = np.array(map(lambda x:x.stop_time, effective_intervals))
+            raise IntervalOfInterestNotCovered('The interval of interest (%s) is not covered by %s' % (interval_of_interest, self._coverage_intervals[first_matrix[i]]))
 
-        if not np.all((all_tstops[:-1] == all_tstarts[1:])):
+        # Lastly, check that there is no interruption in coverage (bad time intervals are *not* supported): the
+        # matrices of each interval are consecutive, and each one starts where the previous one stops
 
-            raise GapInCoverageIntervals("Gap in coverage! Bad time intervals are not supported!")
+        consecutive = matrices_mask[:, :-1] & matrices_mask[:, 1:]
 
+        if (np.any(np.sum(matrices_mask, axis=1) != last_matrix - first_matrix + 1) or
+                np.any(effective_stops[:, :-1][consecutive] != effective_starts[:, 1:][consecutive])):
 
+            raise GapInCoverageIntervals("Gap in coverage! Bad time intervals are not supported!")
 
         return weights
 
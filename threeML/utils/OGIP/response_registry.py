@@ -0,0 +1,107 @@
+import hashlib
+import weakref
+
+import numpy as np
+
+
+class ResponseRegistry(object):
+    def __init__(self):
+        """
+        A registry of the arrays (matrices, ebounds and monte carlo energies) of the responses in use in the process,
+        indexed by the hash of their content. Responses with the same content share the same array, so that many
+        plugins built from the same response (for example one per time interval, for many detectors) hold only one
+        copy of it.
+
+        The shared arrays are read-only. To change the matrix of a response, use InstrumentResponse.replace_matrix,
+        which only affects that response (copy-on-write).
+
+        The registry only holds weak references: an array is dropped as soon as no response uses it.
+        """
+
+        self._arrays = weakref.WeakValueDictionary()
+
+        # the same arrays, by id, to recognize quickly an array which is already shared
+
+        self._shared = weakref.WeakValueDictionary()
+
+        self._n_requests = 0
+        self._n_hits = 0
+
+    @staticmethod
+    def _get_key(array):
+
+        return array.dtype.str, array.shape, hashlib.sha1(np.ascontiguousarray(array).tobytes()).hexdigest()
+
+    def intern(self, array, dtype=float):
+        """
+        Get the shared, read-only array with the same content as the given one, registering it if there is none.
+        The given array is never modified (it is copied if it needs to be registered).
+
+        :param array: the array (or anything which can be converted to an array)
+        :param dtype: the type of the elements of the array
+        :return: the shared array
+        """
+
+        array = np.asarray(array, dtype)
+
+        self._n_requests += 1
+
+        if self._shared.get(id(array)) is array:
+
+            self._n_hits += 1
+
+            return array
+
+        key = self._get_key(array)
+
+        shared = self._arrays.get(key)
+
+        if shared is not None:
+
+            self._n_hits += 1
+
+            return shared
+
+        shared = np.array(array, copy=True)
+
+        shared.flags.writeable = False
+
+        self._arrays[key] = shared
+        self._shared[id(shared)] = shared
+
+        return shared
+
+    def __len__(self):
+
+        return len(self._arrays)
+
+    @property
+    def n_requests(self):
+        """
+        :return: the number of arrays which have been interned
+        """
+
+        return self._n_requests
+
+    @property
+    def n_hits(self):
+        """
+        :return: the number of arrays which were already in the registry
+        """
+
+        return self._n_hits
+
+    def clear(self):
+        """
+        Forget all the registered arrays (the responses using them keep sharing them)
+
+        :return: none
+        """
+
+        self._arrays.clear()
+        self._shared.clear()
+
+
+# The registry used by all the responses in the process
+
+response_registry = ResponseRegistry()
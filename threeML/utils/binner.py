@@ -173,6 +173,35 @@ class Rebinner(object):
 
         return rebinned_vectors
 
+    def rebin_batch(self, array):
+        """
+        Rebin many vectors at once. The vectors are the rows of a 2-d array (n_vectors, n_elements) and the output is
+        a (n_vectors, n_bins) array. The mask is applied as in .rebin
+
+        :param array: 2-d array of vectors to rebin
+        :return: 2-d array of rebinned vectors
+        """
+
+        array = np.atleast_2d(array)
+
+        assert array.shape[1] == len(self._mask), "The vectors to rebin must have the same number of elements of the" \
+                                                  "original (not-rebinned) vector"
+
+        if self.n_bins == 0:
+
+            return np.zeros((array.shape[0], 0))
+
+        # Sum only the elements within each bin (as in .rebin), so that the elements excluded by the mask never enter
+        # the sums. The columns belonging to the bins are selected in order, then reduced at the start of each bin
+
+        in_bin_columns = np.concatenate([np.arange(low_bound, hi_bound)
+                                         for low_bound, hi_bound in zip(self._starts, self._stops)])
+
+        bin_offsets = np.cumsum([0] + [hi_bound - low_bound
+                                       for low_bound, hi_bound in zip(self._starts, self._stops)])[:-1]
+
+        return np.add.reduceat(array[:, in_bin_columns], bin_offsets, axis=1)
+
     def rebin_errors(self, *vectors):
         """
         Rebin errors by summing the squares
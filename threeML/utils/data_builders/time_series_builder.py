@@ -9,9 +9,8 @@ from threeML.exceptions.custom_exceptions import custom_warnings
 from threeML.io.file_utils import file_existing_and_readable
 from threeML.io.progress_bar import progress_bar
 from threeML.plugins.DispersionSpectrumLike import DispersionSpectrumLike
-from threeML.plugins.OGIPLike import OGIPLike
 from threeML.plugins.SpectrumLike import SpectrumLike, NegativeBackground
-from threeML.utils.OGIP.pha import PHAWrite
+from threeML.utils.OGIP.pha import write_time_series_pha
 from threeML.utils.OGIP.response import InstrumentResponse, InstrumentResponseSet, OGIPResponse
 
 from threeML.utils.spectrum.binned_spectrum import BinnedSpectrum, BinnedSpectrumWithDispersion
@@ -174,42 +173,63 @@ class TimeSeriesBuilder(object):
 
         # extract a spectrum
 
-        if self._response is None:
+        if self._rsp_is_weighted:
+            self._response = self._weighted_rsp.weight_by_counts(*self._time_series.time_intervals.to_string().split(','))
 
-            self._observed_spectrum = self._container_type.from_time_series(self._time_series, use_poly=False)
-
-        else:
-
-            if self._rsp_is_weighted:
-                self._response = self._weighted_rsp.weight_by_counts(*self._time_series.time_intervals.to_string().split(','))
-
-            self._observed_spectrum = self._container_type.from_time_series(self._time_series, self._response,
-                                                                                    use_poly=False)
+        self._observed_spectrum, background_spectrum, measured_background_spectrum = self._extract_spectra(self._time_series,
+                                                                                                           self._response)
 
         self._active_interval = intervals
 
-
         # re-get the background if there was a time selection
 
         if self._time_series.poly_fit_exists:
 
+            self._background_spectrum = background_spectrum
 
-            self._background_spectrum = self._container_type.from_time_series(self._time_series,
-                                                                              response=self._response,
-                                                                              use_poly=True,
-                                                                              extract=False
-            )
-
-            self._measured_background_spectrum = self._container_type.from_time_series(self._time_series,
-                                                                                       response=self._response,
-                                                                                       use_poly=False,
-                                                                                       extract=True,
-            )
+            self._measured_background_spectrum = measured_background_spectrum
 
         self._tstart = self._time_series.time_intervals.absolute_start_time
         self._tstop = self._time_series.time_intervals.absolute_stop_time
 
 
+    def _extract_spectra(self, time_series, response):
+        """
+        build the observed, background and measured background spectra from a time series
+        with an active selection (or a TimeSeriesSlice)
+
+        :param time_series: a TimeSeries with an active selection or a TimeSeriesSlice
+        :param response: the response for the selection (or None)
+        :return: (observed spectrum, background spectrum, measured background spectrum)
+        """
+
+        if response is None:
+
+            observed_spectrum = self._container_type.from_time_series(time_series, use_poly=False)
+
+        else:
+
+            observed_spectrum = self._container_type.from_time_series(time_series, response, use_poly=False)
+
+        background_spectrum = None
+        measured_background_spectrum = None
+
+        if self._time_series.poly_fit_exists:
+
+            background_spectrum = self._container_type.from_time_series(time_series,
+                                                                        response=response,
+                                                                        use_poly=True,
+                                                                        extract=False
+                                                                        )
+
+            measured_background_spectrum = self._container_type.from_time_series(time_series,
+                                                                                 response=response,
+                                                                                 use_poly=False,
+                                                                                 extract=True,
+                                                                                 )
+
+        return observed_spectrum, background_spectrum, measured_background_spectrum
+
     def set_background_interval(self, *intervals, **options):
         """
         Set the time interval to fit the background.
@@ -285,20 +305,35 @@ class TimeSeriesBuilder(object):
         :return: None
         """
 
-        # we simply create a bunch of dispersion plugins and convert them to OGIP
+        assert self._time_series.bins is not None, 'This time series does not have any bins!'
 
+        these_bins = self._time_series.bins  # type: TimeIntervalSet
 
+        if start is not None:
+            assert stop is not None, 'must specify a start AND a stop time'
 
-        ogip_list = [OGIPLike.from_general_dispersion_spectrum(sl) for sl in self.to_spectrumlike(from_bins=True,
-                                                                                                  start=start,
-                                                                                                  stop=stop,
-                                                                                                  extract_measured_background=extract_measured_background)]
+        if stop is not None:
+            assert start is not None, 'must specify a start AND a stop time'
 
-        # write out the PHAII file
+            these_bins = these_bins.containing_interval(start, stop, inner=False)
 
-        pha_writer = PHAWrite(*ogip_list)
+        # the spectra are written directly from the counts of the time series, in chunks of bins,
+        # without building a plugin for each bin
 
-        pha_writer.write(file_name, overwrite=overwrite, force_rsp_write=force_rsp_write)
+        if self._rsp_is_weighted:
+
+            responses = self._weighted_rsp.weight_by_counts_over_intervals(these_bins.start_times,
+                                                                           these_bins.stop_times)
+
+        else:
+
+            responses = self._response
+
+        write_time_series_pha(self._time_series, file_name, these_bins.start_times, these_bins.stop_times,
+                              responses=responses,
+                              overwrite=overwrite,
+                              force_rsp_write=force_rsp_write,
+                              extract_measured_background=extract_measured_background)
 
     def get_background_parameters(self):
         """
@@ -613,14 +648,6 @@ class TimeSeriesBuilder(object):
 
             assert self._time_series.bins is not None, 'This time series does not have any bins!'
 
-            # save the original interval if there is one
-            old_interval = copy.copy(self._active_interval)
-            old_verbose = copy.copy(self._verbose)
-
-            # we will keep it quiet to keep from being annoying
-
-            self._verbose = False
-
             list_of_speclikes = []
 
             # get the bins from the time series
@@ -638,51 +665,68 @@ class TimeSeriesBuilder(object):
 
                 these_bins = these_bins.containing_interval(start, stop, inner=False)
 
+            # extract the counts, exposure and background of all the intervals in one pass.
+            # This does not touch the active selection of the time series
+
+            time_slices = self._time_series.get_interval_slices(these_bins.start_times, these_bins.stop_times)
+
+            # unless the response is weighted in time, all the plugins share the same response.
+            # Otherwise, weight the responses of all the intervals at once
+
+            if self._rsp_is_weighted:
+
+                responses = self._weighted_rsp.weight_by_counts_over_intervals(these_bins.start_times,
+                                                                               these_bins.stop_times)
+
+            else:
 
+                responses = [self._response] * len(these_bins)
 
            # loop through the intervals and create spec likes
 
             with progress_bar(len(these_bins), title='Creating plugins') as p:
 
-                for i, interval in enumerate(these_bins):
-
+                for i, (interval, time_slice, response) in enumerate(zip(these_bins, time_slices, responses)):
 
-                    self.set_active_time_interval(interval.to_string())
+                    observed_spectrum, background_spectrum, measured_background_spectrum = \
+                        self._extract_spectra(time_slice, response)
 
-                    assert isinstance(self._observed_spectrum, BinnedSpectrum), 'You are attempting to create a SpectrumLike plugin from the wrong data type'
+                    assert isinstance(observed_spectrum, BinnedSpectrum), 'You are attempting to create a SpectrumLike plugin from the wrong data type'
 
                     if extract_measured_background:
 
-                        this_background_spectrum = self._measured_background_spectrum
+                        this_background_spectrum = measured_background_spectrum
 
                     else:
 
-                        this_background_spectrum = self._background_spectrum
+                        this_background_spectrum = background_spectrum
 
 
                     if this_background_spectrum is None:
                         custom_warnings.warn(
                             'No bakckground selection has been made. This plugin will contain no background!')
 
+                    # we will keep it quiet to keep from being annoying
+
                     try:
 
-                        if self._response is None:
+                        if response is None:
 
                             sl = SpectrumLike(name="%s%s%d" % (self._name, interval_name, i),
-                                              observation=self._observed_spectrum,
+                                              observation=observed_spectrum,
                                               background=this_background_spectrum,
-                                              verbose=self._verbose,
-                                              tstart=self._tstart,
-                                              tstop=self._tstop)
+                                              verbose=False,
+                                              tstart=interval.start_time,
+                                              tstop=interval.stop_time)
 
                         else:
 
                             sl = DispersionSpectrumLike(name="%s%s%d" % (self._name, interval_name, i),
-                                                        observation=self._observed_spectrum,
+                                                        observation=observed_spectrum,
                                                         background=this_background_spectrum,
-                                                        verbose=self._verbose,
-                                                        tstart=self._tstart,
-                                                        tstop=self._tstop)
+                                                        verbose=False,
+                                                        tstart=interval.start_time,
+                                                        tstop=interval.stop_time)
 
                         list_of_speclikes.append(sl)
 
@@ -692,18 +736,6 @@ class TimeSeriesBuilder(object):
 
                     p.increase()
 
-            # restore the old interval
-
-            if old_interval is not None:
-
-               self.set_active_time_interval(*old_interval)
-
-            else:
-
-               self._active_interval = None
-
-            self._verbose = old_verbose
-
             return list_of_speclikes
 
     @classmethod
@@ -792,8 +824,8 @@ class TimeSeriesBuilder(object):
             if test is not None:
 
                 rsp = InstrumentResponseSet.from_rsp2_file(rsp2_file=rsp_file,
-                                                           counts_getter=event_list.counts_over_interval,
-                                                           exposure_getter=event_list.exposure_over_interval,
+                                                           counts_getter=event_list.counts_over_intervals,
+                                                           exposure_getter=event_list.exposure_over_intervals,
                                                            reference_time=gbm_tte_file.trigger_time)
 
 
@@ -896,8 +928,8 @@ class TimeSeriesBuilder(object):
             if test is not None:
 
                 rsp = InstrumentResponseSet.from_rsp2_file(rsp2_file=rsp_file,
-                                                           counts_getter=event_list.counts_over_interval,
-                                                           exposure_getter=event_list.exposure_over_interval,
+                                                           counts_getter=event_list.counts_over_intervals,
+                                                           exposure_getter=event_list.exposure_over_intervals,
                                                            reference_time=cdata.trigger_time)
 
 
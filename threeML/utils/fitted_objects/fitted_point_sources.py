@@ -2,10 +2,11 @@ __author__ = 'grburgess'
 
 from astropy import units as u
 import numpy as np
-import scipy.integrate as integrate
 import collections
 
 
+from threeML.exceptions.custom_exceptions import custom_warnings
+from threeML.random_variates import RandomVariates
 from threeML.utils.fitted_objects.fitted_source_handler import GenericFittedSourceHandler
 
 
@@ -17,6 +18,143 @@ class InvalidUnitError(RuntimeError):
     pass
 
 
+def _log_gauss_legendre_grid(e1, e2, n_intervals, n_points):
+    """
+    nodes and weights to integrate a function of the energy between e1 and e2: the interval is divided in n_intervals
+    of equal width in log(energy), each one integrated with a Gauss-Legendre rule of n_points in log(energy)
+
+    :param e1: lower bound of the integral
+    :param e2: upper bound of the integral
+    :param n_intervals: number of sub-intervals
+    :param n_points: number of nodes in each sub-interval
+    :return: (energies, weights) such that the integral of f is (weights * f(energies)).sum()
+    """
+
+    nodes, weights = np.polynomial.legendre.leggauss(n_points)
+
+    log_bounds = np.linspace(np.log(e1), np.log(e2), n_intervals + 1)
+
+    half_widths = 0.5 * np.diff(log_bounds)
+    centers = 0.5 * (log_bounds[:-1] + log_bounds[1:])
+
+    log_energies = (centers[:, np.newaxis] + half_widths[:, np.newaxis] * nodes[np.newaxis, :]).flatten()
+
+    energies = np.exp(log_energies)
+
+    # dE = E dlog(E)
+
+    return energies, (half_widths[:, np.newaxis] * weights[np.newaxis, :]).flatten() * energies
+
+
+def _evaluate_for_samples(function, energies, parameters, broadcast_function=None):
+    """
+    evaluate a function of the energy for all the samples of its parameters
+
+    :param function: function(energies, **parameters) for one set of parameters
+    :param energies: the energies
+    :param parameters: dictionary of parameter name -> array of samples (or a fixed value)
+    :param broadcast_function: (optional) a function which can be called with the energies as a (1 x n_energies)
+    array and the parameters as (n_samples x 1) arrays, to evaluate all samples at once
+    :return: (n_samples x n_energies) array
+    """
+
+    n_samples = max([np.size(value) for value in parameters.values()] + [1])
+
+    def sample(i):
+
+        return dict((name, value if np.ndim(value) == 0 else value[i]) for name, value in parameters.items())
+
+    if broadcast_function is not None:
+
+        columns = dict((name, value if np.ndim(value) == 0 else np.asarray(value)[:, np.newaxis])
+                       for name, value in parameters.items())
+
+        try:
+
+            with np.errstate(all='ignore'):
+
+                values = np.asarray(broadcast_function(energies[np.newaxis, :], **columns), dtype=float)
+
+        except Exception:
+
+            values = None
+
+        # use the broadcasted values only if they have the right shape and agree with the
+        # function evaluated one sample at a time (check the first and last samples)
+
+        if values is not None and values.shape == (n_samples, energies.shape[0]):
+
+            first = np.asarray(function(energies, **sample(0)), dtype=float)
+            last = np.asarray(function(energies, **sample(n_samples - 1)), dtype=float)
+
+            if np.allclose(values[0], first, equal_nan=True) and np.allclose(values[-1], last, equal_nan=True):
+
+                return values
+
+    return np.array([function(energies, **sample(i)) for i in range(n_samples)], dtype=float).reshape(n_samples, -1)
+
+
+def integrate_fluxes(function, parameters, e1, e2, broadcast_function=None, rtol=1E-6, n_points=8,
+                     max_intervals=256):
+    """
+    Integrate a differential photon flux between e1 and e2 for all the samples of its parameters, computing in a single
+    pass the photon flux, the energy flux and the nuFnu flux (the integrals of f, E f and E^2 f).
+
+    The integrals use a shared Gauss-Legendre grid in log(energy), so that the function is evaluated once per grid
+    for all the samples. The number of sub-intervals of the grid is doubled until the three integrals change by less
+    than rtol for all the samples.
+
+    :param function: function(energies, **parameters) returning the differential photon flux for one set of parameters
+    :param parameters: dictionary of parameter name -> array of samples (or a fixed value)
+    :param e1: lower bound of the integral
+    :param e2: upper bound of the integral
+    :param broadcast_function: (optional) a version of function which evaluates all the samples at once
+    (see _evaluate_for_samples)
+    :param rtol: relative accuracy of the integrals
+    :param n_points: number of Gauss-Legendre nodes in each sub-interval
+    :param max_intervals: maximum number of sub-intervals (a warning is issued if the integrals have not reached
+    the accuracy with this number of sub-intervals)
+    :return: dictionary with photon_flux, energy_flux and nufnu_flux arrays (one value per sample)
+    """
+
+    assert 0 < e1 <= e2, 'The integration bounds must be positive and in increasing order'
+
+    def integrals(n_intervals):
+
+        energies, weights = _log_gauss_legendre_grid(e1, e2, n_intervals, n_points)
+
+        values = _evaluate_for_samples(function, energies, parameters, broadcast_function) * weights
+
+        return np.array([values.dot(np.ones_like(energies)), values.dot(energies), values.dot(energies ** 2)])
+
+    n_intervals = 4
+
+    current = integrals(n_intervals)
+
+    converged = False
+
+    while n_intervals < max_intervals:
+
+        n_intervals *= 2
+
+        previous, current = current, integrals(n_intervals)
+
+        scale = np.maximum(np.abs(current), np.finfo(float).tiny)
+
+        if np.all(np.abs(current - previous) <= rtol * scale):
+
+            converged = True
+
+            break
+
+    if not converged:
+
+        custom_warnings.warn("The integrals of the flux between %g and %g did not reach a relative accuracy of %g "
+                             "with %i sub-intervals" % (e1, e2, rtol, n_intervals))
+
+    return dict(photon_flux=current[0], energy_flux=current[1], nufnu_flux=current[2])
+
+
 class FluxConversion(object):
 
     def __init__(self, flux_unit, energy_unit, flux_model):
@@ -89,6 +227,16 @@ class FluxConversion(object):
 
         return self._is_dimensionless
 
+    @property
+    def flux_type(self):
+        """
+        the type of flux (photon_flux, energy_flux or nufnu_flux)
+
+        :return:
+        """
+
+        return self._flux_type
+
     @property
     def model(self):
         """
@@ -170,18 +318,14 @@ class IntegralFluxConversion(FluxConversion):
                                      "nufnu_flux": lambda x: x ** 3 * test_model(x)}
 
 
-         def photon_integrand(x,param_specification):
-             return flux_model(x, **param_specification)
-
-         def energy_integrand(x,param_specification):
-             return x * flux_model(x, **param_specification)
+         def integral_builder(flux_type):
 
-         def nufnu_integrand(x, param_specification):
-             return x * x * flux_model(x, **param_specification)
+             return lambda e1, e2, **param_specification: integrate_fluxes(flux_model, param_specification,
+                                                                           e1, e2)[flux_type][0]
 
-         self._model_builder = {"photon_flux": lambda e1, e2, **param_specification: integrate.quad(photon_integrand, e1, e2,args=(param_specification))[0],
-                               "energy_flux": lambda e1, e2, **param_specification: integrate.quad(energy_integrand, e1, e2,args=(param_specification))[0],
-                               "nufnu_flux": lambda e1, e2, **param_specification: integrate.quad(nufnu_integrand, e1, e2,args=(param_specification))[0]}
+         self._model_builder = {"photon_flux": integral_builder("photon_flux"),
+                               "energy_flux": integral_builder("energy_flux"),
+                               "nufnu_flux": integral_builder("nufnu_flux")}
 
 
          super(IntegralFluxConversion, self).__init__(flux_unit,
@@ -281,8 +425,9 @@ class FittedPointSourceSpectralHandler(GenericFittedSourceHandler):
 
             self._conversion = converter.conversion_factor
 
+            # the differential flux is evaluated sample by sample (see _build_propagated_function)
 
-
+            self._integral_flux_type = None
 
             super(FittedPointSourceSpectralHandler, self).__init__(analysis_result,
                                                                    flux_function,
@@ -300,6 +445,12 @@ class FittedPointSourceSpectralHandler(GenericFittedSourceHandler):
 
             self._conversion = converter.conversion_factor
 
+            # the integrals are computed for all the samples at once (see _build_propagated_function)
+
+            self._integral_flux_type = converter.flux_type
+            self._flux_model = model
+            self._broadcast_flux_model = test_model.evaluate
+
 
             # we treat the energy range as the range we want to integrate over
 
@@ -327,6 +478,31 @@ class FittedPointSourceSpectralHandler(GenericFittedSourceHandler):
 
         return self._is_dimensionless
 
+    def _build_propagated_function(self):
+        """
+        for the integral fluxes, instead of integrating the model once per sample, all the samples are integrated
+        together with integrate_fluxes
+
+        :return:
+        """
+
+        if self._integral_flux_type is None:
+
+            super(FittedPointSourceSpectralHandler, self)._build_propagated_function()
+
+            return
+
+        arguments = self._get_propagation_arguments()
+
+        def propagated_function(e1, e2):
+
+            fluxes = integrate_fluxes(self._flux_model, arguments, e1, e2,
+                                      broadcast_function=self._broadcast_flux_model)
+
+            return RandomVariates(fluxes[self._integral_flux_type])
+
+        self._propagated_function = propagated_function
+
     @property
     def components(self):
         """
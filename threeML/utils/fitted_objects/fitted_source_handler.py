@@ -92,11 +92,11 @@ class GenericFittedSourceHandler(object):
         pass
 
 
-    def _build_propagated_function(self):
+    def _get_propagation_arguments(self):
         """
-        builds a propagated function using RandomVariates propagation
+        the samples of the free parameters and the values of the fixed ones
 
-        :return:
+        :return: dictionary of parameter name -> samples or value
         """
 
         arguments = {}
@@ -122,6 +122,17 @@ class GenericFittedSourceHandler(object):
 
                 arguments[name] = par.value
 
+        return arguments
+
+    def _build_propagated_function(self):
+        """
+        builds a propagated function using RandomVariates propagation
+
+        :return:
+        """
+
+        arguments = self._get_propagation_arguments()
+
         # create the propagtor
 
         self._propagated_function = self._analysis_results.propagate(self._function, **arguments)
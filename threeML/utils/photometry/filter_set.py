@@ -63,6 +63,10 @@ class FilterSet(object):
         # haven't set a likelihood model yet
         self._model_set = False
 
+        # the photometry engine is built when the model is set
+
+        self._weights = None
+
         # calculate the FWHM
 
         self._calculate_fwhm()
@@ -115,61 +119,98 @@ class FilterSet(object):
         self._wavebounds = IntervalSet.from_starts_and_stops(wmin,wmax)
 
 
-    def set_model(self, differential_flux):
+    def _build_photometry_engine(self):
         """
-        set the model of that will be used during the convolution. Not that speclite
-        considers a differential flux to be in units of erg/s/cm2/lambda so we must convert
-        astromodels into the proper units (using astropy units!)
+        precompute the quantities needed to evaluate all the filters at once:
+        the union of the wavelength grids of the filters, the corresponding energies
+        and a (n_filters x n_wavelengths) weight matrix.
 
+        The weights reproduce exactly the trapezoidal photon-weighted convolution that speclite
+        performs on the grid of each filter, with the conversion from a differential
+        photon flux (1/(keV cm2 s)) to a flux density per unit wavelength, the 1/(hc) photon weighting
+        and the AB zero point of each filter folded in. Hence the ratio with the AB flux
+        of each filter is a single matrix-vector product with the model evaluated on the union grid.
 
+        :return: None
         """
 
-        conversion_factor = (constants.c ** 2 * constants.h ** 2).to('keV2 * cm2')
+        # the wavelength grids of the filters are in speclite's default unit (Angstrom)
 
-        def wrapped_model(x):
-            return differential_flux(x) * conversion_factor / x ** 3
+        wavelength_unit = astro_units.Angstrom
 
+        union_grid = np.unique(np.concatenate([filter._wavelength for filter in self._filters]))
 
+        # this is the factor that converts a differential photon flux in 1/(keV cm2 s)
+        # evaluated at a given wavelength into the photon-weighted integrand of speclite
+        # (per unit wavelength), i.e. c^2 h^2 / lambda^3 * lambda / (h c)
 
-        self._wrapped_model = wrapped_model
+        conversion_factor = (constants.c * constants.h / (union_grid * wavelength_unit) ** 2)
 
-        self._model_set = True
+        conversion_factor = (conversion_factor * wavelength_unit / (astro_units.keV * astro_units.cm ** 2 * astro_units.s)).to('1/(cm2 s)').value
 
-    def ab_magnitudes(self):
-        """
-        return the effective stimulus of the model and filter for the given
-        magnitude system
-        :return: np.ndarray of ab magnitudes
-        """
+        weights = np.zeros((len(self._filters.names), union_grid.shape[0]))
 
-        assert self._model_set, 'no likelihood model has been set'
+        for i, filter in enumerate(self._filters):
 
-        # speclite has issues with unit conversion
-        # so we will do the calculation manually here
+            wavelength = filter._wavelength
 
-        ratio = []
+            # trapezoidal weights on the grid of the filter
 
-        for filter in self._filters:
+            delta = np.diff(wavelength)
 
-            # first get the flux and convert it to base units
-            synthetic_flux = filter.convolve_with_function(self._wrapped_model).to('1/(cm2 s)')
+            trapz_weights = np.zeros_like(wavelength)
 
-            # normalize it to the filter's AB magnitude
+            trapz_weights[:-1] += 0.5 * delta
+            trapz_weights[1:] += 0.5 * delta
 
+            # the grid of the filter is a subset of the union grid
 
+            idx = np.searchsorted(union_grid, wavelength)
 
-            ratio.append((synthetic_flux/filter.ab_zeropoint.to('1/(cm2 s)')).value)
+            weights[i, idx] = trapz_weights * filter.response * conversion_factor[idx] / filter.ab_zeropoint.to('1/(cm2 s)').value
 
+        self._wavelength_grid = union_grid
 
+        self._energy_grid = (constants.c * constants.h / (union_grid * wavelength_unit)).to('keV').value
 
-        ratio = np.array(ratio)
+        self._weights = weights
 
-        return -2.5 * np.log10(ratio)
+    def set_model(self, differential_flux):
+        """
+        set the model of that will be used during the convolution. Not that speclite
+        considers a differential flux to be in units of erg/s/cm2/lambda so we must convert
+        astromodels into the proper units. All the unit conversions are folded into
+        a precomputed weight matrix, so that the differential flux will be called with a plain
+        array of energies in keV (see _build_photometry_engine)
+
+        :param differential_flux: a function returning the differential photon flux (1/(keV cm2 s)) at the given energies (keV)
+        """
+
+        # the weights depend only on the filters, so they are computed only once
+
+        if self._weights is None:
+
+            self._build_photometry_engine()
+
+        self._differential_flux = differential_flux
+
+        self._model_set = True
 
+    def ab_magnitudes(self):
+        """
+        return the effective stimulus of the model and filter for the given
+        magnitude system
+        :return: np.ndarray of ab magnitudes
+        """
+
+        assert self._model_set, 'no likelihood model has been set'
 
+        # one evaluation of the model on the union grid and one
+        # matrix-vector product for all the filters
 
-        #return self._filters.get_ab_magnitudes(self._wrapped_model).to_pandas().loc[0]
+        ratio = np.dot(self._weights, self._differential_flux(self._energy_grid))
 
+        return -2.5 * np.log10(ratio)
 
     def plot_filters(self):
         """
@@ -0,0 +1,115 @@
+import collections
+
+import numpy as np
+
+
+def source_fingerprint(source):
+    """
+    The values of all the parameters of a source (position and spectrum). Two evaluations of the source with the
+    same fingerprint give the same flux.
+
+    :param source: an astromodels source
+    :return: a tuple of floats
+    """
+
+    return tuple(parameter.value for parameter in source.parameters.values())
+
+
+class SourceFluxCache(object):
+    def __init__(self, max_entries=256):
+        """
+        A cache of the fluxes of the sources of a model, as evaluated by a plugin (typically on its own energy grid).
+        Each entry is tagged with the fingerprint of the source (the values of its parameters) at the time of the
+        evaluation, so that a flux is evaluated again only when a parameter of its source has changed. In a fit where
+        the minimizer moves the parameters of one source at a time (or where most of the sources are fixed) this
+        avoids most of the evaluations.
+
+        Plugins keeping the fluxes in an external (C++) model can use the "changed" flag returned by get() to push
+        only the fluxes which changed.
+
+        NOTE: the flux of a source is assumed to depend only on its parameters (and on the energies). The cache must be
+        cleared when the model is replaced.
+
+        :param max_entries: maximum number of cached fluxes (the least recently used are dropped first)
+        """
+
+        assert max_entries >= 1, 'The cache must hold at least one entry'
+
+        self._max_entries = int(max_entries)
+
+        self._entries = collections.OrderedDict()
+
+        self._n_evaluations = 0
+        self._n_hits = 0
+
+    @property
+    def n_evaluations(self):
+        """
+        :return: the number of fluxes which had to be evaluated
+        """
+
+        return self._n_evaluations
+
+    @property
+    def n_hits(self):
+        """
+        :return: the number of fluxes which were taken from the cache
+        """
+
+        return self._n_hits
+
+    def clear(self):
+        """
+        Drop all the cached fluxes (for example when the model changes)
+
+        :return: none
+        """
+
+        self._entries.clear()
+
+    def get(self, key, source, evaluate, energies=None):
+        """
+        Get the flux of a source, evaluating it only if a parameter of the source changed since the last evaluation
+        with the same key (and energies).
+
+        :param key: an identifier of the flux within the plugin (for example the name of the source)
+        :param source: the astromodels source
+        :param evaluate: a function with no arguments which evaluates the flux
+        :param energies: (optional) the energies of the evaluation, if they can change from call to call
+        :return: (flux, changed) where changed is True if the flux has been evaluated again
+        """
+
+        if energies is not None:
+
+            key = (key, np.asarray(energies).tobytes())
+
+        fingerprint = source_fingerprint(source)
+
+        entry = self._entries.get(key)
+
+        if entry is not None and entry[0] == fingerprint:
+
+            self._n_hits += 1
+
+            # mark as most recently used
+
+            del self._entries[key]
+            self._entries[key] = entry
+
+            return entry[1], False
+
+        flux = evaluate()
+
+        self._n_evaluations += 1
+
+        if key in self._entries:
+
+            del self._entries[key]
+
+        self._entries[key] = (fingerprint, flux)
+
+        while len(self._entries) > self._max_entries:
+
+            self._entries.popitem(last=False)
+
+        return flux, True
@@ -30,6 +30,12 @@ class BinnedSpectrumSet(object):
 
             self._time_intervals = None
 
+        # the contiguous arrays and the cumulative index are built on first use
+
+        self._counts = None
+        self._exposure = None
+        self._time_index = None
+
     @property
     def reference_time(self):
 
@@ -75,6 +81,12 @@ class BinnedSpectrumSet(object):
 
         self._time_intervals.sort()
 
+        # the cached arrays are in the old order
+
+        self._counts = None
+        self._exposure = None
+        self._time_index = None
+
 
     @property
     def quality_per_bin(self):
@@ -88,8 +100,15 @@ class BinnedSpectrumSet(object):
 
     @property
     def counts_per_bin(self):
+        """
+        the (time x channel) array of the counts (built once and cached)
+        """
 
-        return np.array([spectrum.counts for spectrum in self._binned_spectrum_list])
+        if self._counts is None:
+
+            self._counts = np.ascontiguousarray([spectrum.counts for spectrum in self._binned_spectrum_list])
+
+        return self._counts
 
     @property
     def count_errors_per_bin(self):
@@ -113,10 +132,210 @@ class BinnedSpectrumSet(object):
 
     @property
     def exposure_per_bin(self):
+        """
+        the exposure of each bin (built once and cached)
+        """
+
+        if self._exposure is None:
+
+            self._exposure = np.array([spectrum.exposure for spectrum in self._binned_spectrum_list], dtype=float)
 
-        return np.array([spectrum.exposure for spectrum in self._binned_spectrum_list])
+        return self._exposure
 
     @property
     def time_intervals(self):
 
         return self._time_intervals
+
+    def _get_time_index(self):
+        """
+        build (once) the index used for the interval queries: the bin edges sorted in time
+        and the cumulative counts and exposure in the same order. If the bins overlap, the
+        edges cannot be sorted consistently and only the sorted edges are kept.
+
+        :return: the index dictionary
+        """
+
+        assert self._time_intervals is not None, 'This spectrum set has no time intervals'
+
+        if self._time_index is None:
+
+            # the bounds are rounded as the TimeIntervalSet does, since they may have
+            # been read from strings which are rounded to six decimals
+
+            true_starts = np.array(self._time_intervals.start_times, dtype=float)
+            true_stops = np.array(self._time_intervals.stop_times, dtype=float)
+
+            starts = np.round(true_starts, decimals=6)
+            stops = np.round(true_stops, decimals=6)
+
+            order = np.argsort(starts, kind='mergesort')
+
+            sorted_starts = starts[order]
+            sorted_stops = stops[order]
+
+            index = {'order': order,
+                     'starts': starts,
+                     'stops': stops,
+                     'sorted_starts': sorted_starts,
+                     'sorted_stops': sorted_stops,
+                     'true_starts': np.sort(true_starts),
+                     'true_stops': np.sort(true_stops),
+                     'contiguous': bool(np.all(np.diff(sorted_stops) >= 0))}
+
+            if index['contiguous']:
+
+                # the bins contained in an interval are a contiguous block of the sorted bins, so the
+                # counts are differences of the cumulative sums (with a leading row of zeros)
+
+                counts = self.counts_per_bin[order]
+
+                cumulative_counts = np.zeros((counts.shape[0] + 1, counts.shape[1]), dtype=counts.dtype)
+                cumulative_counts[1:] = np.cumsum(counts, axis=0)
+
+                cumulative_exposure = np.zeros(counts.shape[0] + 1)
+                cumulative_exposure[1:] = np.cumsum(self.exposure_per_bin[order])
+
+                index['cumulative_counts'] = cumulative_counts
+                index['cumulative_exposure'] = cumulative_exposure
+
+            self._time_index = index
+
+        return self._time_index
+
+    def _contained_bin_ranges(self, starts, stops):
+        """
+        the bins strictly contained in each interval are the sorted bins with index in [first, last)
+
+        :param starts: start times of the intervals
+        :param stops: stop times of the intervals
+        :return: first, last
+        """
+
+        index = self._get_time_index()
+
+        starts = np.round(np.atleast_1d(np.asarray(starts, dtype=float)), decimals=6)
+        stops = np.round(np.atleast_1d(np.asarray(stops, dtype=float)), decimals=6)
+
+        first = np.searchsorted(index['sorted_starts'], starts, side='left')
+        last = np.searchsorted(index['sorted_stops'], stops, side='right')
+
+        return first, np.maximum(first, last)
+
+    def _contained_bin_masks(self, starts, stops):
+        """
+        a (n_intervals x n_bins) mask of the bins strictly contained in each interval (in the original order)
+
+        :param starts: start times of the intervals
+        :param stops: stop times of the intervals
+        :return: boolean array
+        """
+
+        index = self._get_time_index()
+
+        starts = np.round(np.atleast_1d(np.asarray(starts, dtype=float)), decimals=6)
+        stops = np.round(np.atleast_1d(np.asarray(stops, dtype=float)), decimals=6)
+
+        return (index['starts'][np.newaxis, :] >= starts[:, np.newaxis]) & \
+               (index['stops'][np.newaxis, :] <= stops[:, np.newaxis])
+
+    def bin_mask_over_intervals(self, starts, stops):
+        """
+        the mask of the bins strictly contained in at least one of the intervals
+
+        :param starts: start times of the intervals
+        :param stops: stop times of the intervals
+        :return: boolean array with one element per bin (in the original order)
+        """
+
+        index = self._get_time_index()
+
+        if not index['contiguous']:
+
+            return self._contained_bin_masks(starts, stops).any(axis=0)
+
+        first, last = self._contained_bin_ranges(starts, stops)
+
+        # mark the beginning and the end of each block and count the blocks covering each bin
+
+        n_bins = len(self)
+
+        coverage = np.bincount(first, minlength=n_bins + 1) - np.bincount(last, minlength=n_bins + 1)
+
+        sorted_mask = np.cumsum(coverage)[:n_bins] > 0
+
+        mask = np.zeros(n_bins, dtype=bool)
+
+        mask[index['order']] = sorted_mask
+
+        return mask
+
+    def counts_over_intervals(self, starts, stops):
+        """
+        the counts per channel summed over the bins strictly contained in each interval
+
+        :param starts: start times of the intervals
+        :param stops: stop times of the intervals
+        :return: (n_intervals x n_channels) array
+        """
+
+        index = self._get_time_index()
+
+        if not index['contiguous']:
+
+            return np.dot(self._contained_bin_masks(starts, stops), self.counts_per_bin)
+
+        first, last = self._contained_bin_ranges(starts, stops)
+
+        return index['cumulative_counts'][last] - index['cumulative_counts'][first]
+
+    def exposure_over_intervals(self, starts, stops):
+        """
+        the exposure summed over the bins strictly contained in each interval
+
+        :param starts: start times of the intervals
+        :param stops: stop times of the intervals
+        :return: array with the exposure of each interval
+        """
+
+        index = self._get_time_index()
+
+        if not index['contiguous']:
+
+            return np.dot(self._contained_bin_masks(starts, stops), self.exposure_per_bin)
+
+        first, last = self._contained_bin_ranges(starts, stops)
+
+        return index['cumulative_exposure'][last] - index['cumulative_exposure'][first]
+
+    def snap_to_bins(self, starts, stops):
+        """
+        move the bounds of each interval to the nearest bin start and bin stop
+
+        :param starts: start times of the intervals
+        :param stops: stop times of the intervals
+        :return: snapped starts, snapped stops
+        """
+
+        index = self._get_time_index()
+
+        return _nearest(index['true_starts'], starts), _nearest(index['true_stops'], stops)
+
+
+def _nearest(sorted_values, x):
+    """
+    the elements of sorted_values nearest to each element of x (the smallest one in case of ties)
+
+    :param sorted_values: sorted array
+    :param x: values to look for
+    :return: array of the same shape as x
+    """
+
+    x = np.atleast_1d(np.asarray(x, dtype=float))
+
+    right = np.clip(np.searchsorted(sorted_values, x, side='left'), 0, sorted_values.shape[0] - 1)
+    left = np.clip(right - 1, 0, sorted_values.shape[0] - 1)
+
+    use_left = np.abs(x - sorted_values[left]) <= np.abs(sorted_values[right] - x)
+
+    return np.where(use_left, sorted_values[left], sorted_values[right])
@@ -3,10 +3,11 @@ import copy
 import numpy as np
 
 from threeML.exceptions.custom_exceptions import custom_warnings
-from threeML.utils.statistics.likelihood_functions import half_chi2
-from threeML.utils.statistics.likelihood_functions import poisson_log_likelihood_ideal_bkg
-from threeML.utils.statistics.likelihood_functions import poisson_observed_gaussian_background
-from threeML.utils.statistics.likelihood_functions import poisson_observed_poisson_background
+from threeML.utils.statistics.likelihood_functions import half_chi2_derivative
+from threeML.utils.statistics.likelihood_functions import poisson_log_likelihood_derivative
+from threeML.utils.statistics.statistic_kernels import GaussianKernel, PoissonKernel
+from threeML.utils.statistics.statistic_kernels import PoissonObservedGaussianBackgroundKernel
+from threeML.utils.statistics.statistic_kernels import PoissonObservedPoissonBackgroundKernel
 
 
 # These classes provide likelihood evaluation to SpectrumLike and children
@@ -14,6 +15,80 @@ from threeML.utils.statistics.likelihood_functions import poisson_observed_poiss
 _known_noise_models = {}
 
 
+def get_random_generator(random_seed=None):
+    """
+    Return a numpy random Generator, or a RandomState for numpy versions which do not have the Generator API. Both
+    provide the poisson and normal methods used for the batched randomizations below.
+
+    :param random_seed: (optional) seed
+    :return: a random generator
+    """
+
+    try:
+
+        return np.random.default_rng(random_seed)
+
+    except AttributeError:
+
+        return np.random.RandomState(random_seed)
+
+
+def _batch_of_gaussian_variates(expectation, errors, n_realizations, generator, label):
+    """
+    Draw n_realizations Gaussian variates around an expectation. Channels with zero error are always zero
+    (as for the single realization methods below) and negative variates are set to zero.
+
+    :param expectation: the expected counts (one per channel)
+    :param errors: the count errors (one per channel)
+    :param n_realizations: the number of realizations to draw
+    :param generator: a numpy random generator (or RandomState)
+    :param label: source or background, for the warning
+    :return: an (n_realizations, n_channels) array
+    """
+
+    idx = (errors > 0)
+
+    randomized_counts = np.zeros((n_realizations, expectation.shape[0]))
+
+    randomized_counts[:, idx] = generator.normal(loc=expectation[idx],
+                                                 scale=errors[idx],
+                                                 size=(n_realizations, np.sum(idx)))
+
+    negative_idx = (randomized_counts < 0)  # type: np.ndarray
+
+    negative_n = np.sum(negative_idx)
+
+    if negative_n > 0:
+        custom_warnings.warn("Generated %s has negative counts "
+                             "in %i channels (over %i realizations). "
+                             "Fixing them to zero" % (label, negative_n, n_realizations))
+
+        randomized_counts[negative_idx] = 0
+
+    return randomized_counts
+
+
+def _is_same_data(data, other_data):
+
+    if len(data) != len(other_data):
+
+        return False
+
+    for item, other_item in zip(data, other_data):
+
+        if isinstance(item, np.ndarray) or isinstance(other_item, np.ndarray):
+
+            if item is not other_item:
+
+                return False
+
+        elif item != other_item:
+
+            return False
+
+    return True
+
+
 class BinnedStatistic(object):
 
     def __init__(self, spectrum_plugin):
@@ -26,11 +101,77 @@ class BinnedStatistic(object):
 
         self._spectrum_plugin = spectrum_plugin
 
+        # The kernel computing the statistic, with the terms depending only on the data already computed,
+        # and the data it was built from
 
+        self._kernel = None
+        self._kernel_data = None
+
+    def _get_kernel_data(self):
+        """
+        The current data the kernel depends on. The kernel is built again when any of them changes: the arrays are
+        compared by identity (the plugin replaces them when the mask or the rebinner change), the other items by value.
+
+        :return: a tuple
+        """
+        return ()
+
+    def _build_kernel(self, *data):
+        return None
+
+    def _get_kernel(self):
+
+        data = self._get_kernel_data()
+
+        if self._kernel is None or not _is_same_data(data, self._kernel_data):
+
+            self._kernel = self._build_kernel(*data)
+            self._kernel_data = data
+
+        return self._kernel
+
+    def reset(self):
+        """
+        Force the kernel to be built again at the next evaluation (needed only if the data arrays of the plugin are
+        changed in place)
+
+        :return: none
+        """
+
+        self._kernel = None
+        self._kernel_data = None
 
     def get_current_value(self):
         RuntimeError('must be implemented in subclass')
 
+    def get_current_log_like(self):
+        """
+        The log-likelihood with the current model, without the background profiled by the statistic (which is then
+        not copied out of the work buffers of the kernel)
+
+        :return: the log-likelihood
+        """
+        log_like, _ = self.get_current_value()
+
+        return log_like
+
+    def get_log_likes_batch(self, model_counts):
+        """
+        The log-likelihood for many vectors of (selected) model counts at once, with the current data
+
+        :param model_counts: (n_models, n_channels) array of model counts
+        :return: an array with the log-likelihood of each row, or None if the statistic does not support it
+        """
+        return None
+
+    def get_current_derivatives(self):
+        """
+        The derivatives of the log-likelihood with respect to the (selected) model counts, with the current model
+
+        :return: (derivatives, model counts), or None if they cannot be computed in closed form
+        """
+        return None
+
     def get_randomized_source_counts(self, source_model_counts):
         return None
 
@@ -43,16 +184,46 @@ class BinnedStatistic(object):
     def get_randomized_background_errors(self):
         return None
 
+    # The batched versions are used by the in-place simulation of SpectrumLike. They return
+    # an (n_realizations, n_channels) array, or None if the quantity is not randomized
+
+    def get_randomized_source_counts_batch(self, source_model_counts, n_realizations, generator):
+        return None
+
+    def get_randomized_background_counts_batch(self, n_realizations, generator):
+        return None
+
 
 class GaussianObservedStatistic(BinnedStatistic):
+    def _get_kernel_data(self):
+        return (self._spectrum_plugin.current_observed_counts,
+                self._spectrum_plugin.current_observed_count_errors)
+
+    def _build_kernel(self, observed_counts, observed_count_errors):
+        return GaussianKernel(observed_counts, observed_count_errors)
+
     def get_current_value(self):
-        chi2_ = half_chi2(self._spectrum_plugin.current_observed_counts,
-                          self._spectrum_plugin.current_observed_count_errors,
-                          self._spectrum_plugin.get_model())
+        log_like = self._get_kernel()(self._spectrum_plugin.get_model())
+
+        assert np.isfinite(log_like)
+
+        return log_like, None
+
+    def get_log_likes_batch(self, model_counts):
+        log_likes = self._get_kernel()(np.atleast_2d(model_counts))
+
+        assert np.all(np.isfinite(log_likes))
+
+        return log_likes
+
+    def get_current_derivatives(self):
+        model_counts = self._spectrum_plugin.get_model()
 
-        assert np.all(np.isfinite(chi2_))
+        derivatives = half_chi2_derivative(self._spectrum_plugin.current_observed_counts,
+                                           self._spectrum_plugin.current_observed_count_errors,
+                                           model_counts)
 
-        return np.sum(chi2_) * (-1), None
+        return derivatives, model_counts
 
     def get_randomized_source_counts(self, source_model_counts):
         idx = (self._spectrum_plugin.observed_count_errors > 0)
@@ -79,19 +250,39 @@ class GaussianObservedStatistic(BinnedStatistic):
     def get_randomized_source_errors(self):
         return self._spectrum_plugin.observed_count_errors
 
+    def get_randomized_source_counts_batch(self, source_model_counts, n_realizations, generator):
+        return _batch_of_gaussian_variates(source_model_counts,
+                                           self._spectrum_plugin.observed_count_errors,
+                                           n_realizations,
+                                           generator,
+                                           'source')
+
 
 class PoissonObservedIdealBackgroundStatistic(BinnedStatistic):
     def get_current_value(self):
         # In this likelihood the background becomes part of the model, which means that
         # the uncertainty in the background is completely neglected
 
+        return self._get_kernel()(self._spectrum_plugin.get_model()), None
+
+    def _get_kernel_data(self):
+        return (self._spectrum_plugin.current_observed_counts,
+                self._spectrum_plugin.current_scaled_background_counts)
+
+    def _build_kernel(self, observed_counts, scaled_background_counts):
+        return PoissonKernel(observed_counts, scaled_background_counts)
+
+    def get_log_likes_batch(self, model_counts):
+        return self._get_kernel()(np.atleast_2d(model_counts))
+
+    def get_current_derivatives(self):
         model_counts = self._spectrum_plugin.get_model()
 
-        loglike, _ = poisson_log_likelihood_ideal_bkg(self._spectrum_plugin.current_observed_counts,
-                                                      self._spectrum_plugin.current_scaled_background_counts,
-                                                      model_counts)
+        derivatives = poisson_log_likelihood_derivative(self._spectrum_plugin.current_observed_counts,
+                                                        self._spectrum_plugin.current_scaled_background_counts,
+                                                        model_counts)
 
-        return np.sum(loglike), None
+        return derivatives, model_counts
 
     def get_randomized_source_counts(self, source_model_counts):
         # Randomize expectations for the source
@@ -110,27 +301,36 @@ class PoissonObservedIdealBackgroundStatistic(BinnedStatistic):
 
         return randomized_background_counts
 
+    def get_randomized_source_counts_batch(self, source_model_counts, n_realizations, generator):
+        return generator.poisson(source_model_counts + self._spectrum_plugin._background_counts,
+                                 size=(n_realizations, source_model_counts.shape[0]))
+
 
 class PoissonObservedModeledBackgroundStatistic(BinnedStatistic):
     def get_current_value(self):
         # In this likelihood the background becomes part of the model, which means that
         # the uncertainty in the background is completely neglected
 
-        model_counts = self._spectrum_plugin.get_model()
+        return self._get_log_likes(self._spectrum_plugin.get_model()), None
 
+    def _get_kernel_data(self):
+        return (self._spectrum_plugin.current_observed_counts,)
+
+    def _build_kernel(self, observed_counts):
+        # The background is not fixed, so it is added to the model counts at each call
+        return PoissonKernel(observed_counts)
+
+    def _get_log_likes(self, model_counts):
         # we scale the background model to the observation
 
         background_model_counts = self._spectrum_plugin.get_background_model() * self._spectrum_plugin.scale_factor
 
-        loglike, _ = poisson_log_likelihood_ideal_bkg(self._spectrum_plugin.current_observed_counts,
-                                                      background_model_counts,
-                                                      model_counts)
-
         bkg_log_like = self._spectrum_plugin.background_plugin.get_log_like()
 
-        total_log_like = np.sum(loglike) + bkg_log_like
+        return self._get_kernel()(model_counts + background_model_counts) + bkg_log_like
 
-        return total_log_like, None
+    def get_log_likes_batch(self, model_counts):
+        return self._get_log_likes(np.atleast_2d(model_counts))
 
     def get_randomized_source_counts(self, source_model_counts):
         # first generate random source counts from the plugin
@@ -160,15 +360,25 @@ class PoissonObservedNoBackgroundStatistic(BinnedStatistic):
         # In this likelihood the background becomes part of the model, which means that
         # the uncertainty in the background is completely neglected
 
-        model_counts = self._spectrum_plugin.get_model()
+        return self._get_kernel()(self._spectrum_plugin.get_model()), None
+
+    def _get_kernel_data(self):
+        return (self._spectrum_plugin.current_observed_counts,)
+
+    def _build_kernel(self, observed_counts):
+        return PoissonKernel(observed_counts)
+
+    def get_log_likes_batch(self, model_counts):
+        return self._get_kernel()(np.atleast_2d(model_counts))
 
-        background_model_counts = np.zeros_like(model_counts)
+    def get_current_derivatives(self):
+        model_counts = self._spectrum_plugin.get_model()
 
-        loglike, _ = poisson_log_likelihood_ideal_bkg(self._spectrum_plugin.current_observed_counts,
-                                                      background_model_counts,
-                                                      model_counts)
+        derivatives = poisson_log_likelihood_derivative(self._spectrum_plugin.current_observed_counts,
+                                                        np.zeros_like(model_counts),
+                                                        model_counts)
 
-        return np.sum(loglike), None
+        return derivatives, model_counts
 
     def get_randomized_source_counts(self, source_model_counts):
         # Randomize expectations for the source
@@ -180,19 +390,40 @@ class PoissonObservedNoBackgroundStatistic(BinnedStatistic):
 
         return randomized_source_counts
 
+    def get_randomized_source_counts_batch(self, source_model_counts, n_realizations, generator):
+        return generator.poisson(source_model_counts, size=(n_realizations, source_model_counts.shape[0]))
+
 
 class PoissonObservedPoissonBackgroundStatistic(BinnedStatistic):
     def get_current_value(self):
+        return self._get_kernel()(self._spectrum_plugin.get_model(), background=True)
+
+    def get_current_log_like(self):
+        return self._get_kernel()(self._spectrum_plugin.get_model())
+
+    def _get_kernel_data(self):
         # Scale factor between source and background spectrum
 
+        return (self._spectrum_plugin.current_observed_counts,
+                self._spectrum_plugin.current_background_counts,
+                self._spectrum_plugin.scale_factor)
+
+    def _build_kernel(self, observed_counts, background_counts, scale_factor):
+        return PoissonObservedPoissonBackgroundKernel(observed_counts, background_counts, scale_factor)
+
+    def get_log_likes_batch(self, model_counts):
+        return self._get_kernel()(np.atleast_2d(model_counts))
+
+    def get_current_derivatives(self):
         model_counts = self._spectrum_plugin.get_model()
 
-        loglike, bkg_model = poisson_observed_poisson_background(self._spectrum_plugin.current_observed_counts,
-                                                                 self._spectrum_plugin.current_background_counts,
-                                                                 self._spectrum_plugin.scale_factor,
-                                                                 model_counts)
+        _, bkg_model = self._get_kernel()(model_counts, background=True)
+
+        derivatives = poisson_log_likelihood_derivative(self._spectrum_plugin.current_observed_counts,
+                                                        bkg_model,
+                                                        model_counts)
 
-        return np.sum(loglike), bkg_model
+        return derivatives, model_counts
 
     def get_randomized_source_counts(self, source_model_counts):
         # Since we use a profile likelihood, the background model is conditional on the source model, so let's
@@ -217,17 +448,50 @@ class PoissonObservedPoissonBackgroundStatistic(BinnedStatistic):
 
         return randomized_background_counts
 
+    def get_randomized_source_counts_batch(self, source_model_counts, n_realizations, generator):
+        _, background_model_counts = self.get_current_value()
+
+        return generator.poisson(source_model_counts + background_model_counts,
+                                 size=(n_realizations, source_model_counts.shape[0]))
+
+    def get_randomized_background_counts_batch(self, n_realizations, generator):
+        _, background_model_counts = self.get_current_value()
+
+        return generator.poisson(background_model_counts, size=(n_realizations, background_model_counts.shape[0]))
+
 
 class PoissonObservedGaussianBackgroundStatistic(BinnedStatistic):
     def get_current_value(self):
-        expected_model_counts = self._spectrum_plugin.get_model()
+        return self._get_kernel()(self._spectrum_plugin.get_model(), background=True)
+
+    def get_current_log_like(self):
+        return self._get_kernel()(self._spectrum_plugin.get_model())
 
-        loglike, bkg_model = poisson_observed_gaussian_background(self._spectrum_plugin.current_observed_counts,
-                                                                  self._spectrum_plugin.current_background_counts,
-                                                                  self._spectrum_plugin.current_background_count_errors,
-                                                                  expected_model_counts)
+    def _get_kernel_data(self):
+        return (self._spectrum_plugin.current_observed_counts,
+                self._spectrum_plugin.current_background_counts,
+                self._spectrum_plugin.current_background_count_errors)
 
-        return np.sum(loglike), bkg_model
+    def _build_kernel(self, observed_counts, background_counts, background_count_errors):
+        return PoissonObservedGaussianBackgroundKernel(observed_counts, background_counts, background_count_errors)
+
+    def get_log_likes_batch(self, model_counts):
+        return self._get_kernel()(np.atleast_2d(model_counts))
+
+    def get_current_derivatives(self):
+        model_counts = self._spectrum_plugin.get_model()
+
+        _, bkg_model = self._get_kernel()(model_counts, background=True)
+
+        # where there are no background counts the likelihood is the pure Poisson one
+
+        bkg_model = np.where(self._spectrum_plugin.current_background_counts > 0, bkg_model, 0)
+
+        derivatives = poisson_log_likelihood_derivative(self._spectrum_plugin.current_observed_counts,
+                                                        bkg_model,
+                                                        model_counts)
+
+        return derivatives, model_counts
 
     def get_randomized_source_counts(self, source_model_counts):
         # Since we use a profile likelihood, the background model is conditional on the source model, so let's
@@ -275,6 +539,21 @@ class PoissonObservedGaussianBackgroundStatistic(BinnedStatistic):
     def get_randomized_background_errors(self):
         return copy.copy(self._spectrum_plugin.background_count_errors)
 
+    def get_randomized_source_counts_batch(self, source_model_counts, n_realizations, generator):
+        _, background_model_counts = self.get_current_value()
+
+        return generator.poisson(source_model_counts + background_model_counts,
+                                 size=(n_realizations, source_model_counts.shape[0]))
+
+    def get_randomized_background_counts_batch(self, n_realizations, generator):
+        _, background_model_counts = self.get_current_value()
+
+        return _batch_of_gaussian_variates(background_model_counts,
+                                           self._spectrum_plugin.background_count_errors,
+                                           n_realizations,
+                                           generator,
+                                           'background')
+
 
 
 statistic_lookup = {'poisson': {'poisson': PoissonObservedPoissonBackgroundStatistic,
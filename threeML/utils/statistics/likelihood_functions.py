@@ -161,3 +161,46 @@ def half_chi2(y, yerr, expectation):
     # the other likelihood functions. This way we can sum it with other likelihood functions.
 
     return 1/2.0 * (y-expectation)**2 / yerr**2
+
+
+def poisson_log_likelihood_derivative(observed_counts, expected_bkg_counts, expected_model_counts):
+    """
+    Derivative of the Poisson log-likelihood with respect to the expected model counts, for a given expected
+    background:
+
+    dL/dm_i = o_i / (m_i + b_i) - 1
+
+    For the profile likelihoods (poisson_observed_poisson_background and poisson_observed_gaussian_background) the
+    background is the profiled one: since the profile likelihood is stationary with respect to the background, its
+    total derivative is the same as the partial derivative above.
+
+    :param observed_counts:
+    :param expected_bkg_counts:
+    :param expected_model_counts:
+    :return: derivative vector
+    """
+
+    predicted_counts = expected_bkg_counts + expected_model_counts
+
+    # channels with no observed counts have a derivative of -1 even when the prediction is zero
+
+    ratio = np.zeros_like(predicted_counts)
+
+    idx = observed_counts > 0
+
+    ratio[idx] = observed_counts[idx] / predicted_counts[idx]
+
+    return ratio - 1
+
+
+def half_chi2_derivative(y, yerr, expectation):
+    """
+    Derivative of the Gaussian log-likelihood (-half_chi2) with respect to the expectation
+
+    :param y:
+    :param yerr:
+    :param expectation:
+    :return: derivative vector
+    """
+
+    return (y - expectation) / yerr ** 2
@@ -0,0 +1,330 @@
+from math import log
+
+import numpy as np
+
+from threeML.plugins.gammaln import logfactorial
+
+
+# The kernels below compute the same log-likelihoods as the functions in likelihood_functions.py, but all the terms
+# which depend only on the data (log-factorials, masks of the channels with counts, weights...) are computed once when
+# the kernel is created. Each call then only computes the terms depending on the model, in preallocated work buffers
+# with in-place ufuncs, and reduces them with dot products against the data (so that, for example, the sum of
+# o_i * log(m_i) does not need the temporary vector o * log(m)).
+#
+# All kernels accept either one vector of model counts, returning one log-likelihood, or a (n_models, n_channels)
+# array of model counts, returning a log-likelihood for each row (batched mode).
+
+
+class StatisticKernel(object):
+
+    # Number of work buffers needed by the kernel, and how many of them are used to store logarithms (the latter are
+    # always the last ones)
+
+    _n_buffers = 0
+    _n_log_buffers = 0
+
+    # Maximum number of different shapes for which the buffers are kept
+
+    _max_shapes = 4
+
+    def __init__(self, observed_counts):
+        """
+        Base class for the statistic kernels
+
+        :param observed_counts: the observed counts in the selected channels
+        """
+
+        self._observed_counts = np.array(observed_counts, dtype=float)
+
+        self._n_channels = self._observed_counts.shape[0]
+
+        self._buffers = {}
+
+    @property
+    def n_channels(self):
+
+        return self._n_channels
+
+    def _get_buffers(self, model_counts):
+
+        assert model_counts.shape[-1] == self._n_channels, "The model counts must have %i channels, " \
+                                                           "got %i" % (self._n_channels, model_counts.shape[-1])
+
+        shape = model_counts.shape
+
+        buffers = self._buffers.get(shape)
+
+        if buffers is None:
+
+            if len(self._buffers) >= self._max_shapes:
+
+                self._buffers.clear()
+
+            # The buffers for the logarithms are filled with zeros, and the logarithm is then computed only for the
+            # channels where it is multiplied by non-zero data. The other channels stay zero, which gives 0 * log(0) = 0
+            # without any check at each call
+
+            buffers = [np.empty(shape) for _ in range(self._n_buffers - self._n_log_buffers)] + \
+                      [np.zeros(shape) for _ in range(self._n_log_buffers)]
+
+            self._buffers[shape] = buffers
+
+        return buffers
+
+    def __call__(self, model_counts, background=False):
+        """
+        Compute the log-likelihood
+
+        :param model_counts: the expected counts from the model, as a vector or as a (n_models, n_channels) array
+        :param background: if True, return also the (profiled) background counts
+        :return: the log-likelihood (one per row in batched mode), or (log-likelihood, background counts) if
+        background is True
+        """
+
+        raise NotImplementedError("Must be implemented in subclasses")
+
+
+class GaussianKernel(StatisticKernel):
+
+    _n_buffers = 1
+
+    def __init__(self, observed_counts, observed_count_errors):
+        """
+        Gaussian log-likelihood (-half_chi2) for observed counts with the given errors
+
+        :param observed_counts: the observed counts
+        :param observed_count_errors: the errors on the observed counts
+        """
+
+        super(GaussianKernel, self).__init__(observed_counts)
+
+        with np.errstate(divide='ignore'):
+
+            self._weights = 0.5 / np.array(observed_count_errors, dtype=float) ** 2
+
+    def __call__(self, model_counts, background=False):
+
+        residuals, = self._get_buffers(model_counts)
+
+        np.subtract(self._observed_counts, model_counts, out=residuals)
+        np.multiply(residuals, residuals, out=residuals)
+
+        log_like = residuals.dot(self._weights) * (-1)
+
+        if background:
+
+            return log_like, None
+
+        return log_like
+
+
+class PoissonKernel(StatisticKernel):
+
+    _n_buffers = 2
+    _n_log_buffers = 1
+
+    def __init__(self, observed_counts, background_counts=None):
+        """
+        Poisson log-likelihood for a background without uncertainties (poisson_log_likelihood_ideal_bkg), or for no
+        background at all
+
+        :param observed_counts: the observed counts
+        :param background_counts: (optional) the expected background counts
+        """
+
+        super(PoissonKernel, self).__init__(observed_counts)
+
+        if background_counts is not None:
+
+            background_counts = np.array(background_counts, dtype=float)
+
+        self._background_counts = background_counts
+
+        self._has_counts = self._observed_counts > 0
+
+        self._constant = -np.sum(logfactorial(self._observed_counts))
+
+    def __call__(self, model_counts, background=False):
+
+        predicted_counts, log_predicted_counts = self._get_buffers(model_counts)
+
+        if self._background_counts is None:
+
+            predicted_counts = model_counts
+
+        else:
+
+            np.add(model_counts, self._background_counts, out=predicted_counts)
+
+        np.log(predicted_counts, out=log_predicted_counts, where=self._has_counts)
+
+        log_like = log_predicted_counts.dot(self._observed_counts) - np.sum(predicted_counts, axis=-1) + self._constant
+
+        if background:
+
+            return log_like, self._background_counts
+
+        return log_like
+
+
+class PoissonObservedPoissonBackgroundKernel(StatisticKernel):
+
+    _n_buffers = 5
+    _n_log_buffers = 2
+
+    def __init__(self, observed_counts, background_counts, exposure_ratio):
+        """
+        Profile log-likelihood for Poisson observed counts and Poisson background counts
+        (poisson_observed_poisson_background)
+
+        :param observed_counts: the observed counts
+        :param background_counts: the observed background counts
+        :param exposure_ratio: the scale factor between the source and the background spectra
+        """
+
+        super(PoissonObservedPoissonBackgroundKernel, self).__init__(observed_counts)
+
+        self._background_counts = np.array(background_counts, dtype=float)
+
+        alpha = float(exposure_ratio)
+
+        self._alpha = alpha
+
+        # Data-only terms of the profiled background:
+        # B = (alpha * (o + b) - (alpha + 1) * M + sqrt(4 * (alpha + alpha^2) * b * M + ((alpha + 1) * M - alpha * (o + b))^2))
+        #      / (2 * alpha * (1 + alpha))
+
+        self._scaled_total_counts = alpha * (self._observed_counts + self._background_counts)
+
+        self._sqrt_coefficients = 4 * (alpha + alpha ** 2) * self._background_counts
+
+        self._normalization = 1 / (2.0 * alpha * (1 + alpha))
+
+        self._has_counts = self._observed_counts > 0
+        self._has_background_counts = self._background_counts > 0
+
+        self._constant = -np.sum(logfactorial(self._background_counts)) - np.sum(logfactorial(self._observed_counts))
+
+    def __call__(self, model_counts, background=False):
+
+        (difference, background_mle,
+         predicted_counts, log_predicted_counts, log_background_mle) = self._get_buffers(model_counts)
+
+        alpha = self._alpha
+
+        # difference = (alpha + 1) * M - alpha * (o + b)
+
+        np.multiply(model_counts, alpha + 1, out=difference)
+        np.subtract(difference, self._scaled_total_counts, out=difference)
+
+        np.multiply(self._sqrt_coefficients, model_counts, out=background_mle)
+        np.multiply(difference, difference, out=predicted_counts)
+        np.add(background_mle, predicted_counts, out=background_mle)
+        np.sqrt(background_mle, out=background_mle)
+
+        np.subtract(background_mle, difference, out=background_mle)
+        np.multiply(background_mle, self._normalization, out=background_mle)
+
+        # Profile likelihood
+
+        np.multiply(background_mle, alpha, out=predicted_counts)
+        np.add(predicted_counts, model_counts, out=predicted_counts)
+
+        np.log(predicted_counts, out=log_predicted_counts, where=self._has_counts)
+        np.log(background_mle, out=log_background_mle, where=self._has_background_counts)
+
+        log_like = (log_predicted_counts.dot(self._observed_counts)
+                    + log_background_mle.dot(self._background_counts)
+                    - (alpha + 1) * np.sum(background_mle, axis=-1)
+                    - np.sum(model_counts, axis=-1)
+                    + self._constant)
+
+        if background:
+
+            return log_like, background_mle * alpha
+
+        return log_like
+
+
+class PoissonObservedGaussianBackgroundKernel(StatisticKernel):
+
+    _n_buffers = 3
+    _n_log_buffers = 1
+
+    def __init__(self, observed_counts, background_counts, background_errors):
+        """
+        Profile log-likelihood for Poisson observed counts and a background with Gaussian errors
+        (poisson_observed_gaussian_background)
+
+        :param observed_counts: the observed counts
+        :param background_counts: the background counts
+        :param background_errors: the errors on the background counts (can be zero only where the background counts
+        are zero)
+        """
+
+        super(PoissonObservedGaussianBackgroundKernel, self).__init__(observed_counts)
+
+        self._background_counts = np.array(background_counts, dtype=float)
+
+        background_errors = np.array(background_errors, dtype=float)
+
+        s2 = background_errors ** 2
+
+        idx = self._background_counts > 0
+
+        # The profiled background is
+        # B = 0.5 * (sqrt((M + b - s2)^2 + 4 * s2 * o) + b - s2 - M)
+        # In the channels without background counts the likelihood is the pure Poisson one, so there B must be zero
+        # even if the error is not: the data-only terms are zeroed, which gives B = 0.5 * (sqrt(M^2) - M) = 0
+
+        self._shifted_background = np.where(idx, self._background_counts - s2, 0.0)
+
+        self._sqrt_terms = np.where(idx, 4 * s2 * self._observed_counts, 0.0)
+
+        # Where there are background counts the likelihood includes the Gaussian term for the background, elsewhere it
+        # is the pure Poisson likelihood. The weights select the channels for the terms depending on the model
+
+        self._has_background = idx.astype(float)
+
+        self._gaussian_weights = np.zeros(self._n_channels)
+        self._gaussian_weights[idx] = 1 / (2 * s2[idx])
+
+        self._has_counts = self._observed_counts > 0
+
+        self._constant = (-np.sum(logfactorial(self._observed_counts))
+                          - np.sum(idx) * 0.5 * log(2 * np.pi)
+                          - np.sum(np.log(background_errors[idx])))
+
+    def __call__(self, model_counts, background=False):
+
+        background_mle, work, log_predicted_counts = self._get_buffers(model_counts)
+
+        np.add(model_counts, self._shifted_background, out=work)
+        np.multiply(work, work, out=work)
+        np.add(work, self._sqrt_terms, out=work)
+        np.sqrt(work, out=work)
+
+        np.add(work, self._shifted_background, out=background_mle)
+        np.subtract(background_mle, model_counts, out=background_mle)
+        np.multiply(background_mle, 0.5, out=background_mle)
+
+        np.add(background_mle, model_counts, out=work)
+
+        np.log(work, out=log_predicted_counts, where=self._has_counts)
+
+        log_like = log_predicted_counts.dot(self._observed_counts) - np.sum(model_counts, axis=-1)
+
+        # Gaussian term for the background
+
+        np.subtract(background_mle, self._background_counts, out=work)
+        np.multiply(work, work, out=work)
+
+        log_like -= work.dot(self._gaussian_weights) + background_mle.dot(self._has_background)
+
+        log_like += self._constant
+
+        if background:
+
+            return log_like, np.array(background_mle, copy=True)
+
+        return log_like
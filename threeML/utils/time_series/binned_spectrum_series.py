@@ -5,7 +5,7 @@ from threeML.io.plotting.light_curve_plots import binned_light_curve_plot
 from threeML.io.progress_bar import progress_bar
 from threeML.utils.spectrum.binned_spectrum_set import BinnedSpectrumSet
 from threeML.utils.time_interval import TimeIntervalSet
-from threeML.utils.time_series.polynomial import polyfit
+from threeML.utils.time_series.polynomial import polyfit, PolynomialSet
 from threeML.utils.time_series.time_series import TimeSeries
 
 
@@ -63,30 +63,44 @@ class BinnedSpectrumSeries(TimeSeries):
 
         """
 
+        if self._light_curve_pyramid is not None:
+
+            # regular bins of width dt, read from the light curve pyramid (see get_light_curve)
+
+            time_bins, cnts, width, bkg = self.get_light_curve(start, stop, dt)
+
+            if bkg is not None:
+
+                bkg = bkg / width
+
+            return binned_light_curve_plot(time_bins=time_bins,
+                                           cnts=cnts,
+                                           width=width,
+                                           bkg=bkg,
+                                           selection=None if self.time_intervals is None
+                                           else self.time_intervals.bin_stack,
+                                           bkg_selections=None if self.poly_intervals is None
+                                           else self.poly_intervals.bin_stack)
+
         # git a set of bins containing the intervals
 
         bins = self._binned_spectrum_set.time_intervals.containing_interval( start, stop) # type: TimeIntervalSet
 
-        cnts = []
-        width = []
+        # sum the channels of all the selected bins at once
 
-        for bin in bins:
+        mask = self._select_bins(start, stop)
 
-            cnts.append(self.counts_over_interval(bin.start_time, bin.stop_time) )
-            width.append(bin.duration)
+        cnts = self._binned_spectrum_set.counts_per_bin[mask].sum(axis=1)
+        width = np.array(bins.stop_times) - np.array(bins.start_times)
 
 
         # now we want to get the estimated background from the polynomial fit
 
         if self.poly_fit_exists:
 
-            bkg = []
-            for j, tb in enumerate(bins):
-                tmpbkg = 0.
-                for poly in self.polynomials:
-                    tmpbkg += poly.integral(tb.start_time, tb.stop_time)
+            # integrate all the channels over all the bins at once
 
-                bkg.append(tmpbkg / width[j])
+            bkg = self.get_total_poly_count(bins.start_times, bins.stop_times) / width
 
         else:
 
@@ -114,8 +128,8 @@ class BinnedSpectrumSeries(TimeSeries):
         # plot the light curve
 
         fig = binned_light_curve_plot(time_bins=bins.bin_stack,
-                                cnts=np.array(cnts),
-                                width=np.array(width),
+                                cnts=cnts,
+                                width=width,
                                 bkg=bkg,
                                 selection=selection,
                                 bkg_selections=bkg_selection)
@@ -133,22 +147,9 @@ class BinnedSpectrumSeries(TimeSeries):
         :return:
         """
 
-        # this will be a boolean list and the sum will be the
-        # number of events
-
-        bins = self._select_bins(start, stop)
-
-        total_counts = 0
-
-        for idx in np.where(bins)[0]:
-
-            # sum over channels because we just want the total counts
-
-            total_counts += self._binned_spectrum_set[idx].counts.sum()
-
-
-        return total_counts
+        # sum over channels because we just want the total counts
 
+        return self.count_per_channel_over_interval(start, stop).sum()
 
     def count_per_channel_over_interval(self, start, stop):
         """
@@ -158,74 +159,118 @@ class BinnedSpectrumSeries(TimeSeries):
         :return:
         """
 
-        # this will be a boolean list and the sum will be the
-        # number of events
+        return self._binned_spectrum_set.counts_over_intervals(start, stop)[0]
 
-        bins = self._select_bins(start, stop)
+    def count_per_channel_over_intervals(self, starts, stops):
+        """
+        the counts per channel over a set of intervals, from the cumulative counts of the spectrum set
 
-        total_counts = np.zeros(self._n_channels)
+        :param starts: start times of the intervals
+        :param stops: stop times of the intervals
+        :return: (n_intervals x n_channels) array
+        """
 
-        for idx in np.where(bins)[0]:
+        return self._binned_spectrum_set.counts_over_intervals(starts, stops)
 
-            # don't sum over channels because we want the spectrum
-            total_counts += self._binned_spectrum_set[idx].counts
+    def exposure_over_intervals(self, starts, stops):
+        """
+        the exposure over a set of intervals, from the cumulative exposure of the spectrum set
 
-        return total_counts
+        :param starts: start times of the intervals
+        :param stops: stop times of the intervals
+        :return: array of exposures
+        """
 
+        return self._binned_spectrum_set.exposure_over_intervals(starts, stops)
 
-    def _select_bins(self, start, stop):
+    def _get_bins_of_native_bins(self, edges):
         """
-        return an index of the selected bins
-        :param start: start time
-        :param stop: stop time
-        :return: int indices
+        The bin defined by the edges which contains the center of each bin of the spectrum set. The counts and the
+        exposure of a bin of the spectrum set cannot be split, so they are attributed to that bin as a whole.
+
+        :param edges: the bin edges
+        :return: array with the index of the bin for each bin of the spectrum set (-1 if outside of the edges)
         """
 
-        return self._binned_spectrum_set.time_intervals.containing_interval(start,stop,as_mask=True)
+        time_intervals = self._binned_spectrum_set.time_intervals
 
-    def _adjust_to_true_intervals(self, time_intervals):
-        """
+        centers = (np.array(time_intervals.start_times) + np.array(time_intervals.stop_times)) / 2.0
 
-        adjusts time selections to those of the Binned spectrum set
+        index = np.searchsorted(edges, centers, side='right') - 1
 
+        index[(index < 0) | (index >= edges.shape[0] - 1)] = -1
 
-        :param time_intervals: a time interval set
-        :return: an adjusted time interval set
+        return index
+
+    def _get_base_light_curve(self, edges):
         """
+        the counts per channel and the exposure of each bin defined by the edges. Each bin of the spectrum set is
+        counted in the bin containing its center, so light curves are meaningful only for bins wider than those of
+        the spectrum set.
 
-        # get all the starts and stops from these time intervals
+        :param edges: the bin edges
+        :return: ((n_bins x n_channels) counts, exposure)
+        """
 
-        true_starts = np.array(self._binned_spectrum_set.time_intervals.start_times)
-        true_stops = np.array(self._binned_spectrum_set.time_intervals.stop_times)
+        index = self._get_bins_of_native_bins(edges)
 
-        new_starts = []
-        new_stops = []
+        used = index >= 0
 
-        # now go thru all the intervals
-        for interval in time_intervals:
+        counts_per_bin = self._binned_spectrum_set.counts_per_bin
 
-            # find where the suggest intervals hits the true interval
+        # keep integer counts as integers
 
-            # searchsorted is fast, but is not returing what we want
-            # we want the actaul values of the bins closest to the input
+        if np.all(np.mod(counts_per_bin, 1) == 0):
 
-            #idx = np.searchsorted(true_starts, interval.start_time,side)
+            counts_per_bin = counts_per_bin.astype(np.int64)
 
-            idx = (np.abs(true_starts - interval.start_time)).argmin()
+        counts = np.zeros((edges.shape[0] - 1, self._n_channels), dtype=counts_per_bin.dtype)
 
+        np.add.at(counts, index[used], counts_per_bin[used])
 
-            new_start = true_starts[idx]
+        exposure = np.bincount(index[used], weights=self._binned_spectrum_set.exposure_per_bin[used],
+                               minlength=edges.shape[0] - 1)
 
-            #idx = np.searchsorted(true_stops, interval.stop_time)
+        return counts, exposure
 
-            idx = (np.abs(true_stops - interval.stop_time)).argmin()
+    def _get_light_curve_directly(self, edges, channel_mask):
+        """
+        the counts (summed over the channels in the mask) and the exposure of each bin defined by the edges (see
+        _get_base_light_curve)
 
+        :param edges: the bin edges
+        :param channel_mask: boolean mask of the channels to use
+        :return: (counts, exposure)
+        """
 
-            new_stop = true_stops[idx]
+        counts, exposure = self._get_base_light_curve(edges)
 
-            new_starts.append(new_start)
+        return counts[:, channel_mask].sum(axis=1), exposure
 
-            new_stops.append(new_stop)
+    def _select_bins(self, start, stop):
+        """
+        return an index of the selected bins
+        :param start: start time
+        :param stop: stop time
+        :return: int indices
+        """
+
+        return self._binned_spectrum_set.bin_mask_over_intervals(start, stop)
+
+    def _adjust_to_true_intervals(self, time_intervals):
+        """
+
+        adjusts time selections to those of the Binned spectrum set
+
+
+        :param time_intervals: a time interval set
+        :return: an adjusted time interval set
+        """
+
+        # move all the starts and stops at once to the closest bin starts and stops
+
+        new_starts, new_stops = self._binned_spectrum_set.snap_to_bins(time_intervals.start_times,
+                                                                       time_intervals.stop_times)
 
         # alright, now we can make appropriate time intervals
 
@@ -312,7 +357,7 @@ class BinnedSpectrumSeries(TimeSeries):
                 polynomials.append(polynomial)
                 p.increase()
 
-        self._polynomials = polynomials
+        self._polynomials = PolynomialSet(polynomials)
 
     def set_active_time_intervals(self, *args):
         """
@@ -339,23 +384,15 @@ class BinnedSpectrumSeries(TimeSeries):
         time_intervals = self._adjust_to_true_intervals(time_intervals)
 
 
-        # start out with no time bins selection
-        all_idx = np.zeros(len(self._binned_spectrum_set.time_intervals),dtype=bool)
-
-        # now we need to sum up the counts and total time
-
-        total_time = 0
-
-        for interval in time_intervals:
-
-            # the select bins method is called.
-            # since we are sure that the interval bounds
-            # are aligned with the true ones, we do not care if
-            # it is inner or outer
+        # select the bins of all the intervals at once.
+        # since we are sure that the interval bounds
+        # are aligned with the true ones, we do not care if
+        # it is inner or outer
 
-            all_idx = np.logical_or(all_idx,self._select_bins(interval.start_time,interval.stop_time))
+        all_idx = self._binned_spectrum_set.bin_mask_over_intervals(time_intervals.start_times,
+                                                                   time_intervals.stop_times)
 
-            total_time += interval.duration
+        total_time = sum(interval.duration for interval in time_intervals)
 
         # sum along the time axis
         self._counts = self._binned_spectrum_set.counts_per_bin[all_idx].sum(axis=0)
@@ -366,31 +403,10 @@ class BinnedSpectrumSeries(TimeSeries):
         self._time_intervals = time_intervals
 
 
-        tmp_counts = []
-        tmp_err = []  # Temporary list to hold the err counts per chan
-
         if self._poly_fit_exists:
 
-            if not self._poly_fit_exists:
-                raise RuntimeError('A polynomial fit to the channels does not exist!')
-
-            for chan in range(self._n_channels):
-
-                total_counts = 0
-                counts_err = 0
-
-                for tmin, tmax in zip(self._time_intervals.start_times, self._time_intervals.stop_times):
-                    # Now integrate the appropriate background polynomial
-                    total_counts += self._polynomials[chan].integral(tmin, tmax)
-                    counts_err += (self._polynomials[chan].integral_error(tmin, tmax)) ** 2
-
-                tmp_counts.append(total_counts)
-
-                tmp_err.append(np.sqrt(counts_err))
-
-            self._poly_counts = np.array(tmp_counts)
-
-            self._poly_count_err = np.array(tmp_err)
+            self._poly_counts, self._poly_count_err = self._integrate_polynomials(self._time_intervals.start_times,
+                                                                                 self._time_intervals.stop_times)
 
 
         self._exposure = self._binned_spectrum_set.exposure_per_bin[all_idx].sum()
@@ -409,8 +425,4 @@ class BinnedSpectrumSeries(TimeSeries):
         """
 
 
-        mask = self._select_bins(start, stop)
-
-
-
-        return self._binned_spectrum_set.exposure_per_bin[mask].sum()
\ No newline at end of file
+        return self._binned_spectrum_set.exposure_over_intervals(start, stop)[0]
@@ -15,7 +15,7 @@ from threeML.io.progress_bar import progress_bar
 from threeML.io.rich_display import display
 from threeML.utils.binner import TemporalBinner
 from threeML.utils.time_interval import TimeIntervalSet
-from threeML.utils.time_series.polynomial import polyfit, unbinned_polyfit
+from threeML.utils.time_series.polynomial import polyfit, unbinned_polyfit, PolynomialSet
 from threeML.utils.time_series.time_series import TimeSeries
 from threeML.io.plotting.light_curve_plots import binned_light_curve_plot
 
@@ -37,6 +37,113 @@ def ceildiv(a, b):
     return -(-a // b)
 
 
+def _histogram_over_closed_intervals(times, starts, stops, channels=None, n_channels=1, weights=None):
+    """
+    Count (or sum the weights of) the events falling within each of a set of closed intervals [start, stop],
+    for each channel, in a single pass over the events.
+
+    The events are histogrammed in two dimensions (time x channel) on the union of the bounds of
+    the intervals, keeping the events falling exactly on a bound separate, so that an event on the bound
+    shared by two adjacent intervals is accounted in both, as done when selecting one interval at a time.
+
+    :param times: the event times
+    :param starts: the start times of the intervals
+    :param stops: the stop times of the intervals
+    :param channels: the channel index (0 to n_channels - 1) of each event. Events outside this range are ignored
+    :param n_channels: the number of channels
+    :param weights: optional weights of the events
+    :return: (n_intervals x n_channels) array
+    """
+
+    bounds = np.unique(np.concatenate((starts, stops)))
+
+    n_bounds = bounds.shape[0]
+
+    if channels is None:
+
+        channels = np.zeros(times.shape[0], dtype=int)
+
+    selection = np.logical_and(channels >= 0, channels < n_channels)
+
+    left = np.searchsorted(bounds, times, side='left')
+    right = np.searchsorted(bounds, times, side='right')
+
+    on_bound = np.logical_and(selection, left != right)
+
+    # events strictly between bound k-1 and bound k go in the cell k-1
+
+    inside = np.logical_and(np.logical_and(selection, left == right), np.logical_and(left > 0, left < n_bounds))
+
+    def histogram(cell, mask, n_cells):
+
+        this_weights = None if weights is None else weights[mask]
+
+        hist = np.bincount(cell[mask] * n_channels + channels[mask], weights=this_weights,
+                           minlength=n_cells * n_channels).reshape(n_cells, n_channels)
+
+        # cumulative sum with a leading row of zeros so that cumulative[k] is the sum of the cells < k
+
+        return np.vstack((np.zeros((1, n_channels)), np.cumsum(hist, axis=0)))
+
+    cumulative_inside = histogram(left - 1, inside, n_bounds - 1)
+    cumulative_on_bound = histogram(left, on_bound, n_bounds)
+
+    i = np.searchsorted(bounds, starts)
+    j = np.searchsorted(bounds, stops)
+
+    return (cumulative_inside[j] - cumulative_inside[i]) + (cumulative_on_bound[j + 1] - cumulative_on_bound[i])
+
+
+class _GrowableArray(object):
+    def __init__(self, values):
+        """
+        A one-dimensional array which can be extended in place, in amortized O(length of the extension): the
+        storage grows geometrically, so that appending a chunk does not copy all the values each time.
+
+        :param values: the initial values (their dtype is the dtype of the array)
+        """
+
+        values = np.asarray(values)
+
+        self._storage = np.empty(max(2 * values.shape[0], 1024), dtype=values.dtype)
+        self._storage[:values.shape[0]] = values
+
+        self._size = values.shape[0]
+
+    @property
+    def values(self):
+        """
+        :return: a view of the values (it becomes stale after the next extension)
+        """
+
+        return self._storage[:self._size]
+
+    def extend(self, values):
+        """
+        append the values at the end of the array
+
+        :param values: the values to append
+        :return: a view of all the values
+        """
+
+        values = np.asarray(values)
+
+        new_size = self._size + values.shape[0]
+
+        if new_size > self._storage.shape[0]:
+
+            new_storage = np.empty(max(2 * self._storage.shape[0], new_size), dtype=self._storage.dtype)
+            new_storage[:self._size] = self._storage[:self._size]
+
+            self._storage = new_storage
+
+        self._storage[self._size:new_size] = values
+
+        self._size = new_size
+
+        return self.values
+
+
 class EventList(TimeSeries):
 
     def __init__(self,
@@ -86,10 +193,89 @@ class EventList(TimeSeries):
 
         self._temporal_binner = None
 
+        # the growable buffers of the event columns, created when events are first appended
+
+        self._event_buffers = None
+
+        # the counts per channel and exposure on the grid of the binned background fit, updated incrementally
+
+        self._background_table = None
+
         assert self._arrival_times.shape[0] == self._measurement.shape[
             0], "Arrival time (%d) and energies (%d) have different shapes" % (self._arrival_times.shape[0],
                                                                                self._measurement.shape[0])
 
+    def append_events(self, arrival_times, measurement, stop_time=None):
+        """
+        Append a chunk of events (for example while data are being received). The chunk must be sorted in time
+        and cannot precede the events already in the list. The cost is proportional to the size of the chunk.
+
+        The background fit is not repeated: call refit_polynomials() when needed.
+
+        :param arrival_times: the arrival times of the new events
+        :param measurement: the energies or pha channels of the new events
+        :param stop_time: the new stop time of the event list (default: the last arrival time, if later than the
+        current stop time)
+        :return: none
+        """
+
+        self._append_columns(stop_time, _arrival_times=arrival_times, _measurement=measurement)
+
+    def _append_columns(self, stop_time, **columns):
+        """
+        append values to the event columns (the attributes named as the keywords) and extend the event list
+
+        :param stop_time: the new stop time (None to extend it up to the last arrival time)
+        :param columns: the values to append to each column
+        :return: none
+        """
+
+        arrival_times = np.asarray(columns['_arrival_times'])
+
+        for name, values in columns.items():
+
+            assert np.shape(values)[0] == arrival_times.shape[0], "Arrival time (%d) and %s (%d) have different " \
+                                                                  "shapes" % (arrival_times.shape[0], name.strip('_'),
+                                                                              np.shape(values)[0])
+
+        if self._event_buffers is None:
+
+            assert np.all(np.diff(self._arrival_times) >= 0), 'Events can only be appended to a time-sorted list'
+
+            self._event_buffers = dict((name, _GrowableArray(getattr(self, name))) for name in columns)
+
+        if arrival_times.shape[0] > 0:
+
+            assert np.all(np.diff(arrival_times) >= 0), 'The appended events must be sorted in time'
+
+            assert self.n_events == 0 or arrival_times[0] >= self._arrival_times[-1], \
+                'The appended events cannot precede the events in the list'
+
+        for name, values in columns.items():
+
+            setattr(self, name, self._event_buffers[name].extend(values))
+
+        if stop_time is None:
+
+            stop_time = self._stop_time
+
+            if arrival_times.shape[0] > 0:
+
+                stop_time = max(stop_time, arrival_times[-1])
+
+        assert stop_time >= self._stop_time, 'The stop time of the event list cannot decrease'
+
+        self._stop_time = stop_time
+
+        # the data have changed, so the cached polynomial fits cannot be reused
+
+        self._data_version += 1
+
+        # the light curve pyramid is rebuilt on demand, while the background table is updated
+        # incrementally the next time it is needed
+
+        self._light_curve_pyramid = None
+
     @property
     def n_events(self):
 
@@ -232,58 +418,51 @@ class EventList(TimeSeries):
 
         else:
 
-            # otherwise, just use regular linear binning
+            # otherwise, just use regular linear binning. The light curve is read
+            # from the light curve pyramid if it has been built
 
-            bins = np.arange(start, stop + dt, dt)
+            time_bins, cnts, width, bkg = self.get_light_curve(start, stop, dt)
 
-        cnts, bins = np.histogram(self.arrival_times, bins=bins)
-        time_bins = np.array([[bins[i], bins[i + 1]] for i in range(len(bins) - 1)])
+            # the plotter wants the background *rate*
 
-        #width = np.diff(bins)
-        width = []
+            if bkg is not None:
 
-        # now we want to get the estimated background from the polynomial fit
-
-        if self.poly_fit_exists:
-
-            # we will store the bkg rate for each time bin
-
-            bkg = []
+                bkg = bkg / width
 
-            for j, tb in enumerate(time_bins):
+            return self._plot_light_curve(time_bins, cnts, width, bkg)
 
-                # zero out the bkg
-                tmpbkg = 0.
-
-                # we will use the exposure for the width
-
-                this_width = self.exposure_over_interval(tb[0], tb[1])
-
-                # sum up the counts over this interval
+        cnts, bins = np.histogram(self.arrival_times, bins=bins)
+        time_bins = np.array([[bins[i], bins[i + 1]] for i in range(len(bins) - 1)])
 
-                for poly in self.polynomials:
+        # we will use the exposure for the width
 
-                    tmpbkg += poly.integral(tb[0], tb[1])
+        width = self.exposure_over_intervals(time_bins[:, 0], time_bins[:, 1])
 
-                # capture the exposure
+        # now we want to get the estimated background from the polynomial fit
 
-                width.append(this_width)
+        if self.poly_fit_exists:
 
-                # capture the bkg *rate*
+            # integrate all the channels over all the time bins at once
+            # and store the bkg *rate* for each time bin
 
-                bkg.append(tmpbkg / this_width)
+            bkg = self.get_total_poly_count(time_bins[:, 0], time_bins[:, 1]) / width
 
         else:
 
             bkg = None
 
-            for j, tb in enumerate(time_bins):
+        return self._plot_light_curve(time_bins, cnts, width, bkg)
 
-                this_width = self.exposure_over_interval(tb[0], tb[1])
-
-                width.append(this_width)
+    def _plot_light_curve(self, time_bins, cnts, width, bkg):
+        """
+        plot a light curve along with the current selections
 
-        width = np.array(width)
+        :param time_bins: (n_bins x 2) array of the bin bounds
+        :param cnts: the counts in each bin
+        :param width: the exposure of each bin
+        :param bkg: the background rate in each bin (or None)
+        :return: the figure
+        """
 
         # pass all this to the light curve plotter
 
@@ -340,6 +519,79 @@ class EventList(TimeSeries):
 
         return counts_per_channel
 
+    def counts_over_intervals(self, starts, stops):
+        """
+        the number of counts over a set of intervals, computed with a single histogram of the events
+
+        :param starts: start times of the intervals
+        :param stops: stop times of the intervals
+        :return: array of counts
+        """
+
+        return _histogram_over_closed_intervals(self._arrival_times,
+                                                np.asarray(starts, dtype=float),
+                                                np.asarray(stops, dtype=float))[:, 0]
+
+    def count_per_channel_over_intervals(self, starts, stops):
+        """
+        the counts per channel over a set of intervals, computed with a single
+        histogram of the events
+
+        :param starts: start times of the intervals
+        :param stops: stop times of the intervals
+        :return: (n_intervals x n_channels) array
+        """
+
+        channels = np.asarray(self._measurement).astype(int) - self._first_channel
+
+        return _histogram_over_closed_intervals(self._arrival_times,
+                                                np.asarray(starts, dtype=float),
+                                                np.asarray(stops, dtype=float),
+                                                channels=channels,
+                                                n_channels=self._n_channels)
+
+    def _get_base_light_curve(self, edges):
+        """
+        the counts per channel and the exposure of each bin defined by the edges
+
+        :param edges: the bin edges
+        :return: ((n_bins x n_channels) counts, exposure)
+        """
+
+        channels = np.asarray(self._measurement).astype(int) - self._first_channel
+
+        counts, _, _ = np.histogram2d(self._arrival_times, channels,
+                                      bins=[edges, np.arange(self._n_channels + 1) - 0.5])
+
+        exposure = self.exposure_over_intervals(edges[:-1], edges[1:])
+
+        return counts.astype(np.int64), exposure
+
+    def _get_light_curve_directly(self, edges, channel_mask):
+        """
+        the counts (summed over the channels in the mask) and the exposure of each bin defined by the edges
+
+        :param edges: the bin edges
+        :param channel_mask: boolean mask of the channels to use
+        :return: (counts, exposure)
+        """
+
+        channels = np.asarray(self._measurement).astype(int) - self._first_channel
+
+        if channel_mask.all():
+
+            times = self._arrival_times
+
+        else:
+
+            times = self._arrival_times[channel_mask[channels]]
+
+        counts, _ = np.histogram(times, bins=edges)
+
+        exposure = self.exposure_over_intervals(edges[:-1], edges[1:])
+
+        return counts, exposure
+
     def _select_events(self, start, stop):
         """
         return an index of the selected events
@@ -350,6 +602,107 @@ class EventList(TimeSeries):
 
         return np.logical_and(start <= self._arrival_times, self._arrival_times <= stop)
 
+    def _exposure_over_bins(self, edges, first_event):
+        """
+        the exposure of each bin defined by the edges, as used in the background table
+
+        :param edges: the bin edges
+        :param first_event: the index of the first event which can fall in the bins (the events are time-sorted)
+        :return: array of exposures
+        """
+
+        return self.exposure_over_intervals(edges[:-1], edges[1:])
+
+    def _get_background_table(self):
+        """
+        The counts per channel and the exposure on a grid of 1 s bins covering the event list, used by the binned
+        background fit. The table is kept between fits: when events have been appended, only the bins from the last
+        one of the previous table onward are computed again.
+
+        :return: (edges, (n_bins x n_channels) counts, exposure)
+        """
+
+        bin_width = 1.  # seconds
+        edges = np.arange(self._start_time, self._stop_time, bin_width)
+
+        table = self._background_table
+
+        if table is not None and table['n_events'] == self.n_events and table['edges'].shape == edges.shape:
+
+            return table['edges'], table['counts'], table['exposure']
+
+        if table is None:
+
+            first_bin = 0
+
+        else:
+
+            # the last bin of the previous table is closed on the right, so it changes as soon as the grid grows
+
+            first_bin = table['counts'].shape[0] - 1
+
+            if table['n_events'] < self.n_events:
+
+                first_bin = min(first_bin, np.searchsorted(edges, self._arrival_times[table['n_events']], 'right') - 1)
+
+            first_bin = max(first_bin, 0)
+
+        first_event = 0 if first_bin == 0 else np.searchsorted(self._arrival_times, edges[first_bin])
+
+        channels = np.asarray(self._measurement[first_event:]).astype(int) - self._first_channel
+
+        counts, _, _ = np.histogram2d(self._arrival_times[first_event:], channels,
+                                      bins=[edges[first_bin:], np.arange(self._n_channels + 1) - 0.5])
+
+        exposure = self._exposure_over_bins(edges[first_bin:], first_event)
+
+        if first_bin > 0:
+
+            counts = np.vstack((table['counts'][:first_bin], counts))
+            exposure = np.concatenate((table['exposure'][:first_bin], exposure))
+
+        self._background_table = dict(edges=edges, counts=counts, exposure=exposure, n_events=self.n_events)
+
+        return edges, counts, exposure
+
+    def _count_selected_events_in_bins(self, edges, bin_indices):
+        """
+        the counts per channel in some bins of the background table, counting only the events which are inside the
+        background selections
+
+        :param edges: the edges of the bins of the background table
+        :param bin_indices: the indices of the bins
+        :return: (n_bins x n_channels) counts
+        """
+
+        counts = np.zeros((len(bin_indices), self._n_channels))
+
+        last_bin = edges.shape[0] - 2
+
+        for row, i in enumerate(bin_indices):
+
+            # the last bin is closed on the right, as in the table
+
+            first_event = np.searchsorted(self._arrival_times, edges[i], 'left')
+            last_event = np.searchsorted(self._arrival_times, edges[i + 1], 'right' if i == last_bin else 'left')
+
+            times = self._arrival_times[first_event:last_event]
+
+            in_selections = np.zeros(times.shape[0], dtype=bool)
+
+            for selection in self._poly_intervals:
+
+                in_selections |= np.logical_and(times >= selection.start_time, times <= selection.stop_time)
+
+            channels = np.asarray(self._measurement[first_event:last_event])[in_selections].astype(int) - \
+                       self._first_channel
+
+            channels = channels[np.logical_and(channels >= 0, channels < self._n_channels)]
+
+            counts[row] = np.bincount(channels, minlength=self._n_channels)
+
+        return counts
+
     def _fit_polynomials(self):
         """
 
@@ -366,72 +719,52 @@ class EventList(TimeSeries):
         self._fit_method_info['bin type'] = 'Binned'
         self._fit_method_info['fit method'] = threeML_config['event list']['binned fit method']
 
-        # Select all the events that are in the background regions
-        # and make a mask
+        # The counts and exposure in 1 s bins over the whole event list
 
-        all_bkg_masks = []
+        edges, counts, exposure_per_bin = self._get_background_table()
 
-        for selection in self._poly_intervals:
-            all_bkg_masks.append(
-                np.logical_and(self._arrival_times >= selection.start_time, self._arrival_times <= selection.stop_time))
-        poly_mask = all_bkg_masks[0]
+        # Find the mean time of the bins
 
-        # If there are multiple masks:
-        if len(all_bkg_masks) > 1:
-            for mask in all_bkg_masks[1:]:
-                poly_mask = np.logical_or(poly_mask, mask)
+        mean_time = 0.5 * (edges[:-1] + edges[1:])
 
-        # Select the all the events in the poly selections
-        # We only need to do this once
-
-        total_poly_events = self._arrival_times[poly_mask]
+        # This calculation removes the unselected portion of the light curve
+        # so that we are not fitting zero counts
 
-        # For the channel energies we will need to down select again.
-        # We can go ahead and do this to avoid repeated computations
+        non_zero_mask = np.zeros(mean_time.shape[0], dtype=bool)
 
-        total_poly_energies = self._measurement[poly_mask]
+        for selection in self._poly_intervals:
 
-        # This calculation removes the unselected portion of the light curve
-        # so that we are not fitting zero counts. It will be used in the channel calculations
-        # as well
+            non_zero_mask |= np.logical_and(mean_time >= selection.start_time, mean_time <= selection.stop_time)
 
-        bin_width = 1.    # seconds
-        these_bins = np.arange(self._start_time, self._stop_time, bin_width)
+        # The bins at the edges of the selections contain also events outside of them, which must not be counted.
+        # Only these few bins are counted again, the others are taken from the table as they are
 
-        cnts, bins = np.histogram(total_poly_events, bins=these_bins)
+        inside_selections = np.zeros(mean_time.shape[0], dtype=bool)
 
-        # Find the mean time of the bins and calculate the exposure in each bin
-        mean_time = []
-        exposure_per_bin = []
-        for i in xrange(len(bins) - 1):
-            m = np.mean((bins[i], bins[i + 1]))
-            mean_time.append(m)
+        for selection in self._poly_intervals:
 
-            exposure_per_bin.append(self.exposure_over_interval(bins[i], bins[i + 1]))
+            inside_selections |= np.logical_and(edges[:-1] >= selection.start_time,
+                                                edges[1:] <= selection.stop_time)
 
-        mean_time = np.array(mean_time)
+        edge_bins = np.flatnonzero(np.logical_and(non_zero_mask, ~inside_selections))
 
-        exposure_per_bin = np.array(exposure_per_bin)
+        if edge_bins.shape[0] > 0:
 
-        # Remove bins with zero counts
-        all_non_zero_mask = []
+            counts = np.array(counts, copy=True)
 
-        for selection in self._poly_intervals:
-            all_non_zero_mask.append(
-                np.logical_and(mean_time >= selection.start_time, mean_time <= selection.stop_time))
+            counts[edge_bins] = self._count_selected_events_in_bins(edges, edge_bins)
 
-        non_zero_mask = all_non_zero_mask[0]
-        if len(all_non_zero_mask) > 1:
-            for mask in all_non_zero_mask[1:]:
-                non_zero_mask = np.logical_or(mask, non_zero_mask)
+        mean_time = mean_time[non_zero_mask]
+        counts = counts[non_zero_mask]
+        exposure_per_bin = exposure_per_bin[non_zero_mask]
 
         # Now we will find the the best poly order unless the use specified one
-        # The total cnts (over channels) is binned to .1 sec intervals
+        # The total cnts (over channels) is binned to 1 sec intervals
 
         if self._user_poly_order == -1:
 
             self._optimal_polynomial_grade = self._fit_global_and_determine_optimum_grade(
-                cnts[non_zero_mask], mean_time[non_zero_mask], exposure_per_bin[non_zero_mask])
+                counts.sum(axis=1), mean_time, exposure_per_bin)
             if self._verbose:
                 print("Auto-determined polynomial order: %d" % self._optimal_polynomial_grade)
                 print('\n')
@@ -440,35 +773,24 @@ class EventList(TimeSeries):
 
             self._optimal_polynomial_grade = self._user_poly_order
 
-        channels = range(self._first_channel, self._n_channels + self._first_channel)
+        # start from the previous fit, if any (for example before new events were appended)
+
+        initial_guesses = self._get_warm_start(self._optimal_polynomial_grade)
 
         polynomials = []
 
         with progress_bar(self._n_channels, title="Fitting %s background" % self._instrument) as p:
-            for channel in channels:
-                channel_mask = total_poly_energies == channel
-
-                # Mask background events and current channel
-                # poly_chan_mask = np.logical_and(poly_mask, channel_mask)
-                # Select the masked events
-
-                current_events = total_poly_events[channel_mask]
+            for i in range(self._n_channels):
 
-                # now bin the selected channel counts
-
-                cnts, bins = np.histogram(current_events, bins=these_bins)
-
-                # Put data to fit in an x vector and y vector
-
-                polynomial, _ = polyfit(mean_time[non_zero_mask], cnts[non_zero_mask], self._optimal_polynomial_grade,
-                                        exposure_per_bin[non_zero_mask])
+                polynomial, _ = polyfit(mean_time, counts[:, i], self._optimal_polynomial_grade, exposure_per_bin,
+                                        initial_guess=initial_guesses[i])
 
                 polynomials.append(polynomial)
                 p.increase()
 
         # We are now ready to return the polynomials
 
-        self._polynomials = polynomials
+        self._polynomials = PolynomialSet(polynomials)
 
     def _unbinned_fit_polynomials(self):
 
@@ -533,10 +855,14 @@ class EventList(TimeSeries):
         t_start = self._poly_intervals.start_times
         t_stop = self._poly_intervals.stop_times
 
+        # start from the previous fit, if any (for example before new events were appended)
+
+        initial_guesses = self._get_warm_start(self._optimal_polynomial_grade)
+
         polynomials = []
 
         with progress_bar(self._n_channels, title="Fitting %s background" % self._instrument) as p:
-            for channel in channels:
+            for channel, initial_guess in zip(channels, initial_guesses):
                 channel_mask = total_poly_energies == channel
 
                 # Mask background events and current channel
@@ -546,14 +872,14 @@ class EventList(TimeSeries):
                 current_events = total_poly_events[channel_mask]
 
                 polynomial, _ = unbinned_polyfit(current_events, self._optimal_polynomial_grade, t_start, t_stop,
-                                                 poly_exposure)
+                                                 poly_exposure, initial_guess=initial_guess)
 
                 polynomials.append(polynomial)
                 p.increase()
 
         # We are now ready to return the polynomials
 
-        self._polynomials = polynomials
+        self._polynomials = PolynomialSet(polynomials)
 
 
 class EventListWithDeadTime(EventList):
@@ -612,6 +938,57 @@ class EventListWithDeadTime(EventList):
 
             self._dead_time = None
 
+    def append_events(self, arrival_times, measurement, dead_time=None, stop_time=None):
+        """
+        Append a chunk of events (for example while data are being received). The chunk must be sorted in time
+        and cannot precede the events already in the list. The cost is proportional to the size of the chunk.
+
+        The background fit is not repeated: call refit_polynomials() when needed.
+
+        :param arrival_times: the arrival times of the new events
+        :param measurement: the energies or pha channels of the new events
+        :param dead_time: the dead time of each new event (required if the list has dead times, not allowed
+        otherwise)
+        :param stop_time: the new stop time of the event list (default: the last arrival time, if later than the
+        current stop time)
+        :return: none
+        """
+
+        columns = dict(_arrival_times=arrival_times, _measurement=measurement)
+
+        if self._dead_time is not None:
+
+            assert dead_time is not None, 'The dead time of the appended events is required'
+
+            columns['_dead_time'] = dead_time
+
+        else:
+
+            assert dead_time is None, 'The event list has no dead times, the dead time of the appended events ' \
+                                      'would be ignored'
+
+        self._append_columns(stop_time, **columns)
+
+    def _exposure_over_bins(self, edges, first_event):
+        """
+        the exposure of each bin defined by the edges, as used in the background table
+
+        :param edges: the bin edges
+        :param first_event: the index of the first event which can fall in the bins (the events are time-sorted)
+        :return: array of exposures
+        """
+
+        exposure = np.diff(edges)
+
+        if self._dead_time is not None:
+
+            dead_time, _ = np.histogram(self._arrival_times[first_event:], bins=edges,
+                                        weights=self._dead_time[first_event:])
+
+            exposure = exposure - dead_time
+
+        return exposure
+
     def exposure_over_interval(self, start, stop):
         """
         calculate the exposure over the given interval
@@ -633,6 +1010,30 @@ class EventListWithDeadTime(EventList):
 
         return (stop - start) - interval_deadtime
 
+    def exposure_over_intervals(self, starts, stops):
+        """
+        calculate the exposure over a set of intervals, summing the dead time
+        of the events of all the intervals in a single pass
+
+        :param starts: start times of the intervals
+        :param stops: stop times of the intervals
+        :return: array of exposures
+        """
+
+        starts = np.asarray(starts, dtype=float)
+        stops = np.asarray(stops, dtype=float)
+
+        if self._dead_time is not None:
+
+            interval_deadtime = _histogram_over_closed_intervals(self._arrival_times, starts, stops,
+                                                                 weights=self._dead_time)[:, 0]
+
+        else:
+
+            interval_deadtime = 0
+
+        return (stops - starts) - interval_deadtime
+
     def set_active_time_intervals(self, *args):
         '''Set the time interval(s) to be used during the analysis.
 
@@ -678,31 +1079,10 @@ class EventListWithDeadTime(EventList):
 
         self._counts = np.array(tmp_counts)
 
-        tmp_counts = []
-        tmp_err = []    # Temporary list to hold the err counts per chan
-
         if self._poly_fit_exists:
 
-            if not self._poly_fit_exists:
-                raise RuntimeError('A polynomial fit to the channels does not exist!')
-
-            for chan in range(self._n_channels):
-
-                total_counts = 0
-                counts_err = 0
-
-                for tmin, tmax in zip(self._time_intervals.start_times, self._time_intervals.stop_times):
-                    # Now integrate the appropriate background polynomial
-                    total_counts += self._polynomials[chan].integral(tmin, tmax)
-                    counts_err += (self._polynomials[chan].integral_error(tmin, tmax))**2
-
-                tmp_counts.append(total_counts)
-
-                tmp_err.append(np.sqrt(counts_err))
-
-            self._poly_counts = np.array(tmp_counts)
-
-            self._poly_count_err = np.array(tmp_err)
+            self._poly_counts, self._poly_count_err = self._integrate_polynomials(self._time_intervals.start_times,
+                                                                                 self._time_intervals.stop_times)
 
         # Dead time correction
 
@@ -780,6 +1160,35 @@ class EventListWithDeadTimeFraction(EventList):
 
             self._dead_time_fraction = None
 
+    def append_events(self, arrival_times, measurement, dead_time_fraction=None, stop_time=None):
+        """
+        Append a chunk of events (for example while data are being received). The chunk must be sorted in time
+        and cannot precede the events already in the list. The cost is proportional to the size of the chunk.
+
+        :param arrival_times: the arrival times of the new events
+        :param measurement: the energies or pha channels of the new events
+        :param dead_time_fraction: the dead time fraction of each new event (required if the list has them, not
+        allowed otherwise)
+        :param stop_time: the new stop time of the event list (default: the last arrival time, if later than the
+        current stop time)
+        :return: none
+        """
+
+        columns = dict(_arrival_times=arrival_times, _measurement=measurement)
+
+        if self._dead_time_fraction is not None:
+
+            assert dead_time_fraction is not None, 'The dead time fraction of the appended events is required'
+
+            columns['_dead_time_fraction'] = dead_time_fraction
+
+        else:
+
+            assert dead_time_fraction is None, 'The event list has no dead time fractions, the dead time fraction ' \
+                                               'of the appended events would be ignored'
+
+        self._append_columns(stop_time, **columns)
+
     def exposure_over_interval(self, start, stop):
         """
         calculate the exposure over the given interval
@@ -847,31 +1256,10 @@ class EventListWithDeadTimeFraction(EventList):
 
         self._counts = np.array(tmp_counts)
 
-        tmp_counts = []
-        tmp_err = []    # Temporary list to hold the err counts per chan
-
         if self._poly_fit_exists:
 
-            if not self._poly_fit_exists:
-                raise RuntimeError('A polynomial fit to the channels does not exist!')
-
-            for chan in range(self._n_channels):
-
-                total_counts = 0
-                counts_err = 0
-
-                for tmin, tmax in zip(self._time_intervals.start_times, self._time_intervals.stop_times):
-                    # Now integrate the appropriate background polynomial
-                    total_counts += self._polynomials[chan].integral(tmin, tmax)
-                    counts_err += (self._polynomials[chan].integral_error(tmin, tmax))**2
-
-                tmp_counts.append(total_counts)
-
-                tmp_err.append(np.sqrt(counts_err))
-
-            self._poly_counts = np.array(tmp_counts)
-
-            self._poly_count_err = np.array(tmp_err)
+            self._poly_counts, self._poly_count_err = self._integrate_polynomials(self._time_intervals.start_times,
+                                                                                 self._time_intervals.stop_times)
 
         # Dead time correction
 
@@ -947,6 +1335,17 @@ class EventListWithLiveTime(EventList):
         self._live_time_starts = np.asarray(live_time_starts)
         self._live_time_stops = np.asarray(live_time_stops)
 
+    def append_events(self, arrival_times, measurement, stop_time=None):
+        """
+        Not supported: the live time of an EventListWithLiveTime is given over intervals, not per event, so it
+        cannot be extended with the appended events
+
+        :raise RuntimeError: always
+        """
+
+        raise RuntimeError('Events cannot be appended to an EventListWithLiveTime, as its live time is not '
+                           'tabulated per event')
+
     def exposure_over_interval(self, start, stop):
         """
 
@@ -1067,32 +1466,10 @@ class EventListWithLiveTime(EventList):
 
         self._counts = np.array(tmp_counts)
 
-        tmp_counts = []
-        tmp_err = []    # Temporary list to hold the err counts per chan
-
         if self._poly_fit_exists:
 
-            if not self._poly_fit_exists:
-                raise RuntimeError('A polynomial fit to the channels does not exist!')
-
-            # for chan in range(self._first_channel, self._n_channels + self._first_channel):
-            for chan in range(self._n_channels):
-
-                total_counts = 0
-                counts_err = 0
-
-                for tmin, tmax in zip(self._time_intervals.start_times, self._time_intervals.stop_times):
-                    # Now integrate the appropriate background polynomial
-                    total_counts += self._polynomials[chan].integral(tmin, tmax)
-                    counts_err += (self._polynomials[chan].integral_error(tmin, tmax))**2
-
-                tmp_counts.append(total_counts)
-
-                tmp_err.append(np.sqrt(counts_err))
-
-            self._poly_counts = np.array(tmp_counts)
-
-            self._poly_count_err = np.array(tmp_err)
+            self._poly_counts, self._poly_count_err = self._integrate_polynomials(self._time_intervals.start_times,
+                                                                                 self._time_intervals.stop_times)
 
         # Live time correction
 
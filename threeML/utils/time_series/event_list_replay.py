@@ -0,0 +1,121 @@
+import numpy as np
+
+from threeML.utils.data_builders.fermi.gbm_data import GBMTTEFile
+from threeML.utils.time_series.event_list import EventListWithDeadTime
+
+
+class EventListReplay(object):
+    def __init__(self, arrival_times, measurement, n_channels, start_time, stop_time, dead_time=None,
+                 chunk_duration=1., first_channel=0, mission=None, instrument=None):
+        """
+        Replays recorded events as if they were being received, in chunks of fixed duration, by appending them to an
+        EventListWithDeadTime. This can be used to exercise (and time) an analysis which follows the data as they
+        arrive, such as a background fit repeated after each chunk.
+
+        :param arrival_times: the (time-sorted) arrival times of the events
+        :param measurement: the pha channels of the events
+        :param n_channels: number of detector channels
+        :param start_time: start time of the observation
+        :param stop_time: stop time of the observation
+        :param dead_time: the dead time of each event (optional)
+        :param chunk_duration: the duration of each chunk
+        :param first_channel: where detchans begin indexing
+        :param mission: mission name
+        :param instrument: instrument name
+        """
+
+        assert chunk_duration > 0, 'The chunk duration must be positive'
+
+        assert stop_time > start_time, 'The stop time must be after the start time'
+
+        self._arrival_times = np.asarray(arrival_times)
+        self._measurement = np.asarray(measurement)
+        self._dead_time = None if dead_time is None else np.asarray(dead_time)
+
+        assert np.all(np.diff(self._arrival_times) >= 0), 'The arrival times must be sorted'
+
+        self._n_channels = n_channels
+        self._start_time = start_time
+        self._stop_time = stop_time
+        self._first_channel = first_channel
+        self._mission = mission
+        self._instrument = instrument
+
+        # the bounds of the chunks, and the index of the first event of each of them
+
+        self._chunk_bounds = np.append(np.arange(start_time, stop_time, chunk_duration), stop_time)
+
+        self._first_events = np.searchsorted(self._arrival_times, self._chunk_bounds)
+
+        self._first_events[0] = 0
+        self._first_events[-1] = self._arrival_times.shape[0]
+
+    @classmethod
+    def from_gbm_tte(cls, tte_file, chunk_duration=1., trigger_time=None):
+        """
+        Replay the events of a GBM TTE file
+
+        :param tte_file: GBM tte event file
+        :param chunk_duration: the duration of each chunk
+        :param trigger_time: trigger time if needed
+        :return: EventListReplay
+        """
+
+        gbm_tte_file = GBMTTEFile(tte_file)
+
+        if trigger_time is not None:
+            gbm_tte_file.trigger_time = trigger_time
+
+        return cls(arrival_times=gbm_tte_file.arrival_times - gbm_tte_file.trigger_time,
+                   measurement=gbm_tte_file.energies,
+                   n_channels=gbm_tte_file.n_channels,
+                   start_time=gbm_tte_file.tstart - gbm_tte_file.trigger_time,
+                   stop_time=gbm_tte_file.tstop - gbm_tte_file.trigger_time,
+                   dead_time=gbm_tte_file.deadtime,
+                   chunk_duration=chunk_duration,
+                   first_channel=0,
+                   instrument=gbm_tte_file.det_name,
+                   mission=gbm_tte_file.mission)
+
+    @property
+    def n_chunks(self):
+
+        return self._chunk_bounds.shape[0] - 1
+
+    def _chunk(self, i, column):
+
+        if column is None:
+
+            return None
+
+        return column[self._first_events[i]:self._first_events[i + 1]]
+
+    def replay(self):
+        """
+        A generator which yields the event list after each chunk has been received. The first chunk creates
+        the event list, the following ones are appended to it, so that the same event list grows at each step.
+
+        :return: generator of EventListWithDeadTime
+        """
+
+        event_list = EventListWithDeadTime(arrival_times=self._chunk(0, self._arrival_times),
+                                           measurement=self._chunk(0, self._measurement),
+                                           n_channels=self._n_channels,
+                                           start_time=self._start_time,
+                                           stop_time=self._chunk_bounds[1],
+                                           dead_time=self._chunk(0, self._dead_time),
+                                           first_channel=self._first_channel,
+                                           instrument=self._instrument,
+                                           mission=self._mission,
+                                           verbose=False)
+
+        yield event_list
+
+        for i in range(1, self.n_chunks):
+
+            event_list.append_events(self._chunk(i, self._arrival_times),
+                                     self._chunk(i, self._measurement),
+                                     dead_time=self._chunk(i, self._dead_time),
+                                     stop_time=self._chunk_bounds[i + 1])
+
+            yield event_list
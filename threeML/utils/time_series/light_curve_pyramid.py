@@ -0,0 +1,142 @@
+import numpy as np
+
+
+class LightCurvePyramid(object):
+    def __init__(self, grid_start, base_dt, counts, exposure, n_levels=8):
+        """
+        A multi-resolution table of a time series from which light curves can be extracted in O(n_bins),
+        for any channel range.
+
+        The base level holds the cumulative counts (in time *and* channel) and the cumulative exposure on a regular
+        grid of resolution base_dt starting at grid_start. Each coarser level halves the resolution of the previous one,
+        so that coarse light curves are read from small, contiguous tables.
+
+        A light curve can be extracted if its bin edges fall on the grid of one of the levels.
+
+        :param grid_start: the start of the grid of the base level
+        :param base_dt: the resolution of the base level
+        :param counts: (n_base_bins x n_channels) counts in each base bin
+        :param exposure: exposure of each base bin
+        :param n_levels: the number of levels (the coarsest has a resolution of base_dt * 2**(n_levels - 1))
+        """
+
+        counts = np.asarray(counts)
+        exposure = np.asarray(exposure, dtype=float)
+
+        assert counts.ndim == 2, 'counts must be a (n_bins x n_channels) array'
+
+        assert counts.shape[0] == exposure.shape[0], 'counts and exposure must have the same number of bins'
+
+        assert counts.shape[0] % 2 ** (n_levels - 1) == 0, 'the number of base bins must be a multiple of the ' \
+                                                           'coarsest level'
+
+        self._grid_start = float(grid_start)
+        self._base_dt = float(base_dt)
+        self._n_channels = counts.shape[1]
+
+        # the base level: cumulative sums with a leading row (and column) of zeros, so that
+        # the counts within bins [i, j) and channels [a, b) are C[j, b] - C[i, b] - C[j, a] + C[i, a]
+
+        # integer counts (events) are accumulated exactly, other counts (for example from binned spectra with
+        # non-integer counts) as floats
+
+        dtype = np.int64 if np.issubdtype(counts.dtype, np.integer) else float
+
+        cumulative_counts = np.zeros((counts.shape[0] + 1, counts.shape[1] + 1), dtype=dtype)
+
+        cumulative_counts[1:, 1:] = np.cumsum(np.cumsum(counts, axis=0), axis=1)
+
+        cumulative_exposure = np.zeros(exposure.shape[0] + 1)
+
+        cumulative_exposure[1:] = np.cumsum(exposure)
+
+        # the coarser levels are the edges of the base level taken every 2**level
+
+        self._cumulative_counts = []
+        self._cumulative_exposure = []
+
+        for level in range(n_levels):
+
+            self._cumulative_counts.append(np.ascontiguousarray(cumulative_counts[::2 ** level]))
+            self._cumulative_exposure.append(np.ascontiguousarray(cumulative_exposure[::2 ** level]))
+
+    @property
+    def n_levels(self):
+
+        return len(self._cumulative_counts)
+
+    @property
+    def base_dt(self):
+
+        return self._base_dt
+
+    @property
+    def grid_start(self):
+
+        return self._grid_start
+
+    @property
+    def grid_stop(self):
+
+        return self._grid_start + (self._cumulative_exposure[0].shape[0] - 1) * self._base_dt
+
+    def _find_level_indices(self, edges):
+        """
+        find the coarsest level whose grid contains all the edges
+
+        :param edges: the bin edges
+        :return: (level, indices of the edges in the level) or (None, None)
+        """
+
+        for level in range(self.n_levels - 1, -1, -1):
+
+            resolution = self._base_dt * 2 ** level
+
+            position = (edges - self._grid_start) / resolution
+
+            indices = np.round(position).astype(int)
+
+            if not np.allclose(position, indices, rtol=0, atol=1E-6):
+
+                continue
+
+            if indices.min() < 0 or indices.max() >= self._cumulative_exposure[level].shape[0]:
+
+                return None, None
+
+            return level, indices
+
+        return None, None
+
+    def get_light_curve(self, edges, channel_start=0, channel_stop=None):
+        """
+        get the counts and exposure in the bins defined by the edges, summing the
+        channels with index in [channel_start, channel_stop)
+
+        :param edges: the edges of the bins (must lie on the grid of one of the levels)
+        :param channel_start: the first channel index to use
+        :param channel_stop: the channel index after the last to use (None means up to the last channel)
+        :return: (counts, exposure) or None if the edges cannot be obtained from the pyramid
+        """
+
+        if channel_stop is None:
+
+            channel_stop = self._n_channels
+
+        assert 0 <= channel_start < channel_stop <= self._n_channels, 'invalid channel range'
+
+        level, indices = self._find_level_indices(np.asarray(edges, dtype=float))
+
+        if level is None:
+
+            return None
+
+        table = self._cumulative_counts[level]
+
+        cumulative = table[indices, channel_stop] - table[indices, channel_start]
+
+        counts = np.diff(cumulative)
+
+        exposure = np.diff(self._cumulative_exposure[level][indices])
+
+        return counts, exposure
@@ -123,21 +123,30 @@ class Polynomial(object):
 
             self._cov_matrix = np.zeros((n_dim, n_dim)) * np.nan
 
-        # Invert it to get the covariance matrix
+        else:
+
+            self.compute_covariance_matrix_from_hessian(hessian_matrix)
+
+    def compute_covariance_matrix_from_hessian(self, hessian_matrix):
+        """
+        Compute the covariance matrix of this fit by inverting the provided hessian matrix
+        :param hessian_matrix: the hessian of the -loglike at the best fit parameters
+        :return:
+        """
 
         try:
 
+            assert np.all(np.isfinite(hessian_matrix))
+
             covariance_matrix = np.linalg.inv(hessian_matrix)
 
             self._cov_matrix = covariance_matrix
 
-
-
         except:
 
             custom_warnings.warn("Cannot invert Hessian matrix, looks like the matrix is singluar")
 
-            n_dim = len(best_fit_parameters)
+            n_dim = hessian_matrix.shape[0]
 
             self._cov_matrix = np.zeros((n_dim, n_dim)) * np.nan
 
@@ -171,6 +180,128 @@ class Polynomial(object):
         return np.sqrt(err2)
 
 
+class PolynomialSet(object):
+    def __init__(self, polynomials):
+        """
+        A set of polynomials of the same degree (typically one per channel) stored as a
+        (n_polynomials x (degree+1)) coefficient matrix and a stacked (n_polynomials x (degree+1) x (degree+1))
+        covariance tensor, so that integrals and their errors over many intervals are computed for all
+        the polynomials at once.
+
+        The set behaves as a sequence of the original Polynomial objects.
+
+        :param polynomials: a list of Polynomial objects
+        """
+
+        self._polynomials = list(polynomials)
+
+        assert len(self._polynomials) > 0, 'a PolynomialSet needs at least one polynomial'
+
+        degrees = np.unique([poly.degree for poly in self._polynomials])
+
+        assert len(degrees) == 1, 'all the polynomials in a PolynomialSet must have the same degree'
+
+        self._degree = degrees[0]
+
+        self._coefficients = np.array([poly.coefficients for poly in self._polynomials], dtype=float)
+
+        self._covariance_matrices = np.array([poly.covariance_matrix for poly in self._polynomials], dtype=float)
+
+        self._i_plus_1 = np.arange(1, self._degree + 2, dtype=float)
+
+    @classmethod
+    def from_previous_fit(cls, coefficients, covariances):
+        """
+        build the set from the coefficients and covariance matrices of a previous fit
+
+        :param coefficients: (n_polynomials x (degree+1)) coefficients
+        :param covariances: (n_polynomials x (degree+1) x (degree+1)) covariance matrices
+        :return: PolynomialSet
+        """
+
+        return cls([Polynomial.from_previous_fit(coeff, cov) for coeff, cov in zip(coefficients, covariances)])
+
+    def __len__(self):
+
+        return len(self._polynomials)
+
+    def __getitem__(self, item):
+
+        return self._polynomials[item]
+
+    def __iter__(self):
+
+        return iter(self._polynomials)
+
+    @property
+    def degree(self):
+        """
+        the degree of the polynomials
+        :return:
+        """
+
+        return self._degree
+
+    @property
+    def coefficients(self):
+        """
+        the (n_polynomials x (degree+1)) coefficient matrix
+        :return:
+        """
+
+        return self._coefficients
+
+    @property
+    def covariance_matrices(self):
+        """
+        the (n_polynomials x (degree+1) x (degree+1)) covariance tensor
+        :return:
+        """
+
+        return self._covariance_matrices
+
+    def _integral_basis(self, xmin, xmax):
+        """
+        the basis of the integral x^(i+1) / (i+1) evaluated between xmin and xmax
+
+        :param xmin: start(s) of the interval(s)
+        :param xmax: stop(s) of the interval(s)
+        :return: array of shape broadcast(xmin, xmax).shape + (degree+1,)
+        """
+
+        xmin, xmax = np.broadcast_arrays(np.asarray(xmin, dtype=float), np.asarray(xmax, dtype=float))
+
+        return (np.power(xmax[..., np.newaxis], self._i_plus_1) -
+                np.power(xmin[..., np.newaxis], self._i_plus_1)) / self._i_plus_1
+
+    def integral(self, xmin, xmax):
+        """
+        Evaluate the integral of all the polynomials between xmin and xmax
+
+        :param xmin: start(s) of the interval(s) (scalar or array)
+        :param xmax: stop(s) of the interval(s) (scalar or array)
+        :return: array of shape broadcast(xmin, xmax).shape + (n_polynomials,)
+        """
+
+        return np.dot(self._integral_basis(xmin, xmax), self._coefficients.T)
+
+    def integral_error(self, xmin, xmax):
+        """
+        computes the error on the integral of all the polynomials between xmin and xmax
+
+        :param xmin: start(s) of the interval(s) (scalar or array)
+        :param xmax: stop(s) of the interval(s) (scalar or array)
+        :return: array of shape broadcast(xmin, xmax).shape + (n_polynomials,)
+        """
+
+        c = self._integral_basis(xmin, xmax)
+
+        err2 = np.einsum('...i,nij,...j->...n', c, self._covariance_matrices, c)
+
+        return np.sqrt(err2)
+
+
+
 class PolyLogLikelihood(object):
 
     def __init__(self, model, exposure):
@@ -179,10 +310,8 @@ class PolyLogLikelihood(object):
         self._parameters = model.coefficients
         self._exposure = exposure
 
-        # build the covariance call
-        self._build_cov_call()
-
-
+        # the powers of the polynomial basis
+        self._powers = np.arange(model.degree + 1, dtype=float)
 
     def _evaluate_logM(self, M):
         # Evaluate the logarithm with protection for negative or small
@@ -218,8 +347,34 @@ class PolyLogLikelihood(object):
 
         return v, tiny
 
+    def is_valid(self, parameters):
+        """
+        whether the analytic derivatives can be computed for these parameters, i.e., the model is
+        strictly positive wherever its logarithm enters the statistic
+
+        :param parameters: the polynomial coefficients
+        :return: bool
+        """
+
+        raise NotImplementedError('must be built in subclass')
+
+    def gradient(self, parameters):
+        """
+        the analytic gradient of the statistic with respect to the coefficients
+
+        :param parameters: the polynomial coefficients
+        :return: array of size degree+1
+        """
+
+        raise NotImplementedError('must be built in subclass')
+
+    def hessian(self, parameters):
+        """
+        the analytic hessian of the statistic with respect to the coefficients
 
-    def _build_cov_call(self):
+        :param parameters: the polynomial coefficients
+        :return: (degree+1) x (degree+1) array
+        """
 
         raise NotImplementedError('must be built in subclass')
 
@@ -240,44 +395,11 @@ class PolyBinnedLogLikelihood(PolyLogLikelihood):
 
         super(PolyBinnedLogLikelihood,self).__init__(model, exposure)
 
-    def _build_cov_call(self):
-
-        def cov_call(*parameters):
-
-            self._model.coefficients = parameters
-
-            M = self._model(self._bin_centers) * self._exposure
-            M_fixed, tiny = self._fix_precision(M)
-
-            # Replace negative values for the model (impossible in the Poisson context)
-            # with zero
-
-            negative_mask = (M < 0)
-            if negative_mask.sum() > 0:
-                M[negative_mask] = 0.0
-
-            # Poisson loglikelihood statistic (Cash) is:
-            # L = Sum ( M_i - D_i * log(M_i))
-
-            logM = self._evaluate_logM(M)
-
-            # Evaluate v_i = D_i * log(M_i): if D_i = 0 then the product is zero
-            # whatever value has log(M_i). Thus, initialize the whole vector v = {v_i}
-            # to zero, then overwrite the elements corresponding to D_i > 0
-
-            d_times_logM = np.zeros(len(self._counts))
-
-
-            d_times_logM[self._non_zero_mask] = self._counts[self._non_zero_mask] * logM[self._non_zero_mask]
-
-            log_likelihood = np.sum(M_fixed - d_times_logM)
-
-            return log_likelihood
-
-
-        self.cov_call = cov_call
-
+        # the model in counts is linear in the coefficients: M = X . a
+        # with X_ik = exposure_i * x_i^k
 
+        self._design_matrix = np.power(np.asarray(self._bin_centers, dtype=float)[:, np.newaxis], self._powers) * \
+                              np.asarray(self._exposure, dtype=float)[..., np.newaxis]
 
     def __call__(self, parameters):
         """
@@ -316,61 +438,67 @@ class PolyBinnedLogLikelihood(PolyLogLikelihood):
 
         return log_likelihood
 
+    def is_valid(self, parameters):
 
+        M = np.dot(self._design_matrix[self._non_zero_mask], parameters)
 
-class PolyUnbinnedLogLikelihood(PolyLogLikelihood):
-    """
-    Implements a Poisson likelihood (i.e., the Cash statistic). Mind that this is not
-    the Castor statistic (Cstat). The difference between the two is a constant given
-    a dataset. I kept Cash instead of Castor to make easier the comparison with ROOT
-    during tests, since ROOT implements the Cash statistic.
-    """
+        return np.all(M > 0)
 
-    def __init__(self, events, model, t_start, t_stop, exposure):
+    def gradient(self, parameters):
 
-        self._events = events
-        self._t_start = t_start  # list of starts
-        self._t_stop = t_stop
+        # dL/da_k = Sum X_ik (1 - D_i / M_i), where the linear term
+        # vanishes for the bins in which the model is clipped at zero
 
-        super(PolyUnbinnedLogLikelihood, self).__init__(model, exposure)
+        M = np.dot(self._design_matrix, parameters)
 
-    def _build_cov_call(self):
+        weights = (M > 0).astype(float)
 
-        def cov_call(*parameters):
+        weights[self._non_zero_mask] -= self._counts[self._non_zero_mask] / M[self._non_zero_mask]
 
-            # Compute the values for the model given this set of parameters
-            self._model.coefficients = parameters
+        return np.dot(self._design_matrix.T, weights)
 
-            # Integrate the polynomial (or in the future, model) over the given interval
+    def hessian(self, parameters):
 
-            n_expected_counts = 0.
+        # d2L/da_k da_l = Sum X_ik X_il D_i / M_i^2
 
-            for start, stop in zip(self._t_start, self._t_stop):
-                n_expected_counts += self._model.integral(start, stop)
+        M = np.dot(self._design_matrix, parameters)
 
-            # Now evaluate the model at the event times and multiply by the exposure
+        weights = np.zeros_like(M)
 
-            M = self._model(self._events) * self._exposure
+        weights[self._non_zero_mask] = self._counts[self._non_zero_mask] / M[self._non_zero_mask] ** 2
 
-            # Replace negative values for the model (impossible in the Poisson context)
-            # with zero
-            negative_mask = (M < 0)
+        return np.dot(self._design_matrix.T * weights, self._design_matrix)
 
-            if negative_mask.sum() > 0:
-                M[negative_mask] = 0.0
 
-            # Poisson loglikelihood statistic  is:
-            # logL = -Nexp + Sum ( log M_i )
+class PolyUnbinnedLogLikelihood(PolyLogLikelihood):
+    """
+    Implements a Poisson likelihood (i.e., the Cash statistic). Mind that this is not
+    the Castor statistic (Cstat). The difference between the two is a constant given
+    a dataset. I kept Cash instead of Castor to make easier the comparison with ROOT
+    during tests, since ROOT implements the Cash statistic.
+    """
+
+    def __init__(self, events, model, t_start, t_stop, exposure):
+
+        self._events = events
+        self._t_start = t_start  # list of starts
+        self._t_stop = t_stop
 
-            logM = self._evaluate_logM(M)
+        super(PolyUnbinnedLogLikelihood, self).__init__(model, exposure)
 
-            log_likelihood = -n_expected_counts + logM.sum()
+        # the integral of the polynomial over all the intervals is linear in the
+        # coefficients: N_exp = B . a, with B_k = Sum_j (stop_j^(k+1) - start_j^(k+1)) / (k+1)
 
-            return -log_likelihood
+        starts = np.atleast_1d(np.asarray(self._t_start, dtype=float))[:, np.newaxis]
+        stops = np.atleast_1d(np.asarray(self._t_stop, dtype=float))[:, np.newaxis]
 
-        self.cov_call = cov_call
+        self._integral_basis = ((np.power(stops, self._powers + 1) -
+                                 np.power(starts, self._powers + 1)) / (self._powers + 1)).sum(axis=0)
 
+        # the model at the event times is M = X . a with X_ek = exposure * t_e^k
 
+        self._design_matrix = np.power(np.asarray(self._events, dtype=float)[:, np.newaxis], self._powers) * \
+                              self._exposure
 
     def __call__(self, parameters):
         """
@@ -380,12 +508,9 @@ class PolyUnbinnedLogLikelihood(PolyLogLikelihood):
         # Compute the values for the model given this set of parameters
         self._model.coefficients = parameters
 
-        # Integrate the polynomial (or in the future, model) over the given interval
+        # Integrate the polynomial (or in the future, model) over the given intervals
 
-        n_expected_counts = 0.
-
-        for start, stop in zip(self._t_start, self._t_stop):
-            n_expected_counts += self._model.integral(start, stop)
+        n_expected_counts = np.dot(self._integral_basis, parameters)
 
         # Now evaluate the model at the event times and multiply by the exposure
 
@@ -407,10 +532,113 @@ class PolyUnbinnedLogLikelihood(PolyLogLikelihood):
 
         return -log_likelihood
 
+    def is_valid(self, parameters):
+
+        M = np.dot(self._design_matrix, parameters)
+
+        return np.all(M > 0)
+
+    def gradient(self, parameters):
+
+        # d(-logL)/da_k = B_k - Sum X_ek / M_e
+
+        M = np.dot(self._design_matrix, parameters)
+
+        return self._integral_basis - np.dot(self._design_matrix.T, 1. / M)
+
+    def hessian(self, parameters):
+
+        # d2(-logL)/da_k da_l = Sum X_ek X_el / M_e^2
+
+        M = np.dot(self._design_matrix, parameters)
+
+        return np.dot(self._design_matrix.T / M ** 2, self._design_matrix)
+
+
+def _newton_minimize(log_likelihood, initial_guess, max_iterations=100, tolerance=1E-8):
+    """
+    Minimize a polynomial likelihood with a damped Newton method using its analytic
+    gradient and hessian. The Cash statistic of a polynomial rate is convex, so this converges
+    in a handful of iterations from any valid starting point.
+
+    :param log_likelihood: a PolyBinnedLogLikelihood or PolyUnbinnedLogLikelihood
+    :param initial_guess: the starting coefficients
+    :param max_iterations: maximum number of Newton iterations
+    :param tolerance: convergence threshold on the Newton decrement (in units of the statistic)
+    :return: (coefficients, success)
+    """
+
+    current = np.array(initial_guess, dtype=float, ndmin=1)
+
+    if not log_likelihood.is_valid(current):
+
+        return current, False
+
+    current_value = log_likelihood(current)
+
+    for _ in range(max_iterations):
+
+        gradient = log_likelihood.gradient(current)
+
+        try:
+
+            step = np.linalg.solve(log_likelihood.hessian(current), -gradient)
+
+        except np.linalg.LinAlgError:
+
+            return current, False
+
+        # the Newton decrement is the expected decrease of the statistic
+
+        decrement = -np.dot(gradient, step)
+
+        if not np.isfinite(decrement) or decrement < 0:
+
+            return current, False
+
+        if 0.5 * decrement < tolerance:
+
+            return current, True
+
+        # backtracking line search which keeps the model positive
+
+        scale = 1.
+
+        while True:
+
+            trial = current + scale * step
+
+            if log_likelihood.is_valid(trial):
+
+                trial_value = log_likelihood(trial)
+
+                if trial_value <= current_value - 0.25 * scale * decrement:
+
+                    break
+
+            scale *= 0.5
+
+            if scale < 1E-10:
+
+                return current, False
 
+        current, current_value = trial, trial_value
 
-def polyfit(x, y, grade, exposure):
-    """ function to fit a polynomial to event data. not a member to allow parallel computation """
+    return current, False
+
+
+def polyfit(x, y, grade, exposure, initial_guess=None):
+    """
+    function to fit a polynomial to event data. not a member to allow parallel computation
+
+    :param x: the bin centers
+    :param y: the counts in each bin
+    :param grade: the grade of the polynomial
+    :param exposure: the exposure of each bin
+    :param initial_guess: (optional) coefficients to start from, such as the best fit of a lower grade (the missing
+    coefficients are set to zero). If they do not give a positive model, the default initial guess is used
+    :return: (polynomial, min log likelihood)
+    """
 
     # Check that we have enough counts to perform the fit, otherwise
     # return a "zero polynomial"
@@ -420,32 +648,46 @@ def polyfit(x, y, grade, exposure):
         # No data, nothing to do!
         return Polynomial([0.0]), 0.0
 
-    # Compute an initial guess for the polynomial parameters,
-    # with a least-square fit (with weight=1) using SVD (extremely robust):
-    # (note that polyfit returns the coefficient starting from the maximum grade,
-    # thus we need to reverse the order)
+    if initial_guess is not None:
 
-    with warnings.catch_warnings():
-        warnings.simplefilter("ignore")
+        # warm start: a lower grade solution is a valid point of the higher grade model
+
+        initial_guess = _extend_coefficients(initial_guess, grade)
+
+        polynomial = Polynomial(initial_guess)
+
+        if not PolyBinnedLogLikelihood(x, y, polynomial, exposure).is_valid(initial_guess):
+
+            initial_guess = None
+
+    if initial_guess is None:
+
+        # Compute an initial guess for the polynomial parameters,
+        # with a least-square fit (with weight=1) using SVD (extremely robust):
+        # (note that polyfit returns the coefficient starting from the maximum grade,
+        # thus we need to reverse the order)
 
-        initial_guess = np.polyfit(x, y, grade)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
 
-    initial_guess = initial_guess[::-1]
+            initial_guess = np.polyfit(x, y, grade)
 
-    polynomial = Polynomial(initial_guess)
+        initial_guess = initial_guess[::-1]
 
-    # Check that the solution found is meaningful (i.e., definite positive
-    # in the interval of interest)
-    M = polynomial(x)
+        polynomial = Polynomial(initial_guess)
+
+        # Check that the solution found is meaningful (i.e., definite positive
+        # in the interval of interest)
+        M = polynomial(x)
 
-    negative_mask = (M < 0)
+        negative_mask = (M < 0)
 
-    if negative_mask.sum() > 0:
-        # Least square fit failed to converge to a meaningful solution
-        # Reset the initialGuess to reasonable value
-        initial_guess[0] = np.mean(y)
-        meanx = np.mean(x)
-        initial_guess = map(lambda x: abs(x[1]) / pow(meanx, x[0]), enumerate(initial_guess))
+        if negative_mask.sum() > 0:
+            # Least square fit failed to converge to a meaningful solution
+            # Reset the initialGuess to reasonable value
+            initial_guess[0] = np.mean(y)
+            meanx = np.mean(x)
+            initial_guess = map(lambda x: abs(x[1]) / pow(meanx, x[0]), enumerate(initial_guess))
 
     # Improve the solution using a logLikelihood statistic (Cash statistic)
     log_likelihood = PolyBinnedLogLikelihood(x, y, polynomial, exposure)
@@ -465,10 +707,17 @@ def polyfit(x, y, grade, exposure):
 
 
 
-    final_estimate = \
-    opt.minimize(log_likelihood, initial_guess, method=threeML_config['event list']['binned fit method'],
-                 options=threeML_config['event list']['binned fit options'])['x']
-    final_estimate = np.atleast_1d(final_estimate)
+    # use the analytic derivatives, and fall back to the configured minimizer if
+    # the Newton iteration cannot proceed (i.e., invalid starting point)
+
+    final_estimate, success = _newton_minimize(log_likelihood, initial_guess)
+
+    if not success:
+
+        final_estimate = \
+        opt.minimize(log_likelihood, initial_guess, method=threeML_config['event list']['binned fit method'],
+                     options=threeML_config['event list']['binned fit options'])['x']
+        final_estimate = np.atleast_1d(final_estimate)
 
     # Get the value for cstat at the minimum
 
@@ -479,18 +728,29 @@ def polyfit(x, y, grade, exposure):
 
     final_polynomial = Polynomial(final_estimate)
 
-    final_polynomial.compute_covariance_matrix(log_likelihood.cov_call, final_estimate)
+    final_polynomial.compute_covariance_matrix_from_hessian(log_likelihood.hessian(final_estimate))
 
 
     return final_polynomial, min_log_likelihood
 
 
-def unbinned_polyfit(events, grade, t_start, t_stop, exposure, initial_amplitude=1):
+def unbinned_polyfit(events, grade, t_start, t_stop, exposure, initial_amplitude=1, initial_guess=None):
     """
     function to fit a polynomial to event data. not a member to allow parallel computation
 
+    :param events: the arrival times of the events
+    :param grade: the grade of the polynomial
+    :param t_start: the start times of the fitted intervals
+    :param t_stop: the stop times of the fitted intervals
+    :param exposure: the exposure
+    :param initial_amplitude: unused
+    :param initial_guess: (optional) coefficients to start from, such as the best fit of a lower grade (the missing
+    coefficients are set to zero). If they do not give a positive model, the default initial guess is used
+    :return: (polynomial, min log likelihood)
     """
 
+    warm_start = initial_guess
+
     # first do a simple amplitude fit
     with warnings.catch_warnings():
         warnings.simplefilter("ignore")
@@ -515,13 +775,19 @@ def unbinned_polyfit(events, grade, t_start, t_stop, exposure, initial_amplitude
                                                    t_stop,
                                                    exposure)
 
-        like_grid = []
-        for amp in search_grid:
+        if warm_start is not None and log_likelihood.is_valid(_extend_coefficients(warm_start, grade)):
+
+            initial_guess = _extend_coefficients(warm_start, grade)
+
+        else:
 
-            initial_guess[0] = amp
-            like_grid.append(log_likelihood(initial_guess))
+            like_grid = []
+            for amp in search_grid:
 
-        initial_guess[0] = search_grid[np.argmin(like_grid)]
+                initial_guess[0] = amp
+                like_grid.append(log_likelihood(initial_guess))
+
+            initial_guess[0] = search_grid[np.argmin(like_grid)]
 
         # Improve the solution
         dof = len(events) - (grade + 1)
@@ -537,11 +803,18 @@ def unbinned_polyfit(events, grade, t_start, t_stop, exposure, initial_amplitude
                                                            t_stop,
                                                            exposure)
 
-        final_estimate = \
-        opt.minimize(log_likelihood, initial_guess, method=threeML_config['event list']['unbinned fit method'],
-                     options=threeML_config['event list']['unbinned fit options'])['x']
+        # use the analytic derivatives, and fall back to the configured minimizer if
+        # the Newton iteration cannot proceed
 
-        final_estimate = np.atleast_1d(final_estimate)
+        final_estimate, success = _newton_minimize(log_likelihood, initial_guess)
+
+        if not success:
+
+            final_estimate = \
+            opt.minimize(log_likelihood, initial_guess, method=threeML_config['event list']['unbinned fit method'],
+                         options=threeML_config['event list']['unbinned fit options'])['x']
+
+            final_estimate = np.atleast_1d(final_estimate)
 
         min_log_likelihood = log_likelihood(final_estimate)
 
@@ -550,9 +823,69 @@ def unbinned_polyfit(events, grade, t_start, t_stop, exposure, initial_amplitude
 
     final_polynomial = Polynomial(final_estimate)
 
-    final_polynomial.compute_covariance_matrix(log_likelihood.cov_call, final_estimate)
+    final_polynomial.compute_covariance_matrix_from_hessian(log_likelihood.hessian(final_estimate))
 
 
 
 
     return final_polynomial, min_log_likelihood
+
+
+def _extend_coefficients(coefficients, grade):
+    """
+    the coefficients of a polynomial as coefficients of a polynomial of the given grade (padding with zeros)
+
+    :param coefficients: the polynomial coefficients (lowest order first)
+    :param grade: the new grade (not lower than the current one)
+    :return: array of size grade+1
+    """
+
+    coefficients = np.atleast_1d(np.array(coefficients, dtype=float))
+
+    assert coefficients.shape[0] <= grade + 1, 'cannot reduce the grade of a polynomial'
+
+    extended = np.zeros(grade + 1)
+
+    extended[:coefficients.shape[0]] = coefficients
+
+    return extended
+
+
+def select_polynomial_grade(fit, min_grade=0, max_grade=4, delta_threshold=9.0):
+    """
+    Find the optimal grade of a polynomial with likelihood ratio tests between consecutive grades.
+    Since a polynomial of grade k is a polynomial of grade k+1 with a null leading coefficient, the fit of
+    each grade starts from the best fit of the previous one, which makes it converge in a few iterations.
+
+    :param fit: a function fit(grade, initial_guess) returning (polynomial, min log likelihood), like polyfit and
+    unbinned_polyfit with the data bound
+    :param min_grade: the minimum grade
+    :param max_grade: the maximum grade
+    :param delta_threshold: the minimum improvement of 2 * log likelihood for a grade to be preferred to the previous one
+    :return: the best grade
+    """
+
+    log_likelihoods = []
+
+    best_fit = None
+
+    for grade in range(min_grade, max_grade + 1):
+
+        polynomial, log_like = fit(grade, best_fit)
+
+        best_fit = polynomial.coefficients
+
+        log_likelihoods.append(log_like)
+
+    delta_loglike = 2 * (np.array(log_likelihoods[:-1]) - np.array(log_likelihoods[1:]))
+
+    mask = (delta_loglike >= delta_threshold)
+
+    if len(mask.nonzero()[0]) == 0:
+
+        # best grade is the minimum one
+        return min_grade
+
+    else:
+
+        return min_grade + mask.nonzero()[0][-1] + 1
@@ -11,7 +11,9 @@ from threeML.exceptions.custom_exceptions import custom_warnings
 from threeML.io.file_utils import sanitize_filename
 from threeML.utils.spectrum.binned_spectrum import Quality
 from threeML.utils.time_interval import TimeIntervalSet
-from threeML.utils.time_series.polynomial import polyfit, unbinned_polyfit, Polynomial
+from threeML.utils.time_series.light_curve_pyramid import LightCurvePyramid
+from threeML.utils.time_series.polynomial import polyfit, unbinned_polyfit, Polynomial, PolynomialSet, \
+    select_polynomial_grade
 
 
 class ReducingNumberOfThreads(Warning):
@@ -32,6 +34,11 @@ def ceildiv(a, b):
 
 
 class TimeSeries(object):
+
+    # the maximum number of background fits kept in memory
+
+    _max_cached_polynomial_fits = 16
+
     def __init__(self, start_time, stop_time, n_channels, native_quality=None,
                  first_channel=1, ra=None, dec=None, mission=None, instrument=None, verbose=True, edges=None):
         """
@@ -110,6 +117,24 @@ class TimeSeries(object):
         self._user_poly_order = -1
         self._time_selection_exists = False
         self._poly_fit_exists = False
+        self._polynomials = None
+
+        # the last background selection (time intervals, options), to be able to repeat the fit
+
+        self._poly_selection = None
+
+        # the polynomial fits of the previous background selections
+
+        self._polynomial_fit_cache = collections.OrderedDict()
+
+        # the version of the data, increased every time the data change (for example when events are appended), so
+        # that the cached polynomial fits are never reused on different data
+
+        self._data_version = 0
+
+        # the light curve pyramid is only built on request
+
+        self._light_curve_pyramid = None
 
         self._fit_method_info = {"bin type": None, 'fit method': None}
 
@@ -180,38 +205,51 @@ class TimeSeries(object):
 
         Get the total poly counts
 
-        :param start:
-        :param stop:
-        :return:
+        :param start: start time(s) (scalar or array)
+        :param stop: stop time(s) (scalar or array)
+        :param mask: a boolean mask on the channels to sum over
+        :return: the counts summed over the channels (same shape as the broadcasted start/stop)
         """
         if mask is None:
-            mask = np.ones_like(self._polynomials, dtype=np.bool)
+            mask = np.ones(len(self._polynomials), dtype=bool)
 
-        total_counts = 0
-
-        for p in np.asarray(self._polynomials)[mask]:
-            total_counts += p.integral(start, stop)
-
-        return total_counts
+        return self._polynomials.integral(start, stop)[..., mask].sum(axis=-1)
 
     def get_total_poly_error(self, start, stop, mask=None):
         """
 
         Get the total poly error
 
-        :param start:
-        :param stop:
-        :return:
+        :param start: start time(s) (scalar or array)
+        :param stop: stop time(s) (scalar or array)
+        :param mask: a boolean mask on the channels to sum over
+        :return: the error summed in quadrature over the channels (same shape as the broadcasted start/stop)
         """
         if mask is None:
-            mask = np.ones_like(self._polynomials, dtype=np.bool)
+            mask = np.ones(len(self._polynomials), dtype=bool)
+
+        return np.sqrt((self._polynomials.integral_error(start, stop)[..., mask] ** 2).sum(axis=-1))
 
-        total_counts = 0
+    def _integrate_polynomials(self, starts, stops):
+        """
+        integrate the polynomials of all the channels over a set of intervals in one go
+
+        :param starts: the start times of the intervals
+        :param stops: the stop times of the intervals
+        :return: (counts, errors) per channel, summed over the intervals (errors in quadrature)
+        """
 
-        for p in np.asarray(self._polynomials)[mask]:
-            total_counts += p.integral_error(start, stop) ** 2
+        if not self._poly_fit_exists:
+            raise RuntimeError('A polynomial fit to the channels does not exist!')
 
-        return np.sqrt(total_counts)
+        starts = np.atleast_1d(starts)
+        stops = np.atleast_1d(stops)
+
+        counts = self._polynomials.integral(starts, stops).sum(axis=0)
+
+        errors = np.sqrt((self._polynomials.integral_error(starts, stops) ** 2).sum(axis=0))
+
+        return counts, errors
 
     @property
     def bins(self):
@@ -299,6 +337,172 @@ class TimeSeries(object):
 
         raise RuntimeError("Must be implemented in sub class")
 
+    def count_per_channel_over_intervals(self, starts, stops):
+        """
+        the counts per channel over a set of intervals
+
+        :param starts: start times of the intervals
+        :param stops: stop times of the intervals
+        :return: (n_intervals x n_channels) array
+        """
+
+        return np.array([self.count_per_channel_over_interval(start, stop) for start, stop in zip(starts, stops)])
+
+    def counts_over_intervals(self, starts, stops):
+        """
+        the number of counts over a set of intervals
+
+        :param starts: start times of the intervals
+        :param stops: stop times of the intervals
+        :return: array of counts
+        """
+
+        return self.count_per_channel_over_intervals(starts, stops).sum(axis=1)
+
+    def exposure_over_intervals(self, starts, stops):
+        """
+        the exposure over a set of intervals
+
+        :param starts: start times of the intervals
+        :param stops: stop times of the intervals
+        :return: array of exposures
+        """
+
+        return np.array([self.exposure_over_interval(start, stop) for start, stop in zip(starts, stops)])
+
+    def get_interval_slices(self, starts, stops):
+        """
+        Extract the information over each of a set of intervals in one pass: the
+        counts, exposures and background polynomial integrals of all the intervals are computed
+        together. Each interval is returned as a TimeSeriesSlice, which can be used in place of
+        the time series to build spectra (i.e., with from_time_series).
+
+        :param starts: start times of the intervals
+        :param stops: stop times of the intervals
+        :return: list of TimeSeriesSlice
+        """
+
+        starts = np.atleast_1d(np.asarray(starts, dtype=float))
+        stops = np.atleast_1d(np.asarray(stops, dtype=float))
+
+        assert starts.shape == stops.shape, 'must have equal number of start and stop times'
+
+        counts = self.count_per_channel_over_intervals(starts, stops)
+
+        exposures = self.exposure_over_intervals(starts, stops)
+
+        if self._poly_fit_exists:
+
+            poly_counts = self._polynomials.integral(starts, stops)
+
+            poly_count_err = self._polynomials.integral_error(starts, stops)
+
+        else:
+
+            poly_counts = [None] * len(starts)
+
+            poly_count_err = [None] * len(starts)
+
+        return [TimeSeriesSlice(self, start, stop, these_counts, exposure, these_poly_counts, these_poly_count_err)
+                for start, stop, these_counts, exposure, these_poly_counts, these_poly_count_err
+                in zip(starts, stops, counts, exposures, poly_counts, poly_count_err)]
+
+    def get_information_over_intervals(self, starts, stops, use_poly=False, extract=False):
+        """
+        The information of get_information_dict for each of a set of intervals, computed in one pass. Counts, rates
+        and their errors are (n_intervals x n_channels) arrays, while tstart, telapse and exposure have one element per
+        interval. This is meant to write many spectra at once (see PHAII.from_time_series).
+
+        :param starts: start times of the intervals
+        :param stops: stop times of the intervals
+        :param use_poly: (bool) choose to build from the polynomial fits
+        :param extract: (bool) choose to build from the counts of the background selection
+        :return: dict
+        """
+
+        starts = np.atleast_1d(np.asarray(starts, dtype=float))
+        stops = np.atleast_1d(np.asarray(stops, dtype=float))
+
+        assert starts.shape == stops.shape, 'must have equal number of start and stop times'
+
+        n_intervals = starts.shape[0]
+
+        if use_poly or extract:
+
+            assert self._poly_fit_exists, 'A polynomial fit must exist to use the background'
+
+        if extract:
+
+            # the background selection is the same for all the intervals
+
+            is_poisson = True
+
+            exposure = np.ones(n_intervals) * self._poly_exposure
+            counts = np.tile(self._poly_selected_counts, (n_intervals, 1))
+            counts_err = None
+            rates = counts / self._poly_exposure
+            rate_err = None
+
+        elif use_poly:
+
+            is_poisson = False
+
+            exposure = self.exposure_over_intervals(starts, stops)
+            counts = self._polynomials.integral(starts, stops)
+            counts_err = self._polynomials.integral_error(starts, stops)
+
+            # removing negative counts
+
+            idx = counts < 0.
+
+            counts[idx] = 0.
+            counts_err[idx] = 0.
+
+            rates = counts / exposure[:, np.newaxis]
+            rate_err = counts_err / exposure[:, np.newaxis]
+
+        else:
+
+            is_poisson = True
+
+            exposure = self.exposure_over_intervals(starts, stops)
+            counts = self.count_per_channel_over_intervals(starts, stops)
+            counts_err = None
+            rates = counts / exposure[:, np.newaxis]
+            rate_err = None
+
+        if self._native_quality is None:
+
+            quality = Quality.from_ogip(np.zeros(self._n_channels, dtype=int))
+
+        elif isinstance(self._native_quality, Quality):
+
+            quality = self._native_quality
+
+        else:
+
+            quality = Quality.from_ogip(self._native_quality)
+
+        container_dict = {}
+
+        container_dict['instrument'] = self._instrument
+        container_dict['telescope'] = self._mission
+        container_dict['tstart'] = starts
+        container_dict['telapse'] = stops - starts
+        container_dict['channel'] = np.arange(self._n_channels) + self._first_channel
+        container_dict['counts'] = counts
+        container_dict['counts error'] = counts_err
+        container_dict['rates'] = rates
+        container_dict['rate error'] = rate_err
+        container_dict['is_poisson'] = is_poisson
+        container_dict['edges'] = self._edges
+        container_dict['quality'] = quality
+        container_dict['backfile'] = 'NONE'
+        container_dict['grouping'] = np.ones(self._n_channels)
+        container_dict['exposure'] = exposure
+
+        return container_dict
+
     def set_polynomial_fit_interval(self, *time_intervals, **options):
         """Set the time interval to fit the background.
         Multiple intervals can be input as separate arguments
@@ -311,6 +515,8 @@ class TimeSeries(object):
 
         """
 
+        self._poly_selection = (time_intervals, dict(options))
+
         # Find out if we want to binned or unbinned.
         # TODO: add the option to config file
         if 'unbinned' in options:
@@ -382,18 +588,28 @@ class TimeSeries(object):
 
         self._poly_intervals = poly_intervals
 
-        # Fit the events with the given intervals
-        if unbinned:
+        # the same selection on the same data gives the same fit, so that we can reuse a previous one
+
+        cache_key = (tuple(new_intervals), unbinned, self._user_poly_order, self._data_version)
 
-            self._unbinned = True  # keep track!
+        self._unbinned = unbinned  # keep track!
 
-            self._unbinned_fit_polynomials()
+        if cache_key in self._polynomial_fit_cache:
+
+            self._restore_cached_polynomial_fit(cache_key)
 
         else:
 
-            self._unbinned = False
+            # Fit the events with the given intervals
+            if unbinned:
+
+                self._unbinned_fit_polynomials()
+
+            else:
+
+                self._fit_polynomials()
 
-            self._fit_polynomials()
+            self._cache_polynomial_fit(cache_key)
 
         # we have a fit now
 
@@ -409,6 +625,73 @@ class TimeSeries(object):
         if self._time_selection_exists:
             self.set_active_time_intervals(*self._time_intervals.to_string().split(','))
 
+    def refit_polynomials(self):
+        """
+        Repeat the last background fit (same selections and options), for example after new data have been
+        appended. The fits start from the previous polynomials.
+
+        :return: none
+        """
+
+        assert self._poly_selection is not None, 'There is no background selection to fit'
+
+        time_intervals, options = self._poly_selection
+
+        self.set_polynomial_fit_interval(*time_intervals, **dict(options))
+
+    def _get_warm_start(self, grade):
+        """
+        the coefficients of the current polynomials, to be used as starting points of a new fit
+        of the given grade (None for the channels where they cannot be used)
+
+        :param grade: the grade of the new fit
+        :return: list with one element per channel
+        """
+
+        if self._polynomials is None or len(self._polynomials) != self._n_channels:
+
+            return [None] * self._n_channels
+
+        return [polynomial.coefficients if polynomial.degree <= grade else None for polynomial in self._polynomials]
+
+    def _cache_polynomial_fit(self, cache_key):
+        """
+        store the current polynomial fit in the cache, dropping the least recently used fit if the cache is full
+
+        :param cache_key: the key of the selection
+        :return: none
+        """
+
+        self._polynomial_fit_cache[cache_key] = (self._poly_intervals,
+                                                 self._polynomials,
+                                                 self._optimal_polynomial_grade,
+                                                 dict(self._fit_method_info))
+
+        while len(self._polynomial_fit_cache) > self._max_cached_polynomial_fits:
+
+            self._polynomial_fit_cache.popitem(last=False)
+
+    def _restore_cached_polynomial_fit(self, cache_key):
+        """
+        make a cached polynomial fit the current one
+
+        :param cache_key: the key of the selection
+        :return: none
+        """
+
+        # move the fit at the end, as the most recently used
+
+        cached_fit = self._polynomial_fit_cache.pop(cache_key)
+
+        self._polynomial_fit_cache[cache_key] = cached_fit
+
+        poly_intervals, polynomials, grade, fit_method_info = cached_fit
+
+        self._poly_intervals = poly_intervals
+        self._polynomials = polynomials
+        self._optimal_polynomial_grade = grade
+        self._fit_method_info = dict(fit_method_info)
+
     def get_information_dict(self, use_poly=False, extract=False):
         """
         Return a PHAContainer that can be read by different builders
@@ -418,13 +701,47 @@ class TimeSeries(object):
         if not self._time_selection_exists:
             raise RuntimeError('No time selection exists! Cannot calculate rates')
 
+        if use_poly or extract:
+
+            poly_counts = self._poly_counts
+            poly_count_err = self._poly_count_err
+
+        else:
+
+            poly_counts = None
+            poly_count_err = None
+
+        return self._build_information_dict(self._counts, self._exposure, self._time_intervals,
+                                            poly_counts, poly_count_err, use_poly, extract)
+
+    def _build_information_dict(self, counts, exposure, time_intervals, poly_counts, poly_count_err,
+                                use_poly=False, extract=False):
+        """
+        build the PHAContainer dictionary from the counts, exposure and background
+        of a time selection
+
+        :param counts: the counts per channel of the selection
+        :param exposure: the exposure of the selection
+        :param time_intervals: the TimeIntervalSet of the selection
+        :param poly_counts: the background polynomial counts per channel over the selection
+        :param poly_count_err: the error on the background polynomial counts
+        :param use_poly: (bool) choose to build from the polynomial fits
+        :param extract: (bool) choose to build from the counts of the background selection
+        :return: dict
+        """
+
+        # keep the original names for the selected quantities
+
+        selected_counts = counts
+        selected_exposure = exposure
+
         if extract:
 
             is_poisson = True
 
             counts_err = None
             counts = self._poly_selected_counts
-            rates = self._counts / self._poly_exposure
+            rates = selected_counts / self._poly_exposure
             rate_err = None
             exposure = self._poly_exposure
 
@@ -433,11 +750,11 @@ class TimeSeries(object):
 
             is_poisson = False
 
-            counts_err = self._poly_count_err
-            counts = self._poly_counts
-            rate_err = self._poly_count_err / self._exposure
-            rates = self._poly_counts / self._exposure
-            exposure = self._exposure
+            counts_err = poly_count_err
+            counts = poly_counts
+            rate_err = poly_count_err / selected_exposure
+            rates = poly_counts / selected_exposure
+            exposure = selected_exposure
 
             # removing negative counts
 
@@ -454,11 +771,11 @@ class TimeSeries(object):
             is_poisson = True
 
             counts_err = None
-            counts = self._counts
-            rates = self._counts / self._exposure
+            counts = selected_counts
+            rates = selected_counts / selected_exposure
             rate_err = None
 
-            exposure = self._exposure
+            exposure = selected_exposure
 
 
 
@@ -475,8 +792,8 @@ class TimeSeries(object):
 
         container_dict['instrument'] = self._instrument
         container_dict['telescope'] = self._mission
-        container_dict['tstart'] = self._time_intervals.absolute_start_time
-        container_dict['telapse'] = self._time_intervals.absolute_stop_time - self._time_intervals.absolute_start_time
+        container_dict['tstart'] = time_intervals.absolute_start_time
+        container_dict['telapse'] = time_intervals.absolute_stop_time - time_intervals.absolute_start_time
         container_dict['channel'] = np.arange(self._n_channels) + self._first_channel
         container_dict['counts'] = counts
         container_dict['counts error'] = counts_err
@@ -543,39 +860,10 @@ class TimeSeries(object):
         :return: polynomial grade
         """
 
-        min_grade = 0
-        max_grade = 4
-        log_likelihoods = []
-
-        for grade in range(min_grade, max_grade + 1):
-            polynomial, log_like = polyfit(bins, cnts, grade, exposure)
-
-            log_likelihoods.append(log_like)
-
-        # Found the best one
-        delta_loglike = np.array(map(lambda x: 2 * (x[0] - x[1]), zip(log_likelihoods[:-1], log_likelihoods[1:])))
-
-        # print("\ndelta log-likelihoods:")
-
-        # for i in range(max_grade):
-        #    print("%s -> %s: delta Log-likelihood = %s" % (i, i + 1, deltaLoglike[i]))
-
-        # print("")
-
-        delta_threshold = 9.0
-
-        mask = (delta_loglike >= delta_threshold)
-
-        if (len(mask.nonzero()[0]) == 0):
-
-            # best grade is zero!
-            best_grade = 0
+        # each grade is started from the best fit of the previous one
 
-        else:
-
-            best_grade = mask.nonzero()[0][-1] + 1
-
-        return best_grade
+        return select_polynomial_grade(lambda grade, initial_guess: polyfit(bins, cnts, grade, exposure,
+                                                                            initial_guess=initial_guess))
 
     def _unbinned_fit_global_and_determine_optimum_grade(self, events, exposure):
         """
@@ -591,35 +879,14 @@ class TimeSeries(object):
         # Fit the sum of all the channels to determine the optimal polynomial
         # grade
 
-        min_grade = 0
-        max_grade = 4
-        log_likelihoods = []
-
         t_start = self._poly_intervals.start_times
         t_stop = self._poly_intervals.stop_times
 
-        for grade in range(min_grade, max_grade + 1):
-            polynomial, log_like = unbinned_polyfit(events, grade, t_start, t_stop, exposure)
-
-            log_likelihoods.append(log_like)
-
-        # Found the best one
-        delta_loglike = np.array(map(lambda x: 2 * (x[0] - x[1]), zip(log_likelihoods[:-1], log_likelihoods[1:])))
-
-        delta_threshold = 9.0
-
-        mask = (delta_loglike >= delta_threshold)
-
-        if (len(mask.nonzero()[0]) == 0):
+        # each grade is started from the best fit of the previous one
 
-            # best grade is zero!
-            best_grade = 0
-
-        else:
-
-            best_grade = mask.nonzero()[0][-1] + 1
-
-        return best_grade
+        return select_polynomial_grade(lambda grade, initial_guess: unbinned_polyfit(events, grade, t_start, t_stop,
+                                                                                     exposure,
+                                                                                     initial_guess=initial_guess))
 
     def _fit_polynomials(self):
 
@@ -705,7 +972,7 @@ class TimeSeries(object):
 
             covariance = store['covariance']
 
-            self._polynomials = []
+            polynomials = []
 
             # create new polynomials
 
@@ -720,7 +987,9 @@ class TimeSeries(object):
 
                 cov = covariance.loc[i]
 
-                self._polynomials.append(Polynomial.from_previous_fit(coeff, cov))
+                polynomials.append(Polynomial.from_previous_fit(coeff, cov))
+
+            self._polynomials = PolynomialSet(polynomials)
 
             metadata = store.get_storer('coefficients').attrs.metadata
 
@@ -763,3 +1032,194 @@ class TimeSeries(object):
     def view_lightcurve(self, start=-10, stop=20., dt=1., use_binner=False):
 
         raise NotImplementedError('must be implemented in subclass')
+
+    def build_light_curve_pyramid(self, base_dt=0.01, n_levels=8):
+        """
+        Precompute a light curve pyramid: the cumulative counts per channel and the cumulative exposure
+        on a grid of resolution base_dt (anchored at t=0) covering the data, plus coarser power-of-two levels.
+        Afterwards, any light curve with a dt which is a power-of-two multiple of base_dt (and a start
+        on the corresponding grid) is obtained from the pyramid in O(n_bins), for any channel range.
+
+        NOTE: the base level takes (n_base_bins x n_channels) integers of memory
+
+        :param base_dt: the resolution of the base level
+        :param n_levels: the number of levels
+        :return: the LightCurvePyramid
+        """
+
+        assert base_dt > 0, 'base_dt must be positive'
+
+        assert n_levels >= 1, 'there must be at least one level'
+
+        # pad the grid so that it is covered by an integer number of bins of the coarsest level
+
+        coarsest_dt = base_dt * 2 ** (n_levels - 1)
+
+        grid_start = np.floor(self._start_time / coarsest_dt) * coarsest_dt
+
+        grid_stop = np.ceil(self._stop_time / coarsest_dt) * coarsest_dt
+
+        n_base_bins = int(np.round((grid_stop - grid_start) / base_dt))
+
+        edges = grid_start + np.arange(n_base_bins + 1) * base_dt
+
+        counts, exposure = self._get_base_light_curve(edges)
+
+        self._light_curve_pyramid = LightCurvePyramid(grid_start, base_dt, counts, exposure, n_levels)
+
+        return self._light_curve_pyramid
+
+    @property
+    def light_curve_pyramid(self):
+        """
+        the light curve pyramid (None if it has not been built)
+        """
+
+        return self._light_curve_pyramid
+
+    def get_light_curve(self, start, stop, dt, channel_range=None):
+        """
+        Get a light curve with bins of width dt between start and stop, summing the counts
+        of the channels in channel_range. The light curve is read from the light curve pyramid
+        when it has been built and the bins are on one of its grids, otherwise it is computed from the data.
+
+        :param start: the start of the light curve
+        :param stop: the stop of the light curve
+        :param dt: the width of the bins
+        :param channel_range: (first, last) channels to sum (inclusive, in native channel numbers). None uses all
+        :return: (time_bins, counts, exposure, bkg counts) where bkg counts is None if there is no polynomial fit
+        """
+
+        edges = np.arange(start, stop + dt, dt)
+
+        if channel_range is None:
+
+            channel_start = 0
+            channel_stop = self._n_channels
+
+        else:
+
+            channel_start = channel_range[0] - self._first_channel
+            channel_stop = channel_range[1] - self._first_channel + 1
+
+            assert 0 <= channel_start < channel_stop <= self._n_channels, 'invalid channel range %s' % (channel_range,)
+
+        light_curve = None
+
+        if self._light_curve_pyramid is not None:
+
+            light_curve = self._light_curve_pyramid.get_light_curve(edges, channel_start, channel_stop)
+
+        channel_mask = np.zeros(self._n_channels, dtype=bool)
+
+        channel_mask[channel_start:channel_stop] = True
+
+        if light_curve is None:
+
+            light_curve = self._get_light_curve_directly(edges, channel_mask)
+
+        counts, exposure = light_curve
+
+        # the background is the analytical integral of the polynomials
+
+        if self._poly_fit_exists:
+
+            bkg = self.get_total_poly_count(edges[:-1], edges[1:], channel_mask)
+
+        else:
+
+            bkg = None
+
+        time_bins = np.vstack((edges[:-1], edges[1:])).T
+
+        return time_bins, counts, exposure, bkg
+
+    def _get_base_light_curve(self, edges):
+        """
+        the counts per channel and the exposure of each bin defined by the edges
+
+        :param edges: the bin edges
+        :return: ((n_bins x n_channels) counts, exposure)
+        """
+
+        raise NotImplementedError('must be implemented in subclass')
+
+    def _get_light_curve_directly(self, edges, channel_mask):
+        """
+        the counts (summed over the channels in the mask) and the exposure of each bin defined by the edges
+
+        :param edges: the bin edges
+        :param channel_mask: boolean mask of the channels to use
+        :return: (counts, exposure)
+        """
+
+        raise NotImplementedError('must be implemented in subclass')
+
+
+class TimeSeriesSlice(object):
+    def __init__(self, time_series, start, stop, counts, exposure, poly_counts=None, poly_count_err=None):
+        """
+        A light-weight view of a TimeSeries over a single interval, holding the precomputed
+        counts, exposure and background of the interval. It exposes the same get_information_dict
+        interface as the time series, so it can be used in its place to build spectra.
+
+        These are built in bulk with TimeSeries.get_interval_slices
+
+        :param time_series: the parent TimeSeries
+        :param start: start of the interval
+        :param stop: stop of the interval
+        :param counts: the counts per channel in the interval
+        :param exposure: the exposure of the interval
+        :param poly_counts: the background polynomial counts per channel in the interval
+        :param poly_count_err: the error on the background polynomial counts
+        """
+
+        self._time_series = time_series
+        self._time_intervals = TimeIntervalSet.from_starts_and_stops([start], [stop])
+        self._counts = counts
+        self._exposure = exposure
+        self._poly_counts = poly_counts
+        self._poly_count_err = poly_count_err
+
+    @property
+    def time_intervals(self):
+        """
+        the time interval of the slice
+
+        :return: TimeIntervalSet
+        """
+
+        return self._time_intervals
+
+    @property
+    def counts(self):
+
+        return self._counts
+
+    @property
+    def exposure(self):
+
+        return self._exposure
+
+    def get_information_dict(self, use_poly=False, extract=False):
+        """
+        Return a PHAContainer that can be read by different builders
+
+        :param use_poly: (bool) choose to build from the polynomial fits
+        :param extract: (bool) choose to build from the counts of the background selection
+        """
+
+        if use_poly:
+
+            # the background counts are modified in place
+
+            poly_counts = np.array(self._poly_counts)
+            poly_count_err = np.array(self._poly_count_err)
+
+        else:
+
+            poly_counts = self._poly_counts
+            poly_count_err = self._poly_count_err
+
+        return self._time_series._build_information_dict(self._counts, self._exposure, self._time_intervals,
+                                                         poly_counts, poly_count_err, use_poly, extract)